@@ -28,7 +28,7 @@ v1.0.0 (2025-11-17):
 
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -119,6 +119,90 @@ class Settings(BaseSettings):
     MAX_UPLOAD_SIZE_MB: int = 10
     UPLOAD_FOLDER: str = "uploads"
 
+    # ========================================================================
+    # OBJECT STORAGE & MEDIA UPLOADS
+    # ========================================================================
+    # 'supabase' (Supabase Storage) or 'local' (files under
+    # STORAGE_LOCAL_ROOT, served at /storage; for tests and offline use)
+    STORAGE_BACKEND: str = "supabase"
+    STORAGE_LOCAL_ROOT: str = "uploads/storage"
+    # Base of public URLs for the local backend (defaults to API_BASE_URL/storage)
+    STORAGE_LOCAL_PUBLIC_URL: str = ""
+    # Pooled HTTP connections to Supabase Storage per worker
+    STORAGE_MAX_CONNECTIONS: int = Field(default=10, ge=1)
+    STORAGE_TIMEOUT_SECONDS: float = Field(default=60.0, gt=0)
+    # Objects transferred at once by download_many / upload_many
+    STORAGE_BATCH_CONCURRENCY: int = Field(default=8, ge=1)
+    # Lifetime of signed URLs when the caller does not choose one
+    STORAGE_SIGNED_URL_EXPIRY_SECONDS: int = Field(default=3600, ge=1)
+    # Files of one request uploaded at once
+    MEDIA_UPLOAD_CONCURRENCY: int = Field(default=4, ge=1)
+    # Threads decoding/resizing images (outside the event loop)
+    MEDIA_PROCESS_WORKERS: int = Field(default=2, ge=1)
+    # Photos larger than this (longest side, px) are downsized; 0 keeps originals
+    MEDIA_MAX_IMAGE_DIMENSION: int = Field(default=2048, ge=0)
+    MEDIA_JPEG_QUALITY: int = Field(default=85, ge=1, le=95)
+
+    # ========================================================================
+    # DOCUMENT NUMBERING
+    # ========================================================================
+    # Numbers reserved per worker per database round trip. 1 keeps numbers
+    # in creation order; larger blocks cut writes during bursts but leave
+    # gaps when a worker restarts with unused numbers.
+    DOC_SEQUENCE_BLOCK_SIZE: int = Field(default=1, ge=1)
+
+    # ========================================================================
+    # SYNC JOBS
+    # ========================================================================
+    # Jobs of the nightly Zoho/WooCommerce sync start this many seconds apart
+    SYNC_STAGGER_SECONDS: int = Field(default=30, ge=0)
+    # Jobs allowed to run at once per group (zoho jobs share one API quota
+    # and OAuth token); JSON in the environment, e.g. {"zoho": 1, "woocommerce": 2}
+    SYNC_CONCURRENCY_GROUPS: Dict[str, int] = {"zoho": 1, "woocommerce": 2}
+    # Seconds between progress writes to sync_runs while a job runs
+    SYNC_PROGRESS_INTERVAL_SECONDS: float = Field(default=2.0, gt=0)
+
+    # ========================================================================
+    # STOCK ALLOCATION CLEANUP
+    # ========================================================================
+    # Allocations untouched for this many hours are released back to stock
+    ALLOCATION_TIMEOUT_HOURS: int = Field(default=24, ge=1)
+    # Minutes between scheduled release runs
+    ALLOCATION_CLEANUP_INTERVAL_MINUTES: int = Field(default=15, ge=1)
+    # Inventory rows released per statement (each chunk is its own short
+    # transaction, so row locks are held only while that chunk is written)
+    ALLOCATION_CLEANUP_CHUNK_SIZE: int = Field(default=500, ge=1)
+
+    # ========================================================================
+    # WASTAGE ANALYTICS
+    # ========================================================================
+    # Days (including today, IST) rebuilt from wastage_events by each
+    # reconcile run of the daily wastage rollup
+    WASTAGE_ROLLUP_RECONCILE_DAYS: int = Field(default=7, ge=1)
+    # Minutes between scheduled reconcile runs
+    WASTAGE_ROLLUP_RECONCILE_INTERVAL_MINUTES: int = Field(default=60, ge=1)
+    # Wastage threshold alerts compare wastage with quantities received
+    # over this many days (including today, IST)
+    WASTAGE_ALERT_WINDOW_DAYS: int = Field(default=7, ge=1)
+    # An active alert resolves once wastage drops this many percent below
+    # its threshold (e.g. 20 with a 10% threshold: resolves under 8%)
+    WASTAGE_ALERT_HYSTERESIS_PERCENT: float = Field(default=20.0, ge=0, lt=100)
+
+    # ========================================================================
+    # ZOHO BOOKS API LIMITS
+    # ========================================================================
+    # Zoho allows 100 requests/minute per organization and 5 (free) to 10
+    # (paid) concurrent calls; the daily quota depends on the plan and is
+    # read from response headers
+    ZOHO_REQUESTS_PER_MINUTE: int = Field(default=100, ge=1)
+    # Requests that may go out back to back; the rest of the per-minute
+    # budget is spread evenly, so no 60s window exceeds the limit
+    ZOHO_REQUEST_BURST: int = Field(default=10, ge=1)
+    ZOHO_MAX_CONCURRENT_REQUESTS: int = Field(default=5, ge=1)
+    # Retries for 429 / 5xx / network errors, with exponential backoff
+    ZOHO_MAX_RETRIES: int = Field(default=5, ge=0)
+    ZOHO_RETRY_MAX_DELAY_SECONDS: float = Field(default=60.0, gt=0)
+
     class Config:
         """Pydantic configuration"""
 
@@ -2,11 +2,16 @@
 ================================================================================
 Marketplace ERP - Database Connection Manager
 ================================================================================
-Version: 1.2.0
-Last Updated: 2025-11-17
+Version: 1.3.0
+Last Updated: 2026-10-18
 
 Changelog:
 ----------
+v1.3.0 (2026-10-18):
+  - Added keyset (cursor) pagination helpers: SortKey, keyset_condition,
+    keyset_order_by, keyset_page, encode_cursor/decode_cursor
+  - Added count_rows() with exact, estimated (planner) and no-count modes
+
 v1.2.0 (2025-11-17):
   - CRITICAL: Fixed execute_query() to handle RETURNING clauses properly
   - Added transaction-aware helper functions (fetch_one_tx, fetch_all_tx, execute_query_tx)
@@ -27,7 +32,14 @@ v1.0.0 (2025-11-17):
 """
 
 import asyncpg
-from typing import Optional, Dict, List, Any
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Optional, Dict, List, Any, NamedTuple
+from uuid import UUID
 import logging
 
 from app.config import settings
@@ -374,3 +386,192 @@ def paginate_query(
     offset = (page - 1) * page_size
     paginated_query = f"{base_query} LIMIT {page_size} OFFSET {offset}"
     return paginated_query, offset
+
+
+# ============================================================================
+# KEYSET (CURSOR) PAGINATION
+# ============================================================================
+#
+# OFFSET pagination makes Postgres produce and discard every row before the
+# requested page, so deep pages get progressively slower. Keyset pagination
+# instead remembers the sort values of the last row returned (the cursor) and
+# asks for rows strictly after it, which an index on the sort columns answers
+# in constant time regardless of depth.
+#
+# Usage:
+#     sort = [SortKey("t.created_at", "created_at", descending=True),
+#             SortKey("t.id", "id", descending=True)]
+#     condition, cursor_params = keyset_condition(sort, cursor, param_count)
+#     ...
+#     rows = await fetch_all(f"... {where} {keyset_order_by(sort)} LIMIT {limit + 1}", *params)
+#     rows, next_cursor = keyset_page(rows, sort, limit)
+#
+# The last sort key must be unique (normally the primary key) so that rows
+# with equal leading values are neither skipped nor repeated. Sort expressions
+# must never be NULL; wrap nullable columns in COALESCE and pass a default.
+
+
+class CountMode(str, Enum):
+    """How list endpoints compute their total row count"""
+    EXACT = "exact"          # SELECT COUNT(*) - accurate, scans all matches
+    ESTIMATED = "estimated"  # Planner row estimate from table statistics
+    NONE = "none"            # Skip counting entirely
+
+
+class SortKey(NamedTuple):
+    """One column of a keyset sort order"""
+    expression: str          # SQL expression used in ORDER BY / WHERE
+    key: str                 # Column name of the value in result rows
+    descending: bool = False
+    default: Any = None      # Value used when the row value is NULL
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    if isinstance(value, UUID):
+        return {"u": str(value)}
+    return value
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+        if "u" in value:
+            return UUID(value["u"])
+        raise ValueError("Invalid cursor")
+    return value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encode the sort values of a row as an opaque, URL-safe cursor string.
+    """
+    payload = json.dumps([_encode_cursor_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, expected_length: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed or does not match the sort order
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != expected_length:
+            raise ValueError("Invalid cursor")
+        return [_decode_cursor_value(v) for v in values]
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_order_by(sort_keys: List[SortKey]) -> str:
+    """Build the ORDER BY clause matching a keyset sort order."""
+    return "ORDER BY " + ", ".join(
+        f"{k.expression} {'DESC' if k.descending else 'ASC'}" for k in sort_keys
+    )
+
+
+def keyset_condition(
+    sort_keys: List[SortKey], cursor: Optional[str], param_start: int
+) -> tuple[Optional[str], List]:
+    """
+    Build the WHERE condition selecting rows after the cursor position.
+
+    Args:
+        sort_keys: Sort order of the list query
+        cursor: Cursor from a previous page, or None for the first page
+        param_start: Number of the first $n placeholder to use
+
+    Returns:
+        Tuple of (condition SQL or None, list of values to bind)
+
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    if not cursor:
+        return None, []
+
+    values = decode_cursor(cursor, len(sort_keys))
+    placeholders = [f"${param_start + i}" for i in range(len(sort_keys))]
+
+    # Uniform direction: a row-value comparison lets Postgres use one index range scan
+    if len({k.descending for k in sort_keys}) == 1:
+        op = "<" if sort_keys[0].descending else ">"
+        columns = ", ".join(k.expression for k in sort_keys)
+        return f"({columns}) {op} ({', '.join(placeholders)})", values
+
+    # Mixed directions: expand into (a > x) OR (a = x AND b < y) ...
+    branches = []
+    for i, key in enumerate(sort_keys):
+        equalities = [f"{sort_keys[j].expression} = {placeholders[j]}" for j in range(i)]
+        op = "<" if key.descending else ">"
+        branches.append(" AND ".join(equalities + [f"{key.expression} {op} {placeholders[i]}"]))
+    return "(" + " OR ".join(f"({b})" for b in branches) + ")", values
+
+
+def keyset_page(
+    rows: List[Dict], sort_keys: List[SortKey], limit: int
+) -> tuple[List[Dict], Optional[str]]:
+    """
+    Trim a result fetched with LIMIT limit + 1 and compute the next cursor.
+
+    Returns:
+        Tuple of (rows for this page, cursor for the next page or None)
+    """
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    values = [
+        last[k.key] if last[k.key] is not None else k.default
+        for k in sort_keys
+    ]
+    return rows, encode_cursor(values)
+
+
+async def count_rows(
+    from_clause: str, *values, mode: CountMode = CountMode.EXACT
+) -> Optional[int]:
+    """
+    Count rows for a list query according to the requested count mode.
+
+    Args:
+        from_clause: Everything from FROM onwards, e.g. "FROM tickets t WHERE ..."
+        *values: Values bound to placeholders in from_clause
+        mode: EXACT runs COUNT(*), ESTIMATED reads the planner's row estimate,
+              NONE skips counting
+
+    Returns:
+        Row count, or None when mode is NONE
+    """
+    if mode == CountMode.NONE:
+        return None
+
+    try:
+        async with pool.acquire() as conn:
+            if mode == CountMode.ESTIMATED:
+                plan = await conn.fetchval(
+                    f"EXPLAIN (FORMAT JSON) SELECT 1 {from_clause}", *values
+                )
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]["Plan"]["Plan Rows"])
+
+            return await conn.fetchval(f"SELECT COUNT(*) {from_clause}", *values)
+    except Exception as e:
+        logger.error(f"Query error (count_rows): {e}")
+        raise
@@ -51,6 +51,7 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import logging
 import time
@@ -60,6 +61,7 @@ from app.config import settings, display_settings
 from app.database import connect_db, disconnect_db, check_database_health
 from app.scheduler import start_scheduler, stop_scheduler, get_scheduler_status
 from app.utils.settings_diagnostics import diagnose_settings_at_startup
+from app.utils.storage import close_storage_client
 
 # ============================================================================
 # LOGGING SETUP
@@ -125,6 +127,9 @@ async def lifespan(app: FastAPI):
     # Stop background scheduler
     stop_scheduler()
 
+    # Close pooled storage connections
+    await close_storage_client()
+
     # Disconnect from database
     await disconnect_db()
 
@@ -315,7 +320,8 @@ from app.routes import (
     inventory,
     b2c_orders,
     price_list,
-    allocation
+    allocation,
+    search
 )
 from app.routes import settings as settings_router
 
@@ -375,6 +381,13 @@ app.include_router(price_list.router, prefix=f"{settings.API_PREFIX}/price-lists
 # Allocation Sheets (Order Allocation)
 app.include_router(allocation.router, prefix=f"{settings.API_PREFIX}/allocation", tags=["Allocation Sheets"])
 
+# Global search
+app.include_router(search.router, prefix=f"{settings.API_PREFIX}/search", tags=["Search"])
+
+# Local object storage (STORAGE_BACKEND=local, tests and offline use)
+if settings.STORAGE_BACKEND.lower() == "local":
+    app.mount("/storage", StaticFiles(directory=settings.STORAGE_LOCAL_ROOT, check_dir=False), name="storage")
+
 
 # ============================================================================
 # MAIN ENTRY POINT
@@ -31,6 +31,7 @@ from app.schemas.admin import *
 from app.schemas.auth import CurrentUser, ErrorResponse
 from app.auth.dependencies import require_admin
 from app.services import admin_service
+from app.database import CountMode
 
 router = APIRouter()
 
@@ -253,6 +254,8 @@ async def get_activity_logs(
     action_type: Optional[str] = Query(None, description="Filter by action type"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(100, ge=1, le=500, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides page)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     admin: CurrentUser = Depends(require_admin),
 ):
     """Get activity logs"""
@@ -263,6 +266,8 @@ async def get_activity_logs(
         action_type=action_type,
         page=page,
         limit=limit,
+        cursor=cursor,
+        count_mode=count,
     )
     return result
 
@@ -8,6 +8,8 @@ Last Updated: 2024-12-12
 Description:
   API endpoints for allocation sheet management. Spreadsheet-style allocation
   interface organized by delivery date with Items × Customers matrix.
+  Cell writes (edits, auto-fill, mark-ready, invoicing, reconciliation) are
+  pushed as per-cell deltas to the WebSocket room allocation:<sheet_id>.
 
 Endpoints:
   Sheet Management:
@@ -65,11 +67,11 @@ async def get_allocation_sheet(
     Get or generate allocation sheet for delivery date.
     
     **Workflow:**
-    1. Checks if sheet exists for date, creates if not
-    2. Queries all SOs with this delivery_date
-    3. Generates (item, customer) matrix
-    4. Auto-fills SENT using FIFO if first time
-    5. Returns complete grid data
+    1. First open: creates the sheet, builds the (item, customer) matrix
+       from SOs with this delivery_date and auto-fills SENT using FIFO
+    2. Later opens: reconciles only items whose SOs or stock changed since
+       the last load (nothing is written if nothing changed)
+    3. Returns complete grid data
     
     **Returns:**
     - Items list (rows)
@@ -183,10 +185,11 @@ async def auto_fill_sheet(
     **Returns:**
     - Number of cells updated
     - List of shortfalls detected
+    - Changed cells and sheet totals
     """
     try:
         # Run auto-fill
-        await allocation_service.auto_fill_sent_quantities(sheet_id)
+        changed = await allocation_service.auto_fill_sent_quantities(sheet_id)
         
         # Count updated cells and get shortfalls
         # Count updated cells
@@ -217,7 +220,11 @@ async def auto_fill_sheet(
             
         return {
             'updated_cells': updated_count or 0,
-            'shortfalls': [dict(row) for row in shortfalls]
+            'shortfalls': [dict(row) for row in shortfalls],
+            # Applied by the caller directly; room deltas only reach clients
+            # connected to this worker
+            'cells': [allocation_service.format_cell_delta(cell) for cell in changed],
+            'totals': await allocation_service.get_sheet_totals(sheet_id)
         }
     except Exception as e:
         logger.error(f"❌ Failed to auto-fill sheet {sheet_id}: {e}")
@@ -305,17 +312,18 @@ async def mark_customer_ready(
     """
     try:
         # Update all cells for this customer on sheet
-        result = await execute_query("""
+        marked = await fetch_all(f"""
             UPDATE allocation_sheet_cells
             SET invoice_status = 'ready',
                 updated_at = NOW()
             WHERE sheet_id = $1 
               AND customer_id = $2
               AND invoice_status = 'pending'
+            RETURNING {allocation_service.CELL_DELTA_COLUMNS}
         """, request.sheet_id, request.customer_id)
-            
-        # Extract count from result
-        cells_marked = int(result.split()[-1]) if result else 0
+        cells_marked = len(marked)
+
+        await allocation_service.publish_cell_changes(request.sheet_id, marked, reason='mark_ready')
             
         return {
             'cells_marked': cells_marked,
@@ -406,13 +414,16 @@ async def generate_customer_invoice(
                     stock_debited = False
             
         # Mark cells as invoiced
-        await execute_query("""
+        invoiced = await fetch_all(f"""
             UPDATE allocation_sheet_cells
             SET invoice_status = 'invoiced',
                 invoiced_at = NOW(),
                 updated_at = NOW()
             WHERE sheet_id = $1 AND customer_id = $2 AND invoice_status = 'ready'
+            RETURNING {allocation_service.CELL_DELTA_COLUMNS}
         """, request.sheet_id, request.customer_id)
+
+        await allocation_service.publish_cell_changes(request.sheet_id, invoiced, reason='invoiced')
             
         return {
             'invoice_id': request.sheet_id,  # Placeholder
@@ -20,7 +20,7 @@ Authentication:
 ================================================================================
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from fastapi.responses import StreamingResponse, Response
 from typing import List
 import pandas as pd
@@ -587,6 +587,19 @@ async def upload_mrp_pdf(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/mrp-labels/library/{filename}/url")
+async def get_mrp_pdf_url(
+    filename: str,
+    expires_in: int = Query(600, ge=60, le=86400, description="Link lifetime in seconds"),
+    current_user: CurrentUser = Depends(require_module_access("mrp_label_generator"))
+):
+    """Signed, time-limited download link for a library PDF"""
+    try:
+        return await MrpLabelService.get_pdf_download_url(filename, expires_in)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/mrp-labels/library/{filename}")
 async def delete_mrp_pdf(
     filename: str,
@@ -2,8 +2,8 @@
 ================================================================================
 Marketplace ERP - Batch Tracking Routes
 ================================================================================
-Version: 1.0.0
-Last Updated: 2024-12-04
+Version: 1.1.0
+Last Updated: 2026-10-18
 
 Description:
   API endpoints for batch tracking module. Provides complete traceability from
@@ -14,6 +14,7 @@ Endpoints:
   POST   /batches/generate                  - Generate new batch number
   GET    /batches/{batch_number}            - Get batch details
   GET    /batches/{batch_number}/timeline   - Get batch timeline
+  GET    /batches/{batch_number}/trace      - Get upstream/downstream trace graph
   POST   /batches/search                    - Search batches
   POST   /batches/{batch_number}/repack     - Create repacked batch
   GET    /batches/active                    - List active batches
@@ -30,8 +31,8 @@ from datetime import datetime
 from app.schemas.batch_tracking import (
     GenerateBatchRequest, RepackBatchRequest, AddBatchHistoryRequest,
     SearchBatchesRequest, BatchResponse, BatchDetailResponse,
-    BatchTimelineResponse, BatchSearchResponse, RepackBatchResponse,
-    BatchStatus
+    BatchTimelineResponse, BatchTraceResponse, BatchSearchResponse,
+    RepackBatchResponse, BatchStatus
 )
 from app.schemas.auth import CurrentUser
 from app.auth.dependencies import get_current_user, require_admin
@@ -113,67 +114,101 @@ async def get_active_batches(
         )
 
 
-@router.get("/{batch_number:path}", response_model=BatchDetailResponse)
-async def get_batch_details(
+# NOTE: /{batch_number:path}/timeline and /trace MUST come before /{batch_number:path},
+# which would otherwise match them as part of the batch number
+@router.get("/{batch_number:path}/timeline", response_model=BatchTimelineResponse)
+async def get_batch_timeline(
     batch_number: str,
     current_user: CurrentUser = Depends(get_current_user),
 ):
     """
-    Get complete batch details with history and documents.
+    Get visual timeline of batch journey through stages.
 
-    Includes:
-    - Batch metadata (status, repack info, timestamps)
-    - All linked documents (PO, GRN, SO, invoices)
-    - Complete history timeline with events
+    Returns chronological stages with timestamps and status.
+    Used for timeline visualization in frontend.
+
+    **Path Parameters:**
+    - batch_number: Batch number
+    """
+    try:
+        timeline = await batch_tracking_service.get_batch_timeline(batch_number)
+        if not timeline:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Batch {batch_number} not found"
+            )
+        return timeline
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get batch timeline: {str(e)}"
+        )
+
+
+@router.get("/{batch_number:path}/trace", response_model=BatchTraceResponse)
+async def get_batch_trace(
+    batch_number: str,
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Get full upstream/downstream traceability graph of a batch.
+
+    Returns every batch in the repack lineage (parents and repacked
+    children) with its farm/PO, GRN, linked documents, sales orders and
+    wastage, plus the edges between them - all from a single query.
 
     **Path Parameters:**
     - batch_number: Batch number (e.g., B001, B001R)
     """
     try:
-        batch = await batch_tracking_service.get_batch_details(batch_number)
-        if not batch:
+        trace = await batch_tracking_service.get_batch_trace(batch_number)
+        if not trace:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Batch {batch_number} not found"
             )
-        return batch
+        return trace
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get batch details: {str(e)}"
+            detail=f"Failed to trace batch: {str(e)}"
         )
 
 
-@router.get("/{batch_number:path}/timeline", response_model=BatchTimelineResponse)
-async def get_batch_timeline(
+@router.get("/{batch_number:path}", response_model=BatchDetailResponse)
+async def get_batch_details(
     batch_number: str,
     current_user: CurrentUser = Depends(get_current_user),
 ):
     """
-    Get visual timeline of batch journey through stages.
+    Get complete batch details with history and documents.
 
-    Returns chronological stages with timestamps and status.
-    Used for timeline visualization in frontend.
+    Includes:
+    - Batch metadata (status, repack info, timestamps)
+    - All linked documents (PO, GRN, SO, invoices)
+    - Complete history timeline with events
 
     **Path Parameters:**
-    - batch_number: Batch number
+    - batch_number: Batch number (e.g., B001, B001R)
     """
     try:
-        timeline = await batch_tracking_service.get_batch_timeline(batch_number)
-        if not timeline:
+        batch = await batch_tracking_service.get_batch_details(batch_number)
+        if not batch:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Batch {batch_number} not found"
             )
-        return timeline
+        return batch
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get batch timeline: {str(e)}"
+            detail=f"Failed to get batch details: {str(e)}"
         )
 
 
@@ -197,12 +232,21 @@ async def search_batches(
     - Date range
     - Archived flag
 
+    **Pagination:**
+    - cursor: next_cursor from the previous response (constant cost at any depth)
+    - count: exact, estimated or none
+
     **Returns:**
     Paginated search results with total count.
     """
     try:
         results = await batch_tracking_service.search_batches(filters)
         return results
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
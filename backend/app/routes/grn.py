@@ -8,6 +8,7 @@ from io import BytesIO
 from app.auth.dependencies import get_current_user
 from app.schemas.auth import CurrentUser
 from app.services import grn_service
+from app.database import CountMode
 from app.schemas.grn import (
     GRNResponse, GRNDetailResponse, GRNUpdateRequest, GRNListResponse
 )
@@ -63,6 +64,8 @@ async def list_grns(
     to_date: Optional[date] = None,
     page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    count: CountMode = CountMode.EXACT,
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """List GRNs with filtering"""
@@ -74,8 +77,11 @@ async def list_grns(
         # I'll update service file next.
         # Let's assume service has it. I'll add the missing function to service layer in a subsequent tool call.
         return await grn_service.list_grns(
-            status, po_id, batch_number, from_date, to_date, page, limit
+            status, po_id, batch_number, from_date, to_date, page, limit,
+            cursor=cursor, count_mode=count
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -15,9 +15,19 @@ Endpoints:
     GET    /api/v1/inventory/list                - List inventory with filters
     GET    /api/v1/inventory/by-batch/{batch_id} - Batch-wise view
     GET    /api/v1/inventory/availability        - Check stock availability
+    POST   /api/v1/inventory/availability/batch  - Check availability for many lines
     GET    /api/v1/inventory/low-stock           - Low stock alerts
     GET    /api/v1/inventory/expiring            - Expiring items
   
+  Order Allocation:
+    POST   /api/v1/inventory/allocate            - Allocate one item to an order
+    POST   /api/v1/inventory/allocate-order      - Allocate all lines of an order
+    POST   /api/v1/inventory/deallocate          - Release an order's stock
+    POST   /api/v1/inventory/confirm-allocation  - Debit an order's stock
+    POST   /api/v1/inventory/allocations/cleanup - Release stale allocations (admin)
+    GET    /api/v1/inventory/allocations/cleanup/runs - Release run history (admin)
+    GET    /api/v1/inventory/allocations/expiring-soon - Allocations near timeout (admin)
+  
   Stock Movements:
     POST   /api/v1/inventory/transfer            - Transfer between locations
     GET    /api/v1/inventory/movements           - List movements
@@ -39,6 +49,7 @@ Endpoints:
 ================================================================================
 """
 
+import logging
 from fastapi import APIRouter, Depends, Query, HTTPException, status
 from typing import Optional
 from datetime import date
@@ -50,14 +61,18 @@ from app.schemas.inventory import (
     InventoryAdjustmentRequest, InventoryAdjustmentApproval,
     InventoryAdjustmentResponse, ReorderLevelConfig, ReorderLevelResponse,
     StockAvailabilityQuery, StockAvailabilityResponse,
+    StockAvailabilityBatchRequest, StockAvailabilityBatchResponse,
     BatchInventoryView, ExpiringItem, LowStockAlert,
     CurrentStockReportFilters, StockMovementReportFilters,
-    StockAllocationRequest, StockDeallocationRequest, ConfirmAllocationRequest
+    StockAllocationRequest, OrderAllocationRequest,
+    StockDeallocationRequest, ConfirmAllocationRequest
 )
 from app.schemas.auth import CurrentUser
 from app.auth.dependencies import get_current_user, require_admin
 from app.services import inventory_service
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -225,6 +240,50 @@ async def check_stock_availability(
         )
 
 
+@router.post("/availability/batch", response_model=StockAvailabilityBatchResponse)
+async def check_stock_availability_batch(
+    request: StockAvailabilityBatchRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Check stock availability for all lines of an order in one call.
+    
+    **Use Cases:**
+    - SO entry screen validating a multi-line order
+    - Allocation planning across many items
+    
+    **Returns:**
+    - Per-line availability, shortage and location breakdown
+    - Order-level flag and total shortage
+    
+    **Example:**
+    ```
+    POST /api/v1/inventory/availability/batch
+    {
+        "lines": [
+            {"item_id": 1, "quantity": 5.0, "location": "packed_warehouse"},
+            {"item_id": 2, "quantity": 12.5, "grade": "A"}
+        ]
+    }
+    ```
+    """
+    try:
+        result = await inventory_service.check_stock_availability_batch(
+            [line.dict() for line in request.lines]
+        )
+        return result
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check stock availability: {str(e)}"
+        )
+
+
 @router.get("/low-stock")
 async def get_low_stock_items(
     current_user: CurrentUser = Depends(get_current_user),
@@ -748,6 +807,57 @@ async def allocate_stock(
         )
 
 
+@router.post("/allocate-order", status_code=status.HTTP_201_CREATED)
+async def allocate_order_stock(
+    request: OrderAllocationRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Allocate every line of a sales order in one transaction.
+    Changes status: available → allocated
+
+    **Flow:**
+    1. Stock rows for all lines are locked once (rows held by another
+       allocation are skipped, never waited on)
+    2. FIFO split is computed for every line
+    3. If any line is short, nothing is allocated and the shortfalls are
+       returned as a 400
+
+    **Example:**
+    ```
+    POST /api/v1/inventory/allocate-order
+    {
+        "order_id": 123,
+        "lines": [
+            {"item_id": 1, "quantity": 5.0},
+            {"item_id": 2, "quantity": 2.5, "batch_ids": [14]}
+        ],
+        "location": "packed_warehouse"
+    }
+    ```
+    """
+    try:
+        from app.services.inventory_allocation_service import allocate_order
+
+        result = await allocate_order(
+            order_id=request.order_id,
+            lines=[line.dict() for line in request.lines],
+            location=request.location,
+            user_id=str(current_user.id)
+        )
+        return result
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to allocate order: {str(e)}"
+        )
+
+
 @router.post("/deallocate", status_code=status.HTTP_200_OK)
 async def deallocate_stock(
     request: StockDeallocationRequest,
@@ -857,13 +967,16 @@ async def cleanup_stale_allocations(
     **Default:** Releases allocations older than 24 hours
     
     **Auto-Schedule:**
-    - This should run automatically via cron/Celery
+    - Runs on the scheduler every ALLOCATION_CLEANUP_INTERVAL_MINUTES
     - Manual trigger available for testing or emergency cleanup
+    - Skipped if a run is already in progress on any worker
     
     **Actions:**
     - Changes status: allocated → available
     - Logs deallocation movement
-    - Returns list of released items
+    - Releases in chunks of ALLOCATION_CLEANUP_CHUNK_SIZE rows
+    - Returns list of released items; the run is recorded in
+      allocation_cleanup_runs
     
     **Use Cases:**
     - Emergency cleanup of stuck allocations
@@ -873,7 +986,11 @@ async def cleanup_stale_allocations(
     try:
         from app.services.allocation_cleanup_service import release_stale_allocations
         
-        result = await release_stale_allocations(timeout_hours=timeout_hours)
+        result = await release_stale_allocations(
+            timeout_hours=timeout_hours,
+            trigger='manual',
+            triggered_by=str(current_user.id)
+        )
         
         if result['released_count'] > 0:
             logger.warning(
@@ -889,6 +1006,29 @@ async def cleanup_stale_allocations(
         )
 
 
+@router.get("/allocations/cleanup/runs", dependencies=[Depends(require_admin)])
+async def get_allocation_cleanup_runs(
+    limit: int = Query(20, ge=1, le=100, description="Number of runs"),
+    current_user: CurrentUser = Depends(require_admin),
+):
+    """
+    Recent stale allocation release runs (Admin only).
+
+    **Returns:**
+    - Trigger, status, rows and quantity released, chunks and duration per run
+    """
+    try:
+        from app.services.allocation_cleanup_service import get_cleanup_runs
+
+        runs = await get_cleanup_runs(limit=limit)
+        return {'runs': runs, 'count': len(runs)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get cleanup runs: {str(e)}"
+        )
+
+
 @router.get("/allocations/expiring-soon", dependencies=[Depends(require_admin)])
 async def get_expiring_allocations(
     timeout_hours: int = Query(24, description="Allocation timeout in hours"),
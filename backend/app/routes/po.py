@@ -37,6 +37,7 @@ from app.schemas.po import (
 from app.schemas.auth import CurrentUser
 from app.auth.dependencies import get_current_user, require_admin
 from app.services import po_service
+from app.database import CountMode
 
 router = APIRouter()
 
@@ -52,9 +53,10 @@ async def get_next_po_number(
     """
     Get next sequential PO number.
     Format: PO/YY[YY+1]/XXXX
+    Preview only; the number is reserved when the PO is created.
     """
     try:
-        result = await po_service.generate_po_number()
+        result = await po_service.generate_po_number(preview=True)
         return result
     except Exception as e:
         raise HTTPException(
@@ -72,6 +74,8 @@ async def list_pos(
     item_id: Optional[int] = Query(None, description="Filter by item ID"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides page)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     current_user: CurrentUser = Depends(get_current_user),
 ):
     """
@@ -86,6 +90,8 @@ async def list_pos(
     **Pagination:**
     - page: Page number (1-indexed)
     - limit: Items per page (max 100)
+    - cursor: next_cursor from the previous response; constant cost at any depth
+    - count: exact (default), estimated (planner statistics) or none
 
     **Returns:**
     - Paginated list of POs
@@ -99,9 +105,16 @@ async def list_pos(
             to_date=to_date,
             item_id=item_id,
             page=page,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            count_mode=count
         )
         return result
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
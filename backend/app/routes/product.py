@@ -23,7 +23,7 @@ from app.schemas.product import (
     WooCommerceSyncResponse,
     ProductStatsResponse
 )
-from app.services import product_service
+from app.services import product_service, sync_runner_service
 
 router = APIRouter()
 
@@ -99,11 +99,12 @@ async def sync_products(
             detail="Sync already in progress. Please wait for it to complete."
         )
 
-    # Start sync in background
+    # Start sync in background (recorded in sync_runs; skipped if running on another worker)
     background_tasks.add_task(
-        product_service.sync_from_woocommerce,
-        sync_request=sync_request,
-        synced_by=current_user.id
+        sync_runner_service.run_job,
+        "woo_items",
+        triggered_by=current_user.id,
+        sync_request=sync_request
     )
 
     return {
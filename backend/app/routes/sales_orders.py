@@ -32,6 +32,7 @@ from app.schemas.sales_orders import (
 from app.schemas.auth import CurrentUser
 from app.auth.dependencies import get_current_user, require_admin
 from app.services import sales_order_service
+from app.database import CountMode
 
 router = APIRouter()
 
@@ -47,9 +48,10 @@ async def get_next_so_number(
     """
     Get next sequential SO number.
     Format: SO/YY-YY/XXXX
+    Preview only; the number is reserved when the SO is created.
     """
     try:
-        result = await sales_order_service.generate_so_number()
+        result = await sales_order_service.generate_so_number(preview=True)
         return result
     except Exception as e:
         raise HTTPException(
@@ -67,6 +69,8 @@ async def list_sos(
     item_id: Optional[int] = Query(None, description="Filter by item ID"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides page)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     current_user: CurrentUser = Depends(get_current_user),
 ):
     """
@@ -80,9 +84,16 @@ async def list_sos(
             to_date=to_date,
             item_id=item_id,
             page=page,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            count_mode=count
         )
         return result
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
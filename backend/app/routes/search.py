@@ -0,0 +1,45 @@
+"""
+================================================================================
+Marketplace ERP - Global Search Routes
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Quick search across items, products, batches, customers, vendors, purchase
+  orders, sales orders and tickets, backed by pg_trgm indexes.
+
+Endpoints:
+  GET    /api/v1/search    - Ranked quick search over one or more entity types
+
+================================================================================
+"""
+
+from fastapi import APIRouter, Depends, Query, HTTPException, status
+from typing import Optional, List
+
+from app.schemas.search import QuickSearchResponse
+from app.schemas.auth import CurrentUser
+from app.auth.dependencies import get_current_user
+from app.services import search_service
+
+router = APIRouter()
+
+
+@router.get("", response_model=QuickSearchResponse)
+async def quick_search(
+    q: str = Query(..., min_length=2, max_length=100, description="Search text"),
+    types: Optional[List[str]] = Query(None, description="Entity types to search (default: all)"),
+    limit: int = Query(5, ge=1, le=25, description="Maximum results per entity type"),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Search items, products, batches, customers, vendors, POs, SOs and tickets.
+
+    Results are ordered by relevance across all types; prefix matches on the
+    main label (e.g. a batch number) rank first.
+    """
+    try:
+        return await search_service.quick_search(term=q, types=types, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
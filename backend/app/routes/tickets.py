@@ -67,7 +67,7 @@ from app.schemas.tickets import (
 from app.schemas.auth import CurrentUser
 from app.auth.dependencies import get_current_user, require_admin
 from app.services import tickets_service, webhook_service
-from app.database import get_db
+from app.database import get_db, CountMode
 from app.websocket import events as ws_events
 
 router = APIRouter()
@@ -85,8 +85,11 @@ async def list_tickets(
     ticket_type: Optional[TicketType] = Query(None, description="Filter by ticket type"),
     status: Optional[TicketStatus] = Query(None, description="Filter by status"),
     priority: Optional[TicketPriority] = Query(None, description="Filter by priority"),
+    search: Optional[str] = Query(None, min_length=1, description="Search title and description"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(50, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides page)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     current_user: CurrentUser = Depends(get_current_user),
 ):
     """
@@ -98,8 +101,11 @@ async def list_tickets(
         ticket_type=ticket_type,
         ticket_status=status,
         priority=priority,
+        search=search,
         page=page,
         limit=limit,
+        cursor=cursor,
+        count_mode=count,
     )
 
 
@@ -108,6 +114,8 @@ async def list_my_tickets(
     status: Optional[TicketStatus] = Query(None, description="Filter by status"),
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(50, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides page)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     current_user: CurrentUser = Depends(get_current_user),
 ):
     """
@@ -118,6 +126,8 @@ async def list_my_tickets(
         ticket_status=status,
         page=page,
         limit=limit,
+        cursor=cursor,
+        count_mode=count,
     )
 
 
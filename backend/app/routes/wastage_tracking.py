@@ -16,6 +16,7 @@ Endpoints:
   GET    /wastage/analytics/by-stage       - Stage analytics
   GET    /wastage/analytics/by-product     - Product analytics
   GET    /wastage/analytics/trends         - Time series trends
+  POST   /wastage/analytics/rollup/reconcile - Rebuild daily rollup (admin)
   POST   /wastage/repack                   - Initiate repacking
   GET    /wastage/categories               - Dropdown options
   GET    /wastage/thresholds               - Get thresholds
@@ -284,6 +285,29 @@ async def get_wastage_trends(
         )
 
 
+@router.post("/wastage/analytics/rollup/reconcile")
+async def reconcile_wastage_rollup(
+    days: Optional[int] = Query(None, ge=1, le=3650, description="Days to rebuild, including today"),
+    full: bool = Query(False, description="Rebuild every day"),
+    current_user: CurrentUser = Depends(require_admin),
+):
+    """
+    Rebuild the daily wastage rollup from wastage events.
+    
+    Runs on the scheduler for recent days; use full=true after importing
+    or correcting historical events.
+    
+    **Permissions:** Admin only
+    """
+    try:
+        return await wastage_tracking_service.reconcile_wastage_rollup(days=days, full=full)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reconcile rollup: {str(e)}"
+        )
+
+
 # ============================================================================
 # REPACKING WORKFLOW
 # ============================================================================
@@ -454,6 +478,8 @@ async def get_wastage_alerts(
     try:
         result = await wastage_tracking_service.get_current_alerts()
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -14,7 +14,8 @@ Endpoints:
 
 Client Message Types:
   - ping: Keep-alive ping
-  - join_room: Join a room for group messaging
+  - join_room: Join a room for group messaging (allocation:<sheet_id> for
+    live allocation grid deltas)
   - leave_room: Leave a room
 
 Server Message Types:
@@ -26,6 +27,7 @@ Server Message Types:
   - ticket.updated: Ticket updated
   - dashboard.update: Dashboard stats updated
   - notification: User-specific notification
+  - allocation.cells: Allocation sheet cell deltas (room members only)
 
 ================================================================================
 """
@@ -22,7 +22,8 @@ from app.schemas.woo_customer import (
     WooCustomerSyncResponse,
     WooCustomerStatsResponse
 )
-from app.services import woo_customer_service
+from app.services import woo_customer_service, sync_runner_service
+from app.database import CountMode
 
 router = APIRouter()
 
@@ -37,6 +38,8 @@ async def list_woo_customers(
     paying_only: bool = Query(False, description="Filter paying customers only"),
     limit: int = Query(1000, ge=1, le=10000, description="Results limit"),
     offset: int = Query(0, ge=0, description="Results offset"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides offset)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -44,16 +47,19 @@ async def list_woo_customers(
 
     Requires: Any authenticated user
     """
-    customers, total_count = await woo_customer_service.get_customers(
+    customers, total_count, next_cursor = await woo_customer_service.get_customers(
         search=search,
         paying_only=paying_only,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        count_mode=count
     )
 
     return {
         "customers": customers,
-        "total": total_count
+        "total": total_count,
+        "next_cursor": next_cursor
     }
 
 
@@ -88,10 +94,11 @@ async def sync_woo_customers(
             detail="Sync already in progress. Please wait for it to complete."
         )
 
-    # Start sync in background
+    # Start sync in background (recorded in sync_runs; skipped if running on another worker)
     background_tasks.add_task(
-        woo_customer_service.sync_from_woocommerce,
-        synced_by=current_user.id
+        sync_runner_service.run_job,
+        "woo_customers",
+        triggered_by=current_user.id
     )
 
     return {
@@ -49,22 +49,22 @@ async def preview_export(
     mapping = await WooToZohoService.get_product_mapping()
 
     # 3. Transform
-    csv_rows, replacements_log, completed_orders = await WooToZohoService.transform_orders(
+    invoice_df, replacements_df, orders_df = WooToZohoService.build_export_frames(
         orders, mapping, request.invoice_prefix, request.start_sequence
     )
 
     # 4. Generate summary (simple version for preview)
     summary = {
-        "total_orders": len(completed_orders),
+        "total_orders": len(orders_df),
         "date_range": f"{request.start_date} to {request.end_date}",
         "invoice_range": f"{request.invoice_prefix}{request.start_sequence:05d}..."
     }
 
     return {
-        "csv_rows": csv_rows[:50], # Limit preview to 50 rows
-        "replacements_log": replacements_log,
+        "csv_rows": invoice_df.head(50).to_dict('records'), # Limit preview to 50 rows
+        "replacements_log": replacements_df.to_dict('records'),
         "summary": summary,
-        "total_orders": len(completed_orders)
+        "total_orders": len(orders_df)
     }
 
 @router.post("/export")
@@ -83,22 +83,22 @@ async def generate_export(
     mapping = await WooToZohoService.get_product_mapping()
 
     # 3. Transform
-    csv_rows, replacements_log, completed_orders = await WooToZohoService.transform_orders(
+    invoice_df, _, orders_df = WooToZohoService.build_export_frames(
         orders, mapping, request.invoice_prefix, request.start_sequence
     )
     
-    if not completed_orders:
+    if orders_df.empty:
         raise HTTPException(status_code=404, detail="No completed orders found")
 
     # 4. Generate Files
     zip_bytes = WooToZohoService.generate_files(
-        csv_rows, completed_orders, request.invoice_prefix, request.start_sequence,
+        invoice_df, orders_df, request.invoice_prefix, request.start_sequence,
         request.start_date, request.end_date
     )
 
     # 5. Save History
     await WooToZohoService.save_history(
-        completed_orders, request.invoice_prefix, request.start_sequence,
+        orders_df, request.invoice_prefix,
         request.start_date, request.end_date, current_user.id
     )
 
@@ -22,7 +22,8 @@ from app.schemas.zoho_item import (
     ZohoSyncResponse,
     ZohoItemStatsResponse
 )
-from app.services import zoho_item_service
+from app.services import zoho_item_service, zoho_books_client, sync_runner_service
+from app.database import CountMode
 
 router = APIRouter()
 
@@ -39,6 +40,8 @@ async def list_zoho_items(
     product_type: Optional[str] = Query(None, description="Filter by product_type: goods, service"),
     limit: int = Query(1000, ge=1, le=10000, description="Results limit"),
     offset: int = Query(0, ge=0, description="Results offset"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's next_cursor (overrides offset)"),
+    count: CountMode = Query(CountMode.EXACT, description="Total count mode: exact, estimated or none"),
     current_user: CurrentUser = Depends(get_current_user)
 ):
     """
@@ -46,18 +49,21 @@ async def list_zoho_items(
 
     Requires: Any authenticated user
     """
-    items, total_count = await zoho_item_service.get_items(
+    items, total_count, next_cursor = await zoho_item_service.get_items(
         search=search,
         active_only=active_only,
         item_type=item_type,
         product_type=product_type,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        count_mode=count
     )
 
     return {
         "items": items,
-        "total": total_count
+        "total": total_count,
+        "next_cursor": next_cursor
     }
 
 
@@ -92,10 +98,11 @@ async def sync_zoho_items(
             detail="Sync already in progress. Please wait for it to complete."
         )
 
-    # Start sync in background
+    # Start sync in background (recorded in sync_runs; skipped if running on another worker)
     background_tasks.add_task(
-        zoho_item_service.sync_from_zoho_books,
-        synced_by=current_user.id,
+        sync_runner_service.run_job,
+        "zoho_items",
+        triggered_by=current_user.id,
         force_refresh=sync_request.force_refresh
     )
 
@@ -119,6 +126,26 @@ async def get_sync_progress(
     return progress
 
 
+@router.get("/api-usage")
+async def get_zoho_api_usage(
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Get Zoho Books API quota usage for this worker
+
+    Requires: Admin role
+    Returns request/retry/throttle counts, rate-limit budget and the daily
+    quota last reported by Zoho
+    """
+    if current_user.role != "Admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view Zoho API usage"
+        )
+
+    return zoho_books_client.get_quota_metrics()
+
+
 # ============================================================================
 # STATISTICS ENDPOINTS
 # ============================================================================
@@ -22,7 +22,7 @@ from app.schemas.zoho_vendor import (
     ZohoVendorSyncResponse,
     ZohoVendorStatsResponse
 )
-from app.services import zoho_vendor_service
+from app.services import zoho_vendor_service, sync_runner_service
 
 router = APIRouter()
 
@@ -92,10 +92,11 @@ async def sync_zoho_vendors(
             detail="Sync already in progress. Please wait for it to complete."
         )
 
-    # Start sync in background
+    # Start sync in background (recorded in sync_runs; skipped if running on another worker)
     background_tasks.add_task(
-        zoho_vendor_service.sync_from_zoho_books,
-        synced_by=current_user.id,
+        sync_runner_service.run_job,
+        "zoho_vendors",
+        triggered_by=current_user.id,
         force_refresh=sync_request.force_refresh
     )
 
@@ -2,8 +2,8 @@
 ================================================================================
 Marketplace ERP - Background Task Scheduler
 ================================================================================
-Version: 2.2.0
-Last Updated: 2025-12-02
+Version: 2.6.0
+Last Updated: 2026-10-18
 
 Purpose:
 --------
@@ -11,13 +11,33 @@ APScheduler-based background task management for recurring operations.
 
 Tasks:
 ------
-1. Sync Zoho Items from Zoho Books (daily at 4:00 AM IST)
-2. Sync Woo Items from WooCommerce (daily at 4:00 AM IST)
-3. Process webhook delivery queue (every 1 minute)
-4. Process email queue (every 5 minutes)
+1. Zoho Books / WooCommerce syncs via sync_runner_service (daily from 4:00 AM IST)
+2. Process webhook delivery queue (every 1 minute)
+3. Process email queue (every 5 minutes)
+4. Check wastage thresholds (hourly)
+5. Release stale stock allocations (every ALLOCATION_CLEANUP_INTERVAL_MINUTES)
+6. Reconcile the daily wastage rollup (every WASTAGE_ROLLUP_RECONCILE_INTERVAL_MINUTES)
 
 Changelog:
 ----------
+v2.6.0 (2026-10-18):
+  - Added daily wastage rollup reconcile (rebuilds the last
+    WASTAGE_ROLLUP_RECONCILE_DAYS days when they drift from wastage_events)
+
+v2.5.0 (2026-10-18):
+  - Added stale stock allocation release (chunked, advisory-locked, runs
+    recorded in allocation_cleanup_runs)
+
+v2.4.0 (2026-10-18):
+  - Replaced the five 4:00 AM sync jobs with one run_nightly_syncs job that
+    uses sync_runner_service: items before contacts, staggered starts,
+    per-group concurrency, advisory-lock single run, runs in sync_runs
+
+v2.3.0 (2026-10-18):
+  - Zoho vendor/customer and WooCommerce customer syncs use the shared
+    contact sync (concurrent page fetch, staged COPY upsert, unchanged
+    contacts skipped by content hash)
+
 v2.2.0 (2025-12-02):
   - Added Zoho Items sync scheduled task
   - Added Woo Items sync scheduled task
@@ -44,10 +64,9 @@ from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
 
+from app.config import settings
 from app.database import fetch_one, fetch_all, execute_query, get_db
-from app.services import telegram_service, webhook_service, email_service, zoho_item_service, product_service
-from app.services import zoho_vendor_service, zoho_customer_service, woo_customer_service
-from app.schemas.product import WooCommerceSyncRequest
+from app.services import telegram_service, webhook_service, email_service, sync_runner_service
 
 logger = logging.getLogger(__name__)
 
@@ -55,135 +74,26 @@ logger = logging.getLogger(__name__)
 scheduler = None
 
 
-async def sync_zoho_items_daily():
-    """
-    Sync items from Zoho Books daily at 4:00 AM IST.
-    This is a scheduled task that runs automatically.
-    """
-    try:
-        logger.info("🔄 Starting scheduled Zoho Items sync...")
-
-        # Use system user ID for scheduled syncs
-        system_user_id = "00000000-0000-0000-0000-000000000000"
-
-        result = await zoho_item_service.sync_from_zoho_books(
-            synced_by=system_user_id,
-            force_refresh=False  # Only sync items modified in last 24 hours
-        )
-
-        logger.info(
-            f"✅ Scheduled Zoho sync completed: "
-            f"{result['added']} added, {result['updated']} updated, "
-            f"{result['skipped']} skipped, {result['errors']} errors"
-        )
-
-    except Exception as e:
-        logger.error(f"❌ Error in scheduled Zoho sync: {e}", exc_info=True)
-
-
-async def sync_woo_items_daily():
-    """
-    Sync items from WooCommerce daily at 4:00 AM IST.
-    This is a scheduled task that runs automatically.
-    """
-    try:
-        logger.info("🔄 Starting scheduled WooCommerce sync...")
-
-        # Use system user ID for scheduled syncs
-        system_user_id = "00000000-0000-0000-0000-000000000000"
-
-        sync_request = WooCommerceSyncRequest(limit=1000, update_existing=True)
-        result = await product_service.sync_from_woocommerce(
-            sync_request=sync_request,
-            synced_by=system_user_id
-        )
-
-        logger.info(
-            f"✅ Scheduled WooCommerce sync completed: "
-            f"{result['added']} added, {result['updated']} updated, "
-            f"{result['skipped']} skipped, {result['errors']} errors"
-        )
-
-    except Exception as e:
-        logger.error(f"❌ Error in scheduled WooCommerce sync: {e}", exc_info=True)
-
-
-async def sync_zoho_vendors_daily():
-    """
-    Sync vendors from Zoho Books daily at 4:00 AM IST.
-    This is a scheduled task that runs automatically.
-    """
-    try:
-        logger.info("🔄 Starting scheduled Zoho Vendors sync...")
-
-        # Use system user ID for scheduled syncs
-        system_user_id = "00000000-0000-0000-0000-000000000000"
-
-        result = await zoho_vendor_service.sync_from_zoho_books(
-            synced_by=system_user_id,
-            force_refresh=False  # Only sync vendors modified in last 24 hours
-        )
-
-        logger.info(
-            f"✅ Scheduled Zoho Vendors sync completed: "
-            f"{result['added']} added, {result['updated']} updated, "
-            f"{result['skipped']} skipped, {result['errors']} errors"
-        )
-
-    except Exception as e:
-        logger.error(f"❌ Error in scheduled Zoho Vendors sync: {e}", exc_info=True)
-
-
-async def sync_zoho_customers_daily():
-    """
-    Sync customers from Zoho Books daily at 4:00 AM IST.
-    This is a scheduled task that runs automatically.
-    """
-    try:
-        logger.info("🔄 Starting scheduled Zoho Customers sync...")
-
-        # Use system user ID for scheduled syncs
-        system_user_id = "00000000-0000-0000-0000-000000000000"
-
-        result = await zoho_customer_service.sync_from_zoho_books(
-            synced_by=system_user_id,
-            force_refresh=False  # Only sync customers modified in last 24 hours
-        )
-
-        logger.info(
-            f"✅ Scheduled Zoho Customers sync completed: "
-            f"{result['added']} added, {result['updated']} updated, "
-            f"{result['skipped']} skipped, {result['errors']} errors"
-        )
-
-    except Exception as e:
-        logger.error(f"❌ Error in scheduled Zoho Customers sync: {e}", exc_info=True)
-
-
-async def sync_woo_customers_daily():
+async def run_nightly_syncs():
     """
-    Sync customers from WooCommerce daily at 4:00 AM IST.
-    This is a scheduled task that runs automatically.
+    Run the Zoho Books / WooCommerce syncs daily at 4:00 AM IST.
+    Items sync first, then vendors/customers; jobs are staggered and limited
+    per concurrency group by sync_runner_service, and each run is recorded
+    in sync_runs.
     """
     try:
-        logger.info("🔄 Starting scheduled WooCommerce Customers sync...")
-
-        # Use system user ID for scheduled syncs
-        system_user_id = "00000000-0000-0000-0000-000000000000"
+        logger.info("🔄 Starting scheduled Zoho/WooCommerce syncs...")
 
-        result = await woo_customer_service.sync_from_woocommerce(
-            synced_by=system_user_id
+        results = await sync_runner_service.run_jobs(
+            sync_runner_service.NIGHTLY_SYNC_JOBS,
+            trigger="scheduled"
         )
 
-        logger.info(
-            f"✅ Scheduled WooCommerce Customers sync completed: "
-            f"{result['added']} added, {result['updated']} updated, "
-            f"{result['skipped']} skipped, {result['errors']} errors"
-        )
+        finished = [name for name, result in results.items() if result is not None]
+        logger.info(f"✅ Scheduled syncs finished: {len(finished)}/{len(results)} completed")
 
     except Exception as e:
-        logger.error(f"❌ Error in scheduled WooCommerce Customers sync: {e}", exc_info=True)
-
+        logger.error(f"❌ Error in scheduled syncs: {e}", exc_info=True)
 
 
 async def process_webhook_queue():
@@ -244,6 +154,40 @@ async def check_wastage_thresholds():
         logger.error(f"❌ Error checking wastage thresholds: {e}", exc_info=True)
 
 
+async def release_stale_allocations():
+    """
+    Release stock allocations older than ALLOCATION_TIMEOUT_HOURS.
+    Runs every ALLOCATION_CLEANUP_INTERVAL_MINUTES.
+    """
+    try:
+        from app.services import allocation_cleanup_service
+
+        result = await allocation_cleanup_service.release_stale_allocations(trigger="scheduled")
+
+        if result['released_count']:
+            logger.info(f"🔓 Released {result['released_count']} stale allocation(s)")
+
+    except Exception as e:
+        logger.error(f"❌ Error releasing stale allocations: {e}", exc_info=True)
+
+
+async def reconcile_wastage_rollup():
+    """
+    Rebuild recent days of the daily wastage rollup if they drifted.
+    Runs every WASTAGE_ROLLUP_RECONCILE_INTERVAL_MINUTES.
+    """
+    try:
+        from app.services import wastage_tracking_service
+
+        result = await wastage_tracking_service.reconcile_wastage_rollup()
+
+        if result['rows_corrected']:
+            logger.info(f"📊 Wastage rollup: corrected {result['rows_corrected']} row(s)")
+
+    except Exception as e:
+        logger.error(f"❌ Error reconciling wastage rollup: {e}", exc_info=True)
+
+
 def start_scheduler():
     """
     Start the background scheduler with all scheduled tasks.
@@ -253,12 +197,13 @@ def start_scheduler():
     try:
         scheduler = AsyncIOScheduler()
 
-        # Task 1: Sync Zoho Items daily at 4:00 AM IST
+        # Task 1: Zoho/WooCommerce syncs daily at 4:00 AM IST (items, then
+        # vendors and customers; staggered and grouped by the sync runner)
         scheduler.add_job(
-            sync_zoho_items_daily,
+            run_nightly_syncs,
             trigger=CronTrigger(hour=4, minute=0, timezone='Asia/Kolkata'),
-            id="sync_zoho_items_daily",
-            name="Sync Zoho Items from Zoho Books",
+            id="run_nightly_syncs",
+            name="Sync Zoho Books and WooCommerce data",
             replace_existing=True,
             max_instances=1,
         )
@@ -283,68 +228,49 @@ def start_scheduler():
             max_instances=1,
         )
 
-        # Task 4: Sync Woo Items daily at 4:00 AM IST
+        # Task 4: Check wastage thresholds hourly
         scheduler.add_job(
-            sync_woo_items_daily,
-            trigger=CronTrigger(hour=4, minute=0, timezone='Asia/Kolkata'),
-            id="sync_woo_items_daily",
-            name="Sync Woo Items from WooCommerce",
-            replace_existing=True,
-            max_instances=1,
-        )
-
-        # Task 5: Sync Zoho Vendors daily at 4:00 AM IST
-        scheduler.add_job(
-            sync_zoho_vendors_daily,
-            trigger=CronTrigger(hour=4, minute=0, timezone='Asia/Kolkata'),
-            id="sync_zoho_vendors_daily",
-            name="Sync Zoho Vendors from Zoho Books",
-            replace_existing=True,
-            max_instances=1,
-        )
-
-        # Task 6: Sync Zoho Customers daily at 4:00 AM IST
-        scheduler.add_job(
-            sync_zoho_customers_daily,
-            trigger=CronTrigger(hour=4, minute=0, timezone='Asia/Kolkata'),
-            id="sync_zoho_customers_daily",
-            name="Sync Zoho Customers from Zoho Books",
+            check_wastage_thresholds,
+            trigger=CronTrigger(minute=0, timezone='Asia/Kolkata'),  # Top of every hour
+            id="check_wastage_thresholds",
+            name="Check wastage thresholds and generate alerts",
             replace_existing=True,
             max_instances=1,
         )
 
-        # Task 7: Sync WooCommerce Customers daily at 4:00 AM IST
+        # Task 5: Release stale stock allocations
         scheduler.add_job(
-            sync_woo_customers_daily,
-            trigger=CronTrigger(hour=4, minute=0, timezone='Asia/Kolkata'),
-            id="sync_woo_customers_daily",
-            name="Sync WooCommerce Customers from WooCommerce",
+            release_stale_allocations,
+            trigger=IntervalTrigger(minutes=settings.ALLOCATION_CLEANUP_INTERVAL_MINUTES),
+            id="release_stale_allocations",
+            name="Release stale stock allocations",
             replace_existing=True,
             max_instances=1,
         )
 
-        # Task 8: Check wastage thresholds hourly
+        # Task 6: Reconcile the daily wastage rollup
         scheduler.add_job(
-            check_wastage_thresholds,
-            trigger=CronTrigger(minute=0, timezone='Asia/Kolkata'),  # Top of every hour
-            id="check_wastage_thresholds",
-            name="Check wastage thresholds and generate alerts",
+            reconcile_wastage_rollup,
+            trigger=IntervalTrigger(minutes=settings.WASTAGE_ROLLUP_RECONCILE_INTERVAL_MINUTES),
+            id="reconcile_wastage_rollup",
+            name="Reconcile daily wastage rollup",
             replace_existing=True,
             max_instances=1,
         )
 
-
         scheduler.start()
         logger.info("✅ Background scheduler started successfully")
         logger.info("📅 Scheduled tasks:")
-        logger.info("   - Sync Zoho Items: Daily at 4:00 AM IST")
-        logger.info("   - Sync Woo Items: Daily at 4:00 AM IST")
-        logger.info("   - Sync Zoho Vendors: Daily at 4:00 AM IST")
-        logger.info("   - Sync Zoho Customers: Daily at 4:00 AM IST")
-        logger.info("   - Sync WooCommerce Customers: Daily at 4:00 AM IST")
+        logger.info("   - Zoho/WooCommerce syncs: Daily from 4:00 AM IST (items, then contacts)")
         logger.info("   - Process webhook queue: Every 1 minute")
         logger.info("   - Process email queue: Every 5 minutes")
         logger.info("   - Check wastage thresholds: Every hour")
+        logger.info(
+            f"   - Release stale allocations: Every {settings.ALLOCATION_CLEANUP_INTERVAL_MINUTES} minutes"
+        )
+        logger.info(
+            f"   - Reconcile wastage rollup: Every {settings.WASTAGE_ROLLUP_RECONCILE_INTERVAL_MINUTES} minutes"
+        )
 
     except Exception as e:
         logger.error(f"❌ Failed to start scheduler: {e}", exc_info=True)
@@ -252,9 +252,10 @@ class ActivityLogsResponse(BaseModel):
     """Activity logs response"""
 
     logs: List[ActivityLogItem]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 # ============================================================================
@@ -261,6 +261,8 @@ class AutoFillResponse(BaseModel):
     """Response after auto-fill operation"""
     updated_cells: int
     shortfalls: List[ShortfallDetail]
+    cells: List[Dict[str, Any]] = []  # Changed cells (same shape as allocation.cells deltas)
+    totals: Optional[Dict[str, Any]] = None  # {total_order, total_sent, shortfall}
 
 
 class RecalculateResponse(BaseModel):
@@ -275,3 +277,4 @@ class CellUpdateResponse(BaseModel):
     updated_so: bool  # True if ORDER quantity changed
     recalculated_batches: bool  # True if SENT changed
     conflicts: List[str]  # Conflict messages if any
+    totals: Optional[Dict[str, Any]] = None  # Sheet totals after the update
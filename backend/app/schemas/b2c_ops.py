@@ -208,6 +208,7 @@ class MrpLabelPreviewResponse(BaseModel):
     valid_rows: int
     missing_pdfs: List[str]
     data: List[Dict[str, Any]]
+    errors: List[Dict[str, Any]] = Field(default_factory=list, description="Row-level errors: row_number, label, error")
 
 
 class MrpLabelGenerateRequest(BaseModel):
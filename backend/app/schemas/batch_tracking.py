@@ -2,8 +2,8 @@
 ================================================================================
 Marketplace ERP - Batch Tracking Schemas
 ================================================================================
-Version: 1.0.0
-Last Updated: 2024-12-04
+Version: 1.1.0
+Last Updated: 2026-10-18
 
 Description:
   Pydantic models for batch tracking request/response validation and serialization.
@@ -16,7 +16,7 @@ Description:
 from pydantic import BaseModel, Field
 from enum import Enum
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 import math
 
 
@@ -152,6 +152,8 @@ class SearchBatchesRequest(BaseModel):
     is_repacked: Optional[bool] = Field(None, description="Filter by repacked status")
     page: int = Field(1, ge=1, description="Page number")
     limit: int = Field(50, ge=1, le=100, description="Items per page")
+    cursor: Optional[str] = Field(None, description="Cursor from a previous page's next_cursor (overrides page)")
+    count: Literal["exact", "estimated", "none"] = Field("exact", description="Total count mode")
 
     class Config:
         json_schema_extra = {
@@ -234,6 +236,73 @@ class BatchTimelineResponse(BaseModel):
     timeline: List[BatchTimelineStage]
 
 
+class BatchTracePurchaseOrder(BaseModel):
+    """Source PO of a batch in a trace"""
+    po_id: int
+    po_number: str
+    farm: Optional[str] = None
+
+
+class BatchTraceGrn(BaseModel):
+    """Goods receipt of a batch in a trace"""
+    grn_id: int
+    grn_number: str
+    receiving_date: Optional[str] = None
+
+
+class BatchTraceSalesOrder(BaseModel):
+    """Sales order that took stock from a batch"""
+    so_id: int
+    so_number: str
+    status: str
+    customer_name: Optional[str] = None
+    delivery_date: Optional[str] = None
+    allocated_quantity: float
+    delivered_quantity: float
+
+
+class BatchTraceWastage(BaseModel):
+    """Wastage logged against a batch"""
+    events: int = 0
+    quantity: float = 0
+
+
+class BatchTraceNode(BaseModel):
+    """One batch in a traceability graph"""
+    batch_id: int
+    batch_number: str
+    parent_batch_id: Optional[int] = None
+    relation: Literal["upstream", "self", "downstream"]
+    depth: int  # hops from the traced batch (negative upstream)
+    status: str
+    is_repacked: bool
+    current_location: Optional[str] = None
+    created_at: datetime
+    archived_at: Optional[datetime] = None
+    purchase_order: Optional[BatchTracePurchaseOrder] = None
+    grn: Optional[BatchTraceGrn] = None
+    documents: List[BatchDocumentLink] = []
+    sales_orders: List[BatchTraceSalesOrder] = []
+    wastage: BatchTraceWastage = BatchTraceWastage()
+
+
+class BatchTraceEdge(BaseModel):
+    """Repack link between two batches in a trace"""
+    parent_batch_number: str
+    child_batch_number: str
+
+
+class BatchTraceResponse(BaseModel):
+    """Full upstream/downstream traceability graph of a batch"""
+    batch_number: str
+    root_batch_number: str
+    batches: List[BatchTraceNode]
+    edges: List[BatchTraceEdge]
+    farms: List[str]
+    customers: List[str]
+    sales_order_count: int
+
+
 class BatchSearchResult(BaseModel):
     """Single batch in search results"""
     batch_id: int
@@ -248,10 +317,11 @@ class BatchSearchResult(BaseModel):
 class BatchSearchResponse(BaseModel):
     """Search results with pagination"""
     batches: List[BatchSearchResult]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
     page: int
     limit: int
     pages: int
+    next_cursor: Optional[str] = None
 
     @classmethod
     def create(cls, batches: List[BatchSearchResult], total: int, page: int, limit: int):
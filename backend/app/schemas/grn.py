@@ -94,6 +94,7 @@ class GRNDetailResponse(GRNResponse):
 
 class GRNListResponse(BaseModel):
     grns: List[GRNResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     limit: int
+    next_cursor: Optional[str] = None
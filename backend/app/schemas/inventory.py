@@ -316,6 +316,26 @@ class StockAvailabilityResponse(BaseModel):
     locations: dict  # {location: quantity}
 
 
+class StockAvailabilityBatchRequest(BaseModel):
+    """Check availability for many order lines in one call"""
+    lines: List[StockAvailabilityQuery] = Field(..., min_length=1, max_length=500)
+
+
+class StockAvailabilityLineResult(StockAvailabilityResponse):
+    """Availability result for one requested line"""
+    line_index: int
+    location_filter: Optional[str] = None
+    grade_filter: Optional[str] = None
+
+
+class StockAvailabilityBatchResponse(BaseModel):
+    """Batch availability check result"""
+    lines: List[StockAvailabilityLineResult]
+    all_available: bool
+    lines_short: int
+    total_shortage: Decimal
+
+
 # ============================================================================
 # BATCH INVENTORY SCHEMAS
 # ============================================================================
@@ -407,6 +427,26 @@ class StockAllocationRequest(BaseModel):
         return v
 
 
+class OrderAllocationLine(BaseModel):
+    """One line of a whole-order allocation"""
+    item_id: int = Field(..., gt=0, description="Item ID")
+    quantity: Decimal = Field(..., gt=0, description="Quantity to allocate")
+    batch_ids: Optional[List[int]] = Field(None, description="Specific batches to allocate (optional, uses FIFO if not provided)")
+
+
+class OrderAllocationRequest(BaseModel):
+    """Allocate every line of a sales order in one transaction"""
+    order_id: int = Field(..., gt=0, description="Sales order ID")
+    lines: List[OrderAllocationLine] = Field(..., min_length=1, max_length=500)
+    location: Optional[str] = Field('packed_warehouse', description="Location to allocate from")
+
+    @validator('location')
+    def validate_location(cls, v):
+        if v and v not in VALID_LOCATIONS:
+            raise ValueError(f'Location must be one of: {", ".join(VALID_LOCATIONS)}')
+        return v
+
+
 class StockDeallocationRequest(BaseModel):
     """Deallocate/release stock from cancelled order"""
     order_id: int = Field(..., gt=0, description="Sales order ID to deallocate")
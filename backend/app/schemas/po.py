@@ -204,10 +204,11 @@ class PODetailResponse(POResponse):
 class POListResponse(BaseModel):
     """Paginated list of purchase orders"""
     pos: List[POResponse]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
     page: int
     limit: int
     pages: int
+    next_cursor: Optional[str] = None
 
     @classmethod
     def create(cls, pos: List[POResponse], total: int, page: int, limit: int):
@@ -210,10 +210,11 @@ class SODetailResponse(SOResponse):
 class SOListResponse(BaseModel):
     """Paginated list of sales orders"""
     orders: List[SOResponse]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
     page: int
     limit: int
     pages: int
+    next_cursor: Optional[str] = None
 
     @classmethod
     def create(cls, orders: List[SOResponse], total: int, page: int, limit: int):
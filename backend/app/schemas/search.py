@@ -0,0 +1,29 @@
+"""
+================================================================================
+Marketplace ERP - Global Search Schemas
+================================================================================
+Version: 1.0.0
+Created: 2026-10-18
+
+Response models for the global quick-search endpoint.
+================================================================================
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+
+
+class QuickSearchResult(BaseModel):
+    """One matching record"""
+    entity_type: str = Field(..., description="item, product, batch, customer, woo_customer, vendor, purchase_order, sales_order or ticket")
+    id: int = Field(..., description="Primary key of the record in its own table")
+    label: Optional[str] = Field(None, description="Main display text (name, number or title)")
+    sublabel: Optional[str] = Field(None, description="Secondary display text (SKU, status, company)")
+    score: float = Field(..., description="Rank; higher is better (prefix matches score above 1)")
+
+
+class QuickSearchResponse(BaseModel):
+    """Ranked results across all searched entity types"""
+    query: str
+    results: List[QuickSearchResult]
+    counts: Dict[str, int] = Field(default_factory=dict, description="Number of results per entity type")
@@ -122,3 +122,4 @@ class SyncResponse(BaseModel):
     deleted_count: int
     unchanged_count: int
     total_products: int
+    field_changes: Dict[str, int] = {}
@@ -244,14 +244,15 @@ class TicketDetailResponse(BaseModel):
 class TicketsListResponse(BaseModel):
     """Paginated list of tickets"""
     tickets: List[TicketResponse]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
     page: int
     limit: int
     total_pages: int = Field(default=0)
+    next_cursor: Optional[str] = None
 
     def __init__(self, **data):
         super().__init__(**data)
-        if self.limit > 0:
+        if self.limit > 0 and self.total is not None:
             self.total_pages = math.ceil(self.total / self.limit)
 
 
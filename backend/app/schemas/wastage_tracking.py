@@ -280,7 +280,7 @@ class WastageProductAnalytics(BaseModel):
     total_wastage_kg: float
     total_cost: float
     wastage_percentage: float
-    problematic_stages: List[Dict[str, float]]
+    problematic_stages: List[Dict[str, Any]]
 
 
 class WastageAnalyticsByProductResponse(BaseModel):
@@ -336,10 +336,16 @@ class WastageAlertResponse(BaseModel):
     alert_level: str
     message: str
     farm: Optional[str] = None
+    item: Optional[str] = None
     stage: Optional[str] = None
     current_percentage: float
     threshold: float
     period: str  # e.g., "last_7_days"
+    id: Optional[int] = None
+    threshold_id: Optional[int] = None
+    status: Optional[str] = None  # active, resolved
+    triggered_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
 
 
 class RepackBatchResponse(BaseModel):
@@ -117,7 +117,8 @@ class WooCustomerResponse(WooCustomerBase):
 class WooCustomerListResponse(BaseModel):
     """Schema for WooCommerce customer list response"""
     customers: List[WooCustomerResponse]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
+    next_cursor: Optional[str] = None
 
 
 # ============================================================================
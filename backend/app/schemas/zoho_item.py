@@ -86,7 +86,8 @@ class ZohoItemResponse(ZohoItemBase):
 class ZohoItemListResponse(BaseModel):
     """Schema for Zoho item list response"""
     items: List[ZohoItemResponse]
-    total: int
+    total: Optional[int] = None  # None when counting was skipped (count=none)
+    next_cursor: Optional[str] = None
 
 
 # ============================================================================
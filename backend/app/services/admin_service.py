@@ -68,7 +68,10 @@ import logging
 import math
 import uuid
 
-from app.database import get_db, fetch_one, fetch_all, execute_query
+from app.database import (
+    get_db, fetch_one, fetch_all, execute_query,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
 from app.auth.password import hash_password
 from app.services.auth_service import log_activity
 from app.schemas.admin import (
@@ -80,6 +83,12 @@ from app.schemas.admin import (
 
 logger = logging.getLogger(__name__)
 
+# Activity log order: newest first, id as keyset tie-breaker
+ACTIVITY_LOG_SORT = [
+    SortKey("created_at", "created_at", descending=True),
+    SortKey("id", "id", descending=True),
+]
+
 
 # ============================================================================
 # USER MANAGEMENT
@@ -793,8 +802,10 @@ async def get_activity_logs(
     action_type: Optional[str] = None,
     page: int = 1,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
 ) -> Dict:
-    """Get activity logs with filters"""
+    """Get activity logs with filters (keyset pagination when cursor is given)"""
     # Build WHERE clause
     where_conditions = [f"created_at >= NOW() - INTERVAL '{days} days'"]
     params = []
@@ -818,16 +829,23 @@ async def get_activity_logs(
     where_clause = f"WHERE {' AND '.join(where_conditions)}"
 
     # Get total count
-    count_query = f"""
-        SELECT COUNT(*) as total
-        FROM activity_logs
-        {where_clause}
-    """
-    count_result = await fetch_one(count_query, *params)
-    total = count_result["total"] if count_result else 0
+    total = await count_rows(f"FROM activity_logs {where_clause}", *params, mode=count_mode)
+
+    # Continue after the cursor position, or fall back to page offset
+    try:
+        cursor_condition, cursor_params = keyset_condition(ACTIVITY_LOG_SORT, cursor, param_count)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if cursor_condition:
+        where_conditions.append(cursor_condition)
+        params.extend(cursor_params)
+        param_count += len(cursor_params)
+        where_clause = f"WHERE {' AND '.join(where_conditions)}"
+        offset = 0
+    else:
+        offset = (page - 1) * limit
 
     # Get paginated logs
-    offset = (page - 1) * limit
     logs_query = f"""
         SELECT
             id, 
@@ -837,11 +855,12 @@ async def get_activity_logs(
             description, metadata, success, created_at
         FROM activity_logs
         {where_clause}
-        ORDER BY created_at DESC
+        {keyset_order_by(ACTIVITY_LOG_SORT)}
         LIMIT ${param_count} OFFSET ${param_count + 1}
     """
-    params.extend([limit, offset])
+    params.extend([limit + 1, offset])
     logs_raw = await fetch_all(logs_query, *params)
+    logs_raw, next_cursor = keyset_page(logs_raw, ACTIVITY_LOG_SORT, limit)
 
     # Convert logs to dicts and parse metadata JSON strings
     import json
@@ -856,7 +875,7 @@ async def get_activity_logs(
                 log_dict['metadata'] = None
         logs.append(log_dict)
 
-    return {"logs": logs, "total": total, "page": page, "limit": limit}
+    return {"logs": logs, "total": total, "page": page, "limit": limit, "next_cursor": next_cursor}
 
 
 # ============================================================================
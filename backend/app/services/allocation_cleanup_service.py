@@ -2,171 +2,260 @@
 ================================================================================
 Allocation Cleanup Service
 ================================================================================
-Version: 1.0.0
+Version: 2.0.0
 Created: 2024-12-12
+Last Updated: 2026-10-18
 
 Description:
-  Service to automatically release stale allocations (older than 24 hours).
-  Should be run as a scheduled task (cron/celery).
+  Service to automatically release stale allocations (older than
+  settings.ALLOCATION_TIMEOUT_HOURS). Runs on the scheduler every
+  settings.ALLOCATION_CLEANUP_INTERVAL_MINUTES and can be triggered
+  manually from POST /inventory/allocations/cleanup.
+
+  - Chunked, set-based release: each chunk of ALLOCATION_CLEANUP_CHUNK_SIZE
+    rows is locked (SKIP LOCKED, so rows being allocated or confirmed are
+    left alone), released and logged as deallocation movements by a single
+    statement in its own short transaction.
+  - Single run across workers: pg_try_advisory_xact_lock held on a
+    dedicated connection for the duration of the run; an overlapping run is
+    skipped.
+  - Every run is recorded in allocation_cleanup_runs (migration 044).
 
 Usage:
   - Run manually: python -m app.services.allocation_cleanup_service
-  - Schedule: Add to cron or Celery Beat
-  - Frequency: Every 1 hour recommended
 
 ================================================================================
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone, timedelta
-from app.database import fetch_all, execute_query, DatabaseTransaction
+from decimal import Decimal
+import time
+from app.config import settings
+from app.database import fetch_all, execute_query, get_db
 import logging
 
 logger = logging.getLogger(__name__)
 
+CLEANUP_LOCK_KEY = "allocation_cleanup"
+
+# Order holding an allocated row `i`; rows allocated before migration 043
+# have no allocated_order_id and are traced through their latest allocation
+# movement
+ALLOCATION_ORDER_ID = """
+    COALESCE(i.allocated_order_id, (
+        SELECT m.reference_id
+        FROM inventory_movements m
+        WHERE m.item_id = i.item_id
+          AND m.batch_id = i.batch_id
+          AND m.from_location = i.location
+          AND m.reference_type = 'sales_order'
+          AND m.movement_type = 'allocation'
+        ORDER BY m.created_at DESC
+        LIMIT 1
+    ))
+"""
+
+# Release up to $2 allocations older than $1 hours and log their movements
+RELEASE_CHUNK_QUERY = f"""
+    WITH stale AS MATERIALIZED (
+        SELECT i.id, i.updated_at AS allocated_at, {ALLOCATION_ORDER_ID} AS order_id
+        FROM inventory i
+        WHERE i.status = 'allocated'
+          AND i.updated_at < NOW() - make_interval(hours => $1::int)
+        ORDER BY i.updated_at, i.id
+        LIMIT $2::int
+        FOR UPDATE OF i SKIP LOCKED
+    ),
+    released AS (
+        UPDATE inventory i
+        SET status = 'available', allocated_order_id = NULL, updated_at = NOW()
+        FROM stale s
+        WHERE i.id = s.id
+        RETURNING i.id, i.item_id, i.batch_id, i.quantity, i.location, s.order_id, s.allocated_at,
+                  (EXTRACT(EPOCH FROM (NOW() - s.allocated_at)) / 3600)::numeric AS age_hours
+    ),
+    logged AS (
+        INSERT INTO inventory_movements (
+            item_id, batch_id, movement_type, quantity,
+            from_location, to_location,
+            reference_type, reference_id, notes, created_by
+        )
+        SELECT
+            item_id, batch_id, 'deallocation', quantity, location, location,
+            'sales_order', order_id,
+            format('Auto-released due to timeout (%s hours old, limit: %shrs)', round(age_hours, 1), $1::int),
+            NULL
+        FROM released
+        WHERE quantity > 0
+    )
+    SELECT r.*, zi.name AS item_name, b.batch_number
+    FROM released r
+    JOIN zoho_items zi ON r.item_id = zi.id
+    JOIN batches b ON r.batch_id = b.id
+"""
+
 
-async def release_stale_allocations(timeout_hours: int = 24) -> Dict[str, Any]:
+async def _finish_run(run_id: int, status: str, totals: Dict[str, Any], started: float,
+                      error: Optional[str] = None) -> None:
+    await execute_query(
+        """
+        UPDATE allocation_cleanup_runs
+        SET status = $2, released_count = $3, released_quantity = $4, orders_affected = $5,
+            chunks = $6, error_message = $7, finished_at = NOW(), duration_ms = $8
+        WHERE id = $1
+        """,
+        run_id, status, totals['released_count'], totals['released_quantity'],
+        len(totals['orders']), totals['chunks'], error, int((time.monotonic() - started) * 1000)
+    )
+
+
+async def release_stale_allocations(
+    timeout_hours: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    trigger: str = 'manual',
+    triggered_by: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Release stock allocations older than specified timeout.
-    
+
     Args:
-        timeout_hours: Hours before allocation is considered stale (default: 24)
-        
+        timeout_hours: Hours before allocation is considered stale
+            (default: settings.ALLOCATION_TIMEOUT_HOURS)
+        chunk_size: Rows released per statement
+            (default: settings.ALLOCATION_CLEANUP_CHUNK_SIZE)
+        trigger: 'manual' or 'scheduled'
+        triggered_by: User ID for manual runs
+
     Returns:
         Summary of released allocations
-        
+
     Business Logic:
-        - Stock in 'allocated' status for >24 hours is released
+        - Stock in 'allocated' status for longer than the timeout is released
         - Changed to 'available' status
         - Deallocation movement logged
-        - Admin notified of auto-releases
+        - Run recorded in allocation_cleanup_runs
     """
-    try:
-        async with DatabaseTransaction() as conn:
-            # 1. Find stale allocations
-            stale_query = """
-                SELECT 
-                    i.id as inventory_id,
-                    i.item_id,
-                    i.batch_id,
-                    i.quantity,
-                    i.location,
-                    i.updated_at,
-                    m.reference_id as order_id,
-                    zi.name as item_name,
-                    b.batch_number
-                FROM inventory i
-                JOIN inventory_movements m ON (
-                    m.item_id = i.item_id 
-                    AND m.batch_id = i.batch_id
-                    AND m.reference_type = 'sales_order'
-                    AND m.movement_type = 'allocation'
-                )
-                JOIN zoho_items zi ON i.item_id = zi.id
-                JOIN batches b ON i.batch_id = b.id
-                WHERE i.status = 'allocated'
-                  AND i.updated_at < NOW() - INTERVAL '%s hours'
-                ORDER BY i.updated_at ASC
-            """ % timeout_hours
-            
-            stale_allocations = await conn.fetch(stale_query)
-            
-            if not stale_allocations:
-                logger.info("✅ No stale allocations found (timeout: ${timeout_hours}hrs)")
+    timeout_hours = timeout_hours or settings.ALLOCATION_TIMEOUT_HOURS
+    chunk_size = chunk_size or settings.ALLOCATION_CLEANUP_CHUNK_SIZE
+    started = time.monotonic()
+
+    pool = get_db()
+    async with pool.acquire() as lock_conn:
+        lock_tx = lock_conn.transaction()
+        await lock_tx.start()
+        try:
+            locked = await lock_conn.fetchval(
+                "SELECT pg_try_advisory_xact_lock(hashtext($1))", CLEANUP_LOCK_KEY
+            )
+            run_id = await execute_query(
+                """
+                INSERT INTO allocation_cleanup_runs (trigger, triggered_by, status, timeout_hours, chunk_size)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING id
+                """,
+                trigger, str(triggered_by) if triggered_by else None,
+                'running' if locked else 'skipped', timeout_hours, chunk_size
+            )
+
+            totals = {'released_count': 0, 'released_quantity': Decimal('0'), 'orders': set(), 'chunks': 0}
+
+            if not locked:
+                logger.info("⏭️ Stale allocation release already running on another worker, skipping")
+                await _finish_run(run_id, 'skipped', totals, started)
                 return {
                     'released_count': 0,
                     'timeout_hours': timeout_hours,
+                    'skipped': True,
+                    'run_id': run_id,
+                    'message': 'Cleanup already running'
+                }
+
+            released_items: List[Dict[str, Any]] = []
+            try:
+                # Each chunk is its own statement (and transaction); released
+                # rows get a fresh updated_at, so they are never picked again
+                while True:
+                    rows = await fetch_all(RELEASE_CHUNK_QUERY, timeout_hours, chunk_size)
+                    if not rows:
+                        break
+
+                    totals['chunks'] += 1
+                    totals['released_count'] += len(rows)
+                    for row in rows:
+                        totals['released_quantity'] += Decimal(str(row['quantity']))
+                        if row['order_id'] is not None:
+                            totals['orders'].add(row['order_id'])
+                        released_items.append({
+                            'order_id': row['order_id'],
+                            'item_id': row['item_id'],
+                            'item_name': row['item_name'],
+                            'batch_id': row['batch_id'],
+                            'batch_number': row['batch_number'],
+                            'quantity': float(row['quantity']),
+                            'location': row['location'],
+                            'age_hours': round(float(row['age_hours']), 1),
+                            'allocated_at': row['allocated_at'].isoformat()
+                        })
+
+                    if len(rows) < chunk_size:
+                        break
+            except Exception as e:
+                logger.error(f"❌ Failed to release stale allocations: {e}")
+                await _finish_run(run_id, 'failed', totals, started, str(e) or e.__class__.__name__)
+                raise
+
+            await _finish_run(run_id, 'completed', totals, started)
+
+            if not released_items:
+                logger.info(f"✅ No stale allocations found (timeout: {timeout_hours}hrs)")
+                return {
+                    'released_count': 0,
+                    'timeout_hours': timeout_hours,
+                    'run_id': run_id,
                     'message': 'No stale allocations'
                 }
-            
-            released_items = []
-            
-            for allocation in stale_allocations:
-                inventory_id = allocation['inventory_id']
-                item_id = allocation['item_id']
-                batch_id = allocation['batch_id']
-                quantity = allocation['quantity']
-                location = allocation['location']
-                order_id = allocation['order_id']
-                age_hours = (datetime.now(timezone.utc) - allocation['updated_at']).total_seconds() / 3600
-                
-                # 2. Release allocation (allocated → available)
-                update_query = """
-                    UPDATE inventory
-                    SET status = 'available', updated_at = NOW()
-                    WHERE id = $1
-                    RETURNING id
-                """
-                await conn.execute(update_query, inventory_id)
-                
-                # 3. Log deallocation movement
-                movement_query = """
-                    INSERT INTO inventory_movements (
-                        item_id, batch_id, movement_type, quantity,
-                        from_location, to_location,
-                        reference_type, reference_id, notes, created_by
-                    ) VALUES ($1, $2, 'deallocation', $3, $4, $4, 
-                              'sales_order', $5, $6, NULL)
-                """
-                notes = f"Auto-released due to timeout ({age_hours:.1f} hours old, limit: {timeout_hours}hrs)"
-                await conn.execute(
-                    movement_query,
-                    item_id,
-                    batch_id,
-                    quantity,
-                    location,
-                    order_id,
-                    notes
-                )
-                
-                released_items.append({
-                    'order_id': order_id,
-                    'item_id': item_id,
-                    'item_name': allocation['item_name'],
-                    'batch_id': batch_id,
-                    'batch_number': allocation['batch_number'],
-                    'quantity': float(quantity),
-                    'location': location,
-                    'age_hours': round(age_hours, 1),
-                    'allocated_at': allocation['updated_at'].isoformat()
-                })
-            
+
             logger.warning(
                 f"⚠️ Auto-released {len(released_items)} stale allocation(s) "
-                f"(>{timeout_hours}hrs old)"
+                f"(>{timeout_hours}hrs old) in {totals['chunks']} chunk(s)"
             )
-            
-            # 4. Return summary for admin notification
+
+            # Summary for admin notification
             return {
                 'released_count': len(released_items),
+                'released_quantity': float(totals['released_quantity']),
+                'orders_affected': len(totals['orders']),
+                'chunks': totals['chunks'],
                 'timeout_hours': timeout_hours,
+                'run_id': run_id,
                 'released_items': released_items,
                 'message': f'Released {len(released_items)} stale allocations',
                 'executed_at': datetime.now(timezone.utc).isoformat()
             }
-            
-    except Exception as e:
-        logger.error(f"❌ Failed to release stale allocations: {e}")
-        raise
+        finally:
+            # Ends the transaction, releasing the advisory lock
+            await lock_tx.rollback()
 
 
-async def get_stale_allocations_report(timeout_hours: int = 24) -> List[Dict[str, Any]]:
+async def get_stale_allocations_report(timeout_hours: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Get report of allocations approaching timeout (for monitoring).
-    
+
     Args:
-        timeout_hours: Timeout threshold
-        
+        timeout_hours: Timeout threshold (default: settings.ALLOCATION_TIMEOUT_HOURS)
+
     Returns:
         List of allocations with remaining time
     """
+    timeout_hours = timeout_hours or settings.ALLOCATION_TIMEOUT_HOURS
     try:
         # Find allocations approaching timeout (e.g., >20 hours old)
-        warning_threshold = timeout_hours - 4  # 4 hours before timeout
-        
-        query = """
-            SELECT 
-                m.reference_id as order_id,
+        warning_threshold = max(timeout_hours - 4, 0)  # 4 hours before timeout
+
+        query = f"""
+            SELECT
+                {ALLOCATION_ORDER_ID} as order_id,
                 i.item_id,
                 zi.name as item_name,
                 i.batch_id,
@@ -177,21 +266,15 @@ async def get_stale_allocations_report(timeout_hours: int = 24) -> List[Dict[str
                 EXTRACT(EPOCH FROM (NOW() - i.updated_at))/3600 as age_hours,
                 $1 - EXTRACT(EPOCH FROM (NOW() - i.updated_at))/3600 as hours_remaining
             FROM inventory i
-            JOIN inventory_movements m ON (
-                m.item_id = i.item_id 
-                AND m.batch_id = i.batch_id
-                AND m.reference_type = 'sales_order'
-                AND m.movement_type = 'allocation'
-            )
             JOIN zoho_items zi ON i.item_id = zi.id
             JOIN batches b ON i.batch_id = b.id
             WHERE i.status = 'allocated'
-              AND i.updated_at < NOW() - INTERVAL '%s hours'
+              AND i.updated_at < NOW() - make_interval(hours => $2)
             ORDER BY i.updated_at ASC
-        """ % warning_threshold
-        
-        approaching_timeout = await fetch_all(query, timeout_hours)
-        
+        """
+
+        approaching_timeout = await fetch_all(query, timeout_hours, warning_threshold)
+
         return [
             {
                 'order_id': row['order_id'],
@@ -207,30 +290,50 @@ async def get_stale_allocations_report(timeout_hours: int = 24) -> List[Dict[str
             }
             for row in approaching_timeout
         ]
-        
+
     except Exception as e:
         logger.error(f"❌ Failed to get stale allocations report: {e}")
         raise
 
 
+async def get_cleanup_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent release runs with their counts and timings"""
+    return await fetch_all(
+        """
+        SELECT id, trigger, triggered_by, status, timeout_hours, chunk_size,
+               released_count, released_quantity, orders_affected, chunks,
+               error_message, started_at, finished_at, duration_ms
+        FROM allocation_cleanup_runs
+        ORDER BY started_at DESC, id DESC
+        LIMIT $1
+        """,
+        limit
+    )
+
+
 # For manual testing
 if __name__ == "__main__":
     import asyncio
-    
+    from app.database import connect_db, disconnect_db
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    
+
     async def main():
-        print("Running allocation cleanup service...")
-        result = await release_stale_allocations(timeout_hours=24)
-        print(f"\nResult: {result}")
-        
-        print("\n\nChecking for approaching timeout...")
-        report = await get_stale_allocations_report(timeout_hours=24)
-        print(f"Found {len(report)} allocations approaching timeout")
-        for item in report:
-            print(f"  - Order #{item['order_id']}: {item['hours_remaining']:.1f}hrs remaining")
-    
+        await connect_db()
+        try:
+            print("Running allocation cleanup service...")
+            result = await release_stale_allocations()
+            print(f"\nResult: {result}")
+
+            print("\n\nChecking for approaching timeout...")
+            report = await get_stale_allocations_report()
+            print(f"Found {len(report)} allocations approaching timeout")
+            for item in report:
+                print(f"  - Order #{item['order_id']}: {item['hours_remaining']:.1f}hrs remaining")
+        finally:
+            await disconnect_db()
+
     asyncio.run(main())
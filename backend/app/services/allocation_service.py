@@ -1,179 +1,348 @@
 """
 Allocation Sheet Service
 Handles sheet generation, FIFO auto-fill, and cell management
+
+Opening a sheet is a read: cells are built and FIFO-filled by reconcile_sheet
+only for items marked in allocation_dirty_items (migration 042) by SO, SO line
+and packed warehouse stock changes. A new sheet is built in full once.
+
+Changed cells are pushed to the sheet's WebSocket room (allocation:<sheet_id>)
+as compact deltas, so open grids patch themselves instead of reloading.
 """
 
+import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import date, datetime, timezone
 from decimal import Decimal
 from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction
+from app.websocket import events as ws_events
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+# Cell columns sent in WebSocket deltas (RETURNING list of cell writes)
+CELL_DELTA_COLUMNS = """
+    id, item_id, customer_id, order_quantity, sent_quantity, has_shortfall,
+    order_modified, invoice_status, allocated_batches, version
+"""
+
+
+async def generate_sheet_data(delivery_date: date, user_id: str = None) -> Dict[str, Any]:
+    """
+    Allocation sheet grid for a delivery date.
 
-async def get_or_create_sheet(delivery_date: date) -> int:
+    Reconciles first only when the sheet does not exist yet or has items
+    marked dirty; otherwise this is a plain read of the stored cells. If
+    another worker is reconciling the sheet, the current grid is returned.
     """
-    Get existing sheet or create new one for delivery date
-    
+    state = await fetch_one("""
+        SELECT
+            (SELECT id FROM allocation_sheets WHERE delivery_date = $1) AS sheet_id,
+            EXISTS(SELECT 1 FROM allocation_dirty_items WHERE delivery_date = $1) AS dirty
+    """, delivery_date)
+
+    if state['sheet_id'] is None:
+        # First open: wait for a concurrent build rather than return nothing
+        await reconcile_sheet(delivery_date, user_id=user_id, wait=True)
+    elif state['dirty']:
+        await reconcile_sheet(delivery_date, user_id=user_id)
+
+    return await get_sheet_data(delivery_date)
+
+
+async def get_sheet_data(delivery_date: date) -> Optional[Dict[str, Any]]:
+    """
+    Read the stored grid for a delivery date (no writes, no locks).
+
     Returns:
-        sheet_id
+        Grid data (items, customers sorted by SO number, cells, totals),
+        or None if no sheet exists for the date
     """
-    # Check if sheet exists
-    existing = await fetch_one(
+    sheet = await fetch_one(
         "SELECT id FROM allocation_sheets WHERE delivery_date = $1",
         delivery_date
     )
-    
-    if existing:
-        return existing['id']
-    
-    # Create new sheet
-    result = await fetch_one(
-        "INSERT INTO allocation_sheets (delivery_date) VALUES ($1) RETURNING id",
-        delivery_date
+    if not sheet:
+        return None
+    sheet_id = sheet['id']
+
+    cells, items, customers = await asyncio.gather(
+        fetch_all("""
+            SELECT * FROM allocation_sheet_cells
+            WHERE sheet_id = $1
+            ORDER BY item_id, customer_id
+        """, sheet_id),
+        fetch_all("""
+            SELECT id, name, sku
+            FROM zoho_items
+            WHERE id IN (SELECT item_id FROM allocation_sheet_cells WHERE sheet_id = $1)
+            ORDER BY name
+        """, sheet_id),
+        fetch_all("""
+            SELECT DISTINCT ON (c.customer_id)
+                c.customer_id AS id,
+                cu.contact_name AS name,
+                so.so_number,
+                so.id AS so_id
+            FROM allocation_sheet_cells c
+            JOIN sales_orders so ON so.id = c.so_id
+            JOIN zoho_customers cu ON cu.id = so.customer_id
+            WHERE c.sheet_id = $1
+            ORDER BY c.customer_id, so.so_number ASC
+        """, sheet_id),
     )
-    
-    logger.info(f"✅ Created new allocation sheet for {delivery_date}")
-    return result['id']
 
+    total_order = sum(Decimal(str(c['order_quantity'])) for c in cells)
+    total_sent = sum(Decimal(str(c['sent_quantity'] or 0)) for c in cells)
 
-async def generate_sheet_data(delivery_date: date, user_id: str = None) -> Dict[str, Any]:
+    return {
+        'sheet_id': sheet_id,
+        'delivery_date': delivery_date,
+        'items': items,
+        'customers': sorted(customers, key=lambda c: c['so_number']),
+        'cells': [format_cell_response(c) for c in cells],
+        'totals': {
+            'total_order': float(total_order),
+            'total_sent': float(total_sent),
+            'shortfall': float(total_order - total_sent)
+        }
+    }
+
+
+async def reconcile_sheet(
+    delivery_date: date,
+    user_id: str = None,
+    full: bool = False,
+    wait: bool = False
+) -> Optional[Dict[str, Any]]:
     """
-    Generate complete allocation sheet data for delivery date
-    
-    Steps:
-    1. Get or create sheet record
-    2. Query all SOs for delivery date
-    3. Generate cells for (item, customer) combinations
-    4. Auto-fill SENT quantities using FIFO
-    5. Return grid data
+    Bring a sheet's cells in line with its SOs and stock.
+
+    Creates the sheet if needed (and then builds it in full). Otherwise
+    only items claimed from allocation_dirty_items are processed: cells are
+    upserted from the SO lines in one statement (rows whose ORDER quantity
+    and SO are unchanged are not written), cells whose SO line is gone are
+    removed unless already invoiced, and FIFO is re-run for those items.
+
+    Args:
+        delivery_date: Sheet date
+        user_id: Recorded as created_by on new cells
+        full: Reconcile every item, not just dirty ones
+        wait: Wait for a concurrent reconcile instead of skipping
+
+    Returns:
+        Dict with sheet_id, items, cells_written, cells_removed,
+        cells_filled; None if skipped because another reconcile is running
     """
     async with DatabaseTransaction() as conn:
-        # 1. Get/create sheet
-        sheet_id = await get_or_create_sheet(delivery_date)
-        
-        # 2. Get all SOs for this delivery date
-        sos_query = """
-            SELECT
-                so.id as so_id,
-                so.so_number,
-                so.customer_id,
-                c.contact_name as customer_name,
-                soi.item_id,
-                soi.quantity
+        lock_key = f"allocation_sheet:{delivery_date}"
+        if wait:
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", lock_key)
+        elif not await conn.fetchval("SELECT pg_try_advisory_xact_lock(hashtext($1))", lock_key):
+            logger.info(f"⏭️ Allocation sheet {delivery_date} is being reconciled elsewhere, skipping")
+            return None
+
+        sheet_id = await conn.fetchval(
+            "SELECT id FROM allocation_sheets WHERE delivery_date = $1",
+            delivery_date
+        )
+        if sheet_id is None:
+            sheet_id = await conn.fetchval(
+                "INSERT INTO allocation_sheets (delivery_date) VALUES ($1) RETURNING id",
+                delivery_date
+            )
+            full = True
+            logger.info(f"✅ Created new allocation sheet for {delivery_date}")
+
+        # Claim dirty items first: changes committed after this are marked again
+        claimed = await conn.fetch(
+            "DELETE FROM allocation_dirty_items WHERE delivery_date = $1 RETURNING item_id",
+            delivery_date
+        )
+        item_ids = None if full else [row['item_id'] for row in claimed]
+        result = {'sheet_id': sheet_id, 'items': 0, 'cells_written': 0, 'cells_removed': 0, 'cells_filled': 0}
+        if item_ids == []:
+            return result
+
+        written = await conn.fetch("""
+            INSERT INTO allocation_sheet_cells (
+                sheet_id, item_id, customer_id, so_id, order_quantity, created_by
+            )
+            SELECT DISTINCT ON (soi.item_id, so.customer_id)
+                $1, soi.item_id, so.customer_id::text, so.id, soi.quantity, $4::uuid
             FROM sales_orders so
             JOIN sales_order_items soi ON so.id = soi.sales_order_id
             JOIN zoho_customers c ON so.customer_id = c.id
-            WHERE so.delivery_date = $1
+            WHERE so.delivery_date = $2
               AND so.status NOT IN ('cancelled', 'delivered')
-            ORDER BY so.so_number ASC
-        """
-        so_items = await conn.fetch(sos_query, delivery_date)
-        
-        if not so_items:
-            logger.warning(f"⚠️ No SOs found for delivery date {delivery_date}")
-            return {
-                'sheet_id': sheet_id,
-                'delivery_date': delivery_date,
-                'items': [],
-                'customers': [],
-                'cells': [],
-                'totals': {'total_order': 0, 'total_sent': 0, 'shortfall': 0}
-            }
-        
-        # 3. Get unique items and customers
-        item_ids = list(set(item['item_id'] for item in so_items))
-        customer_ids = list(set(item['customer_id'] for item in so_items))
-        
-        # Get item details
-        items_query = """
-            SELECT id, name, sku
-            FROM zoho_items
-            WHERE id = ANY($1::int[])
-            ORDER BY name
-        """
-        items = await conn.fetch(items_query, item_ids)
-        
-        # Get customer details with SO numbers
-        customers_dict = {}
-        for so_item in so_items:
-            cust_id = str(so_item['customer_id'])  # Convert to string to match allocation_sheet_cells.customer_id type
-            if cust_id not in customers_dict:
-                customers_dict[cust_id] = {
-                    'id': cust_id,
-                    'name': so_item['customer_name'],
-                    'so_number': so_item['so_number'],
-                    'so_id': so_item['so_id']
-                }
-
-        customers = sorted(customers_dict.values(), key=lambda c: c['so_number'])
-        
-        # 4. Generate/update cells
-        cells = []
-        for so_item in so_items:
-            # Check if cell exists
-            existing_cell = await conn.fetchrow("""
-                SELECT * FROM allocation_sheet_cells
-                WHERE sheet_id = $1
-                  AND item_id = $2
-                  AND customer_id = $3
-            """, sheet_id, so_item['item_id'], str(so_item['customer_id']))
-
-            if existing_cell:
-                # Update ORDER quantity if SO changed
-                if existing_cell['order_quantity'] != so_item['quantity']:
-                    await conn.execute("""
-                        UPDATE allocation_sheet_cells
-                        SET order_quantity = $1, updated_at = NOW()
-                        WHERE id = $2
-                    """, so_item['quantity'], existing_cell['id'])
-
-                cells.append(dict(existing_cell))
-            else:
-                # Create new cell
-                new_cell = await conn.fetchrow("""
-                    INSERT INTO allocation_sheet_cells (
-                        sheet_id, item_id, customer_id, so_id,
-                        order_quantity, created_by
-                    ) VALUES ($1, $2, $3, $4, $5, $6)
-                    RETURNING *
-                """, sheet_id, so_item['item_id'], str(so_item['customer_id']),
-                    so_item['so_id'], so_item['quantity'], user_id)
-                
-                cells.append(dict(new_cell))
-        
-        # 5. Auto-fill SENT quantities using FIFO
-        await auto_fill_sent_quantities(sheet_id, conn)
-        
-        # 6. Reload cells with allocated batches
-        cells_query = """
-            SELECT * FROM allocation_sheet_cells
-            WHERE sheet_id = $1
-            ORDER BY item_id, customer_id
-        """
-        cells = await conn.fetch(cells_query, sheet_id)
-        
-        # 7. Calculate totals
-        total_order = sum(Decimal(str(c['order_quantity'])) for c in cells)
-        total_sent = sum(Decimal(str(c['sent_quantity'] or 0)) for c in cells)
-        
-        return {
-            'sheet_id': sheet_id,
-            'delivery_date': delivery_date,
-            'items': [dict(i) for i in items],
-            'customers': customers,
-            'cells': [format_cell_response(dict(c)) for c in cells],
-            'totals': {
-                'total_order': float(total_order),
-                'total_sent': float(total_sent),
-                'shortfall': float(total_order - total_sent)
-            }
-        }
+              AND ($3::int[] IS NULL OR soi.item_id = ANY($3::int[]))
+            ORDER BY soi.item_id, so.customer_id, so.so_number DESC
+            ON CONFLICT (sheet_id, item_id, customer_id) DO UPDATE
+            SET order_quantity = EXCLUDED.order_quantity,
+                so_id = EXCLUDED.so_id,
+                updated_at = NOW()
+            WHERE allocation_sheet_cells.order_quantity IS DISTINCT FROM EXCLUDED.order_quantity
+               OR allocation_sheet_cells.so_id IS DISTINCT FROM EXCLUDED.so_id
+            RETURNING {CELL_DELTA_COLUMNS}
+        """.format(CELL_DELTA_COLUMNS=CELL_DELTA_COLUMNS), sheet_id, delivery_date, item_ids, user_id)
+
+        removed = await conn.fetch("""
+            DELETE FROM allocation_sheet_cells cell
+            WHERE cell.sheet_id = $1
+              AND ($3::int[] IS NULL OR cell.item_id = ANY($3::int[]))
+              AND cell.invoice_status = 'pending'
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM sales_orders so
+                  JOIN sales_order_items soi ON so.id = soi.sales_order_id
+                  WHERE so.delivery_date = $2
+                    AND so.status NOT IN ('cancelled', 'delivered')
+                    AND soi.item_id = cell.item_id
+                    AND so.customer_id::text = cell.customer_id
+              )
+            RETURNING id
+        """, sheet_id, delivery_date, item_ids)
+
+        filled = await _fill_items(conn, sheet_id, item_ids)
+
+    result.update({
+        'items': len(item_ids) if item_ids is not None else None,
+        'cells_written': len(written),
+        'cells_removed': len(removed),
+        'cells_filled': len(filled),
+    })
+    logger.info(
+        f"✅ Reconciled allocation sheet {delivery_date} "
+        f"({'all' if item_ids is None else len(item_ids)} items): "
+        f"{len(written)} cells written, {len(removed)} removed, {len(filled)} refilled"
+    )
+
+    # Later writes of a cell carry its latest version
+    changed = {cell['id']: dict(cell) for cell in [*written, *filled]}
+    await publish_cell_changes(
+        sheet_id, list(changed.values()), [row['id'] for row in removed], reason='reconcile'
+    )
+    return result
+
+
+def _allocate_fifo(cells: List[Dict], stock: List[Dict]) -> List[tuple]:
+    """
+    Walk one item's cells (in SO order) through its batches (in FIFO order).
+
+    Returns:
+        (cell_id, sent_quantity, allocated_batches JSON) per cell
+    """
+    remaining = [Decimal(str(batch['quantity'])) for batch in stock]
+    position = 0
+    results = []
+
+    for cell in cells:
+        needed = Decimal(str(cell['order_quantity']))
+        allocated = []
+        allocated_qty = Decimal('0')
+
+        while position < len(stock) and allocated_qty < needed:
+            batch = stock[position]
+            take = min(remaining[position], needed - allocated_qty)
+
+            allocated.append({
+                'batch_id': batch['batch_id'],
+                'batch_number': batch['batch_number'],
+                'quantity': float(take),
+                'is_repacked': batch['is_repacked'],
+                'is_expiring_soon': batch['is_expiring_soon']
+            })
+
+            allocated_qty += take
+            remaining[position] -= take
 
+            # Move past exhausted batches
+            if remaining[position] <= 0:
+                position += 1
 
-async def auto_fill_sent_quantities(sheet_id: int, conn=None):
+        results.append((cell['id'], allocated_qty, json.dumps(allocated)))
+
+    return results
+
+
+async def _fill_items(conn, sheet_id: int, item_ids: Optional[List[int]] = None) -> List[Dict]:
+    """
+    FIFO-fill SENT for a sheet's cells (all items, or only item_ids) with
+    one stock query and one bulk UPDATE. Items without stock are left as
+    they are; cells whose result is unchanged are not written.
+
+    Returns:
+        Updated cells (CELL_DELTA_COLUMNS)
+    """
+    cells = await conn.fetch("""
+        SELECT id, item_id, order_quantity
+        FROM allocation_sheet_cells
+        WHERE sheet_id = $1
+          AND ($2::int[] IS NULL OR item_id = ANY($2::int[]))
+        ORDER BY item_id, so_id
+    """, sheet_id, item_ids)
+    if not cells:
+        return []
+
+    stock = await conn.fetch("""
+        SELECT
+            i.item_id, i.batch_id, i.quantity,
+            b.batch_number, b.is_repacked,
+            CASE 
+                WHEN i.expiry_date IS NOT NULL 
+                     AND i.expiry_date <= CURRENT_DATE + INTERVAL '2 days' 
+                THEN TRUE
+                ELSE FALSE
+            END as is_expiring_soon
+        FROM inventory i
+        JOIN batches b ON i.batch_id = b.id
+        WHERE i.item_id = ANY($1::int[])
+          AND i.location = 'packed_warehouse'
+          AND i.status = 'available'
+        ORDER BY 
+            i.item_id,
+            CASE 
+                WHEN i.expiry_date IS NOT NULL 
+                     AND i.expiry_date <= CURRENT_DATE + INTERVAL '2 days' 
+                THEN 0
+                ELSE 1
+            END,
+            b.is_repacked DESC,
+            i.entry_date ASC
+    """, list({cell['item_id'] for cell in cells}))
+
+    stock_by_item: Dict[int, List[Dict]] = {}
+    for batch in stock:
+        stock_by_item.setdefault(batch['item_id'], []).append(batch)
+    cells_by_item: Dict[int, List[Dict]] = {}
+    for cell in cells:
+        cells_by_item.setdefault(cell['item_id'], []).append(cell)
+
+    updates = []
+    for item_id, item_cells in cells_by_item.items():
+        # No stock available - leave SENT as it is
+        if item_id in stock_by_item:
+            updates.extend(_allocate_fifo(item_cells, stock_by_item[item_id]))
+    if not updates:
+        return []
+
+    cell_ids, sent_quantities, batches = zip(*updates)
+    updated = await conn.fetch("""
+        UPDATE allocation_sheet_cells
+        SET sent_quantity = u.new_sent_quantity,
+            allocated_batches = u.new_batches::jsonb,
+            updated_at = NOW()
+        FROM unnest($1::int[], $2::numeric[], $3::text[]) AS u(cell_id, new_sent_quantity, new_batches)
+        WHERE id = u.cell_id
+          AND (sent_quantity IS DISTINCT FROM u.new_sent_quantity
+               OR allocated_batches IS DISTINCT FROM u.new_batches::jsonb)
+        RETURNING {CELL_DELTA_COLUMNS}
+    """.format(CELL_DELTA_COLUMNS=CELL_DELTA_COLUMNS), list(cell_ids), list(sent_quantities), list(batches))
+    return [dict(row) for row in updated]
+
+
+async def auto_fill_sent_quantities(sheet_id: int, conn=None) -> List[Dict]:
     """
     Auto-fill SENT quantities using FIFO algorithm
     
@@ -184,110 +353,94 @@ async def auto_fill_sent_quantities(sheet_id: int, conn=None):
     
     Customer Priority:
     - SO number ascending (lower number = higher priority)
+
+    Changed cells are published to the sheet's room when this runs in its
+    own transaction; a caller passing conn publishes after committing.
+
+    Returns:
+        Changed cells
     """
-    should_close = False
     if conn is None:
-        conn = DatabaseTransaction()
-        await conn.__aenter__()
-        should_close = True
-    
+        async with DatabaseTransaction() as conn:
+            updated = await _fill_items(conn, sheet_id)
+        await publish_cell_changes(sheet_id, updated, reason='auto_fill')
+    else:
+        updated = await _fill_items(conn, sheet_id)
+
+    logger.info(f"✅ Auto-filled SENT quantities for sheet {sheet_id} ({len(updated)} cells changed)")
+    return updated
+
+
+def format_cell_delta(cell: Dict) -> Dict[str, Any]:
+    """Compact cell state for WebSocket deltas (fields the grid renders)"""
+    sent = Decimal(str(cell.get('sent_quantity') or 0))
+    ordered = Decimal(str(cell['order_quantity']))
+
+    return {
+        'id': cell['id'],
+        'item_id': cell['item_id'],
+        'customer_id': cell['customer_id'],
+        'order_quantity': float(ordered),
+        'sent_quantity': float(sent) if sent > 0 else None,
+        'has_shortfall': sent < ordered,
+        'order_modified': cell['order_modified'],
+        'invoice_status': cell['invoice_status'],
+        'allocated_batches': cell.get('allocated_batches'),
+        'version': cell['version']
+    }
+
+
+async def get_sheet_totals(sheet_id: int) -> Dict[str, float]:
+    """Sheet totals (total_order, total_sent, shortfall) in one aggregate"""
+    row = await fetch_one("""
+        SELECT
+            COALESCE(SUM(order_quantity), 0) AS total_order,
+            COALESCE(SUM(sent_quantity), 0) AS total_sent
+        FROM allocation_sheet_cells
+        WHERE sheet_id = $1
+    """, sheet_id)
+    total_order = Decimal(str(row['total_order']))
+    total_sent = Decimal(str(row['total_sent']))
+    return {
+        'total_order': float(total_order),
+        'total_sent': float(total_sent),
+        'shortfall': float(total_order - total_sent)
+    }
+
+
+async def publish_cell_changes(
+    sheet_id: int,
+    cells: List[Dict],
+    removed: Optional[List[int]] = None,
+    reason: str = 'update'
+):
+    """
+    Push changed / removed cells to clients viewing the sheet.
+
+    Rooms live in each worker's connection manager, so only clients
+    connected to this worker receive the delta. Failures are logged and
+    never fail the write that triggered them.
+
+    Args:
+        sheet_id: Sheet the cells belong to
+        cells: Changed cells (at least CELL_DELTA_COLUMNS)
+        removed: IDs of deleted cells
+        reason: cell_update, auto_fill, reconcile, mark_ready, invoiced
+    """
+    removed = removed or []
+    if (not cells and not removed) or not ws_events.has_allocation_watchers(sheet_id):
+        return
+
     try:
-        # Get all cells for this sheet
-        cells = await conn.fetch("""
-            SELECT * FROM allocation_sheet_cells
-            WHERE sheet_id = $1
-            ORDER BY item_id, so_id
-        """, sheet_id)
-        
-        # Group by item
-        items_dict = {}
-        for cell in cells:
-            item_id = cell['item_id']
-            if item_id not in items_dict:
-                items_dict[item_id] = []
-            items_dict[item_id].append(cell)
-        
-        # Process each item
-        for item_id, item_cells in items_dict.items():
-            # Get available stock for this item with FIFO priority
-            stock_query = """
-                SELECT
-                    i.id, i.batch_id, i.quantity,
-                    b.batch_number, b.is_repacked,
-                    i.expiry_date,
-                    i.entry_date,
-                    CASE 
-                        WHEN i.expiry_date IS NOT NULL 
-                             AND i.expiry_date <= CURRENT_DATE + INTERVAL '2 days' 
-                        THEN TRUE
-                        ELSE FALSE
-                    END as is_expiring_soon
-                FROM inventory i
-                JOIN batches b ON i.batch_id = b.id
-                WHERE i.item_id = $1
-                  AND i.location = 'packed_warehouse'
-                  AND i.status = 'available'
-                ORDER BY 
-                    CASE 
-                        WHEN i.expiry_date IS NOT NULL 
-                             AND i.expiry_date <= CURRENT_DATE + INTERVAL '2 days' 
-                        THEN 0
-                        ELSE 1
-                    END,
-                    b.is_repacked DESC,
-                    i.entry_date ASC
-            """
-            stock = await conn.fetch(stock_query, item_id)
-            
-            if not stock:
-                # No stock available - leave SENT empty
-                continue
-            
-            # Convert to mutable list of dicts
-            remaining_stock = [dict(s) for s in stock]
-            
-            # Allocate to customers (already sorted by SO number via ORDER BY)
-            for cell in item_cells:
-                needed = Decimal(str(cell['order_quantity']))
-                allocated = []
-                allocated_qty = Decimal('0')
-                
-                for batch in remaining_stock[:]:  # Create copy for iteration
-                    if allocated_qty >= needed:
-                        break
-                    
-                    batch_qty = Decimal(str(batch['quantity']))
-                    take = min(batch_qty, needed - allocated_qty)
-                    
-                    allocated.append({
-                        'batch_id': batch['batch_id'],
-                        'batch_number': batch['batch_number'],
-                        'quantity': float(take),
-                        'is_repacked': batch['is_repacked'],
-                        'is_expiring_soon': batch['is_expiring_soon']
-                    })
-                    
-                    allocated_qty += take
-                    batch['quantity'] = float(batch_qty - take)
-                    
-                    # Remove exhausted batches
-                    if batch['quantity'] <= 0:
-                        remaining_stock.remove(batch)
-                
-                # Update cell with allocated quantity and batches
-                await conn.execute("""
-                    UPDATE allocation_sheet_cells
-                    SET sent_quantity = $1,
-                        allocated_batches = $2::jsonb,
-                        updated_at = NOW()
-                    WHERE id = $3
-                """, float(allocated_qty), json.dumps(allocated), cell['id'])
-        
-        logger.info(f"✅ Auto-filled SENT quantities for sheet {sheet_id}")
-        
-    finally:
-        if should_close:
-            await conn.__aexit__(None, None, None)
+        await ws_events.emit_allocation_cells(
+            sheet_id,
+            [format_cell_delta(cell) for cell in cells],
+            removed,
+            await get_sheet_totals(sheet_id),
+            reason
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish allocation deltas for sheet {sheet_id}: {e}")
 
 
 def format_cell_response(cell: Dict) -> Dict[str, Any]:
@@ -450,10 +603,13 @@ async def update_cell(
             "SELECT * FROM allocation_sheet_cells WHERE id = $1",
             cell_id
         )
-        
-        return {
-            'cell': format_cell_response(dict(updated_cell)),
-            'updated_so': updated_so,
-            'recalculated_batches': recalculated_batches,
-            'conflicts': []
-        }
+
+    await publish_cell_changes(updated_cell['sheet_id'], [dict(updated_cell)], reason='cell_update')
+
+    return {
+        'cell': format_cell_response(dict(updated_cell)),
+        'updated_so': updated_so,
+        'recalculated_batches': recalculated_batches,
+        'conflicts': [],
+        'totals': await get_sheet_totals(updated_cell['sheet_id'])
+    }
@@ -2,17 +2,18 @@
 ================================================================================
 Marketplace ERP - Batch Tracking Service
 ================================================================================
-Version: 1.0.0
-Last Updated: 2024-12-04
+Version: 1.1.0
+Last Updated: 2026-10-18
 
 Description:
   Business logic for batch tracking module. Handles batch number generation,
   batch history tracking, document linking, repacking workflow, and search.
 
 Functions:
-  - generate_batch_number: Atomic batch number generation
+  - generate_batch_number: Batch number generation (document_sequences counter)
   - get_batch_details: Complete batch information
   - get_batch_timeline: Visual timeline of batch journey
+  - get_batch_trace: Upstream/downstream traceability graph (batch_lineage)
   - search_batches: Search with multiple criteria
   - create_repacked_batch: Repacking workflow
   - add_batch_history: Log event to batch history
@@ -23,13 +24,17 @@ Functions:
 ================================================================================
 """
 
+import json
 import logging
 from typing import Optional, Dict, List, Any
 from datetime import datetime, timedelta
 from app.utils.timezone import now_ist
 import asyncpg
 
-from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction
+from app.database import (
+    fetch_one, fetch_all, execute_query, DatabaseTransaction,
+    SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
 from app.schemas.batch_tracking import (
     BatchStatus, BatchStage, BatchEventType, DocumentType,
     GenerateBatchRequest, RepackBatchRequest, AddBatchHistoryRequest,
@@ -38,64 +43,167 @@ from app.schemas.batch_tracking import (
     BatchSearchResult, RepackBatchResponse, BatchHistoryEvent,
     BatchDocumentLink
 )
+from app.services import doc_sequence_service
 
 logger = logging.getLogger(__name__)
 
+# Batch search order: newest first, id as keyset tie-breaker
+BATCH_SEARCH_SORT = [
+    SortKey("b.created_at", "created_at", descending=True),
+    SortKey("b.id", "id", descending=True),
+]
+
+# Latest history event of each stage; a batch without history yields one
+# row with a NULL stage
+BATCH_TIMELINE_QUERY = """
+    SELECT h.stage, h.created_at, h.event_details
+    FROM batches b
+    LEFT JOIN LATERAL (
+        SELECT DISTINCT ON (bh.stage) bh.stage, bh.created_at, bh.event_details
+        FROM batch_history bh
+        WHERE bh.batch_id = b.id
+        ORDER BY bh.stage, bh.created_at DESC
+    ) h ON TRUE
+    WHERE b.batch_number = $1
+"""
+
+# Whole repack lineage of batch $1 as one JSON array: ancestors (negative
+# depth), the batch itself (0) and descendants from the batch_lineage closure
+# table. Sales order quantities net deallocations off allocations.
+BATCH_TRACE_QUERY = """
+    WITH target AS (
+        SELECT id FROM batches WHERE batch_number = $1
+    ),
+    lineage AS (
+        SELECT l.ancestor_id AS batch_id, -l.depth AS depth
+        FROM batch_lineage l
+        JOIN target t ON l.descendant_id = t.id
+        UNION
+        SELECT l.descendant_id, l.depth
+        FROM batch_lineage l
+        JOIN target t ON l.ancestor_id = t.id
+    ),
+    nodes AS (
+        SELECT
+            ln.depth, b.batch_number,
+            json_build_object(
+                'batch_id', b.id,
+                'batch_number', b.batch_number,
+                'parent_batch_id', b.parent_batch_id,
+                'relation', CASE
+                    WHEN ln.depth < 0 THEN 'upstream'
+                    WHEN ln.depth = 0 THEN 'self'
+                    ELSE 'downstream'
+                END,
+                'depth', ln.depth,
+                'status', b.status,
+                'is_repacked', b.is_repacked,
+                'current_location', b.current_location,
+                'created_at', b.created_at,
+                'archived_at', b.archived_at,
+                'purchase_order', CASE WHEN po.id IS NOT NULL THEN json_build_object(
+                    'po_id', po.id, 'po_number', po.po_number, 'farm', v.contact_name
+                ) END,
+                'grn', CASE WHEN g.id IS NOT NULL THEN json_build_object(
+                    'grn_id', g.id, 'grn_number', g.grn_number, 'receiving_date', g.receiving_date
+                ) END,
+                'documents', docs.items,
+                'sales_orders', orders.items,
+                'wastage', json_build_object('events', w.events, 'quantity', w.quantity)
+            ) AS node
+        FROM lineage ln
+        JOIN batches b ON b.id = ln.batch_id
+        LEFT JOIN purchase_orders po ON po.id = b.po_id
+        LEFT JOIN zoho_vendors v ON v.id = po.vendor_id
+        LEFT JOIN grns g ON g.id = b.grn_id
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(json_build_object(
+                'document_type', d.document_type,
+                'document_id', d.document_id,
+                'document_number', d.document_number
+            ) ORDER BY d.linked_at), '[]'::json) AS items
+            FROM batch_documents d
+            WHERE d.batch_id = b.id
+        ) docs
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(json_build_object(
+                'so_id', so.id,
+                'so_number', so.so_number,
+                'status', so.status,
+                'customer_name', c.contact_name,
+                'delivery_date', so.delivery_date,
+                'allocated_quantity', mv.allocated,
+                'delivered_quantity', mv.delivered
+            ) ORDER BY so.delivery_date, so.id), '[]'::json) AS items
+            FROM (
+                SELECT
+                    m.reference_id AS so_id,
+                    SUM(CASE m.movement_type
+                        WHEN 'allocation' THEN m.quantity
+                        WHEN 'deallocation' THEN -m.quantity
+                        ELSE 0
+                    END) AS allocated,
+                    SUM(CASE WHEN m.movement_type = 'stock_out' THEN m.quantity ELSE 0 END) AS delivered
+                FROM inventory_movements m
+                WHERE m.batch_id = b.id AND m.reference_type = 'sales_order'
+                GROUP BY m.reference_id
+            ) mv
+            JOIN sales_orders so ON so.id = mv.so_id
+            LEFT JOIN zoho_customers c ON c.id = so.customer_id
+            WHERE mv.allocated > 0 OR mv.delivered > 0
+        ) orders
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS events, COALESCE(SUM(we.quantity), 0) AS quantity
+            FROM wastage_events we
+            WHERE we.batch_id = b.id
+        ) w
+    )
+    SELECT COALESCE(json_agg(node ORDER BY depth, batch_number), '[]'::json) AS batches
+    FROM nodes
+"""
+
 
 # ============================================================================
 # BATCH NUMBER GENERATION
 # ============================================================================
 
-async def _check_and_rollover_fy(conn: asyncpg.Connection):
+async def _get_batch_numbering() -> Dict[str, str]:
     """
-    Check if financial year rollover is needed and perform it.
-    Called within a transaction before generating batch number.
+    Prefix and financial year for new batch numbers, from batch_sequence.
+    Once the configured FY has ended the row is rolled forward (no lock is
+    held; the counter itself lives in document_sequences and starts at 1
+    for the new FY automatically).
 
     Indian FY: April 1 to March 31
     Example: FY 2025-26 = April 1, 2025 to March 31, 2026
     """
-    from datetime import date
-
-    # Get current batch sequence
-    query = """
-        SELECT fy_end_date, financial_year, prefix
+    config = await fetch_one("""
+        SELECT prefix, financial_year, fy_end_date
         FROM batch_sequence
         WHERE id = 1
-    """
-    seq = await conn.fetchrow(query)
-
-    if not seq:
-        return
-
-    today = date.today()
-    fy_end_date = seq['fy_end_date']
-
-    # Check if we've passed the FY end date
-    if today > fy_end_date:
-        # Calculate new FY
-        # If today is after March 31, new FY starts April 1 of current year
-        if today.month >= 4:  # Apr-Dec
-            new_fy_start = date(today.year, 4, 1)
-            new_fy_end = date(today.year + 1, 3, 31)
-            new_fy_short = f"{str(today.year)[-2:]}{str(today.year + 1)[-2:]}"  # 2526
-        else:  # Jan-Mar (already in next FY)
-            new_fy_start = date(today.year - 1, 4, 1)
-            new_fy_end = date(today.year, 3, 31)
-            new_fy_short = f"{str(today.year - 1)[-2:]}{str(today.year)[-2:]}"  # 2425
-
-        # Rollover: reset sequence, update FY
-        update_query = """
-            UPDATE batch_sequence
-            SET current_number = 0,
-                financial_year = $1,
-                fy_start_date = $2,
-                fy_end_date = $3,
-                updated_at = NOW()
-            WHERE id = 1
-        """
-        await conn.execute(update_query, new_fy_short, new_fy_start, new_fy_end)
+    """)
+
+    if not config:
+        raise Exception("Batch sequence not initialized")
+
+    today = now_ist().date()
+    if today <= config['fy_end_date']:
+        return {"prefix": config['prefix'], "financial_year": config['financial_year']}
 
-        logger.info(f"✅ FY Rollover: Reset batch sequence. New FY: {new_fy_short} ({new_fy_start} to {new_fy_end})")
+    fy = doc_sequence_service.get_financial_year(today)
+    result = await execute_query("""
+        UPDATE batch_sequence
+        SET financial_year = $1,
+            fy_start_date = $2,
+            fy_end_date = $3,
+            updated_at = NOW()
+        WHERE id = 1 AND fy_end_date < $4
+    """, fy['code'], fy['start_date'], fy['end_date'], today)
+
+    if result == "UPDATE 1":
+        logger.info(f"✅ FY Rollover: New batch FY: {fy['code']} ({fy['start_date']} to {fy['end_date']})")
+
+    return {"prefix": config['prefix'], "financial_year": fy['code']}
 
 
 async def generate_batch_number(
@@ -104,9 +212,13 @@ async def generate_batch_number(
     created_by: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Generate new sequential batch number (thread-safe).
+    Generate new sequential batch number (concurrency-safe).
     Format: B/2526/0001 (prefix/fy_short/sequence)
 
+    The number is reserved through doc_sequence_service before the batch
+    transaction starts, so concurrent batch creation does not serialize on
+    a counter row.
+
     Args:
         po_id: Purchase Order ID (optional)
         grn_id: GRN ID (optional)
@@ -119,31 +231,21 @@ async def generate_batch_number(
         Exception: If batch generation fails
     """
     try:
-        async with DatabaseTransaction() as conn:
-            # 1. Check if FY rollover needed
-            await _check_and_rollover_fy(conn)
-
-            # 2. Lock and increment batch_sequence (atomic)
-            sequence_query = """
-                UPDATE batch_sequence
-                SET current_number = current_number + 1,
-                    updated_at = NOW()
-                WHERE id = 1
-                RETURNING current_number, prefix, financial_year
-            """
-            sequence_row = await conn.fetchrow(sequence_query)
-
-            if not sequence_row:
-                raise Exception("Batch sequence not initialized")
-
-            current_number = sequence_row['current_number']
-            prefix = sequence_row['prefix']
-            financial_year = sequence_row['financial_year']
+        # 1. Prefix and FY (rolls over on the first batch of a new FY)
+        numbering = await _get_batch_numbering()
+        prefix = numbering['prefix']
+        financial_year = numbering['financial_year']
+
+        # 2. Reserve the next number for this FY
+        current_number = await doc_sequence_service.next_number(
+            doc_sequence_service.DOC_BATCH, financial_year
+        )
 
-            # 3. Format batch number: B/2526/0001 - pad to 4 digits
-            batch_number = f"{prefix}/{financial_year}/{current_number:04d}"
+        # 3. Format batch number: B/2526/0001 - pad to 4 digits
+        batch_number = f"{prefix}/{financial_year}/{current_number:04d}"
 
-            # 3. Create batch record
+        async with DatabaseTransaction() as conn:
+            # 4. Create batch record
             insert_query = """
                 INSERT INTO batches (
                     batch_number, status, po_id, grn_id, created_by
@@ -160,7 +262,7 @@ async def generate_batch_number(
                 created_by
             )
 
-            # 4. Add initial history event
+            # 5. Add initial history event
             history_query = """
                 INSERT INTO batch_history (
                     batch_id, stage, event_type, new_status, created_by
@@ -176,7 +278,7 @@ async def generate_batch_number(
                 created_by
             )
 
-            # 5. Link documents (if provided)
+            # 6. Link documents (if provided)
             if po_id:
                 await _link_document_internal(
                     conn, batch_row['id'], DocumentType.PO.value, po_id, None, created_by
@@ -281,7 +383,10 @@ async def get_batch_details(batch_number: str) -> Optional[Dict[str, Any]]:
                 {
                     "stage": h['stage'],
                     "event_type": h['event_type'],
-                    "event_details": h['event_details'],
+                    "event_details": (
+                        json.loads(h['event_details']) if isinstance(h['event_details'], str)
+                        else h['event_details']
+                    ),
                     "old_status": h['old_status'],
                     "new_status": h['new_status'],
                     "location": h['location'],
@@ -301,6 +406,9 @@ async def get_batch_timeline(batch_number: str) -> Optional[Dict[str, Any]]:
     """
     Get visual timeline of batch journey through stages.
 
+    Reads only the latest history event of each stage (one query) instead of
+    loading the full batch details.
+
     Args:
         batch_number: Batch number
 
@@ -308,9 +416,8 @@ async def get_batch_timeline(batch_number: str) -> Optional[Dict[str, Any]]:
         Timeline data or None if batch not found
     """
     try:
-        # Get batch history
-        details = await get_batch_details(batch_number)
-        if not details:
+        rows = await fetch_all(BATCH_TIMELINE_QUERY, batch_number)
+        if not rows:
             return None
 
         # Define stage order and names
@@ -324,28 +431,21 @@ async def get_batch_timeline(batch_number: str) -> Optional[Dict[str, Any]]:
             "delivery": "Delivery"
         }
 
-        # Build timeline from history
-        timeline = []
-        history_by_stage = {}
-
-        for event in details['history']:
-            stage = event['stage']
-            if stage not in history_by_stage:
-                history_by_stage[stage] = []
-            history_by_stage[stage].append(event)
+        # Most recent event in each stage
+        latest_by_stage = {row['stage']: row for row in rows if row['stage']}
 
-        # Create timeline stages
+        timeline = []
         for stage_key, stage_name in stage_map.items():
-            if stage_key in history_by_stage:
-                events = history_by_stage[stage_key]
-                latest_event = events[-1]  # Most recent event in this stage
+            if stage_key in latest_by_stage:
+                latest_event = latest_by_stage[stage_key]
+                details = latest_event['event_details']
 
                 timeline.append({
                     "stage": stage_key,
                     "stage_name": stage_name,
                     "timestamp": latest_event['created_at'],
                     "status": "completed",
-                    "details": latest_event.get('event_details', {})
+                    "details": json.loads(details) if isinstance(details, str) else details
                 })
 
         return {
@@ -358,6 +458,60 @@ async def get_batch_timeline(batch_number: str) -> Optional[Dict[str, Any]]:
         raise
 
 
+# ============================================================================
+# BATCH TRACEABILITY
+# ============================================================================
+
+async def get_batch_trace(batch_number: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the full upstream/downstream traceability graph of a batch.
+
+    Every batch in the repack lineage (from batch_lineage, migration 048)
+    comes back from one query with its source PO/farm, GRN, linked documents,
+    the sales orders it was allocated or delivered to, and its wastage.
+
+    Args:
+        batch_number: Batch number to trace
+
+    Returns:
+        Trace graph or None if batch not found
+    """
+    try:
+        row = await fetch_one(BATCH_TRACE_QUERY, batch_number)
+        batches = json.loads(row['batches']) if row else []
+        if not batches:
+            return None
+
+        # Batches are ordered by depth, so the most upstream one comes first
+        numbers = {b['batch_id']: b['batch_number'] for b in batches}
+        edges = [
+            {
+                "parent_batch_number": numbers[b['parent_batch_id']],
+                "child_batch_number": b['batch_number']
+            }
+            for b in batches
+            if b['parent_batch_id'] in numbers
+        ]
+        sales_orders = [so for b in batches for so in b['sales_orders']]
+
+        return {
+            "batch_number": batch_number,
+            "root_batch_number": batches[0]['batch_number'],
+            "batches": batches,
+            "edges": edges,
+            "farms": sorted({
+                b['purchase_order']['farm'] for b in batches
+                if b['purchase_order'] and b['purchase_order']['farm']
+            }),
+            "customers": sorted({so['customer_name'] for so in sales_orders if so['customer_name']}),
+            "sales_order_count": len({so['so_id'] for so in sales_orders})
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Failed to trace batch {batch_number}: {e}")
+        raise
+
+
 # ============================================================================
 # BATCH SEARCH
 # ============================================================================
@@ -414,38 +568,37 @@ async def search_batches(filters: SearchBatchesRequest) -> Dict[str, Any]:
         where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
         # Count total
-        count_query = f"""
-            SELECT COUNT(*) as total
-            FROM batches b
-            {where_clause}
-        """
-        count_result = await fetch_one(count_query, *params)
-        total = count_result['total'] if count_result else 0
+        total = await count_rows(f"FROM batches b {where_clause}", *params, mode=filters.count)
+
+        # Continue after the cursor position, or fall back to page offset
+        cursor_condition, cursor_params = keyset_condition(BATCH_SEARCH_SORT, filters.cursor, param_count)
+        if cursor_condition:
+            conditions.append(cursor_condition)
+            params.extend(cursor_params)
+            param_count += len(cursor_params)
+            where_clause = "WHERE " + " AND ".join(conditions)
+            offset = 0
+        else:
+            offset = (filters.page - 1) * filters.limit
 
         # Get paginated results
-        offset = (filters.page - 1) * filters.limit
         search_query = f"""
             SELECT
                 b.id, b.batch_number, b.status, b.is_repacked,
                 b.created_at,
                 v.vendor_display_name,
-                (
-                    SELECT location
-                    FROM batch_history bh
-                    WHERE bh.batch_id = b.id AND bh.location IS NOT NULL
-                    ORDER BY bh.created_at DESC
-                    LIMIT 1
-                ) as current_location
+                b.current_location
             FROM batches b
             LEFT JOIN purchase_orders po ON b.po_id = po.id
             LEFT JOIN zoho_vendors v ON po.vendor_id = v.id
             {where_clause}
-            ORDER BY b.created_at DESC
+            {keyset_order_by(BATCH_SEARCH_SORT)}
             LIMIT ${param_count} OFFSET ${param_count + 1}
         """
-        params.extend([filters.limit, offset])
+        params.extend([filters.limit + 1, offset])
 
         batches = await fetch_all(search_query, *params)
+        batches, next_cursor = keyset_page(batches, BATCH_SEARCH_SORT, filters.limit)
 
         # Build response
         results = [
@@ -466,7 +619,8 @@ async def search_batches(filters: SearchBatchesRequest) -> Dict[str, Any]:
             "total": total,
             "page": filters.page,
             "limit": filters.limit,
-            "pages": (total + filters.limit - 1) // filters.limit if total > 0 else 1
+            "pages": (total + filters.limit - 1) // filters.limit if total else 1,
+            "next_cursor": next_cursor
         }
 
     except Exception as e:
@@ -501,7 +655,7 @@ async def create_repacked_batch(
     try:
         # 1. Validate parent batch exists and not already repacked
         parent_query = """
-            SELECT id, batch_number, status
+            SELECT id, batch_number, status, po_id, grn_id
             FROM batches
             WHERE batch_number = $1
         """
@@ -553,19 +707,19 @@ async def create_repacked_batch(
                 INSERT INTO batch_history (
                     batch_id, stage, event_type, event_details, new_status, created_by
                 )
-                VALUES ($1, $2, $3, $4, $5, $6)
+                VALUES ($1, $2, $3, $4::jsonb, $5, $6)
             """
             await conn.execute(
                 history_query,
                 new_batch['id'],
                 BatchStage.INVENTORY.value,
                 BatchEventType.REPACKED.value,
-                {
+                json.dumps({
                     "parent_batch": parent_batch_number,
                     "reason": repack_data.reason,
                     "damaged_quantity": repack_data.damaged_quantity,
                     "repacked_quantity": repack_data.repacked_quantity
-                },
+                }),
                 BatchStatus.IN_INVENTORY.value,
                 created_by
             )
@@ -630,7 +784,7 @@ async def add_batch_history(
                     batch_id, stage, event_type, event_details,
                     old_status, new_status, location, created_by
                 )
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                VALUES ($1, $2, $3, $4::jsonb, $5, $6, $7, $8)
                 RETURNING id, created_at
             """
             history = await conn.fetchrow(
@@ -638,21 +792,23 @@ async def add_batch_history(
                 batch['id'],
                 event.stage.value,
                 event.event_type.value,
-                event.event_details,
+                json.dumps(event.event_details) if event.event_details is not None else None,
                 old_status if new_status != old_status else None,
                 new_status if new_status != old_status else None,
                 event.location,
                 created_by
             )
 
-            # 3. Update batch status if changed
-            if new_status != old_status:
+            # 3. Update batch status if changed and keep current_location in step
+            #    with the latest located history event
+            if new_status != old_status or event.location:
                 update_query = """
                     UPDATE batches
-                    SET status = $1
-                    WHERE id = $2
+                    SET status = $1,
+                        current_location = COALESCE($2, current_location)
+                    WHERE id = $3
                 """
-                await conn.execute(update_query, new_status, batch['id'])
+                await conn.execute(update_query, new_status, event.location, batch['id'])
 
             return {
                 "history_id": history['id'],
@@ -877,7 +1033,7 @@ async def get_batch_configuration() -> Dict[str, Any]:
     """
     try:
         query = """
-            SELECT prefix, current_number, financial_year,
+            SELECT prefix, financial_year,
                    fy_start_date, fy_end_date, updated_at
             FROM batch_sequence
             WHERE id = 1
@@ -887,13 +1043,20 @@ async def get_batch_configuration() -> Dict[str, Any]:
         if not config:
             raise Exception("Batch configuration not found")
 
+        current_number = await doc_sequence_service.get_current_number(
+            doc_sequence_service.DOC_BATCH, config['financial_year']
+        )
+        next_number = await doc_sequence_service.peek_next_number(
+            doc_sequence_service.DOC_BATCH, config['financial_year']
+        )
+
         return {
             "prefix": config['prefix'],
-            "current_number": config['current_number'],
+            "current_number": current_number,
             "financial_year": config['financial_year'],
             "fy_start_date": config['fy_start_date'].isoformat(),
             "fy_end_date": config['fy_end_date'].isoformat(),
-            "next_batch_number": f"{config['prefix']}/{config['financial_year']}/{config['current_number'] + 1:04d}",
+            "next_batch_number": f"{config['prefix']}/{config['financial_year']}/{next_number:04d}",
             "updated_at": config['updated_at']
         }
 
@@ -937,12 +1100,8 @@ async def update_batch_configuration(
             params.append(prefix)
             param_count += 1
 
-        if starting_number is not None:
-            if starting_number < 0:
-                raise ValueError("Starting number must be >= 0")
-            updates.append(f"current_number = ${param_count}")
-            params.append(starting_number)
-            param_count += 1
+        if starting_number is not None and starting_number < 0:
+            raise ValueError("Starting number must be >= 0")
 
         if financial_year is not None:
             if len(financial_year) != 4:
@@ -961,7 +1120,7 @@ async def update_batch_configuration(
             params.append(fy_end_date)
             param_count += 1
 
-        if not updates:
+        if not updates and starting_number is None:
             raise ValueError("No updates provided")
 
         # Add updated_at
@@ -971,20 +1130,29 @@ async def update_batch_configuration(
             UPDATE batch_sequence
             SET {', '.join(updates)}
             WHERE id = 1
-            RETURNING prefix, current_number, financial_year, fy_start_date, fy_end_date
+            RETURNING prefix, financial_year, fy_start_date, fy_end_date
         """
 
         result = await fetch_one(query, *params)
 
+        # The counter for the (possibly new) FY lives in document_sequences
+        if starting_number is not None:
+            await doc_sequence_service.set_current_number(
+                doc_sequence_service.DOC_BATCH, result['financial_year'], starting_number
+            )
+        current_number = await doc_sequence_service.get_current_number(
+            doc_sequence_service.DOC_BATCH, result['financial_year']
+        )
+
         logger.info(f"✅ Updated batch configuration: {result}")
 
         return {
             "prefix": result['prefix'],
-            "current_number": result['current_number'],
+            "current_number": current_number,
             "financial_year": result['financial_year'],
             "fy_start_date": result['fy_start_date'].isoformat() if result['fy_start_date'] else None,
             "fy_end_date": result['fy_end_date'].isoformat() if result['fy_end_date'] else None,
-            "next_batch_number": f"{result['prefix']}/{result['financial_year']}/{result['current_number'] + 1:04d}"
+            "next_batch_number": f"{result['prefix']}/{result['financial_year']}/{current_number + 1:04d}"
         }
 
     except ValueError as ve:
@@ -0,0 +1,279 @@
+"""
+================================================================================
+Marketplace ERP - Contact Sync Service
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Shared pipeline for the contact master syncs (Zoho customers, Zoho vendors,
+  WooCommerce customers); the Zoho item sync uses the same staged upsert
+  for each page it receives:
+
+  1. fetch_all_pages: list pages are requested CONTACT_FETCH_CONCURRENCY at
+     a time until the source reports no more pages
+  2. The calling service flattens the records into a DataFrame (helpers:
+     flatten_records, parse_datetimes, first_present) and names the columns
+     after the target table
+  3. upsert_contacts: rows get a content hash, are COPYed into a temporary
+     staging table and merged with one INSERT ... ON CONFLICT per batch.
+     Rows whose stored content_hash matches are left untouched, so a nightly
+     run only writes contacts that actually changed.
+
+  Columns not listed in a ContactSyncSpec (notes, customer_segment, ...) are
+  never overwritten, which preserves user edits.
+
+Functions:
+  - fetch_all_pages: Concurrent pagination over a page fetcher
+  - flatten_records: Records -> DataFrame with nested dicts flattened
+  - column: Source column with a default when absent or null
+  - first_present: First non-null value across candidate columns
+  - first_nonzero: First non-zero amount across candidate columns
+  - parse_datetimes: Vectorized ISO timestamp parsing
+  - upsert_contacts: Hash, stage with COPY and merge into the target table
+
+================================================================================
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.database import DatabaseTransaction
+
+logger = logging.getLogger(__name__)
+
+# Pages requested at once while paginating a contact list
+CONTACT_FETCH_CONCURRENCY = 4
+
+# Rows staged and merged per transaction
+CONTACT_SYNC_BATCH = 1000
+
+
+class ContactSyncSpec(NamedTuple):
+    """
+    How a normalized contact frame maps onto its table.
+
+    table: Target table
+    key: Source identifier column with a UNIQUE constraint (ON CONFLICT target)
+    columns: Columns written from the source on insert and update
+    required: Columns that must be non-null; rows missing one are errors
+    insert_values: Extra columns set only on insert, as SQL expressions
+    audit_values: Extra columns set on insert and update, as SQL expressions
+    (expressions may reference $1, the syncing user)
+    """
+    table: str
+    key: str
+    columns: Tuple[str, ...]
+    required: Tuple[str, ...] = ()
+    insert_values: Dict[str, str] = {}
+    audit_values: Dict[str, str] = {}
+
+
+async def fetch_all_pages(
+    fetch_page: Callable[[int], Awaitable[Tuple[List[Dict], bool]]],
+    concurrency: int = CONTACT_FETCH_CONCURRENCY,
+    max_pages: Optional[int] = None
+) -> List[Dict]:
+    """
+    Fetch pages 1..N, concurrency pages at a time.
+
+    Args:
+        fetch_page: Coroutine taking a page number and returning
+            (records, has_more_pages)
+        concurrency: Pages requested per round
+        max_pages: Stop after this many pages
+
+    Returns:
+        Records from every page, in page order
+    """
+    records: List[Dict] = []
+    page = 1
+    while max_pages is None or page <= max_pages:
+        last = page + concurrency - 1 if max_pages is None else min(page + concurrency - 1, max_pages)
+        results = await asyncio.gather(*[fetch_page(p) for p in range(page, last + 1)])
+
+        for page_records, has_more in results:
+            records.extend(page_records)
+            if not page_records or not has_more:
+                return records
+        page = last + 1
+    return records
+
+
+def flatten_records(records: List[Dict], max_level: int = 1) -> pd.DataFrame:
+    """Records as a DataFrame; nested dicts become parent_child columns"""
+    if not records:
+        return pd.DataFrame()
+    return pd.json_normalize(records, sep='_', max_level=max_level)
+
+
+def column(df: pd.DataFrame, name: str, default: Any = None) -> pd.Series:
+    """Column by name, or a column of default when the source omitted it"""
+    if name in df.columns:
+        values = df[name]
+        return values if default is None else values.where(values.notna(), default)
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def first_present(df: pd.DataFrame, *names: str) -> pd.Series:
+    """First non-null value across candidate columns, row by row"""
+    result = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            values = df[name].astype(object)
+            result = values.where(values.notna(), result)
+    return result
+
+
+def first_nonzero(df: pd.DataFrame, *names: str) -> pd.Series:
+    """First value that is neither null nor zero (Python `a or b`), else 0"""
+    result = pd.Series([0.0] * len(df), index=df.index)
+    for name in reversed(names):
+        if name in df.columns:
+            values = pd.to_numeric(df[name], errors='coerce')
+            result = values.where(values.fillna(0) != 0, result)
+    return result
+
+
+def parse_datetimes(values: pd.Series, naive: bool = False) -> pd.Series:
+    """
+    Parse ISO timestamps ('2021-03-02T16:56:44+0530', '2024-01-05T10:00:00')
+    in one pass; unparseable values become NaT. Offset-less values are
+    taken as UTC. With naive=True the result is UTC without tzinfo, for
+    TIMESTAMP (without time zone) columns.
+    """
+    parsed = pd.to_datetime(values, errors='coerce', utc=True, format='ISO8601')
+    return parsed.dt.tz_convert(None) if naive else parsed
+
+
+def _hash_token(value: Any) -> str:
+    """
+    Text of one value for content hashing, independent of the column dtype
+    the rest of the page gave it: missing values (None, NaN, NaT) are all '',
+    and integral numbers are written without a fraction (5 and 5.0 match).
+    """
+    if value is None:
+        return ''
+    if hasattr(value, 'item') and not isinstance(value, pd.Timestamp):
+        value = value.item()  # numpy scalar -> Python value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (float, Decimal)):
+        if value != value:  # NaN
+            return ''
+        number = float(value)
+        return str(int(number)) if number.is_integer() else repr(number)
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _content_hashes(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """MD5 per row over the synced columns (see _hash_token)"""
+    values = df[list(columns)]
+    values = values.astype(object).where(values.notna(), None)
+    joined = values.map(_hash_token).agg('\x1f'.join, axis=1)
+    return joined.map(lambda text: hashlib.md5(text.encode()).hexdigest())
+
+
+def _to_records(df: pd.DataFrame) -> List[tuple]:
+    """Rows as tuples of Python values with NaN/NaT/NA as None"""
+    values = df.astype(object)
+    values = values.where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+async def upsert_contacts(
+    spec: ContactSyncSpec,
+    df: pd.DataFrame,
+    synced_by: Optional[str] = None,
+    force: bool = False,
+    on_batch: Optional[Callable[[Dict[str, int]], None]] = None
+) -> Dict[str, int]:
+    """
+    Merge a normalized contact frame into spec.table.
+
+    Args:
+        spec: Table mapping
+        df: One row per contact with spec.key and spec.columns
+        synced_by: User ID, bound as $1 in insert_values/audit_values
+        force: Rewrite rows even when their content hash is unchanged
+        on_batch: Called with running counts after every batch
+
+    Returns:
+        Dict with total, added, updated, skipped, errors
+    """
+    counts = {"total": len(df), "added": 0, "updated": 0, "skipped": 0, "errors": 0}
+    if df.empty:
+        return counts
+
+    # Rows without a key or a required value cannot be written
+    invalid = df[spec.key].isna()
+    for name in spec.required:
+        invalid |= df[name].isna() | (df[name].astype(str).str.strip() == '')
+    if invalid.any():
+        logger.warning(f"{spec.table}: {int(invalid.sum())} contacts missing {spec.key} or required fields")
+    counts["errors"] += int(invalid.sum())
+    df = df.loc[~invalid]
+
+    # A contact listed twice is written once (last occurrence wins)
+    duplicates = df.duplicated(subset=[spec.key], keep='last')
+    counts["skipped"] += int(duplicates.sum())
+    df = df.loc[~duplicates]
+    if on_batch:
+        on_batch(counts)
+
+    staged_columns = [spec.key, *spec.columns, 'content_hash']
+    df = df.assign(content_hash=_content_hashes(df, [spec.key, *spec.columns]))[staged_columns]
+
+    stage = f"_stage_{spec.table}"
+    extra_insert = {**spec.insert_values, **spec.audit_values}
+    insert_columns = [*staged_columns, 'last_sync_at', *extra_insert.keys()]
+    select_values = [*(f"s.{c}" for c in staged_columns), 'NOW()', *extra_insert.values()]
+    assignments = [
+        *(f"{c} = EXCLUDED.{c}" for c in [*spec.columns, 'content_hash']),
+        'last_sync_at = NOW()',
+        'updated_at = NOW()',
+        *(f"{c} = {expr}" for c, expr in spec.audit_values.items()),
+    ]
+    merge_query = f"""
+        INSERT INTO {spec.table} ({', '.join(insert_columns)})
+        SELECT {', '.join(select_values)} FROM {stage} s
+        ON CONFLICT ({spec.key}) DO UPDATE SET {', '.join(assignments)}
+        {'' if force else f'WHERE {spec.table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash'}
+        RETURNING (xmax = 0) AS inserted
+    """
+    uses_user = any('$1' in expr for expr in extra_insert.values())
+    merge_args = [synced_by] if uses_user else []
+
+    for start in range(0, len(df), CONTACT_SYNC_BATCH):
+        batch = df.iloc[start:start + CONTACT_SYNC_BATCH]
+        try:
+            async with DatabaseTransaction() as conn:
+                await conn.execute(
+                    f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+                    f"SELECT {', '.join(staged_columns)} FROM {spec.table} WITH NO DATA"
+                )
+                await conn.copy_records_to_table(stage, records=_to_records(batch), columns=staged_columns)
+                written = await conn.fetch(merge_query, *merge_args)
+
+            added = sum(1 for row in written if row['inserted'])
+            counts["added"] += added
+            counts["updated"] += len(written) - added
+            counts["skipped"] += len(batch) - len(written)
+        except Exception as e:
+            logger.error(f"Error merging {len(batch)} contacts into {spec.table}: {e}")
+            counts["errors"] += len(batch)
+
+        if on_batch:
+            on_batch(counts)
+
+    return counts
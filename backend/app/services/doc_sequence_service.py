@@ -0,0 +1,177 @@
+"""
+================================================================================
+Marketplace ERP - Document Sequence Service
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Sequential document numbers per (document type, financial year), backed by
+  the document_sequences table (migration 035). Numbers are reserved with one
+  upsert on a pooled connection, outside the caller's transaction, so the
+  counter row is locked only for that statement and concurrent creates neither
+  collide nor queue behind each other. A rolled-back create leaves a gap.
+
+  With settings.DOC_SEQUENCE_BLOCK_SIZE > 1 each worker reserves a block of
+  numbers per round trip and hands them out locally.
+
+  Financial year rollover needs no job: the first number of a new FY inserts
+  its row starting at 1.
+
+Functions:
+  - get_financial_year: Indian FY (Apr 1 - Mar 31) for a date
+  - next_number: Reserve the next number for a document type and FY
+  - peek_next_number: Next number without reserving it (previews)
+  - ensure_at_least: Move the counter past a manually entered number
+  - get_current_number: Last issued number
+  - set_current_number: Reset the counter (admin)
+
+================================================================================
+"""
+
+import asyncio
+import logging
+from typing import Optional, Dict, List, Tuple, Any
+from datetime import date
+
+from app.config import settings
+from app.database import fetch_one, execute_query
+from app.utils.timezone import now_ist
+
+logger = logging.getLogger(__name__)
+
+# Document types
+DOC_SALES_ORDER = "sales_order"
+DOC_PURCHASE_ORDER = "purchase_order"
+DOC_BATCH = "batch"
+
+# Numbers reserved by this worker but not handed out yet: key -> [next, last]
+_blocks: Dict[Tuple[str, str], List[int]] = {}
+_block_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+
+def get_financial_year(on: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Indian financial year containing a date (defaults to today in IST).
+
+    Returns:
+        Dict with code ('2526'), label ('25-26'), start_date, end_date
+    """
+    on = on or now_ist().date()
+    start_year = on.year if on.month >= 4 else on.year - 1
+    end_year = start_year + 1
+    return {
+        "code": f"{str(start_year)[-2:]}{str(end_year)[-2:]}",
+        "label": f"{str(start_year)[-2:]}-{str(end_year)[-2:]}",
+        "start_date": date(start_year, 4, 1),
+        "end_date": date(end_year, 3, 31),
+    }
+
+
+async def _reserve(doc_type: str, financial_year: str, count: int) -> Tuple[int, int]:
+    """Reserve count numbers in one statement; returns (first, last)"""
+    last = await execute_query(
+        """
+        INSERT INTO document_sequences (doc_type, financial_year, current_number)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (doc_type, financial_year) DO UPDATE
+        SET current_number = document_sequences.current_number + EXCLUDED.current_number,
+            updated_at = NOW()
+        RETURNING current_number
+        """,
+        doc_type, financial_year, count
+    )
+    return last - count + 1, last
+
+
+async def next_number(
+    doc_type: str,
+    financial_year: str,
+    block_size: Optional[int] = None
+) -> int:
+    """
+    Reserve the next number for a document type and financial year.
+
+    Args:
+        doc_type: Document type (DOC_* constant)
+        financial_year: Short FY code, e.g. '2526'
+        block_size: Numbers to reserve per round trip (default from settings)
+
+    Returns:
+        The reserved number
+    """
+    size = max(1, block_size or settings.DOC_SEQUENCE_BLOCK_SIZE)
+    if size == 1:
+        number, _ = await _reserve(doc_type, financial_year, 1)
+        return number
+
+    key = (doc_type, financial_year)
+    lock = _block_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        block = _blocks.get(key)
+        if not block or block[0] > block[1]:
+            first, last = await _reserve(doc_type, financial_year, size)
+            block = _blocks[key] = [first, last]
+            logger.debug(f"Reserved {doc_type} numbers {first}-{last} for FY {financial_year}")
+        number = block[0]
+        block[0] += 1
+        return number
+
+
+async def peek_next_number(doc_type: str, financial_year: str) -> int:
+    """Next number this worker would issue, without reserving it"""
+    block = _blocks.get((doc_type, financial_year))
+    if block and block[0] <= block[1]:
+        return block[0]
+    return await get_current_number(doc_type, financial_year) + 1
+
+
+async def get_current_number(doc_type: str, financial_year: str) -> int:
+    """Last number issued (or reserved) for a document type and FY"""
+    row = await fetch_one(
+        """
+        SELECT current_number FROM document_sequences
+        WHERE doc_type = $1 AND financial_year = $2
+        """,
+        doc_type, financial_year
+    )
+    return row['current_number'] if row else 0
+
+
+async def ensure_at_least(doc_type: str, financial_year: str, number: int) -> None:
+    """
+    Move the counter to number if it is behind, so a manually entered
+    document number is never issued again.
+    """
+    await execute_query(
+        """
+        INSERT INTO document_sequences (doc_type, financial_year, current_number)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (doc_type, financial_year) DO UPDATE
+        SET current_number = GREATEST(document_sequences.current_number, EXCLUDED.current_number),
+            updated_at = NOW()
+        """,
+        doc_type, financial_year, number
+    )
+
+
+async def set_current_number(doc_type: str, financial_year: str, number: int) -> None:
+    """
+    Reset the counter (admin). Discards this worker's unused block; other
+    workers keep theirs until exhausted.
+    """
+    if number < 0:
+        raise ValueError("Sequence number must be >= 0")
+
+    await execute_query(
+        """
+        INSERT INTO document_sequences (doc_type, financial_year, current_number)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (doc_type, financial_year) DO UPDATE
+        SET current_number = EXCLUDED.current_number,
+            updated_at = NOW()
+        """,
+        doc_type, financial_year, number
+    )
+    _blocks.pop((doc_type, financial_year), None)
+    logger.info(f"✅ Reset {doc_type} sequence for FY {financial_year} to {number}")
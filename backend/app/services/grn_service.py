@@ -7,23 +7,27 @@ Version: 1.0.0
 Last Updated: 2024-12-06
 """
 
+import json
 import logging
 from typing import Optional, Dict, List, Any
 from datetime import datetime, date, time
 from decimal import Decimal
 import asyncpg
-import uuid
 from io import BytesIO
 
 from fastapi import UploadFile
 
-from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction, get_db
+from app.database import (
+    fetch_one, fetch_all, execute_query, DatabaseTransaction,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
 from app.schemas.grn import (
     GRNUpdateRequest, GRNResponse, GRNDetailResponse, GRNItemResponse, GRNPhotoResponse
 )
-from app.schemas.batch_tracking import BatchStage, BatchEventType, AddBatchHistoryRequest, BatchStatus
+from app.schemas.batch_tracking import BatchStage, BatchEventType, BatchStatus
 from app.services import po_service, batch_tracking_service, wastage_tracking_service
-from app.utils.supabase_client import get_supabase_client_async
+from app.utils.storage import get_storage_client
+from app.utils.media_upload import MediaUploadError, upload_media
 
 # Try importing ReportLab, fallback if not available
 try:
@@ -35,6 +39,14 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+GRN_PHOTOS_BUCKET = "grn-photos"
+
+# GRN list order: newest first, id as keyset tie-breaker
+GRN_LIST_SORT = [
+    SortKey("g.created_at", "created_at", descending=True),
+    SortKey("g.id", "id", descending=True),
+]
+
 # ============================================================================
 # GRN NUMBER GENERATION
 # ============================================================================
@@ -215,11 +227,12 @@ async def list_grns(
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
     page: int = 1,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT
 ) -> Dict[str, Any]:
-    """List GRNs with filters"""
+    """List GRNs with filters (keyset pagination when cursor is given)"""
     try:
-        offset = (page - 1) * limit
         params = []
         where_clauses = ["1=1"]
         param_idx = 1
@@ -253,7 +266,23 @@ async def list_grns(
 
         where_stmt = " AND ".join(where_clauses)
         
-        base_query = f"""
+        total = await count_rows(
+            f"FROM grns g JOIN batches b ON g.batch_id = b.id WHERE {where_stmt}",
+            *params, mode=count_mode
+        )
+
+        # Continue after the cursor position, or fall back to page offset
+        cursor_condition, cursor_params = keyset_condition(GRN_LIST_SORT, cursor, param_idx)
+        if cursor_condition:
+            where_clauses.append(cursor_condition)
+            params.extend(cursor_params)
+            param_idx += len(cursor_params)
+            where_stmt = " AND ".join(where_clauses)
+            offset = 0
+        else:
+            offset = (page - 1) * limit
+        
+        query = f"""
             SELECT 
                 g.*, 
                 po.po_number, po.vendor_id, 
@@ -266,26 +295,22 @@ async def list_grns(
             JOIN zoho_vendors v ON po.vendor_id = v.id
             LEFT JOIN auth.users u ON g.receiver_id = u.id
             WHERE {where_stmt}
+            {keyset_order_by(GRN_LIST_SORT)}
+            LIMIT ${param_idx} OFFSET ${param_idx + 1}
         """
+        params.append(limit + 1)
+        params.append(offset)
         
-        count_query = f"SELECT COUNT(*) FROM grns g JOIN batches b ON g.batch_id = b.id WHERE {where_stmt}"
+        grns = await fetch_all(query, *params)
+        grns, next_cursor = keyset_page(grns, GRN_LIST_SORT, limit)
         
-        async with get_db().acquire() as conn:
-            total = await conn.fetchval(count_query, *params)
-            
-            # Pagination
-            query = f"{base_query} ORDER BY g.created_at DESC LIMIT ${param_idx} OFFSET ${param_idx + 1}"
-            params.append(limit)
-            params.append(offset)
-            
-            grns = await conn.fetch(query, *params)
-            
-            return {
-                "grns": grns,
-                "total": total,
-                "page": page,
-                "limit": limit
-            }
+        return {
+            "grns": grns,
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
             
     except Exception as e:
         logger.error(f"❌ Failed to list GRNs: {e}")
@@ -393,11 +418,16 @@ async def update_grn(
 
 async def finalize_grn(grn_id: int, user_id: str) -> Dict[str, Any]:
     """
-    Finalize GRN and trigger downstream processes
+    Finalize GRN and trigger downstream processes.
+
+    GRN items, PO items and photo counts are loaded with one query each and
+    validated before anything is written; PO quantity updates, extra PO
+    items and wastage events (with their photos) are then applied with one
+    bulk statement each, so PO item rows are locked only for the write phase.
     """
     try:
         async with DatabaseTransaction() as conn:
-            grn = await conn.fetchrow("SELECT * FROM grns WHERE id = $1", grn_id)
+            grn = await conn.fetchrow("SELECT * FROM grns WHERE id = $1 FOR UPDATE", grn_id)
             if not grn:
                 raise ValueError(f"GRN {grn_id} not found")
             
@@ -406,148 +436,157 @@ async def finalize_grn(grn_id: int, user_id: str) -> Dict[str, Any]:
 
             if not grn['receiver_id']:
                 raise ValueError("Receiver must be assigned before finalization")
-            
-            items = await conn.fetch("SELECT * FROM grn_items WHERE grn_id = $1", grn_id)
-            
-            # Validations
-            for item in items:
-                if item['damage'] > 0:
-                    count = await conn.fetchval("""
-                        SELECT COUNT(*) FROM grn_photos 
-                        WHERE grn_id = $1 AND item_id = $2 AND photo_type = 'damage'
-                    """, grn_id, item['item_id'])
-                    if count == 0:
-                        raise ValueError(f"Photos required for damage on item ID {item['item_id']}")
-                
-                if item['reject'] > 0:
-                     count = await conn.fetchval("""
-                        SELECT COUNT(*) FROM grn_photos 
-                        WHERE grn_id = $1 AND item_id = $2 AND photo_type = 'reject'
-                    """, grn_id, item['item_id'])
-                     if count == 0:
-                        raise ValueError(f"Photos required for reject on item ID {item['item_id']}")
-
-            # Update PO items and add extra items
+
             po_id = grn['po_id']
-            
-            extra_items_list = []
-            
-            for item in items:
-                po_item = await conn.fetchrow("""
-                    SELECT * FROM purchase_order_items WHERE po_id = $1 AND item_id = $2
-                """, po_id, item['item_id'])
-                
-                if po_item:
-                    await conn.execute("""
-                        UPDATE purchase_order_items SET quantity = $1 WHERE po_id = $2 AND item_id = $3
-                    """, item['final_accepted'], po_id, item['item_id'])
-                else:
-                    # Extra item
-                    extra_items_list.append({
-                        'item_id': item['item_id'],
-                        'quantity': float(item['final_accepted']), 
-                        'unit_price': 0,
-                        'notes': f"Extra item from GRN {grn['grn_number']}"
-                    })
-                    await conn.execute("""
-                        UPDATE grn_items SET added_to_po = true WHERE grn_id = $1 AND item_id = $2
-                    """, grn_id, item['item_id'])
-            
-            if extra_items_list:
-                for extra in extra_items_list:
-                     await conn.execute("""
+
+            # 1. Load GRN items, PO items and photo counts
+            items = await conn.fetch("""
+                SELECT gi.*, i.name AS item_name
+                FROM grn_items gi
+                JOIN zoho_items i ON gi.item_id = i.id
+                WHERE gi.grn_id = $1
+                ORDER BY gi.id
+            """, grn_id)
+
+            po_item_ids = {
+                row['item_id'] for row in await conn.fetch(
+                    "SELECT DISTINCT item_id FROM purchase_order_items WHERE po_id = $1", po_id
+                )
+            }
+
+            photo_counts = {
+                (row['item_id'], row['photo_type']): row['count']
+                for row in await conn.fetch("""
+                    SELECT item_id, photo_type, COUNT(*) AS count
+                    FROM grn_photos
+                    WHERE grn_id = $1
+                    GROUP BY item_id, photo_type
+                """, grn_id)
+            }
+
+            # 2. Validations
+            missing_photos = [
+                f"Photos required for {photo_type} on item ID {item['item_id']}"
+                for item in items
+                for photo_type in ('damage', 'reject')
+                if item[photo_type] > 0 and not photo_counts.get((item['item_id'], photo_type))
+            ]
+            if missing_photos:
+                raise ValueError("; ".join(missing_photos))
+
+            # 3. Update PO items to accepted quantities and add extra items
+            po_lines = [item for item in items if item['item_id'] in po_item_ids]
+            extra_lines = [item for item in items if item['item_id'] not in po_item_ids]
+
+            if po_lines:
+                await conn.execute("""
+                    UPDATE purchase_order_items poi
+                    SET quantity = u.quantity
+                    FROM unnest($2::int[], $3::numeric[]) AS u(item_id, quantity)
+                    WHERE poi.po_id = $1 AND poi.item_id = u.item_id
+                """, po_id, [item['item_id'] for item in po_lines], [item['final_accepted'] for item in po_lines])
+
+            if extra_lines:
+                await conn.execute("""
+                    WITH added AS (
                         INSERT INTO purchase_order_items (po_id, item_id, quantity, unit_price, total_price, notes)
-                        VALUES ($1, $2, $3, 0, 0, $4)
-                     """, po_id, extra['item_id'], extra['quantity'], extra['notes'])
-            
-            # Log Wastage
-            batch = await conn.fetchrow("SELECT * FROM batches WHERE id = $1", grn['batch_id'])
-            
-            for item in items:
-                if item['damage'] > 0:
-                    photos = await conn.fetch("""
-                        SELECT photo_url, photo_path, file_size FROM grn_photos WHERE grn_id = $1 AND item_id = $2 AND photo_type = 'damage'
-                    """, grn_id, item['item_id'])
-                    
-                    # Log wastage directly (service expects UploadFile)
-                    wastage_event = await conn.fetchrow("""
+                        SELECT $1, u.item_id, u.quantity, 0, 0, $5
+                        FROM unnest($3::int[], $4::numeric[]) AS u(item_id, quantity)
+                    )
+                    UPDATE grn_items SET added_to_po = true
+                    WHERE grn_id = $2 AND item_id = ANY($3::int[])
+                """, po_id, grn_id,
+                    [item['item_id'] for item in extra_lines],
+                    [item['final_accepted'] for item in extra_lines],
+                    f"Extra item from GRN {grn['grn_number']}")
+
+            # 4. Log wastage: one event per damaged/rejected line, with that
+            # line's GRN photos linked to it (URL reference, no file copy)
+            wastage_lines = [
+                (item, photo_type)
+                for item in items
+                for photo_type in ('damage', 'reject')
+                if item[photo_type] > 0
+            ]
+            if wastage_lines:
+                wastage_event_ids = await conn.fetch("""
+                    WITH events AS (
                         INSERT INTO wastage_events (
-                            batch_id, stage, wastage_type, item_name, quantity, unit,
+                            batch_id, stage, wastage_type, item_id, item_name, quantity, unit,
                             cost_allocation, reason, notes,
                             po_id, grn_id, created_by
-                        ) VALUES (
-                            $1, $2, 'damage', $3, $4, 'units',
-                            $5, 'Damaged during receiving', $6,
-                            $7, $8, $9
                         )
-                        RETURNING id, event_id
-                    """, grn['batch_id'], 'receiving', item['item_name'], 
-                         float(item['damage']), item['damage_cost_allocation'],
-                         item.get('notes'), po_id, grn_id, user_id)
-
-                    # Link photos
-                    for p in photos:
-                         # We copy GRN photo to wastage photo table
-                         # Note: Optimally we might move file or just ref the URL. 
-                         # Wastage module expects files in its own bucket structure usually, 
-                         # but here we just link the URL.
-                         await conn.execute("""
-                            INSERT INTO wastage_photos (
-                                wastage_event_id, photo_url, photo_path, file_name,
-                                file_size_kb, uploaded_by
-                            ) VALUES ($1, $2, $3, $4, $5, $6)
-                         """, wastage_event['id'], p['photo_url'], p['photo_path'], 
-                             p['photo_path'].split('/')[-1], p['file_size'] or 0, user_id)
-                
-                if item['reject'] > 0:
-                    photos = await conn.fetch("""
-                        SELECT photo_url, photo_path, file_size FROM grn_photos WHERE grn_id = $1 AND item_id = $2 AND photo_type = 'reject'
-                    """, grn_id, item['item_id'])
-                     
-                    wastage_event = await conn.fetchrow("""
-                        INSERT INTO wastage_events (
-                            batch_id, stage, wastage_type, item_name, quantity, unit,
-                            cost_allocation, reason, notes,
-                            po_id, grn_id, created_by
-                        ) VALUES (
-                            $1, $2, 'reject', $3, $4, 'units',
-                            $5, 'Rejected during receiving', $6,
-                            $7, $8, $9
+                        SELECT
+                            $1, 'receiving', w.wastage_type, w.item_id, w.item_name, w.quantity, 'units',
+                            w.cost_allocation,
+                            CASE w.wastage_type
+                                WHEN 'damage' THEN 'Damaged during receiving'
+                                ELSE 'Rejected during receiving'
+                            END,
+                            w.notes,
+                            $2, $3, $4
+                        FROM unnest($5::int[], $6::text[], $7::text[], $8::numeric[], $9::text[], $10::text[])
+                            AS w(item_id, wastage_type, item_name, quantity, cost_allocation, notes)
+                        RETURNING id, item_id, wastage_type
+                    ),
+                    photos AS (
+                        INSERT INTO wastage_photos (
+                            wastage_event_id, photo_url, photo_path, file_name,
+                            file_size_kb, uploaded_by
                         )
-                        RETURNING id, event_id
-                    """, grn['batch_id'], 'receiving', item['item_name'], 
-                         float(item['reject']), item['reject_cost_allocation'],
-                         item.get('notes'), po_id, grn_id, user_id)
-                    
-                    for p in photos:
-                         await conn.execute("""
-                            INSERT INTO wastage_photos (
-                                wastage_event_id, photo_url, photo_path, file_name,
-                                file_size_kb, uploaded_by
-                            ) VALUES ($1, $2, $3, $4, $5, $6)
-                         """, wastage_event['id'], p['photo_url'], p['photo_path'], 
-                             p['photo_path'].split('/')[-1], p['file_size'] or 0, user_id)
-
-            # Update Statuses
+                        SELECT
+                            e.id, p.photo_url, p.photo_path, regexp_replace(p.photo_path, '^.*/', ''),
+                            CEIL(COALESCE(p.file_size, 0) / 1024.0)::int, $4
+                        FROM events e
+                        JOIN grn_photos p
+                          ON p.grn_id = $3
+                         AND p.item_id = e.item_id
+                         AND p.photo_type = e.wastage_type
+                    )
+                    SELECT id FROM events
+                """, grn['batch_id'], po_id, grn_id, user_id,
+                    [item['item_id'] for item, _ in wastage_lines],
+                    [photo_type for _, photo_type in wastage_lines],
+                    [item['item_name'] for item, _ in wastage_lines],
+                    [item[photo_type] for item, photo_type in wastage_lines],
+                    [item[f'{photo_type}_cost_allocation'] for item, photo_type in wastage_lines],
+                    [item['notes'] for item, _ in wastage_lines])
+                await wastage_tracking_service.add_events_to_rollup(conn, [row['id'] for row in wastage_event_ids])
+
+            # 5. Update Statuses
             await conn.execute("UPDATE grns SET status = 'completed', completed_at = NOW() WHERE id = $1", grn_id)
             await conn.execute("UPDATE purchase_orders SET status = 'completed' WHERE id = $1", po_id)
             await po_service._log_status_change(conn, po_id, 'grn_generated', 'completed', str(user_id), "GRN Finalized")
-            
-            await conn.execute("UPDATE batches SET status = 'received' WHERE id = $1", grn['batch_id'])
-            
-            # Batch History
-            await batch_tracking_service.add_batch_history(
-                batch_number=batch['batch_number'],
-                event=AddBatchHistoryRequest( 
-                     stage=BatchStage.GRN,
-                     event_type=BatchEventType.RECEIVED,
-                     new_status=BatchStatus.RECEIVED,
-                     event_details={'grn_number': grn['grn_number'], 'status': 'received'}
+
+            # 6. Batch received + history, on this transaction's connection
+            # (a second connection would wait on this transaction's batch row lock)
+            await conn.execute("""
+                WITH previous AS (
+                    SELECT id, status FROM batches WHERE id = $1 FOR UPDATE
                 ),
-                created_by=str(user_id)
+                received AS (
+                    UPDATE batches b
+                    SET status = $2
+                    FROM previous
+                    WHERE b.id = previous.id
+                    RETURNING b.id, previous.status AS old_status
+                )
+                INSERT INTO batch_history (
+                    batch_id, stage, event_type, event_details, old_status, new_status, created_by
+                )
+                SELECT
+                    id, $3, $4, $5::jsonb,
+                    CASE WHEN old_status IS DISTINCT FROM $2 THEN old_status END,
+                    CASE WHEN old_status IS DISTINCT FROM $2 THEN $2 END,
+                    $6
+                FROM received
+            """, grn['batch_id'], BatchStatus.RECEIVED.value, BatchStage.GRN.value, BatchEventType.RECEIVED.value,
+                json.dumps({'grn_number': grn['grn_number'], 'status': 'received'}), str(user_id))
+
+            logger.info(
+                f"✅ Finalized GRN {grn['grn_number']}: {len(items)} item(s), "
+                f"{len(extra_lines)} added to PO, {len(wastage_lines)} wastage event(s)"
             )
-
-            logger.info(f"✅ Finalized GRN {grn['grn_number']}")
             return await _get_grn_details_internal(conn, grn_id)
 
     except ValueError as ve:
@@ -568,51 +607,55 @@ async def upload_grn_photos(
     files: List[UploadFile],
     user_id: str
 ) -> List[str]:
-    """Upload photos to Supabase"""
+    """
+    Upload damage/reject photos for a GRN item.
+
+    Files are uploaded concurrently under content-hash names, so re-sending
+    a request after a partial failure only stores the missing photos.
+    Photos that were stored are recorded even if others failed.
+    """
     if photo_type not in ['damage', 'reject']:
         raise ValueError("photo_type must be 'damage' or 'reject'")
     
     # We need GRN number for path
-    grn = await get_grn_by_id(grn_id)
+    grn = await fetch_one("SELECT id, grn_number FROM grns WHERE id = $1", grn_id)
     if not grn:
         raise ValueError("GRN not found")
-        
-    photo_urls = []
-    
-    supabase = await get_supabase_client_async()
-    
+
     for file in files:
-        ext = file.filename.split('.')[-1].lower()
+        ext = (file.filename or '').split('.')[-1].lower()
         if ext not in ['jpg', 'jpeg', 'png']:
              raise ValueError("Only JPG/PNG allowed")
 
-        unique_filename = f"{uuid.uuid4()}.{ext}"
-        storage_path = f"{grn['grn_number']}/{item_id}/{photo_type}/{unique_filename}"
-        
-        file_bytes = await file.read()
-        
-        # Upload
-        try:
-             res = supabase.storage.from_('grn-photos').upload(
-                 path=storage_path,
-                 file=file_bytes,
-                 file_options={"content-type": file.content_type}
-             )
-        except Exception as e:
-             raise Exception(f"Upload failed: {e}")
-
-        public_url = supabase.storage.from_('grn-photos').get_public_url(storage_path)
-        
-        # Save DB
-        async with DatabaseTransaction() as conn:
-            await conn.execute("""
-                INSERT INTO grn_photos (grn_id, item_id, photo_type, photo_url, photo_path, uploaded_by, file_size)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-            """, grn_id, item_id, photo_type, public_url, storage_path, user_id, 0) # size 0 or len(file_bytes)
-        
-        photo_urls.append(public_url)
-        
-    return photo_urls
+    prefix = f"{grn['grn_number']}/{item_id}/{photo_type}"
+    failure = None
+    try:
+        stored = await upload_media(
+            GRN_PHOTOS_BUCKET, files,
+            path_for=lambda _, media: f"{prefix}/{media.sha256[:32]}.{media.extension}"
+        )
+    except MediaUploadError as e:
+        stored, failure = e.stored, e
+
+    if stored:
+        await execute_query("""
+            INSERT INTO grn_photos (
+                grn_id, item_id, photo_type, photo_url, photo_path, uploaded_by,
+                file_size, width, height, content_type, content_hash
+            )
+            SELECT $1, $2, $3, u.url, u.path, $4, u.size, u.width, u.height, u.content_type, u.sha256
+            FROM unnest($5::text[], $6::text[], $7::int[], $8::int[], $9::int[], $10::text[], $11::text[])
+                AS u(url, path, size, width, height, content_type, sha256)
+            ON CONFLICT (grn_id, photo_path) DO NOTHING
+        """, grn_id, item_id, photo_type, user_id,
+            [m.url for m in stored], [m.path for m in stored], [m.size for m in stored],
+            [m.width for m in stored], [m.height for m in stored],
+            [m.content_type for m in stored], [m.sha256 for m in stored])
+
+    if failure:
+        raise Exception(f"Upload failed: {failure}")
+
+    return [m.url for m in stored]
 
 async def delete_grn_photo(photo_id: int, user_id: str) -> bool:
     async with DatabaseTransaction() as conn:
@@ -626,8 +669,8 @@ async def delete_grn_photo(photo_id: int, user_id: str) -> bool:
             raise ValueError("GRN locked")
             
         # Delete from storage
-        supabase = await get_supabase_client_async()
-        supabase.storage.from_('grn-photos').remove([photo['photo_path']])
+        storage = await get_storage_client()
+        await storage.remove(GRN_PHOTOS_BUCKET, [photo['photo_path']])
         
         # Delete from DB
         await conn.execute("DELETE FROM grn_photos WHERE id = $1", photo_id)
@@ -1,227 +1,330 @@
 """
 Inventory Allocation Service Functions
 For order integration - allocate, deallocate, and confirm stock
+
+An order is allocated as a whole in one transaction (allocate_order):
+  1. The candidate inventory rows for every line are locked once, in id
+     order, with FOR UPDATE SKIP LOCKED. Rows held by a concurrent
+     allocation are skipped rather than waited on, so two orders sharing
+     items can never deadlock.
+  2. The FIFO split (expiring soon → repacked → oldest) is computed in
+     memory. If any line is short, nothing is written.
+  3. Full rows, split rows and movements are written with one bulk
+     statement each, whatever the number of lines.
+
+Allocated rows carry allocated_order_id (migration 043); deallocation and
+confirmation are single statements over that order's rows.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
-from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction
+from app.database import fetch_all, DatabaseTransaction
 from app.utils.timezone import now_ist
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-async def allocate_stock_to_order(
+# Available rows for the order's items, locked in id order. FIFO ranks are
+# computed after locking: fifo_rank for automatic selection, batch_rank when
+# the line names its batches (repacked first, then oldest).
+LOCK_AVAILABLE_STOCK_QUERY = """
+    WITH locked AS MATERIALIZED (
+        SELECT i.id, i.item_id, i.batch_id, i.quantity, i.entry_date, i.expiry_date
+        FROM inventory i
+        WHERE i.item_id = ANY($1::int[])
+          AND i.location = $2
+          AND i.status = 'available'
+        ORDER BY i.id
+        FOR UPDATE SKIP LOCKED
+    )
+    SELECT
+        l.id, l.item_id, l.batch_id, l.quantity, l.expiry_date,
+        b.batch_number, b.is_repacked,
+        (l.expiry_date IS NOT NULL
+         AND l.expiry_date <= CURRENT_DATE + INTERVAL '2 days') AS is_expiring_soon,
+        ROW_NUMBER() OVER (
+            PARTITION BY l.item_id
+            ORDER BY
+                CASE
+                    WHEN l.expiry_date IS NOT NULL
+                         AND l.expiry_date <= CURRENT_DATE + INTERVAL '2 days'
+                    THEN 0  -- Expiring soon gets highest priority
+                    ELSE 1
+                END,
+                b.is_repacked DESC,  -- Repacked second
+                l.entry_date ASC,    -- Oldest third
+                l.id
+        ) AS fifo_rank,
+        ROW_NUMBER() OVER (
+            PARTITION BY l.item_id
+            ORDER BY b.is_repacked DESC, l.entry_date ASC, l.id
+        ) AS batch_rank
+    FROM locked l
+    JOIN batches b ON l.batch_id = b.id
+"""
+
+# Allocated rows of order $1. Rows allocated before migration 043 have no
+# allocated_order_id and are matched through the order's allocation movements.
+ORDER_ALLOCATED_ROWS_FILTER = """
+    i.status = 'allocated'
+    AND (
+        i.allocated_order_id = $1
+        OR (
+            i.allocated_order_id IS NULL
+            AND (i.item_id, i.batch_id, i.location) IN (
+                SELECT item_id, batch_id, from_location
+                FROM inventory_movements
+                WHERE reference_type = 'sales_order'
+                  AND reference_id = $1
+                  AND movement_type = 'allocation'
+            )
+        )
+    )
+"""
+
+
+def _plan_allocation(
+    lines: List[Dict[str, Any]],
+    stock: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[int, Dict[str, Any], Decimal]], List[Tuple[int, Decimal]]]:
+    """
+    FIFO split of every line over the locked stock rows.
+
+    Lines are served in order; a row shared by two lines of the same item
+    is drawn down across both.
+
+    Returns:
+        (takes, shortfalls): takes as (line_index, stock_row, quantity);
+        shortfalls as (line_index, quantity available to that line)
+    """
+    rows_by_item: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    for row in stock:
+        rows_by_item[row['item_id']].append(row)
+    remaining = {row['id']: Decimal(str(row['quantity'])) for row in stock}
+
+    takes = []
+    shortfalls = []
+    for index, line in enumerate(lines):
+        candidates = rows_by_item.get(line['item_id'], [])
+        if line['batch_ids']:
+            wanted = set(line['batch_ids'])
+            candidates = sorted(
+                (row for row in candidates if row['batch_id'] in wanted),
+                key=lambda row: row['batch_rank']
+            )
+        else:
+            candidates = sorted(candidates, key=lambda row: row['fifo_rank'])
+
+        available = sum((remaining[row['id']] for row in candidates), Decimal('0'))
+        if available < line['quantity']:
+            shortfalls.append((index, available))
+            continue
+
+        needed = line['quantity']
+        for row in candidates:
+            if needed <= 0:
+                break
+            take = min(remaining[row['id']], needed)
+            if take <= 0:
+                continue
+            remaining[row['id']] -= take
+            needed -= take
+            takes.append((index, row, take))
+
+    return takes, shortfalls
+
+
+async def allocate_order(
     order_id: int,
-    item_id: int,
-    quantity: Decimal,
-    batch_ids: Optional[List[int]] = None,
+    lines: List[Dict[str, Any]],
     location: str = 'packed_warehouse',
     user_id: str = None
 ) -> Dict[str, Any]:
     """
-    Allocate stock to a sales order.
+    Allocate every line of a sales order in one transaction.
     Changes status from 'available' → 'allocated'
-    
+
     Args:
         order_id: Sales order ID
-        item_id: Item ID to allocate
-        quantity: Quantity to allocate
-        batch_ids: Specific batches (optional, uses FIFO if not provided)
+        lines: [{item_id, quantity, batch_ids (optional, uses FIFO if not provided)}]
         location: Location to allocate from
         user_id: User performing allocation
-        
+
     Returns:
-        Allocation details with batches allocated
-        
+        Allocation details per line with batches allocated
+
     Raises:
-        ValueError: If insufficient stock or validation fails
+        ValueError: If any line has insufficient stock or validation fails
+            (nothing is allocated in that case)
     """
+    if not lines:
+        raise ValueError(f"Order #{order_id} has no lines to allocate")
+
+    requested = [
+        {
+            'item_id': int(line['item_id']),
+            'quantity': Decimal(str(line['quantity'])),
+            'batch_ids': line.get('batch_ids') or None,
+        }
+        for line in lines
+    ]
+    item_ids = sorted({line['item_id'] for line in requested})
+
     try:
         async with DatabaseTransaction() as conn:
-            # 1. Get item info
-            item_query = "SELECT id, name, sku FROM zoho_items WHERE id = $1"
-            item = await conn.fetchrow(item_query, item_id)
-            if not item:
-                raise ValueError(f"Item {item_id} not found")
-            
-            # 2. IDEMPOTENCY CHECK - Prevent duplicate allocation
-            existing_allocation = await conn.fetchrow("""
-                SELECT COUNT(*) as count FROM inventory_movements
-                WHERE reference_type = 'sales_order'
-                  AND reference_id = $1
-                  AND movement_type = 'allocation'
+            # 1. One allocation per order at a time, across workers
+            await conn.execute(
+                "SELECT pg_advisory_xact_lock(hashtext($1))", f"order_allocation:{order_id}"
+            )
+
+            # 2. IDEMPOTENCY CHECK - Prevent duplicate allocation (a
+            # deallocated order may be allocated again)
+            already_allocated = await conn.fetchval(f"""
+                SELECT EXISTS (SELECT 1 FROM inventory i WHERE {ORDER_ALLOCATED_ROWS_FILTER})
+                    OR EXISTS (
+                        SELECT 1 FROM inventory
+                        WHERE allocated_order_id = $1 AND status = 'delivered'
+                    )
             """, order_id)
-            if existing_allocation and existing_allocation['count'] > 0:
+            if already_allocated:
                 raise ValueError(f"Order #{order_id} already has stock allocated. Use deallocate first if you need to reallocate.")
-            
-            # 3. Check if order exists (optional - depends on sales_orders table structure)
-            # order_query = "SELECT id FROM sales_orders WHERE id = $1"
-            # order = await conn.fetchrow(order_query, order_id)
-            # if not order:
-            #     raise ValueError(f"Order {order_id} not found")
-            
-            # 4. Get available stock (use specific batches or FIFO)
-            if batch_ids:
-                # Use specified batches
-                batch_placeholders = ','.join([f'${i+3}' for i in range(len(batch_ids))])
-                stock_query = f"""
-                    SELECT
-                        i.id, i.batch_id, i.quantity, b.batch_number,
-                        b.is_repacked
-                    FROM inventory i
-                    JOIN batches b ON i.batch_id = b.id
-                    WHERE i.item_id = $1
-                      AND i.location = $2
-                      AND i.batch_id IN ({batch_placeholders})
-                      AND i.status = 'available'
-                    ORDER BY b.is_repacked DESC, i.entry_date ASC
-                """
-                params = [item_id, location] + batch_ids
-                available_stock = await conn.fetch(stock_query, *params)
-            else:
-                # FIFO: Prioritize expiring items (<2 days), then repacked batches, then oldest first
-                stock_query = """
-                    SELECT
-                        i.id, i.batch_id, i.quantity, b.batch_number,
-                        b.is_repacked,
-                        i.expiry_date,
-                        CASE 
-                            WHEN i.expiry_date IS NOT NULL 
-                                 AND i.expiry_date <= CURRENT_DATE + INTERVAL '2 days' 
-                            THEN TRUE
-                            ELSE FALSE
-                        END as is_expiring_soon
-                    FROM inventory i
-                    JOIN batches b ON i.batch_id = b.id
-                    WHERE i.item_id = $1
-                      AND i.location = $2
-                      AND i.status = 'available'
-                    ORDER BY 
-                        CASE 
-                            WHEN i.expiry_date IS NOT NULL 
-                                 AND i.expiry_date <= CURRENT_DATE + INTERVAL '2 days' 
-                            THEN 0  -- Expiring soon gets highest priority
-                            ELSE 1
-                        END,
-                        b.is_repacked DESC,  -- Repacked second
-                        i.entry_date ASC     -- Oldest third
-                """
-                available_stock = await conn.fetch(stock_query, item_id, location)
-            
-            if not available_stock:
-                raise ValueError(f"No available stock found for item {item['name']} at {location}")
-            
-            # 5. Calculate total available
-            total_available = sum(Decimal(str(s['quantity'])) for s in available_stock)
-            if total_available < quantity:
-                raise ValueError(
-                    f"Insufficient stock. Requested: {quantity}, Available: {total_available}"
+
+            # 3. Get item info
+            items = {
+                row['id']: row
+                for row in await conn.fetch(
+                    "SELECT id, name, sku FROM zoho_items WHERE id = ANY($1::int[])", item_ids
                 )
-            
-            # 6. Allocate stock (FIFO - take from batches in order)
-            allocated_batches = []
-            remaining_to_allocate = quantity
-            
-            for stock_record in available_stock:
-                if remaining_to_allocate <= 0:
-                    break
-                
-                record_qty = Decimal(str(stock_record['quantity']))
-                allocate_qty = min(record_qty, remaining_to_allocate)
-                
-                # Update inventory record
-                if allocate_qty == record_qty:
-                    # Allocate entire record
-                    update_query = """
-                        UPDATE inventory
-                        SET status = 'allocated', updated_at = NOW()
-                        WHERE id = $1
-                    """
-                    await conn.execute(update_query, stock_record['id'])
-                else:
-                    # Partial allocation - split record
-                    # Reduce available quantity
-                    reduce_query = """
-                        UPDATE inventory
-                        SET quantity = quantity - $1, updated_at = NOW()
-                        WHERE id = $2
-                    """
-                    await conn.execute(reduce_query, allocate_qty, stock_record['id'])
-                    
-                    # Create new allocated record
-                    split_query = """
-                        INSERT INTO inventory (
-                            item_id, batch_id, location, quantity, grade, status,
-                            shelf_life_days, entry_date, expiry_date, created_by
+            }
+            missing = [item_id for item_id in item_ids if item_id not in items]
+            if missing:
+                raise ValueError(f"Item(s) not found: {', '.join(str(i) for i in missing)}")
+
+            # 4. Lock candidate stock and split it in memory
+            stock = [dict(row) for row in await conn.fetch(LOCK_AVAILABLE_STOCK_QUERY, item_ids, location)]
+            takes, shortfalls = _plan_allocation(requested, stock)
+
+            if shortfalls:
+                problems = []
+                for index, available in shortfalls:
+                    line = requested[index]
+                    name = items[line['item_id']]['name']
+                    if available <= 0:
+                        problems.append(f"No available stock found for item {name} at {location}")
+                    else:
+                        problems.append(
+                            f"Insufficient stock for {name}. Requested: {line['quantity']}, Available: {available}"
                         )
-                        SELECT
-                            item_id, batch_id, location, $1, grade, 'allocated',
-                            shelf_life_days, entry_date, expiry_date, $2
-                        FROM inventory
-                        WHERE id = $3
-                    """
-                    await conn.execute(split_query, allocate_qty, user_id, stock_record['id'])
-                
-                # Log movement
-                movement_query = """
-                    INSERT INTO inventory_movements (
-                        item_id, batch_id, movement_type, quantity,
-                        from_location, to_location,
-                        reference_type, reference_id, notes, created_by
-                    ) VALUES ($1, $2, 'allocation', $3, $4, $4, 'sales_order', $5, $6, $7)
-                """
-                await conn.execute(
-                    movement_query,
-                    item_id,
-                    stock_record['batch_id'],
-                    allocate_qty,
-                    location,
-                    order_id,
-                    f"Allocated to order #{order_id}",
-                    user_id
+                raise ValueError("; ".join(problems))
+
+            # 5. Whole rows change status; partly used rows are split
+            taken_per_row: Dict[int, Decimal] = defaultdict(Decimal)
+            row_quantity: Dict[int, Decimal] = {}
+            for _, row, take in takes:
+                taken_per_row[row['id']] += take
+                row_quantity[row['id']] = Decimal(str(row['quantity']))
+
+            full_ids = [row_id for row_id, taken in taken_per_row.items() if taken == row_quantity[row_id]]
+            partial = [(row_id, taken) for row_id, taken in taken_per_row.items() if taken < row_quantity[row_id]]
+
+            if full_ids:
+                await conn.execute("""
+                    UPDATE inventory
+                    SET status = 'allocated', allocated_order_id = $2, updated_at = NOW()
+                    WHERE id = ANY($1::int[])
+                """, full_ids, order_id)
+
+            if partial:
+                await conn.execute("""
+                    WITH reduced AS (
+                        UPDATE inventory i
+                        SET quantity = i.quantity - p.take, updated_at = NOW()
+                        FROM unnest($1::int[], $2::numeric[]) AS p(id, take)
+                        WHERE i.id = p.id
+                        RETURNING i.item_id, i.batch_id, i.location, i.grade,
+                                  i.shelf_life_days, i.entry_date, i.expiry_date, p.take
+                    )
+                    INSERT INTO inventory (
+                        item_id, batch_id, location, quantity, grade, status,
+                        shelf_life_days, entry_date, expiry_date, allocated_order_id, created_by
+                    )
+                    SELECT
+                        item_id, batch_id, location, take, grade, 'allocated',
+                        shelf_life_days, entry_date, expiry_date, $3, $4
+                    FROM reduced
+                """, [row_id for row_id, _ in partial], [taken for _, taken in partial], order_id, user_id)
+
+            # 6. Log movements (one per line and batch row)
+            await conn.execute("""
+                INSERT INTO inventory_movements (
+                    item_id, batch_id, movement_type, quantity,
+                    from_location, to_location,
+                    reference_type, reference_id, notes, created_by
                 )
-                
-                allocated_batches.append({
-                    'batch_id': stock_record['batch_id'],
-                    'batch_number': stock_record['batch_number'],
-                    'quantity': float(allocate_qty),
-                    'is_repacked': stock_record['is_repacked'],
-                    'is_expiring_soon': stock_record.get('is_expiring_soon', False),
-                    'expiry_date': stock_record['expiry_date'].isoformat() if stock_record.get('expiry_date') else None
-                })
-                
-                remaining_to_allocate -= allocate_qty
-            
+                SELECT m.item_id, m.batch_id, 'allocation', m.quantity, $4, $4, 'sales_order', $5, $6, $7
+                FROM unnest($1::int[], $2::int[], $3::numeric[]) AS m(item_id, batch_id, quantity)
+            """,
+                [row['item_id'] for _, row, _ in takes],
+                [row['batch_id'] for _, row, _ in takes],
+                [take for _, _, take in takes],
+                location,
+                order_id,
+                f"Allocated to order #{order_id}",
+                user_id
+            )
+
+        # Response per line
+        batches_per_line: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for index, row, take in takes:
+            batches_per_line[index].append({
+                'batch_id': row['batch_id'],
+                'batch_number': row['batch_number'],
+                'quantity': float(take),
+                'is_repacked': row['is_repacked'],
+                'is_expiring_soon': row['is_expiring_soon'],
+                'expiry_date': row['expiry_date'].isoformat() if row['expiry_date'] else None
+            })
+
+        allocated_lines = []
+        for index, line in enumerate(requested):
+            allocated_batches = batches_per_line[index]
+
             # Calculate priority breakdown for response
-            expiring_count = sum(1 for b in allocated_batches if b.get('is_expiring_soon', False))
-            repacked_count = sum(1 for b in allocated_batches if b['is_repacked'] and not b.get('is_expiring_soon', False))
+            expiring_count = sum(1 for b in allocated_batches if b['is_expiring_soon'])
+            repacked_count = sum(1 for b in allocated_batches if b['is_repacked'] and not b['is_expiring_soon'])
             regular_count = len(allocated_batches) - expiring_count - repacked_count
-            
-            logger.info(
-                f"✅ Allocated {quantity} of {item['name']} to order #{order_id} "
-                f"from {len(allocated_batches)} batch(es) "
-                f"[Expiring: {expiring_count}, Repacked: {repacked_count}, Regular: {regular_count}]"
-            )
-            
-            return {
-                'order_id': order_id,
-                'item_id': item_id,
-                'item_name': item['name'],
-                'total_allocated': float(quantity),
+
+            allocated_lines.append({
+                'item_id': line['item_id'],
+                'item_name': items[line['item_id']]['name'],
+                'total_allocated': float(line['quantity']),
                 'batches_allocated': allocated_batches,
                 'allocation_priority_applied': {
                     'expiring_soon_count': expiring_count,
                     'repacked_count': repacked_count,
                     'regular_count': regular_count
-                },
-                'expires_at': (datetime.now(timezone.utc) + timedelta(hours=24)).isoformat(),
-                'status': 'allocated',
-                'created_at': datetime.now(timezone.utc).isoformat()
-            }
-            
+                }
+            })
+
+        total_allocated = sum((line['quantity'] for line in requested), Decimal('0'))
+        logger.info(
+            f"✅ Allocated order #{order_id}: {len(requested)} line(s), {total_allocated} units "
+            f"from {len(taken_per_row)} stock row(s) ({len(partial)} split)"
+        )
+
+        return {
+            'order_id': order_id,
+            'location': location,
+            'lines': allocated_lines,
+            'total_allocated': float(total_allocated),
+            'expires_at': (datetime.now(timezone.utc) + timedelta(hours=24)).isoformat(),
+            'status': 'allocated',
+            'created_at': datetime.now(timezone.utc).isoformat()
+        }
+
     except ValueError as ve:
         logger.warning(f"⚠️ Allocation failed: {ve}")
         raise
@@ -230,6 +333,47 @@ async def allocate_stock_to_order(
         raise
 
 
+async def allocate_stock_to_order(
+    order_id: int,
+    item_id: int,
+    quantity: Decimal,
+    batch_ids: Optional[List[int]] = None,
+    location: str = 'packed_warehouse',
+    user_id: str = None
+) -> Dict[str, Any]:
+    """
+    Allocate a single item to a sales order (one-line allocate_order).
+    Changes status from 'available' → 'allocated'
+
+    Args:
+        order_id: Sales order ID
+        item_id: Item ID to allocate
+        quantity: Quantity to allocate
+        batch_ids: Specific batches (optional, uses FIFO if not provided)
+        location: Location to allocate from
+        user_id: User performing allocation
+
+    Returns:
+        Allocation details with batches allocated
+
+    Raises:
+        ValueError: If insufficient stock or validation fails
+    """
+    result = await allocate_order(
+        order_id,
+        [{'item_id': item_id, 'quantity': quantity, 'batch_ids': batch_ids}],
+        location=location,
+        user_id=user_id
+    )
+    return {
+        'order_id': order_id,
+        **result['lines'][0],
+        'expires_at': result['expires_at'],
+        'status': result['status'],
+        'created_at': result['created_at']
+    }
+
+
 async def deallocate_stock_from_order(
     order_id: int,
     user_id: str = None
@@ -237,110 +381,78 @@ async def deallocate_stock_from_order(
     """
     Deallocate/release stock from a cancelled order.
     Changes status from 'allocated' → 'available'
-    
+
     Args:
         order_id: Sales order ID
         user_id: User performing deallocation
-        
+
     Returns:
         Deallocation details
-        
+
     Raises:
         ValueError: If no allocations found
     """
     try:
-        async with DatabaseTransaction() as conn:
-            # 1. DUPLICATE CALL CHECK - Verify stock is actually allocated
-            allocated_count = await conn.fetchrow("""
-                SELECT COUNT(*) as count FROM inventory
-                WHERE status = 'allocated'
-                  AND item_id IN (
-                      SELECT DISTINCT item_id FROM inventory_movements
-                      WHERE reference_type = 'sales_order'
-                        AND reference_id = $1
-                        AND movement_type = 'allocation'
-                  )
-            """, order_id)
-            
-            if not allocated_count or allocated_count['count'] == 0:
-                raise ValueError(f"No allocated stock found for order #{order_id}. May have been deallocated already.")
-            
-            # 2. Find allocated stock for this order
-            find_query = """
-                SELECT
-                    m.item_id, m.batch_id, m.quantity, m.from_location,
-                    i.name as item_name, b.batch_number
-                FROM inventory_movements m
-                JOIN zoho_items i ON m.item_id = i.id
-                JOIN batches b ON m.batch_id = b.id
-                WHERE m.reference_type = 'sales_order'
-                  AND m.reference_id = $1
-                  AND m.movement_type = 'allocation'
-            """
-            allocations = await conn.fetch(find_query, order_id)
-            
-            if not allocations:
-                raise ValueError(f"No allocation records found for order #{order_id}")
-            
-            deallocated_items = []
-            
-            for allocation in allocations:
-                item_id = allocation['item_id']
-                batch_id = allocation['batch_id']
-                quantity = Decimal(str(allocation['quantity']))
-                location = allocation['from_location']
-                
-                # 3. Change allocated stock back to available
-                update_query = """
-                    UPDATE inventory
-                    SET status = 'available', updated_at = NOW()
-                    WHERE item_id = $1
-                      AND batch_id = $2
-                      AND location = $3
-                      AND status = 'allocated'
-                """
-                await conn.execute(update_query, item_id, batch_id, location)
-                
-                # 4. Log deallocation movement (using 'deallocation' not 'adjustment')
-                movement_query = """
-                    INSERT INTO inventory_movements (
-                        item_id, batch_id, movement_type, quantity,
-                        from_location, to_location,
-                        reference_type, reference_id, notes, created_by
-                    ) VALUES ($1, $2, 'deallocation', $3, $4, $4, 'sales_order', $5, $6, $7)
-                """
-                await conn.execute(
-                    movement_query,
-                    item_id,
-                    batch_id,
-                    quantity,
-                    location,
-                    order_id,
-                    f"Deallocated from cancelled order #{order_id}",
-                    user_id
+        # Lock, release and log the order's rows in one statement
+        released = await fetch_all(f"""
+            WITH target AS MATERIALIZED (
+                SELECT i.id
+                FROM inventory i
+                WHERE {ORDER_ALLOCATED_ROWS_FILTER}
+                ORDER BY i.id
+                FOR UPDATE
+            ),
+            released AS (
+                UPDATE inventory i
+                SET status = 'available', allocated_order_id = NULL, updated_at = NOW()
+                FROM target t
+                WHERE i.id = t.id
+                RETURNING i.id, i.item_id, i.batch_id, i.quantity, i.location
+            ),
+            logged AS (
+                INSERT INTO inventory_movements (
+                    item_id, batch_id, movement_type, quantity,
+                    from_location, to_location,
+                    reference_type, reference_id, notes, created_by
                 )
-                
-                deallocated_items.append({
-                    'item_id': item_id,
-                    'item_name': allocation['item_name'],
-                    'batch_id': batch_id,
-                    'batch_number': allocation['batch_number'],
-                    'quantity': float(quantity),
-                    'location': location
-                })
-            
-            logger.info(
-                f"✅ Deallocated stock from order #{order_id}: "
-                f"{len(deallocated_items)} item(s)"
+                SELECT item_id, batch_id, 'deallocation', quantity, location, location, 'sales_order', $1, $2, $3
+                FROM released
+                WHERE quantity > 0
             )
-            
-            return {
-                'order_id': order_id,
-                'items_deallocated': deallocated_items,
-                'status': 'deallocated',
-                'created_at': now_ist()
+            SELECT r.item_id, zi.name AS item_name, r.batch_id, b.batch_number, r.quantity, r.location
+            FROM released r
+            JOIN zoho_items zi ON r.item_id = zi.id
+            JOIN batches b ON r.batch_id = b.id
+            ORDER BY r.id
+        """, order_id, f"Deallocated from cancelled order #{order_id}", user_id)
+
+        if not released:
+            raise ValueError(f"No allocated stock found for order #{order_id}. May have been deallocated already.")
+
+        deallocated_items = [
+            {
+                'item_id': row['item_id'],
+                'item_name': row['item_name'],
+                'batch_id': row['batch_id'],
+                'batch_number': row['batch_number'],
+                'quantity': float(row['quantity']),
+                'location': row['location']
             }
-            
+            for row in released
+        ]
+
+        logger.info(
+            f"✅ Deallocated stock from order #{order_id}: "
+            f"{len(deallocated_items)} item(s)"
+        )
+
+        return {
+            'order_id': order_id,
+            'items_deallocated': deallocated_items,
+            'status': 'deallocated',
+            'created_at': now_ist()
+        }
+
     except ValueError as ve:
         logger.warning(f"⚠️ Deallocation failed: {ve}")
         raise
@@ -356,115 +468,79 @@ async def confirm_allocation(
     """
     Confirm allocation and debit stock (order → invoice).
     Changes status from 'allocated' → 'delivered' and decrements quantity
-    
+
     Args:
         order_id: Sales order ID
         user_id: User confirming allocation
-        
+
     Returns:
         Confirmation details
-        
+
     Raises:
         ValueError: If no allocations found
     """
     try:
-        async with DatabaseTransaction() as conn:
-            # 1. DUPLICATE CALL CHECK - Verify stock is actually allocated
-            allocated_count = await conn.fetchrow("""
-                SELECT COUNT(*) as count FROM inventory
-                WHERE status = 'allocated'
-                  AND item_id IN (
-                      SELECT DISTINCT item_id FROM inventory_movements
-                      WHERE reference_type = 'sales_order'
-                        AND reference_id = $1
-                        AND movement_type = 'allocation'
-                  )
-            """, order_id)
-            
-            if not allocated_count or allocated_count['count'] == 0:
-                raise ValueError(f"No allocated stock found for order #{order_id}. May have been confirmed already.")
-            
-            # 2. Find allocated stock for this order
-            find_query = """
-                SELECT
-                    m.item_id, m.batch_id, m.quantity, m.from_location,
-                    i.name as item_name, b.batch_number
-                FROM inventory_movements m
-                JOIN zoho_items i ON m.item_id = i.id
-                JOIN batches b ON m.batch_id = b.id
-                WHERE m.reference_type = 'sales_order'
-                  AND m.reference_id = $1
-                  AND m.movement_type = 'allocation'
-            """
-            allocations = await conn.fetch(find_query, order_id)
-            
-            if not allocations:
-                raise ValueError(f"No allocation records found for order #{order_id}")
-            
-            confirmed_items = []
-            
-            for allocation in allocations:
-                item_id = allocation['item_id']
-                batch_id = allocation['batch_id']
-                quantity = Decimal(str(allocation['quantity']))
-                location = allocation['from_location']
-                
-                # 3. Update allocated stock to delivered and decrement quantity
-                # Option A: Change status to 'delivered' and keep quantity
-                # Option B: Delete record entirely (stock is gone)
-                # We'll use Option A for audit trail
-                update_query = """
-                    UPDATE inventory
-                    SET status = 'delivered',
-                        quantity = 0,
-                        updated_at = NOW()
-                    WHERE item_id = $1
-                      AND batch_id = $2
-                      AND location = $3
-                      AND status = 'allocated'
-                """
-                await conn.execute(update_query, item_id, batch_id, location)
-                
-                # 4. Log stock out movement
-                movement_query = """
-                    INSERT INTO inventory_movements (
-                        item_id, batch_id, movement_type, quantity,
-                        from_location, to_location,
-                        reference_type, reference_id, notes, created_by
-                    ) VALUES ($1, $2, 'stock_out', $3, $4, NULL, 'sales_order', $5, $6, $7)
-                """
-                await conn.execute(
-                    movement_query,
-                    item_id,
-                    batch_id,
-                    quantity,
-                    location,
-                    order_id,
-                    f"Stock out for order #{order_id} (invoiced)",
-                    user_id
+        # Delivered rows keep their order reference and drop to quantity 0
+        # (audit trail); the stock out movement records what was debited
+        confirmed = await fetch_all(f"""
+            WITH target AS MATERIALIZED (
+                SELECT i.id, i.quantity
+                FROM inventory i
+                WHERE {ORDER_ALLOCATED_ROWS_FILTER}
+                ORDER BY i.id
+                FOR UPDATE
+            ),
+            confirmed AS (
+                UPDATE inventory i
+                SET status = 'delivered', quantity = 0, allocated_order_id = $1, updated_at = NOW()
+                FROM target t
+                WHERE i.id = t.id
+                RETURNING i.id, i.item_id, i.batch_id, t.quantity, i.location
+            ),
+            logged AS (
+                INSERT INTO inventory_movements (
+                    item_id, batch_id, movement_type, quantity,
+                    from_location, to_location,
+                    reference_type, reference_id, notes, created_by
                 )
-                
-                confirmed_items.append({
-                    'item_id': item_id,
-                    'item_name': allocation['item_name'],
-                    'batch_id': batch_id,
-                    'batch_number': allocation['batch_number'],
-                    'quantity': float(quantity),
-                    'location': location
-                })
-            
-            logger.info(
-                f"✅ Confirmed allocation for order #{order_id}: "
-                f"{len(confirmed_items)} item(s), stock debited"
+                SELECT item_id, batch_id, 'stock_out', quantity, location, NULL, 'sales_order', $1, $2, $3
+                FROM confirmed
+                WHERE quantity > 0
             )
-            
-            return {
-                'order_id': order_id,
-                'items_confirmed': confirmed_items,
-                'status': 'confirmed',
-                'created_at': now_ist()
+            SELECT c.item_id, zi.name AS item_name, c.batch_id, b.batch_number, c.quantity, c.location
+            FROM confirmed c
+            JOIN zoho_items zi ON c.item_id = zi.id
+            JOIN batches b ON c.batch_id = b.id
+            ORDER BY c.id
+        """, order_id, f"Stock out for order #{order_id} (invoiced)", user_id)
+
+        if not confirmed:
+            raise ValueError(f"No allocated stock found for order #{order_id}. May have been confirmed already.")
+
+        confirmed_items = [
+            {
+                'item_id': row['item_id'],
+                'item_name': row['item_name'],
+                'batch_id': row['batch_id'],
+                'batch_number': row['batch_number'],
+                'quantity': float(row['quantity']),
+                'location': row['location']
             }
-            
+            for row in confirmed
+        ]
+
+        logger.info(
+            f"✅ Confirmed allocation for order #{order_id}: "
+            f"{len(confirmed_items)} item(s), stock debited"
+        )
+
+        return {
+            'order_id': order_id,
+            'items_confirmed': confirmed_items,
+            'status': 'confirmed',
+            'created_at': now_ist()
+        }
+
     except ValueError as ve:
         logger.warning(f"⚠️ Confirmation failed: {ve}")
         raise
@@ -18,6 +18,7 @@ Functions:
     - get_inventory_list: List inventory with filters
     - get_batch_inventory: Batch-wise inventory view
     - check_stock_availability: Real-time availability check
+    - check_stock_availability_batch: Availability for many order lines in one query
     
   Stock Movements:
     - record_stock_movement: Log stock movement
@@ -363,72 +364,135 @@ async def check_stock_availability(
     Returns:
         Availability status with stock breakdown
     """
-    try:
-        # 1. Get item info
-        item_query = "SELECT id, name, sku FROM zoho_items WHERE id = $1"
-        item = await fetch_one(item_query, item_id)
-        if not item:
-            raise ValueError(f"Item {item_id} not found")
-        
-        # 2. Build query for available stock
-        conditions = ["i.item_id = $1", "i.status = 'available'"]
-        params = [item_id]
-        param_count = 2
-        
-        if location:
-            conditions.append(f"i.location = ${param_count}")
-            params.append(location)
-            param_count += 1
+    result = await check_stock_availability_batch([
+        {'item_id': item_id, 'quantity': quantity, 'location': location, 'grade': grade}
+    ])
+    line = result['lines'][0]
+    for key in ('line_index', 'location_filter', 'grade_filter'):
+        line.pop(key)
+    return line
+
+
+async def check_stock_availability_batch(
+    lines: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Check stock availability for many order lines with a single query.
+    
+    Each line is evaluated independently against the same snapshot, so the
+    per-line figures match what check_stock_availability would return.
+    
+    Args:
+        lines: List of dicts with item_id, quantity, optional location and grade
         
-        if grade:
-            conditions.append(f"i.grade = ${param_count}")
-            params.append(grade)
-            param_count += 1
+    Returns:
+        Per-line availability with location breakdown, plus order-level totals
         
-        # 3. Get available stock by location
-        stock_query = f"""
+    Raises:
+        ValueError: If any item does not exist
+    """
+    try:
+        if not lines:
+            return {'lines': [], 'all_available': True, 'lines_short': 0, 'total_shortage': 0.0}
+        
+        # One grouped query: requested lines are unnested into a derived table,
+        # available stock is summed per (line, location) and allocated stock per item
+        availability_query = """
+            WITH req AS (
+                SELECT *
+                FROM unnest($1::int[], $2::int[], $3::text[], $4::text[])
+                    AS r(line_index, item_id, location, grade)
+            ),
+            stock AS (
+                SELECT r.line_index, i.location, SUM(i.quantity) as quantity
+                FROM req r
+                JOIN inventory i
+                  ON i.item_id = r.item_id
+                 AND i.status = 'available'
+                 AND (r.location IS NULL OR i.location = r.location)
+                 AND (r.grade IS NULL OR i.grade = r.grade)
+                GROUP BY r.line_index, i.location
+            ),
+            allocated AS (
+                SELECT i.item_id, SUM(i.quantity) as allocated
+                FROM inventory i
+                WHERE i.status = 'allocated'
+                  AND i.item_id IN (SELECT DISTINCT item_id FROM req)
+                GROUP BY i.item_id
+            )
             SELECT
-                i.location,
-                SUM(i.quantity) as quantity
-            FROM inventory i
-            WHERE {' AND '.join(conditions)}
-            GROUP BY i.location
-        """
-        stock_by_location = await fetch_all(stock_query, *params)
-        
-        # 4. Get allocated stock
-        allocated_query = f"""
-            SELECT COALESCE(SUM(i.quantity), 0) as allocated
-            FROM inventory i
-            WHERE i.item_id = $1 AND i.status = 'allocated'
+                r.line_index, r.item_id, z.id as found_item_id, z.name as item_name,
+                s.location, s.quantity,
+                COALESCE(a.allocated, 0) as allocated
+            FROM req r
+            LEFT JOIN zoho_items z ON z.id = r.item_id
+            LEFT JOIN stock s ON s.line_index = r.line_index
+            LEFT JOIN allocated a ON a.item_id = r.item_id
+            ORDER BY r.line_index
         """
-        allocated_result = await fetch_one(allocated_query, item_id)
-        allocated_stock = Decimal(str(allocated_result['allocated'])) if allocated_result else Decimal('0')
-        
-        # 5. Calculate totals
-        current_stock = sum(Decimal(str(s['quantity'])) for s in stock_by_location)
-        net_available = current_stock
-        shortage = max(Decimal('0'), quantity - net_available)
-        available = net_available >= quantity
+        rows = await fetch_all(
+            availability_query,
+            list(range(len(lines))),
+            [line['item_id'] for line in lines],
+            [line.get('location') for line in lines],
+            [line.get('grade') for line in lines]
+        )
         
-        # 6. Build locations dict
-        locations = {s['location']: float(s['quantity']) for s in stock_by_location}
+        # Fold rows back into one entry per requested line
+        by_line: Dict[int, Dict[str, Any]] = {}
+        missing_items = set()
+        for row in rows:
+            if row['found_item_id'] is None:
+                missing_items.add(row['item_id'])
+                continue
+            entry = by_line.setdefault(row['line_index'], {
+                'item_name': row['item_name'],
+                'allocated': Decimal(str(row['allocated'])),
+                'locations': {}
+            })
+            if row['location'] is not None:
+                entry['locations'][row['location']] = Decimal(str(row['quantity']))
+        
+        if missing_items:
+            raise ValueError(f"Item(s) not found: {', '.join(str(i) for i in sorted(missing_items))}")
+        
+        results = []
+        total_shortage = Decimal('0')
+        for index, line in enumerate(lines):
+            entry = by_line[index]
+            quantity = Decimal(str(line['quantity']))
+            current_stock = sum(entry['locations'].values(), Decimal('0'))
+            net_available = current_stock
+            shortage = max(Decimal('0'), quantity - net_available)
+            total_shortage += shortage
+            
+            results.append({
+                'line_index': index,
+                'item_id': line['item_id'],
+                'item_name': entry['item_name'],
+                'location_filter': line.get('location'),
+                'grade_filter': line.get('grade'),
+                'requested_quantity': float(quantity),
+                'available': net_available >= quantity,
+                'current_stock': float(current_stock),
+                'allocated_stock': float(entry['allocated']),
+                'net_available': float(net_available),
+                'shortage': float(shortage),
+                'locations': {loc: float(qty) for loc, qty in entry['locations'].items()}
+            })
+        
+        lines_short = sum(1 for r in results if not r['available'])
         
         logger.info(
-            f"Stock check for {item['name']}: Requested={quantity}, "
-            f"Available={net_available}, Sufficient={available}"
+            f"Batch stock check: {len(results)} line(s), {lines_short} short, "
+            f"total shortage={total_shortage}"
         )
         
         return {
-            'item_id': item_id,
-            'item_name': item['name'],
-            'requested_quantity': float(quantity),
-            'available': available,
-            'current_stock': float(current_stock),
-            'allocated_stock': float(allocated_stock),
-            'net_available': float(net_available),
-            'shortage': float(shortage),
-            'locations': locations
+            'lines': results,
+            'all_available': lines_short == 0,
+            'lines_short': lines_short,
+            'total_shortage': float(total_shortage)
         }
         
     except ValueError as ve:
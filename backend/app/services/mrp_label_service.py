@@ -2,17 +2,22 @@
 ================================================================================
 MRP Label Service - PDF Merging & Management
 ================================================================================
-Version: 1.0.0
+Version: 1.1.0
 Created: 2025-12-01
+Last Updated: 2026-10-18
 
 Description:
     Service for merging multiple product label PDFs based on Excel quantity data.
     Also handles management of source PDFs in Supabase Storage.
 
+    Storage goes through the async client (app.utils.storage), so listing,
+    downloading and uploading never block the event loop; the source PDFs
+    of a merge are downloaded concurrently, each file once.
+
 Dependencies:
     - pypdf: PDF merging
     - pandas: Data processing
-    - supabase: Cloud storage
+    - app.utils.storage: Cloud storage
 """
 
 import io
@@ -21,10 +26,10 @@ from datetime import datetime
 from app.utils.timezone import now_ist
 from typing import List, Dict, Any, Tuple, Optional
 import logging
-import pandas as pd
 from pypdf import PdfWriter, PdfReader
 
-from app.utils.supabase_client import get_supabase_client_async
+from app.utils.storage import get_storage_client
+from app.utils.excel_upload import UploadErrors, read_upload_frame, coerce_numeric
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +39,13 @@ MAX_FILE_SIZE_MB = 10
 MAX_DECOMPRESSED_SIZE_MB = 100
 LABELS_PER_FILE = 25
 
+# Upload columns and the headers accepted for each
+COLUMN_ALIASES = {
+    'item_id': ['item id', 'itemid', 'item', 'product_id'],
+    'variation_id': ['variation id', 'variationid', 'variation'],
+    'quantity': ['quantity', 'qty', 'count', 'copies']
+}
+
 class MrpLabelService:
     """Service for MRP label PDF merging and library management"""
     
@@ -60,87 +72,51 @@ class MrpLabelService:
                 except zipfile.BadZipFile:
                     raise ValueError("Invalid Excel file (corrupt ZIP structure)")
 
-            # 3. Parse Excel
-            try:
-                xls = pd.ExcelFile(io.BytesIO(file_content))
-                if "Item Summary" not in xls.sheet_names:
-                    raise ValueError("Sheet 'Item Summary' not found")
-                
-                df = pd.read_excel(xls, sheet_name="Item Summary")
-            except Exception as e:
-                raise ValueError(f"Failed to read Excel data: {str(e)}")
+            # 3. Parse Excel and match columns by alias
+            df = read_upload_frame(file_content, sheet_name="Item Summary", aliases=COLUMN_ALIASES)
+
+            # 4. Validate column-wise (blank or zero means "not set")
+            errors = UploadErrors()
+            for col in COLUMN_ALIASES:
+                df[col] = coerce_numeric(df, col, errors, integer=True, min_value=0).fillna(0).astype(int)
 
-            # 4. Validate Columns
-            # Normalize columns
-            df.columns = [str(col).strip().lower() for col in df.columns]
-            
-            # Map aliases
-            col_map = {}
-            aliases = {
-                'item_id': ['item id', 'itemid', 'item', 'product_id'],
-                'variation_id': ['variation id', 'variationid', 'variation'],
-                'quantity': ['quantity', 'qty', 'count', 'copies']
-            }
-            
-            for standard, alias_list in aliases.items():
-                for col in df.columns:
-                    if col in alias_list:
-                        col_map[standard] = col
-                        break
-            
-            missing = [k for k in aliases.keys() if k not in col_map]
-            if missing:
-                raise ValueError(f"Missing required columns: {', '.join(missing)}")
-            
-            # 5. Clean Data
-            df = df.rename(columns={v: k for k, v in col_map.items()})
-            df = df[['item_id', 'variation_id', 'quantity']]
-            
-            # Convert to numeric
-            for col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-            
-            # Filter valid rows
             df = df[df['quantity'] > 0]
-            df = df[(df['item_id'] > 0) | (df['variation_id'] > 0)]
+            no_id = (df['item_id'] <= 0) & (df['variation_id'] <= 0)
+            errors.add(df, no_id, "item_id or variation_id is required")
+            df = df[~no_id]
             
             if df.empty:
                 raise ValueError("No valid data rows found")
             
-            # 6. Check PDF Availability
-            supabase = await get_supabase_client_async()
-            files = supabase.storage.from_(BUCKET_NAME).list()
-            available_files = {f['name'] for f in files}
+            # 5. Check PDF Availability
+            storage = await get_storage_client()
+            available_files = {f.name for f in await storage.list(BUCKET_NAME)}
             
-            data_rows = []
-            missing_pdfs = set()
-            total_pages = 0
+            # Logic: Use variation_id if present, else item_id
+            use_id = df['variation_id'].where(df['variation_id'] != 0, df['item_id'])
+            df['pdf_filename'] = use_id.astype(str) + '.pdf'
+            df['is_available'] = df['pdf_filename'].isin(available_files)
             
-            for _, row in df.iterrows():
-                # Logic: Use variation_id if present, else item_id
-                use_id = row['variation_id'] if row['variation_id'] != 0 else row['item_id']
-                filename = f"{use_id}.pdf"
-                
-                if filename not in available_files:
-                    missing_pdfs.add(filename)
-                
-                data_rows.append({
-                    'item_id': int(row['item_id']),
-                    'variation_id': int(row['variation_id']),
-                    'quantity': int(row['quantity']),
-                    'pdf_filename': filename,
-                    'is_available': filename in available_files
-                })
-                
-                if filename in available_files:
-                    total_pages += row['quantity']
+            data_rows = df[['item_id', 'variation_id', 'quantity', 'pdf_filename', 'is_available']].to_dict('records')
+            missing_pdfs = sorted(set(df.loc[~df['is_available'], 'pdf_filename']))
+            total_pages = df.loc[df['is_available'], 'quantity'].sum()
             
             return {
                 'total_items': int(len(df)),
                 'total_pages': int(total_pages),
                 'valid_rows': int(len(data_rows)),
-                'missing_pdfs': list(missing_pdfs),
-                'data': data_rows
+                'missing_pdfs': missing_pdfs,
+                'data': [
+                    {
+                        'item_id': int(row['item_id']),
+                        'variation_id': int(row['variation_id']),
+                        'quantity': int(row['quantity']),
+                        'pdf_filename': row['pdf_filename'],
+                        'is_available': bool(row['is_available'])
+                    }
+                    for row in data_rows
+                ],
+                'errors': sorted(errors.items, key=lambda e: e['row_number'])
             }
 
         except Exception as e:
@@ -156,28 +132,22 @@ class MrpLabelService:
             Tuple(file_bytes, filename, is_zip)
         """
         try:
-            supabase = await get_supabase_client_async()
+            storage = await get_storage_client()
             merger = PdfWriter()
             total_pages = 0
             
-            # Cache downloaded PDFs to avoid repeated downloads
-            pdf_cache = {}
+            # Download every source PDF once, concurrently
+            items = [item for item in data if item.get('is_available')]
+            downloads = await storage.download_many(BUCKET_NAME, [item['pdf_filename'] for item in items])
+            pdf_cache = {name: io.BytesIO(content) for name, content in downloads.succeeded.items()}
             
-            for item in data:
-                if not item.get('is_available'):
-                    continue
-                    
+            for item in items:
                 filename = item['pdf_filename']
                 qty = item['quantity']
                 
-                # Download if not cached
                 if filename not in pdf_cache:
-                    try:
-                        res = supabase.storage.from_(BUCKET_NAME).download(filename)
-                        pdf_cache[filename] = io.BytesIO(res)
-                    except Exception as e:
-                        logger.error(f"Failed to download {filename}: {e}")
-                        continue
+                    logger.error(f"Failed to download {filename}: {downloads.failed.get(filename)}")
+                    continue
                 
                 # Merge
                 try:
@@ -237,23 +207,23 @@ class MrpLabelService:
     async def list_library_pdfs() -> List[Dict[str, Any]]:
         """List all PDFs in library"""
         try:
-            supabase = await get_supabase_client_async()
-            files = supabase.storage.from_(BUCKET_NAME).list()
+            storage = await get_storage_client()
+            files = await storage.list(BUCKET_NAME)
             
             # Sort by name (numeric aware if possible, but string sort is default)
             # We can try to sort numerically if names are numbers
             def sort_key(f):
-                name = f['name'].replace('.pdf', '')
-                return int(name) if name.isdigit() else name
+                name = f.name.replace('.pdf', '')
+                return (0, int(name), '') if name.isdigit() else (1, 0, name)
                 
             files.sort(key=sort_key)
             
             return [
                 {
-                    'name': f['name'],
-                    'size': f['metadata'].get('size', 0),
-                    'created_at': f['created_at'],
-                    'updated_at': f['updated_at']
+                    'name': f.name,
+                    'size': f.size,
+                    'created_at': f.created_at or '',
+                    'updated_at': f.updated_at or ''
                 }
                 for f in files
             ]
@@ -268,15 +238,11 @@ class MrpLabelService:
             if not filename.lower().endswith('.pdf'):
                 raise ValueError("Only PDF files allowed")
             
-            supabase = await get_supabase_client_async()
+            storage = await get_storage_client()
             
             # Check if exists (to overwrite or error? Streamlit code implies overwrite or error handling)
             # Supabase upload with upsert=True is safest
-            res = supabase.storage.from_(BUCKET_NAME).upload(
-                filename,
-                file_content,
-                file_options={"content-type": "application/pdf", "upsert": "true"}
-            )
+            await storage.upload(BUCKET_NAME, filename, file_content, content_type="application/pdf", upsert=True)
             return {"message": "Upload successful", "filename": filename}
             
         except Exception as e:
@@ -287,9 +253,20 @@ class MrpLabelService:
     async def delete_pdf(filename: str) -> Dict[str, Any]:
         """Delete PDF from library"""
         try:
-            supabase = await get_supabase_client_async()
-            supabase.storage.from_(BUCKET_NAME).remove([filename])
+            storage = await get_storage_client()
+            await storage.remove(BUCKET_NAME, [filename])
             return {"message": "Deleted successfully"}
         except Exception as e:
             logger.error(f"Error deleting PDF {filename}: {e}")
             raise
+
+    @staticmethod
+    async def get_pdf_download_url(filename: str, expires_in: int = 600) -> Dict[str, Any]:
+        """Time-limited download link for a library PDF"""
+        try:
+            storage = await get_storage_client()
+            url = await storage.create_signed_url(BUCKET_NAME, filename, expires_in=expires_in)
+            return {"filename": filename, "url": url, "expires_in": expires_in}
+        except Exception as e:
+            logger.error(f"Error signing URL for PDF {filename}: {e}")
+            raise
@@ -30,57 +30,62 @@ from datetime import datetime, date
 from decimal import Decimal
 import asyncpg
 import csv
+import re
 from io import StringIO
 
-from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction
+from app.database import (
+    fetch_one, fetch_all, execute_query, DatabaseTransaction,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
 from app.schemas.po import (
     POCreateRequest, POUpdateRequest, POItemCreate,
     VendorPricingRequest, POStatus, PriceSource
 )
+from app.services import doc_sequence_service
 
 logger = logging.getLogger(__name__)
 
+# List order for POs: newest first, id as the unique tie-breaker for keyset pagination
+PO_LIST_SORT = [
+    SortKey("po.created_at", "created_at", descending=True),
+    SortKey("po.id", "id", descending=True),
+]
+
 
 # ============================================================================
 # PO NUMBER GENERATION
 # ============================================================================
 
-async def generate_po_number(custom_number: Optional[str] = None) -> Dict[str, Any]:
+async def generate_po_number(
+    custom_number: Optional[str] = None,
+    preview: bool = False
+) -> Dict[str, Any]:
     """
-    Generate sequential PO number (thread-safe).
+    Generate sequential PO number (concurrency-safe, via doc_sequence_service).
     Format: PO/YY[YY+1]/XXXX (e.g., PO/2526/0001)
 
     Args:
         custom_number: Optional custom number to validate/use
+        preview: Return the next number without reserving it
 
     Returns:
         Dict with {po_number, sequence_number, financial_year}
     """
     try:
-        # 1. Determine Financial Year (FY)
-        today = date.today()
-        year = today.year
-        month = today.month
-
-        if month >= 4:  # April onwards
-            start_year = year
-            end_year = year + 1
-        else:  # Jan-Mar
-            start_year = year - 1
-            end_year = year
-        
-        # Format: 2526 (for FY 2025-26)
-        fy_str = f"{str(start_year)[-2:]}{str(end_year)[-2:]}"
+        # 1. Determine Financial Year (FY), format: 2526
+        fy_str = doc_sequence_service.get_financial_year()['code']
 
         # 2. If custom number provided, use it (but try to extract sequence)
         if custom_number:
-            # Try to extract sequence if it matches pattern
-            import re
             match = re.match(r"PO/(\d{4})/(\d{4})", custom_number)
             if match:
                 fy_match = match.group(1)
                 seq_match = int(match.group(2))
                 if fy_match == fy_str:
+                    # Keep generated numbers from reusing it
+                    await doc_sequence_service.ensure_at_least(
+                        doc_sequence_service.DOC_PURCHASE_ORDER, fy_str, seq_match
+                    )
                     return {
                         "po_number": custom_number,
                         "sequence_number": seq_match,
@@ -94,14 +99,15 @@ async def generate_po_number(custom_number: Optional[str] = None) -> Dict[str, A
                 "financial_year": fy_str
             }
 
-        # 3. Get max sequence number for this FY
-        query = """
-            SELECT COALESCE(MAX(sequence_number), 0) + 1 as next_seq
-            FROM purchase_orders
-            WHERE financial_year = $1
-        """
-        result = await fetch_one(query, fy_str)
-        next_seq = result['next_seq'] if result else 1
+        # 3. Reserve (or peek at) the next number for this FY
+        if preview:
+            next_seq = await doc_sequence_service.peek_next_number(
+                doc_sequence_service.DOC_PURCHASE_ORDER, fy_str
+            )
+        else:
+            next_seq = await doc_sequence_service.next_number(
+                doc_sequence_service.DOC_PURCHASE_ORDER, fy_str
+            )
 
         # 4. Format: PO/2526/0001
         po_number = f"PO/{fy_str}/{next_seq:04d}"
@@ -428,7 +434,9 @@ async def list_pos(
     to_date: Optional[date] = None,
     item_id: Optional[int] = None,
     page: int = 1,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT
 ) -> Dict[str, Any]:
     """
     List POs with filtering and pagination.
@@ -439,11 +447,13 @@ async def list_pos(
         from_date: Filter by dispatch date from
         to_date: Filter by dispatch date to
         item_id: Filter by item (in PO items)
-        page: Page number (1-indexed)
+        page: Page number (1-indexed), ignored when cursor is given
         limit: Items per page
+        cursor: Keyset cursor from a previous page's next_cursor
+        count_mode: exact, estimated or no total count
 
     Returns:
-        Paginated PO list with total count
+        Paginated PO list with total count and next_cursor
     """
     try:
         # Build WHERE conditions
@@ -484,16 +494,20 @@ async def list_pos(
         where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
         # Count total
-        count_query = f"""
-            SELECT COUNT(*) as total
-            FROM purchase_orders po
-            {where_clause}
-        """
-        count_result = await fetch_one(count_query, *params)
-        total = count_result['total'] if count_result else 0
+        total = await count_rows(f"FROM purchase_orders po {where_clause}", *params, mode=count_mode)
+
+        # Continue after the cursor position, or fall back to page offset
+        cursor_condition, cursor_params = keyset_condition(PO_LIST_SORT, cursor, param_count)
+        if cursor_condition:
+            conditions.append(cursor_condition)
+            params.extend(cursor_params)
+            param_count += len(cursor_params)
+            where_clause = "WHERE " + " AND ".join(conditions)
+            offset = 0
+        else:
+            offset = (page - 1) * limit
 
         # Get paginated results
-        offset = (page - 1) * limit
         list_query = f"""
             SELECT
                 po.id, po.po_number, po.vendor_id, po.dispatch_date,
@@ -503,23 +517,25 @@ async def list_pos(
             FROM purchase_orders po
             JOIN zoho_vendors v ON po.vendor_id = v.id
             {where_clause}
-            ORDER BY po.created_at DESC
+            {keyset_order_by(PO_LIST_SORT)}
             LIMIT ${param_count} OFFSET ${param_count + 1}
         """
-        params.extend([limit, offset])
+        params.extend([limit + 1, offset])
 
         pos = await fetch_all(list_query, *params)
+        pos, next_cursor = keyset_page(pos, PO_LIST_SORT, limit)
 
         # Calculate pages
         import math
-        pages = math.ceil(total / limit) if total > 0 else 1
+        pages = math.ceil(total / limit) if total else 1
 
         return {
             'pos': pos,
             'total': total,
             'page': page,
             'limit': limit,
-            'pages': pages
+            'pages': pages,
+            'next_cursor': next_cursor
         }
 
     except Exception as e:
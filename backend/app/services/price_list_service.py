@@ -16,13 +16,18 @@ from datetime import date, datetime
 from decimal import Decimal
 import logging
 import io
-from openpyxl import Workbook, load_workbook
+import pandas as pd
+from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 
 from app.database import fetch_one, fetch_all, execute_query
+from app.utils.excel_upload import UploadErrors, read_upload_frame, coerce_numeric, merge_lookup
 
 logger = logging.getLogger(__name__)
 
+# Import sheet columns by position (see generate_excel_template)
+IMPORT_COLUMNS = ['item_name', 'sku', 'price', 'notes']
+
 
 # ============================================================================
 # PRICE LIST CRUD OPERATIONS
@@ -529,87 +534,79 @@ async def generate_excel_template() -> bytes:
 
 
 async def import_from_excel(price_list_id: int, file: UploadFile) -> Dict:
-    """Import price list items from Excel file"""
+    """
+    Import price list items from Excel file
+    
+    Columns are read by position (Item Name, SKU, Price, Notes), validated
+    column-wise, item names are resolved with one query and all valid rows
+    are upserted in one statement. Later rows win for repeated items.
+    """
     # Verify price list
     await get_price_list_by_id(price_list_id)
     
     try:
         # Read Excel file
         contents = await file.read()
-        wb = load_workbook(io.BytesIO(contents), data_only=True)
-        ws = wb.active
+        df = read_upload_frame(contents, columns=IMPORT_COLUMNS)
+        df = df[df['item_name'].notna() & (df['item_name'].astype(str).str.strip() != '')]
+        df['item_name'] = df['item_name'].astype(str).str.strip()
         
-        items_imported = 0
-        items_updated = 0
-        errors = []
+        errors = UploadErrors()
+        df['price'] = coerce_numeric(
+            df, 'price', errors, required=True, min_value=0, exclusive_min=True,
+            label_column='item_name'
+        )
+        df = df[df['price'].notna()]
         
-        # Skip header row
-        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            if not row[0]:  # Skip empty rows
-                continue
-            
-            item_name = str(row[0]).strip()
-            
-            try:
-                price = float(row[2]) if row[2] else None
-                notes = str(row[3]) if row[3] else None
-                
-                if not price or price <= 0:
-                    errors.append({
-                        "row_number": row_num,
-                        "sku": item_name,  # Changed to item_name for consistency with error display
-                        "error": "Price must be greater than 0"
-                    })
-                    continue
-                
-                # Find item by exact name match
-                item = await fetch_one(
-                    "SELECT id FROM zoho_items WHERE name = $1",
-                    item_name
-                )
-                
-                if not item:
-                    errors.append({
-                        "row_number": row_num,
-                        "sku": item_name,  # Changed to item_name for consistency with error display
-                        "error": "Item name not found in items database"
-                    })
-                    continue
-                
-                # Check if exists
-                existing = await fetch_one(
-                    "SELECT id FROM price_list_items WHERE price_list_id = $1 AND item_id = $2",
-                    price_list_id,
-                    item['id']
-                )
-                
-                # Add or update
-                await add_or_update_price_list_item(
-                    price_list_id,
-                    item['id'],
-                    Decimal(str(price)),
-                    notes
-                )
-                
-                if existing:
-                    items_updated += 1
-                else:
-                    items_imported += 1
-                    
-            except Exception as e:
-                errors.append({
-                    "row_number": row_num,
-                    "sku": item_name,  # Changed to item_name for consistency with error display
-                    "error": str(e)
-                })
+        # Resolve item names in one query
+        items = await fetch_all(
+            "SELECT id AS item_id, name AS item_name FROM zoho_items WHERE name = ANY($1::text[])",
+            df['item_name'].unique().tolist()
+        )
+        df = merge_lookup(df, items, on=['item_name'], values=['item_id'])
+        errors.add(df, df['item_id'].isna(), "Item name not found in items database", 'item_name')
+        df = df[df['item_id'].notna()].drop_duplicates(subset='item_id', keep='last')
+        
+        item_ids = [int(item_id) for item_id in df['item_id']]
+        existing = await fetch_all(
+            "SELECT item_id FROM price_list_items WHERE price_list_id = $1 AND item_id = ANY($2::int[])",
+            price_list_id,
+            item_ids
+        )
+        items_updated = len(existing)
+        items_imported = len(item_ids) - items_updated
+        
+        if item_ids:
+            await execute_query(
+                """
+                INSERT INTO price_list_items (price_list_id, item_id, price, notes)
+                SELECT $1, u.item_id, u.price, u.notes
+                FROM unnest($2::int[], $3::numeric[], $4::text[]) AS u(item_id, price, notes)
+                ON CONFLICT (price_list_id, item_id)
+                DO UPDATE SET price = EXCLUDED.price, notes = EXCLUDED.notes, updated_at = NOW()
+                """,
+                price_list_id,
+                item_ids,
+                [Decimal(str(price)) for price in df['price']],
+                [None if pd.isna(note) else str(note) for note in df['notes']]
+            )
+        
+        error_list = [
+            {
+                "row_number": e['row_number'],
+                "sku": e['label'],  # Item name, for consistency with error display
+                "error": e['error']
+            }
+            for e in sorted(errors.items, key=lambda e: e['row_number'])
+        ]
         
         return {
             "success": True,
             "items_imported": items_imported,
             "items_updated": items_updated,
-            "items_failed": len(errors),
-            "errors": errors,
-            "message": f"Imported {items_imported}, Updated {items_updated}, Failed {len(errors)}"
+            "items_failed": len(error_list),
+            "errors": error_list,
+            "message": f"Imported {items_imported}, Updated {items_updated}, Failed {len(error_list)}"
         }
         
     except Exception as e:
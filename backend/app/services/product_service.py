@@ -11,6 +11,9 @@ Service for managing products, WooCommerce sync, and CRUD operations
 
 from typing import List, Dict, Optional, Tuple
 from fastapi import HTTPException, status
+import asyncio
+import hashlib
+import json
 import logging
 import httpx
 import os
@@ -18,10 +21,22 @@ from datetime import datetime
 
 from app.database import fetch_one, fetch_all, execute_query, get_db
 from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
-from app.services import settings_service
+from app.services import settings_service, sync_runner_service
 
 logger = logging.getLogger(__name__)
 
+# Concurrent WooCommerce requests during product sync
+WC_SYNC_CONCURRENCY = 5
+
+# Rows written per INSERT/UPDATE statement during product sync
+WC_SYNC_WRITE_BATCH = 500
+
+# WooCommerce fields whose change triggers a products row update
+SYNC_HASH_FIELDS = (
+    'sku', 'name', 'parent_name', 'stock_quantity', 'regular_price',
+    'sale_price', 'categories', 'attributes', 'status'
+)
+
 # Global progress tracking for sync operations
 _sync_progress = {
     "in_progress": False,
@@ -364,90 +379,41 @@ async def sync_from_woocommerce(sync_request, synced_by: str) -> Dict[str, int]:
 
         logger.info(f"Starting WooCommerce sync with limit={limit}, API URL={api_url[:40]}...")
 
-        # Fetch simple products
-        products = await fetch_wc_products(api_url, consumer_key, consumer_secret, limit)
-        
-        # Fetch variations for variable products
+        async with httpx.AsyncClient(auth=(consumer_key, consumer_secret), timeout=30.0) as client:
+            semaphore = asyncio.Semaphore(WC_SYNC_CONCURRENCY)
+
+            # Fetch simple products
+            products = await fetch_wc_products(client, semaphore, api_url, limit)
+
+            # Fetch variations for all variable products concurrently
+            variable_products = [p for p in products if p.get('type') == 'variable']
+            variation_lists = await asyncio.gather(*[
+                fetch_wc_variations(client, semaphore, api_url, product['id'])
+                for product in variable_products
+            ])
+
+        variations_by_parent = {
+            product['id']: variations
+            for product, variations in zip(variable_products, variation_lists)
+        }
         all_products = []
         for product in products:
             all_products.append(product)
-            
-            if product.get('type') == 'variable':
-                variations = await fetch_wc_variations(
-                    api_url, consumer_key, consumer_secret, product['id']
-                )
-                for variation in variations:
-                    variation['parent_name'] = product['name']
-                    all_products.append(variation)
+            for variation in variations_by_parent.get(product['id'], []):
+                variation['parent_name'] = product['name']
+                all_products.append(variation)
         
         # Set total for progress tracking
         _sync_progress["total"] = len(all_products)
         logger.info(f"Fetched {len(all_products)} products (including variations) from WooCommerce")
 
-        # Sync to database with progress tracking
-        for idx, product in enumerate(all_products):
-            _sync_progress["current"] = idx + 1
-            
-            try:
-                # Check if product already exists
-                existing = await fetch_one(
-                    "SELECT id FROM products WHERE product_id = $1 AND (variation_id = $2 OR (variation_id IS NULL AND $2 IS NULL))",
-                    product.get('id'),
-                    product.get('variation_id')
-                )
-
-                if existing:
-                    if sync_request.update_existing:
-                        # Update existing product with latest WooCommerce data
-                        product_update = ProductUpdate(
-                            sku=product.get('sku', ''),
-                            product_name=product.get('name', ''),
-                            parent_product=product.get('parent_name'),
-                            stock_quantity=product.get('stock_quantity', 0),
-                            regular_price=product.get('regular_price'),
-                            sale_price=product.get('sale_price'),
-                            categories=product.get('categories', ''),
-                            attribute=product.get('attributes', ''),
-                            product_status=product.get('status', 'publish')
-                        )
-                        await update_product(
-                            existing['id'],
-                            product_update,
-                            updated_by=synced_by,
-                            is_admin=True
-                        )
-                        _sync_progress["updated"] += 1
-                    else:
-                        _sync_progress["skipped"] += 1
-                    continue
-
-                # Insert new product
-                product_create = ProductCreate(
-                    product_id=product.get('id'),
-                    variation_id=product.get('variation_id'),
-                    sku=product.get('sku', ''),
-                    product_name=product.get('name', ''),
-                    parent_product=product.get('parent_name'),
-                    stock_quantity=product.get('stock_quantity', 0),
-                    regular_price=product.get('regular_price'),
-                    sale_price=product.get('sale_price'),
-                    categories=product.get('categories', ''),
-                    attribute=product.get('attributes', ''),
-                    product_status=product.get('status', 'publish'),
-                    is_active=True
-                )
-
-                await create_product(product_create, synced_by)
-                _sync_progress["added"] += 1
-
-            except Exception as e:
-                logger.error(f"Error syncing product {product.get('id')}: {e}")
-                _sync_progress["errors"] += 1
+        # Diff against existing rows (one query), then write set-based batches
+        await _upsert_wc_products(all_products, sync_request.update_existing)
         
         # Update last_sync_at for synced products
         await execute_query(
             "UPDATE products SET last_sync_at = NOW() WHERE product_id = ANY($1)",
-            [p.get('id') for p in all_products]
+            list({p.get('id') for p in all_products})
         )
         
         # Log final counts before marking as complete
@@ -487,70 +453,199 @@ async def sync_from_woocommerce(sync_request, synced_by: str) -> Dict[str, int]:
         )
 
 
-async def fetch_wc_products(api_url: str, consumer_key: str, consumer_secret: str, limit: int) -> List[Dict]:
+def _content_hash(product: Dict) -> str:
+    """Hash of the WooCommerce fields written to products"""
+    payload = json.dumps([product.get(field) for field in SYNC_HASH_FIELDS], default=str)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+async def _upsert_wc_products(all_products: List[Dict], update_existing: bool) -> None:
+    """
+    Write fetched WooCommerce products to the products table.
+
+    Existing rows are matched on (product_id, variation_id) with one query;
+    new rows are inserted and changed rows updated in batches of
+    WC_SYNC_WRITE_BATCH using unnest(). Rows whose content hash is unchanged
+    are skipped. Counts are accumulated in _sync_progress.
     """
-    Fetch products from WooCommerce API with pagination support
+    existing_rows = await fetch_all(
+        "SELECT id, product_id, variation_id, woo_content_hash FROM products WHERE product_id = ANY($1::bigint[])",
+        list({p.get('id') for p in all_products})
+    )
+    existing = {(row['product_id'], row['variation_id']): row for row in existing_rows}
+
+    inserts, updates = [], []
+    seen = set()
+    for product in all_products:
+        key = (product.get('id'), product.get('variation_id'))
+        if key in seen:
+            continue
+        seen.add(key)
+
+        content_hash = _content_hash(product)
+        row = existing.get(key)
+        if row is None:
+            inserts.append((product, content_hash))
+        elif update_existing and row['woo_content_hash'] != content_hash:
+            updates.append((row['id'], product, content_hash))
+        else:
+            _sync_progress["skipped"] += 1
+    _sync_progress["skipped"] += len(all_products) - len(seen)
+    _sync_progress["current"] = _sync_progress["skipped"]
+
+    def columns(batch):
+        return (
+            [p.get('sku', '') for p, _ in batch],
+            [p.get('name', '') for p, _ in batch],
+            [p.get('parent_name') for p, _ in batch],
+            [p.get('stock_quantity', 0) for p, _ in batch],
+            [p.get('regular_price') for p, _ in batch],
+            [p.get('sale_price') for p, _ in batch],
+            [p.get('categories', '') for p, _ in batch],
+            [p.get('attributes', '') for p, _ in batch],
+            [p.get('status', 'publish') for p, _ in batch],
+            [h for _, h in batch],
+        )
+
+    for i in range(0, len(inserts), WC_SYNC_WRITE_BATCH):
+        batch = inserts[i:i + WC_SYNC_WRITE_BATCH]
+        try:
+            await execute_query(
+                """
+                INSERT INTO products (
+                    product_id, variation_id, sku, product_name, parent_product,
+                    stock_quantity, regular_price, sale_price, categories, attribute,
+                    product_status, woo_content_hash, is_active
+                )
+                SELECT u.product_id, u.variation_id, u.sku, u.product_name, u.parent_product,
+                       u.stock_quantity, u.regular_price, u.sale_price, u.categories, u.attribute,
+                       u.product_status, u.woo_content_hash, TRUE
+                FROM unnest(
+                    $1::bigint[], $2::bigint[], $3::text[], $4::text[], $5::text[],
+                    $6::int[], $7::numeric[], $8::numeric[], $9::text[], $10::text[],
+                    $11::text[], $12::text[]
+                ) AS u(
+                    product_id, variation_id, sku, product_name, parent_product,
+                    stock_quantity, regular_price, sale_price, categories, attribute,
+                    product_status, woo_content_hash
+                )
+                """,
+                [p.get('id') for p, _ in batch],
+                [p.get('variation_id') for p, _ in batch],
+                *columns(batch)
+            )
+            _sync_progress["added"] += len(batch)
+        except Exception as e:
+            logger.error(f"Error inserting {len(batch)} WooCommerce products: {e}")
+            _sync_progress["errors"] += len(batch)
+        _sync_progress["current"] += len(batch)
+
+    for i in range(0, len(updates), WC_SYNC_WRITE_BATCH):
+        batch = updates[i:i + WC_SYNC_WRITE_BATCH]
+        pairs = [(p, h) for _, p, h in batch]
+        try:
+            await execute_query(
+                """
+                UPDATE products p
+                SET sku = u.sku,
+                    product_name = u.product_name,
+                    parent_product = u.parent_product,
+                    stock_quantity = u.stock_quantity,
+                    regular_price = u.regular_price,
+                    sale_price = u.sale_price,
+                    categories = u.categories,
+                    attribute = u.attribute,
+                    product_status = u.product_status,
+                    woo_content_hash = u.woo_content_hash,
+                    updated_at = NOW()
+                FROM unnest(
+                    $1::int[], $2::text[], $3::text[], $4::text[],
+                    $5::int[], $6::numeric[], $7::numeric[], $8::text[], $9::text[],
+                    $10::text[], $11::text[]
+                ) AS u(
+                    id, sku, product_name, parent_product,
+                    stock_quantity, regular_price, sale_price, categories, attribute,
+                    product_status, woo_content_hash
+                )
+                WHERE p.id = u.id
+                """,
+                [row_id for row_id, _, _ in batch],
+                *columns(pairs)
+            )
+            _sync_progress["updated"] += len(batch)
+        except Exception as e:
+            logger.error(f"Error updating {len(batch)} WooCommerce products: {e}")
+            _sync_progress["errors"] += len(batch)
+        _sync_progress["current"] += len(batch)
+
+
+async def _get_wc_page(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    url: str,
+    params: Dict
+) -> Tuple[List[Dict], int]:
+    """GET one WooCommerce list page; returns (objects, total pages)"""
+    async with semaphore:
+        response = await client.get(url, params=params)
+    response.raise_for_status()
+    return response.json(), int(response.headers.get('X-WP-TotalPages', 1))
+
+
+def _parse_wc_product(product: Dict) -> Dict:
+    """Flatten a WooCommerce product for the products table"""
+    # Handle None values from WooCommerce
+    stock_qty = product.get('stock_quantity')
+    if stock_qty is None:
+        stock_qty = 0
+
+    return {
+        'id': product['id'],
+        'name': product['name'],
+        'sku': product.get('sku', ''),
+        'type': product.get('type', 'simple'),
+        'regular_price': float(product.get('regular_price', 0) or 0),
+        'sale_price': float(product.get('sale_price', 0) or 0),
+        'stock_quantity': int(stock_qty),
+        'status': product.get('status', 'publish'),
+        'categories': ', '.join([cat['name'] for cat in product.get('categories', [])]),
+        'variation_id': None
+    }
+
+
+async def fetch_wc_products(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    api_url: str,
+    limit: int
+) -> List[Dict]:
+    """
+    Fetch published products from WooCommerce API
+
+    The first page reports the page count; the remaining pages needed for
+    limit are fetched concurrently (bounded by semaphore).
 
     Args:
-        limit: Total number of products to fetch (will fetch multiple pages if needed)
+        limit: Total number of products to fetch
     """
     try:
-        all_products = []
-        page = 1
         per_page = 100  # WooCommerce API max per page
+        params = {'per_page': per_page, 'status': 'publish', 'page': 1}
 
-        async with httpx.AsyncClient() as client:
-            while len(all_products) < limit:
-                # Calculate how many to fetch this page
-                remaining = limit - len(all_products)
-                current_per_page = min(per_page, remaining)
-
-                response = await client.get(
-                    f"{api_url}/products",
-                    auth=(consumer_key, consumer_secret),
-                    params={
-                        'per_page': current_per_page,
-                        'status': 'publish',
-                        'page': page
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                products = response.json()
-
-                # No more products to fetch
-                if not products:
-                    break
-
-                # Parse and add to results
-                for product in products:
-                    # Handle None values from WooCommerce
-                    stock_qty = product.get('stock_quantity')
-                    if stock_qty is None:
-                        stock_qty = 0
-
-                    parsed = {
-                        'id': product['id'],
-                        'name': product['name'],
-                        'sku': product.get('sku', ''),
-                        'type': product.get('type', 'simple'),
-                        'regular_price': float(product.get('regular_price', 0) or 0),
-                        'sale_price': float(product.get('sale_price', 0) or 0),
-                        'stock_quantity': int(stock_qty),
-                        'status': product.get('status', 'publish'),
-                        'categories': ', '.join([cat['name'] for cat in product.get('categories', [])]),
-                        'variation_id': None
-                    }
-                    all_products.append(parsed)
-
-                # If we got less than per_page, we've reached the end
-                if len(products) < current_per_page:
-                    break
-
-                page += 1
-                logger.info(f"Fetched page {page-1}, total products so far: {len(all_products)}")
-
-        logger.info(f"Fetched total of {len(all_products)} products from WooCommerce")
+        first_page, total_pages = await _get_wc_page(client, semaphore, f"{api_url}/products", params)
+        pages_needed = min(total_pages, (limit + per_page - 1) // per_page)
+
+        other_pages = await asyncio.gather(*[
+            _get_wc_page(client, semaphore, f"{api_url}/products", {**params, 'page': page})
+            for page in range(2, pages_needed + 1)
+        ])
+
+        raw_products = list(first_page)
+        for page_products, _ in other_pages:
+            raw_products.extend(page_products)
+
+        all_products = [_parse_wc_product(product) for product in raw_products[:limit]]
+        logger.info(f"Fetched total of {len(all_products)} products from WooCommerce ({pages_needed} pages)")
         return all_products
 
     except Exception as e:
@@ -558,18 +653,23 @@ async def fetch_wc_products(api_url: str, consumer_key: str, consumer_secret: st
         raise
 
 
-async def fetch_wc_variations(api_url: str, consumer_key: str, consumer_secret: str, product_id: int) -> List[Dict]:
-    """Fetch variations for a variable product"""
+async def fetch_wc_variations(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    api_url: str,
+    product_id: int
+) -> List[Dict]:
+    """Fetch all variation pages for a variable product"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{api_url}/products/{product_id}/variations",
-                auth=(consumer_key, consumer_secret),
-                params={'per_page': 100},
-                timeout=30.0
-            )
-            response.raise_for_status()
-            variations = response.json()
+        url = f"{api_url}/products/{product_id}/variations"
+        variations, total_pages = await _get_wc_page(client, semaphore, url, {'per_page': 100, 'page': 1})
+        if total_pages > 1:
+            other_pages = await asyncio.gather(*[
+                _get_wc_page(client, semaphore, url, {'per_page': 100, 'page': page})
+                for page in range(2, total_pages + 1)
+            ])
+            for page_variations, _ in other_pages:
+                variations.extend(page_variations)
         
         parsed_variations = []
         for variation in variations:
@@ -642,17 +742,10 @@ async def get_product_stats() -> Dict[str, int]:
 
 async def get_sync_progress() -> Dict:
     """
-    Get current sync progress
-    
+    Get progress of the latest sync run (from sync_runs, so it is the same
+    on every worker)
+
     Returns:
-        Dict with progress information including percentage
+        Dict with progress information including percentage and ETA
     """
-    progress = _sync_progress.copy()
-    
-    # Calculate percentage
-    if progress["total"] > 0:
-        progress["percentage"] = int((progress["current"] / progress["total"]) * 100)
-    else:
-        progress["percentage"] = 0
-    
-    return progress
+    return await sync_runner_service.get_progress("woo_items")
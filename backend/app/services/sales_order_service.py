@@ -26,56 +26,62 @@ from typing import Optional, Dict, List, Any
 from datetime import datetime, date
 from decimal import Decimal
 import asyncpg
+import re
 
-from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction
+from app.database import (
+    fetch_one, fetch_all, execute_query, DatabaseTransaction,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
 from app.schemas.sales_orders import (
     SOCreateRequest, SOUpdateRequest,
     CustomerPricingRequest, SOStatus, PriceSource
 )
+from app.services import doc_sequence_service
 
 logger = logging.getLogger(__name__)
 
+# List order for orders: newest first, id as the unique tie-breaker for keyset pagination
+SO_LIST_SORT = [
+    SortKey("so.created_at", "created_at", descending=True),
+    SortKey("so.id", "id", descending=True),
+]
+
 
 # ============================================================================
 # SO NUMBER GENERATION
 # ============================================================================
 
-async def generate_so_number(custom_number: Optional[str] = None) -> Dict[str, Any]:
+async def generate_so_number(
+    custom_number: Optional[str] = None,
+    preview: bool = False
+) -> Dict[str, Any]:
     """
-    Generate sequential SO number (thread-safe).
+    Generate sequential SO number (concurrency-safe, via doc_sequence_service).
     Format: SO/YY-YY/XXXX (e.g., SO/25-26/0001)
 
     Args:
         custom_number: Optional custom number to validate/use
+        preview: Return the next number without reserving it
 
     Returns:
         Dict with {so_number, sequence_number, financial_year}
     """
     try:
-        # 1. Determine Financial Year (FY)
-        today = date.today()
-        year = today.year
-        month = today.month
-
-        if month >= 4:  # April onwards
-            start_year = year
-            end_year = year + 1
-        else:  # Jan-Mar
-            start_year = year - 1
-            end_year = year
-        
-        # Format: 25-26 (for FY 2025-26)
-        fy_str = f"{str(start_year)[-2:]}-{str(end_year)[-2:]}"
+        # 1. Determine Financial Year (FY), format: 25-26
+        fy = doc_sequence_service.get_financial_year()
+        fy_str = fy['label']
 
         # 2. If custom number provided, use it (but try to extract sequence)
         if custom_number:
-            # Try to extract sequence if it matches pattern
-            import re
             match = re.match(r"SO/(\d{2}-\d{2})/(\d{4})", custom_number)
             if match:
                 fy_match = match.group(1)
                 seq_match = int(match.group(2))
                 if fy_match == fy_str:
+                    # Keep generated numbers from reusing it
+                    await doc_sequence_service.ensure_at_least(
+                        doc_sequence_service.DOC_SALES_ORDER, fy['code'], seq_match
+                    )
                     return {
                         "so_number": custom_number,
                         "sequence_number": seq_match,
@@ -89,30 +95,15 @@ async def generate_so_number(custom_number: Optional[str] = None) -> Dict[str, A
                 "financial_year": fy_str
             }
 
-        # 3. Get max sequence number for this FY
-        # Note: We don't have explicit financial_year/sequence_number columns in the CREATE TABLE 
-        # based on the SQL provided, but we can extract it from so_number or add columns if needed.
-        # For Marketplace ERP standards (matching PO), we usually parse the max number.
-        
-        query = """
-            SELECT so_number 
-            FROM sales_orders 
-            WHERE so_number LIKE $1
-            ORDER BY so_number DESC 
-            LIMIT 1
-        """
-        pattern = f"SO/{fy_str}/%"
-        result = await fetch_one(query, pattern)
-        
-        next_seq = 1
-        if result and result['so_number']:
-            try:
-                # Extract last 4 digits
-                parts = result['so_number'].split('/')
-                if len(parts) == 3:
-                     next_seq = int(parts[2]) + 1
-            except ValueError:
-                pass # Fallback to 1
+        # 3. Reserve (or peek at) the next number for this FY
+        if preview:
+            next_seq = await doc_sequence_service.peek_next_number(
+                doc_sequence_service.DOC_SALES_ORDER, fy['code']
+            )
+        else:
+            next_seq = await doc_sequence_service.next_number(
+                doc_sequence_service.DOC_SALES_ORDER, fy['code']
+            )
 
         # 4. Format: SO/25-26/0001
         so_number = f"SO/{fy_str}/{next_seq:04d}"
@@ -454,7 +445,9 @@ async def list_sos(
     to_date: Optional[date] = None,
     item_id: Optional[int] = None,
     page: int = 1,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT
 ) -> Dict[str, Any]:
     """
     List SOs with filtering and pagination.
@@ -498,16 +491,20 @@ async def list_sos(
         where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
 
         # Count total
-        count_query = f"""
-            SELECT COUNT(*) as total
-            FROM sales_orders so
-            {where_clause}
-        """
-        count_result = await fetch_one(count_query, *params)
-        total = count_result['total'] if count_result else 0
+        total = await count_rows(f"FROM sales_orders so {where_clause}", *params, mode=count_mode)
+
+        # Continue after the cursor position, or fall back to page offset
+        cursor_condition, cursor_params = keyset_condition(SO_LIST_SORT, cursor, param_count)
+        if cursor_condition:
+            conditions.append(cursor_condition)
+            params.extend(cursor_params)
+            param_count += len(cursor_params)
+            where_clause = "WHERE " + " AND ".join(conditions)
+            offset = 0
+        else:
+            offset = (page - 1) * limit
 
         # Get paginated results
-        offset = (page - 1) * limit
         list_query = f"""
             SELECT
                 so.id, so.so_number, so.customer_id, so.order_date,
@@ -518,22 +515,24 @@ async def list_sos(
             FROM sales_orders so
             JOIN zoho_customers c ON so.customer_id = c.id
             {where_clause}
-            ORDER BY so.created_at DESC
+            {keyset_order_by(SO_LIST_SORT)}
             LIMIT ${param_count} OFFSET ${param_count + 1}
         """
-        params.extend([limit, offset])
+        params.extend([limit + 1, offset])
 
         sos = await fetch_all(list_query, *params)
+        sos, next_cursor = keyset_page(sos, SO_LIST_SORT, limit)
 
         import math
-        pages = math.ceil(total / limit) if total > 0 else 1
+        pages = math.ceil(total / limit) if total else 1
 
         return {
             'orders': sos,
             'total': total,
             'page': page,
             'limit': limit,
-            'pages': pages
+            'pages': pages,
+            'next_cursor': next_cursor
         }
 
     except Exception as e:
@@ -0,0 +1,175 @@
+"""
+================================================================================
+Marketplace ERP - Global Search Service
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Quick search across items, products, batches, customers, vendors, purchase
+  orders, sales orders and tickets. Every searched column has a pg_trgm GIN
+  index (migration 034), so the substring match is an index scan; results are
+  ranked by trigram word similarity with a boost for prefix matches on the
+  main label.
+
+  Each entity contributes at most SEARCH_CANDIDATE_LIMIT matches to the
+  ranking step, which keeps result size bounded for short or very common
+  terms. Candidates are taken best-first (prefix matches, then similarity),
+  so exact and prefix matches are never cut off by the limit.
+
+Functions:
+  - quick_search: Ranked search over one or more entity types in one query
+
+================================================================================
+"""
+
+import logging
+from typing import Optional, Dict, List, Any
+
+from app.database import fetch_all
+
+logger = logging.getLogger(__name__)
+
+# Best matches per entity that are ranked; anything beyond is not considered
+SEARCH_CANDIDATE_LIMIT = 200
+
+# Searchable entities: table, label/sublabel expressions and indexed columns
+SEARCH_ENTITIES: Dict[str, Dict[str, Any]] = {
+    "item": {
+        "table": "zoho_items",
+        "label": "name",
+        "sublabel": "sku",
+        "columns": ["name", "sku", "hsn_or_sac"],
+    },
+    "product": {
+        "table": "products",
+        "label": "product_name",
+        "sublabel": "sku",
+        "columns": ["product_name", "sku"],
+    },
+    "batch": {
+        "table": "batches",
+        "label": "batch_number",
+        "sublabel": "status",
+        "columns": ["batch_number"],
+    },
+    "customer": {
+        "table": "zoho_customers",
+        "label": "contact_name",
+        "sublabel": "COALESCE(company_name, email)",
+        "columns": ["contact_name", "company_name", "email"],
+    },
+    "woo_customer": {
+        "table": "woo_customers",
+        "label": "TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, ''))",
+        "sublabel": "email",
+        "columns": ["first_name", "last_name", "email", "billing_company", "billing_phone"],
+    },
+    "vendor": {
+        "table": "zoho_vendors",
+        "label": "contact_name",
+        "sublabel": "COALESCE(company_name, email)",
+        "columns": ["contact_name", "company_name", "email"],
+    },
+    "purchase_order": {
+        "table": "purchase_orders",
+        "label": "po_number",
+        "sublabel": "status",
+        "columns": ["po_number"],
+    },
+    "sales_order": {
+        "table": "sales_orders",
+        "label": "so_number",
+        "sublabel": "status",
+        "columns": ["so_number"],
+    },
+    "ticket": {
+        "table": "tickets",
+        "label": "title",
+        "sublabel": "status",
+        "columns": ["title"],
+    },
+}
+
+
+def _escape_like(term: str) -> str:
+    """Escape LIKE wildcards so the term is matched literally"""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _entity_query(entity_type: str) -> str:
+    """
+    Ranked sub-select for one entity.
+
+    Parameters: $1 = raw term, $2 = '%term%' pattern, $3 = 'term%' pattern,
+    $4 = per-entity result limit.
+    """
+    entity = SEARCH_ENTITIES[entity_type]
+    columns = entity["columns"]
+    match = " OR ".join(f"{col} ILIKE $2" for col in columns)
+    similarity = ", ".join(f"word_similarity($1, COALESCE({col}, ''))" for col in columns)
+
+    return f"""
+        (SELECT '{entity_type}' AS entity_type, c.id, c.label, c.sublabel,
+                (c.similarity + CASE WHEN c.label ILIKE $3 THEN 1 ELSE 0 END)::float AS score
+         FROM (
+             SELECT id,
+                    {entity['label']} AS label,
+                    {entity['sublabel']}::text AS sublabel,
+                    GREATEST({similarity}) AS similarity
+             FROM {entity['table']}
+             WHERE {match}
+             ORDER BY ({entity['label']}) ILIKE $3 DESC, similarity DESC, id
+             LIMIT {SEARCH_CANDIDATE_LIMIT}
+         ) c
+         ORDER BY score DESC, c.id
+         LIMIT $4)
+    """
+
+
+async def quick_search(
+    term: str,
+    types: Optional[List[str]] = None,
+    limit: int = 5
+) -> Dict[str, Any]:
+    """
+    Search every requested entity type and return results ranked by score.
+
+    Args:
+        term: Search text (substring match, case-insensitive)
+        types: Entity types to search (defaults to all of SEARCH_ENTITIES)
+        limit: Maximum results per entity type
+
+    Returns:
+        Dict with query, results (ordered by score) and counts per type
+
+    Raises:
+        ValueError: If types contains an unknown entity type
+    """
+    term = term.strip()
+    entity_types = types or list(SEARCH_ENTITIES.keys())
+    unknown = [t for t in entity_types if t not in SEARCH_ENTITIES]
+    if unknown:
+        raise ValueError(
+            f"Unknown search type(s): {', '.join(unknown)}. "
+            f"Valid types: {', '.join(SEARCH_ENTITIES.keys())}"
+        )
+
+    if not term:
+        return {"query": term, "results": [], "counts": {}}
+
+    # Preserve caller order while dropping duplicates
+    entity_types = list(dict.fromkeys(entity_types))
+    query = (
+        "SELECT * FROM ("
+        + " UNION ALL ".join(_entity_query(t) for t in entity_types)
+        + ") results ORDER BY score DESC, entity_type, id"
+    )
+    escaped = _escape_like(term)
+    rows = await fetch_all(query, term, f"%{escaped}%", f"{escaped}%", limit)
+
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["entity_type"]] = counts.get(row["entity_type"], 0) + 1
+
+    return {"query": term, "results": rows, "counts": counts}
@@ -219,6 +219,11 @@ async def update_setting(
 
     logger.info(f"[SETTINGS] Audit log entry created for '{key}'")
 
+    # A stored Zoho token belongs to the old credentials
+    if key in ("zoho.client_id", "zoho.client_secret", "zoho.refresh_token"):
+        await conn.execute("DELETE FROM oauth_tokens WHERE provider = 'zoho'")
+        logger.info("[SETTINGS] Shared Zoho access token cleared")
+
     # Clear cache
     _settings_cache.clear()
     logger.info(f"[SETTINGS] Settings cache cleared")
@@ -9,11 +9,10 @@ Business logic for updating WooCommerce product stock and prices with:
 - List management (updatable/non-updatable/deleted)
 - Bulk Excel upload/download
 - Change history tracking
-- Parallel WooCommerce updates using asyncio.gather()
+- WooCommerce updates via the products/variations batch endpoints
 ================================================================================
 """
 
-import asyncio
 import uuid
 from typing import List, Dict, Optional, Tuple, Any
 from datetime import datetime, timedelta
@@ -24,11 +23,21 @@ import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 
-from app.database import fetch_all, fetch_one, execute_query
+from app.database import fetch_all, fetch_one, execute_query, DatabaseTransaction
 from app.services.woocommerce_service import WooCommerceService
+from app.utils.excel_upload import UploadErrors, read_upload_frame, coerce_numeric, merge_lookup
 
 logger = logging.getLogger(__name__)
 
+# Columns of the 'Products' upload sheet (see generate_excel_template)
+UPLOAD_COLUMNS = ['product_id', 'variation_id', 'new_stock', 'new_regular_price', 'new_sale_price']
+
+# Extra WooCommerce push attempts for items that failed, before recording results
+WOO_PUSH_RETRIES = 1
+
+# Fields reconciled by sync_from_woocommerce
+SYNC_FIELDS = ('stock_quantity', 'regular_price', 'sale_price')
+
 def safe_float(value, default=0.0):
     """Safely convert value to float, handling empty strings and None"""
     if value is None or value == '':
@@ -132,21 +141,27 @@ class StockPriceService:
         valid_changes = []
         validation_errors = []
         
+        # Get current product data for all changes in one query
+        rows = await fetch_all("""
+            SELECT id, product_id, variation_id, product_name, parent_product, sku,
+                   stock_quantity, regular_price, sale_price
+            FROM products
+            WHERE id = ANY($1::int[])
+        """, list({change['db_id'] for change in changes}))
+        products_by_id = {row['id']: row for row in rows}
+        
         for change in changes:
             db_id = change['db_id']
-            
-            # Get current product data
-            product = await fetch_one("""
-                SELECT id, product_id, variation_id, product_name, parent_product, sku,
-                       stock_quantity, regular_price, sale_price
-                FROM products
-                WHERE id = $1
-            """, db_id)
+            product = products_by_id.get(db_id)
             
             if not product:
                 validation_errors.append(f"Product ID {db_id} not found")
                 continue
             
+            # Spreadsheet uploads report errors against their row
+            if change.get('row_number'):
+                product = {**product, 'product_name': f"Row {change['row_number']}: {product['product_name']}"}
+            
             change_details = []
             
             # Validate stock change
@@ -215,7 +230,7 @@ class StockPriceService:
                     'db_id': db_id,
                     'product_id': product['product_id'],
                     'variation_id': product.get('variation_id'),
-                    'product_name': product['product_name'],
+                    'product_name': products_by_id[db_id]['product_name'],
                     'parent_product': product.get('parent_product'),
                     'sku': product.get('sku'),
                     'changes': change_details
@@ -228,6 +243,11 @@ class StockPriceService:
         """
         Apply updates to database and WooCommerce
         
+        Database rows and history are written in one transaction, then the
+        changes are pushed through WooCommerce's batch endpoints (grouped by
+        parent product, 100 per request). Items that fail are retried once on
+        their own before per-item results are recorded in bulk.
+        
         Args:
             changes: List of validated changes
             user_id: User ID performing the update
@@ -236,160 +256,157 @@ class StockPriceService:
             Dict with success_count, failure_count, failed_items, batch_id
         """
         batch_id = str(uuid.uuid4())
-        success_count = 0
-        failure_count = 0
-        failed_items = []
+        if not changes:
+            return {
+                'success_count': 0,
+                'failure_count': 0,
+                'failed_items': [],
+                'batch_id': batch_id
+            }
         
-        # Step 1: Update database first
-        for item in changes:
-            try:
-                # Prepare updates
-                db_updates = {}
-                for change_detail in item['changes']:
-                    db_updates[change_detail['field']] = change_detail['new_value']
-                
-                # Update product
-                await execute_query("""
-                    UPDATE products
-                    SET stock_quantity = COALESCE($1, stock_quantity),
-                        regular_price = COALESCE($2, regular_price),
-                        sale_price = COALESCE($3, sale_price),
-                        updated_at = NOW()
-                    WHERE id = $4
-                """, 
-                    db_updates.get('stock_quantity'),
-                    db_updates.get('regular_price'),
-                    db_updates.get('sale_price'),
-                    item['db_id']
-                )
-                
-                # Log each change in history
-                for change_detail in item['changes']:
-                    await execute_query("""
-                        INSERT INTO stock_price_history (
-                            product_id, variation_id, field_changed,
-                            old_value, new_value, changed_by, batch_id,
-                            change_source, sync_status
-                        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                    """,
-                        item['product_id'],
-                        item['variation_id'],
-                        change_detail['field'],
-                        str(change_detail['old_value']),
-                        str(change_detail['new_value']),
-                        user_id,
-                        batch_id,
-                        'manual',
-                        'pending'
-                    )
-            except Exception as e:
-                logger.error(f"Database update failed for {item['product_name']}: {e}")
-                failed_items.append(f"{item['product_name']}: Database error - {str(e)}")
-                failure_count += 1
-                continue
+        # Step 1: Update database first (one statement per table)
+        db_ids, stocks, regulars, sales = [], [], [], []
+        history = {
+            'product_id': [], 'variation_id': [], 'field': [],
+            'old_value': [], 'new_value': []
+        }
+        wc_updates: Dict[Tuple[int, Optional[int]], Dict[str, Any]] = {}
+        names: Dict[Tuple[int, Optional[int]], str] = {}
         
-        # Step 2: Update WooCommerce in parallel (using asyncio.gather)
-        wc_tasks = []
         for item in changes:
-            # Prepare WooCommerce updates
-            wc_updates = {}
+            db_updates = {d['field']: d['new_value'] for d in item['changes']}
+            db_ids.append(item['db_id'])
+            stocks.append(db_updates.get('stock_quantity'))
+            regulars.append(db_updates.get('regular_price'))
+            sales.append(db_updates.get('sale_price'))
+            
+            key = (item['product_id'], item['variation_id'])
+            names[key] = item['product_name']
+            wc_updates[key] = {}
+            
             for change_detail in item['changes']:
                 field = change_detail['field']
                 value = change_detail['new_value']
                 
+                history['product_id'].append(item['product_id'])
+                history['variation_id'].append(item['variation_id'])
+                history['field'].append(field)
+                history['old_value'].append(str(change_detail['old_value']))
+                history['new_value'].append(str(value))
+                
                 # Format for WooCommerce API
                 if field in ['regular_price', 'sale_price']:
-                    wc_updates[field] = str(value)
+                    wc_updates[key][field] = str(value)
                 elif field == 'stock_quantity':
-                    wc_updates[field] = int(value)
-            
-            # Create async task
-            wc_tasks.append(
-                StockPriceService._update_woocommerce_product(
-                    item['product_id'],
-                    item['variation_id'],
-                    wc_updates,
-                    batch_id,
-                    item['product_name']
-                )
-            )
+                    wc_updates[key][field] = int(value)
         
-        # Execute WooCommerce updates concurrently (max 5 at a time)
-        for i in range(0, len(wc_tasks), 5):
-            batch = wc_tasks[i:i+5]
-            results = await asyncio.gather(*batch, return_exceptions=True)
-            
-            for result in results:
-                if isinstance(result, Exception):
-                    failure_count += 1
-                    failed_items.append(str(result))
-                elif result['success']:
-                    success_count += 1
-                else:
-                    failure_count += 1
-                    failed_items.append(result['error'])
+        try:
+            async with DatabaseTransaction() as conn:
+                await conn.execute("""
+                    UPDATE products p
+                    SET stock_quantity = COALESCE(u.stock_quantity, p.stock_quantity),
+                        regular_price = COALESCE(u.regular_price, p.regular_price),
+                        sale_price = COALESCE(u.sale_price, p.sale_price),
+                        updated_at = NOW()
+                    FROM unnest($1::int[], $2::int[], $3::numeric[], $4::numeric[])
+                        AS u(id, stock_quantity, regular_price, sale_price)
+                    WHERE p.id = u.id
+                """, db_ids, stocks, regulars, sales)
+                
+                await conn.execute("""
+                    INSERT INTO stock_price_history (
+                        product_id, variation_id, field_changed,
+                        old_value, new_value, changed_by, batch_id,
+                        change_source, sync_status
+                    )
+                    SELECT h.product_id, h.variation_id, h.field_changed,
+                           h.old_value, h.new_value, $6, $7, 'manual', 'pending'
+                    FROM unnest($1::bigint[], $2::bigint[], $3::text[], $4::text[], $5::text[])
+                        AS h(product_id, variation_id, field_changed, old_value, new_value)
+                """,
+                    history['product_id'], history['variation_id'], history['field'],
+                    history['old_value'], history['new_value'], user_id, batch_id
+                )
+        except Exception as e:
+            logger.error(f"Database update failed for batch {batch_id}: {e}")
+            return {
+                'success_count': 0,
+                'failure_count': len(changes),
+                'failed_items': [f"{name}: Database error - {str(e)}" for name in names.values()],
+                'batch_id': batch_id
+            }
         
+        # Step 2: Push to WooCommerce via batch endpoints, retrying only failures
+        results = await StockPriceService._push_woocommerce_updates(wc_updates)
+        for attempt in range(WOO_PUSH_RETRIES):
+            failed_keys = [key for key, error in results.items() if error]
+            if not failed_keys:
+                break
+            logger.info(f"Retrying {len(failed_keys)} failed WooCommerce updates (attempt {attempt + 1})")
+            results.update(await StockPriceService._push_woocommerce_updates(
+                {key: wc_updates[key] for key in failed_keys}
+            ))
+        
+        # Step 3: Record per-item sync results in one statement
+        await StockPriceService._record_sync_results(batch_id, results)
+        
+        failed_items = [
+            f"{names[key]}: {error}" for key, error in results.items() if error
+        ]
         return {
-            'success_count': success_count,
-            'failure_count': failure_count,
+            'success_count': len(results) - len(failed_items),
+            'failure_count': len(failed_items),
             'failed_items': failed_items,
             'batch_id': batch_id
         }
     
     @staticmethod
-    async def _update_woocommerce_product(
-        product_id: int,
-        variation_id: Optional[int],
-        updates: Dict,
-        batch_id: str,
-        product_name: str
-    ) -> Dict:
-        """Update a single product on WooCommerce"""
-        try:
+    async def _push_woocommerce_updates(
+        wc_updates: Dict[Tuple[int, Optional[int]], Dict[str, Any]]
+    ) -> Dict[Tuple[int, Optional[int]], Optional[str]]:
+        """Push {(product_id, variation_id): fields} through the WooCommerce batch endpoints"""
+        product_updates = []
+        variation_updates: Dict[int, List[Dict[str, Any]]] = {}
+        for (product_id, variation_id), fields in wc_updates.items():
             if variation_id:
-                success = await WooCommerceService.update_product_variation(
-                    product_id, variation_id, updates
-                )
+                variation_updates.setdefault(product_id, []).append({'id': variation_id, **fields})
             else:
-                success = await WooCommerceService.update_product(product_id, updates)
-            
-            # Mark as synced
-            await execute_query("""
-                UPDATE stock_price_history
-                SET sync_status = $1,
-                    sync_attempted_at = NOW()
-                WHERE batch_id = $2
-                  AND product_id = $3
-                  AND (variation_id = $4 OR (variation_id IS NULL AND $4 IS NULL))
-            """, 
-                'success' if success else 'failed',
-                batch_id,
-                product_id,
-                variation_id
-            )
-            
-            return {'success': success, 'error': None if success else 'WooCommerce update failed'}
+                product_updates.append({'id': product_id, **fields})
         
+        try:
+            return await WooCommerceService.batch_update_products(product_updates, variation_updates)
         except Exception as e:
-            error_msg = f"{product_name}: {str(e)}"
-            
-            # Mark as failed
-            await execute_query("""
-                UPDATE stock_price_history
-                SET sync_status = 'failed',
-                    sync_error = $1,
-                    sync_attempted_at = NOW()
-                WHERE batch_id = $2
-                  AND product_id = $3
-                  AND (variation_id = $4 OR (variation_id IS NULL AND $4 IS NULL))
-            """, 
-                str(e),
-                batch_id,
-                product_id,
-                variation_id
-            )
-            
-            return {'success': False, 'error': error_msg}
+            # Credentials missing or similar: every item failed
+            logger.error(f"WooCommerce batch push failed: {e}")
+            return {key: str(e) for key in wc_updates}
+    
+    @staticmethod
+    async def _record_sync_results(
+        batch_id: str,
+        results: Dict[Tuple[int, Optional[int]], Optional[str]]
+    ) -> None:
+        """Write WooCommerce sync status for every history row of a batch"""
+        if not results:
+            return
+        
+        keys = list(results.keys())
+        await execute_query("""
+            UPDATE stock_price_history h
+            SET sync_status = r.sync_status,
+                sync_error = r.sync_error,
+                sync_attempted_at = NOW()
+            FROM unnest($2::bigint[], $3::bigint[], $4::text[], $5::text[])
+                AS r(product_id, variation_id, sync_status, sync_error)
+            WHERE h.batch_id = $1
+              AND h.product_id = r.product_id
+              AND h.variation_id IS NOT DISTINCT FROM r.variation_id
+        """,
+            batch_id,
+            [key[0] for key in keys],
+            [key[1] for key in keys],
+            ['failed' if results[key] else 'success' for key in keys],
+            [results[key] for key in keys]
+        )
     
     # ========================================================================
     # Sync from WooCommerce
@@ -398,11 +415,19 @@ class StockPriceService:
     @staticmethod
     async def sync_from_woocommerce(user_id: str) -> Dict:
         """
-        Sync products from WooCommerce (batch fetch and parallel updates)
+        Sync products from WooCommerce (batch fetch, diff, bulk apply)
+        
+        Local rows are diffed against the WooCommerce catalogue; all changed
+        rows are written with one UPDATE ... FROM unnest() and all missing
+        products are marked deleted with one multi-row upsert, in a single
+        transaction.
         
         Returns:
-            Dict with updated_count, deleted_count, unchanged_count, total_products
+            Dict with updated_count, deleted_count, unchanged_count,
+            total_products and field_changes (rows changed per field)
         """
+        field_changes = {field: 0 for field in SYNC_FIELDS}
+        
         # Fetch all products from WooCommerce
         wc_products = await WooCommerceService.fetch_all_products()
         
@@ -411,98 +436,97 @@ class StockPriceService:
                 'updated_count': 0,
                 'deleted_count': 0,
                 'unchanged_count': 0,
-                'total_products': 0
+                'total_products': 0,
+                'field_changes': field_changes
             }
         
-        # Get local products
-        local_products = await fetch_all("""
-            SELECT id, product_id, variation_id, stock_quantity, regular_price, sale_price
-            FROM products
-        """)
-        
         # Create lookup for WooCommerce products
         wc_lookup = {}
         for wc_prod in wc_products:
             key = (wc_prod['id'], wc_prod.get('variation_id'))
-            wc_lookup[key] = wc_prod
-        
-        # Identify updates and deletes
-        updates_needed = []
-        deletes_needed = []
+            wc_lookup[key] = {
+                'stock_quantity': wc_prod.get('stock_quantity', 0),
+                'regular_price': safe_float(wc_prod.get('regular_price', 0)),
+                'sale_price': safe_float(wc_prod.get('sale_price', 0))
+            }
         
-        for local_prod in local_products:
-            key = (local_prod['product_id'], local_prod.get('variation_id'))
+        async with DatabaseTransaction() as conn:
+            # Get local products
+            local_products = await conn.fetch("""
+                SELECT id, product_id, variation_id, stock_quantity, regular_price, sale_price
+                FROM products
+            """)
             
-            if key in wc_lookup:
-                wc_prod = wc_lookup[key]
+            # Identify updates and deletes
+            updates = {'id': [], 'stock_quantity': [], 'regular_price': [], 'sale_price': []}
+            deletes = {}
+            
+            for local_prod in local_products:
+                key = (local_prod['product_id'], local_prod['variation_id'])
+                wc_values = wc_lookup.get(key)
                 
-                # Check if values changed
-                if (local_prod['stock_quantity'] != wc_prod.get('stock_quantity', 0) or
-                    safe_float(local_prod['regular_price']) != safe_float(wc_prod.get('regular_price', 0)) or
-                    safe_float(local_prod['sale_price']) != safe_float(wc_prod.get('sale_price', 0))):
-                    
-                    updates_needed.append({
-                        'id': local_prod['id'],
-                        'product_id': local_prod['product_id'],
-                        'variation_id': local_prod.get('variation_id'),
-                        'stock_quantity': wc_prod.get('stock_quantity', 0),
-                        'regular_price': safe_float(wc_prod.get('regular_price', 0)),
-                        'sale_price': safe_float(wc_prod.get('sale_price', 0))
-                    })
-            else:
-                # Product not found in WooCommerce - mark as deleted
-                deletes_needed.append({
-                    'product_id': local_prod['product_id'],
-                    'variation_id': local_prod.get('variation_id')
-                })
-        
-        # Apply updates
-        updated_count = 0
-        for update in updates_needed:
-            try:
-                await execute_query("""
-                    UPDATE products
-                    SET stock_quantity = $1,
-                        regular_price = $2,
-                        sale_price = $3,
+                if wc_values is None:
+                    # Product not found in WooCommerce - mark as deleted
+                    deletes[key] = True
+                    continue
+                
+                local_values = {
+                    'stock_quantity': local_prod['stock_quantity'],
+                    'regular_price': safe_float(local_prod['regular_price']),
+                    'sale_price': safe_float(local_prod['sale_price'])
+                }
+                changed = [f for f in SYNC_FIELDS if local_values[f] != wc_values[f]]
+                if not changed:
+                    continue
+                
+                for field in changed:
+                    field_changes[field] += 1
+                updates['id'].append(local_prod['id'])
+                for field in SYNC_FIELDS:
+                    updates[field].append(wc_values[field])
+            
+            # Apply updates
+            if updates['id']:
+                await conn.execute("""
+                    UPDATE products p
+                    SET stock_quantity = u.stock_quantity,
+                        regular_price = u.regular_price,
+                        sale_price = u.sale_price,
                         updated_at = NOW()
-                    WHERE id = $4
-                """, 
-                    update['stock_quantity'],
-                    update['regular_price'],
-                    update['sale_price'],
-                    update['id']
-                )
-                updated_count += 1
-            except Exception as e:
-                logger.error(f"Sync update failed: {e}")
-        
-        # Mark deleted products
-        deleted_count = 0
-        for delete in deletes_needed:
-            try:
-                await execute_query("""
+                    FROM unnest($1::int[], $2::int[], $3::numeric[], $4::numeric[])
+                        AS u(id, stock_quantity, regular_price, sale_price)
+                    WHERE p.id = u.id
+                """, updates['id'], updates['stock_quantity'], updates['regular_price'], updates['sale_price'])
+            
+            # Mark deleted products
+            if deletes:
+                await conn.execute("""
                     INSERT INTO product_update_settings (
                         product_id, variation_id, is_deleted, updated_by
-                    ) VALUES ($1, $2, true, $3)
+                    )
+                    SELECT d.product_id, d.variation_id, true, $3
+                    FROM unnest($1::bigint[], $2::bigint[]) AS d(product_id, variation_id)
                     ON CONFLICT (product_id, variation_id)
                     DO UPDATE SET is_deleted = true, updated_by = $3, updated_at = NOW()
-                """, 
-                    delete['product_id'],
-                    delete['variation_id'],
+                """,
+                    [key[0] for key in deletes],
+                    [key[1] for key in deletes],
                     user_id
                 )
-                deleted_count += 1
-            except Exception as e:
-                logger.error(f"Mark deleted failed: {e}")
         
-        unchanged_count = len(local_products) - updated_count - deleted_count
+        updated_count = len(updates['id'])
+        deleted_count = len(deletes)
+        logger.info(
+            f"WooCommerce sync: {updated_count} updated {field_changes}, "
+            f"{deleted_count} marked deleted"
+        )
         
         return {
             'updated_count': updated_count,
             'deleted_count': deleted_count,
-            'unchanged_count': unchanged_count,
-            'total_products': len(local_products)
+            'unchanged_count': len(local_products) - updated_count - deleted_count,
+            'total_products': len(local_products),
+            'field_changes': field_changes
         }
     
     # ========================================================================
@@ -573,45 +597,59 @@ class StockPriceService:
     
     @staticmethod
     async def process_excel_upload(file_content: bytes, user_id: str) -> Dict:
-        """Process uploaded Excel file and apply changes"""
+        """
+        Process uploaded Excel file and apply changes
+        
+        The sheet is parsed and validated column-wise; (product_id,
+        variation_id) pairs are resolved to products with a single query.
+        Any row error rejects the upload and every error is reported.
+        """
+        try:
+            df = read_upload_frame(
+                file_content,
+                sheet_name='Products',
+                aliases={col: [] for col in UPLOAD_COLUMNS}
+            )
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}
+        
         try:
-            df = pd.read_excel(BytesIO(file_content), sheet_name='Products')
+            # Parse and validate column-wise
+            errors = UploadErrors()
+            df['product_id'] = coerce_numeric(df, 'product_id', errors, integer=True, required=True)
+            df['variation_id'] = coerce_numeric(df, 'variation_id', errors, integer=True)
+            df['new_stock'] = coerce_numeric(df, 'new_stock', errors, integer=True, min_value=0)
+            df['new_regular_price'] = coerce_numeric(df, 'new_regular_price', errors, min_value=0)
+            df['new_sale_price'] = coerce_numeric(df, 'new_sale_price', errors, min_value=0)
             
-            # Validate columns
-            required_cols = ['product_id', 'variation_id', 'new_stock', 'new_regular_price', 'new_sale_price']
-            missing_cols = [col for col in required_cols if col not in df.columns]
+            df = df[
+                df['product_id'].notna()
+                & (df['new_stock'].notna() | df['new_regular_price'].notna() | df['new_sale_price'].notna())
+            ]
             
-            if missing_cols:
-                return {
-                    'success': False,
-                    'error': f"Missing columns: {', '.join(missing_cols)}"
-                }
+            # Resolve all (product_id, variation_id) keys in one query
+            rows = await fetch_all("""
+                SELECT id AS db_id, product_id, variation_id
+                FROM products
+                WHERE product_id = ANY($1::bigint[])
+            """, [int(pid) for pid in df['product_id'].unique()])
+            df = merge_lookup(df, rows, on=['product_id', 'variation_id'], values=['db_id'])
+            errors.add(df, df['db_id'].isna(), 'Product not found', 'product_id')
+            df = df[df['db_id'].notna()]
+            
+            if errors:
+                return {'success': False, 'error': '; '.join(errors.messages())}
             
-            # Parse changes
             changes = []
-            for _, row in df.iterrows():
-                if pd.notna(row['new_stock']) or pd.notna(row['new_regular_price']) or pd.notna(row['new_sale_price']):
-                    # Get db_id
-                    product = await fetch_one("""
-                        SELECT id FROM products
-                        WHERE product_id = $1
-                          AND (variation_id = $2 OR (variation_id IS NULL AND $2 IS NULL))
-                    """, 
-                        int(row['product_id']),
-                        int(row['variation_id']) if pd.notna(row['variation_id']) else None
-                    )
-                    
-                    if product:
-                        change = {'db_id': product['id']}
-                        
-                        if pd.notna(row['new_stock']):
-                            change['stock_quantity'] = int(row['new_stock'])
-                        if pd.notna(row['new_regular_price']):
-                            change['regular_price'] = float(row['new_regular_price'])
-                        if pd.notna(row['new_sale_price']):
-                            change['sale_price'] = float(row['new_sale_price'])
-                        
-                        changes.append(change)
+            for row in df.to_dict('records'):
+                change = {'db_id': int(row['db_id']), 'row_number': int(row['row_number'])}
+                if pd.notna(row['new_stock']):
+                    change['stock_quantity'] = int(row['new_stock'])
+                if pd.notna(row['new_regular_price']):
+                    change['regular_price'] = float(row['new_regular_price'])
+                if pd.notna(row['new_sale_price']):
+                    change['sale_price'] = float(row['new_sale_price'])
+                changes.append(change)
             
             if not changes:
                 return {'success': False, 'error': 'No changes found in Excel file'}
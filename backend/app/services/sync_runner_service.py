@@ -0,0 +1,394 @@
+"""
+================================================================================
+Marketplace ERP - Sync Job Runner
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Runs the Zoho Books / WooCommerce sync jobs and records every run in the
+  sync_runs table (migration 039): status, counts, timings and errors. The
+  running job's in-memory _sync_progress is flushed to its row every
+  SYNC_PROGRESS_INTERVAL_SECONDS, so progress endpoints on any worker read
+  the same data.
+
+  - Single run per job across workers: the runner holds
+    pg_try_advisory_xact_lock on a dedicated connection (inside an open
+    transaction, which keeps the lock on one server connection behind the
+    transaction pooler) for the duration of the job. A second start on any
+    worker is skipped; on the same worker it is caught before it would
+    queue on the group semaphore. get_progress probes the same lock, so a
+    'running' row left by a worker that died is reported (and recorded) as
+    failed.
+  - Concurrency groups: jobs in a group share a semaphore sized by
+    settings.SYNC_CONCURRENCY_GROUPS (zoho jobs share one API quota/token).
+  - Staggering and dependencies: run_jobs starts jobs
+    settings.SYNC_STAGGER_SECONDS apart and starts a job only after the jobs
+    it depends on (items before contacts) have finished.
+
+Functions:
+  - run_job: Run one job with locking and run recording
+  - run_jobs: Run several jobs with staggering, groups and dependency order
+  - get_progress: Progress of a job's latest run (for /sync-progress)
+
+================================================================================
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.config import settings
+from app.database import fetch_one, execute_query, get_db, DatabaseTransaction
+
+logger = logging.getLogger(__name__)
+
+# User ID recorded for scheduled runs
+SYSTEM_USER_ID = "00000000-0000-0000-0000-000000000000"
+
+# Counts copied from a job's _sync_progress into sync_runs
+PROGRESS_FIELDS = ("total", "current", "added", "updated", "skipped", "errors")
+
+# Marks 'running' rows of job $1 whose worker died (caller holds the job lock)
+INTERRUPTED_RUN_QUERY = """
+    UPDATE sync_runs
+    SET status = 'failed', error_message = 'Interrupted (worker stopped)',
+        finished_at = NOW(), updated_at = NOW()
+    WHERE job_name = $1 AND status = 'running'
+"""
+
+LATEST_RUN_QUERY = """
+    SELECT id, status, total, current, added, updated, skipped, errors, error_message,
+           started_at, finished_at,
+           EXTRACT(EPOCH FROM (COALESCE(finished_at, NOW()) - started_at))::float AS elapsed_seconds
+    FROM sync_runs
+    WHERE job_name = $1
+    ORDER BY started_at DESC, id DESC
+    LIMIT 1
+"""
+
+
+async def _run_zoho_items(triggered_by: str, force_refresh: bool = False) -> Dict:
+    from app.services import zoho_item_service
+    return await zoho_item_service.sync_from_zoho_books(synced_by=triggered_by, force_refresh=force_refresh)
+
+
+async def _run_woo_items(triggered_by: str, sync_request=None) -> Dict:
+    from app.services import product_service
+    from app.schemas.product import WooCommerceSyncRequest
+    sync_request = sync_request or WooCommerceSyncRequest(limit=1000, update_existing=True)
+    return await product_service.sync_from_woocommerce(sync_request=sync_request, synced_by=triggered_by)
+
+
+async def _run_zoho_vendors(triggered_by: str, force_refresh: bool = False) -> Dict:
+    from app.services import zoho_vendor_service
+    return await zoho_vendor_service.sync_from_zoho_books(synced_by=triggered_by, force_refresh=force_refresh)
+
+
+async def _run_zoho_customers(triggered_by: str, force_refresh: bool = False) -> Dict:
+    from app.services import zoho_customer_service
+    return await zoho_customer_service.sync_from_zoho_books(synced_by=triggered_by, force_refresh=force_refresh)
+
+
+async def _run_woo_customers(triggered_by: str) -> Dict:
+    from app.services import woo_customer_service
+    return await woo_customer_service.sync_from_woocommerce(synced_by=triggered_by)
+
+
+class SyncJob(NamedTuple):
+    """A sync job: entry point, progress module, group and dependencies"""
+    name: str
+    label: str
+    module: str                    # app.services module holding _sync_progress
+    group: str                     # key of settings.SYNC_CONCURRENCY_GROUPS
+    run: Callable[..., Awaitable[Dict]]
+    depends_on: Tuple[str, ...] = ()
+
+
+SYNC_JOBS: Dict[str, SyncJob] = {
+    "zoho_items": SyncJob("zoho_items", "Zoho Items", "zoho_item_service", "zoho", _run_zoho_items),
+    "woo_items": SyncJob("woo_items", "Woo Items", "product_service", "woocommerce", _run_woo_items),
+    "zoho_vendors": SyncJob(
+        "zoho_vendors", "Zoho Vendors", "zoho_vendor_service", "zoho", _run_zoho_vendors,
+        depends_on=("zoho_items",)
+    ),
+    "zoho_customers": SyncJob(
+        "zoho_customers", "Zoho Customers", "zoho_customer_service", "zoho", _run_zoho_customers,
+        depends_on=("zoho_items",)
+    ),
+    "woo_customers": SyncJob(
+        "woo_customers", "WooCommerce Customers", "woo_customer_service", "woocommerce", _run_woo_customers,
+        depends_on=("woo_items",)
+    ),
+}
+
+# Jobs run by the nightly scheduled sync
+NIGHTLY_SYNC_JOBS = ["zoho_items", "woo_items", "zoho_vendors", "zoho_customers", "woo_customers"]
+
+_group_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+# Jobs started on this worker (queued on their group or running)
+_running_jobs: Set[str] = set()
+
+
+def _group_semaphore(group: str) -> asyncio.Semaphore:
+    if group not in _group_semaphores:
+        _group_semaphores[group] = asyncio.Semaphore(max(1, settings.SYNC_CONCURRENCY_GROUPS.get(group, 1)))
+    return _group_semaphores[group]
+
+
+def _progress_source(job: SyncJob) -> Dict[str, Any]:
+    """The job module's current _sync_progress dict (modules may rebind it)"""
+    module = importlib.import_module(f"app.services.{job.module}")
+    return getattr(module, "_sync_progress", {})
+
+
+def _counts(source: Dict[str, Any]) -> List[int]:
+    return [int(source.get(field) or 0) for field in PROGRESS_FIELDS]
+
+
+async def _write_counts(run_id: int, counts: List[int]) -> None:
+    await execute_query(
+        """
+        UPDATE sync_runs
+        SET total = $2, current = $3, added = $4, updated = $5, skipped = $6, errors = $7,
+            updated_at = NOW()
+        WHERE id = $1 AND status = 'running'
+        """,
+        run_id, *counts
+    )
+
+
+async def _flush_progress(run_id: int, job: SyncJob) -> None:
+    """Copy in-memory progress to the run row until cancelled"""
+    while True:
+        await asyncio.sleep(settings.SYNC_PROGRESS_INTERVAL_SECONDS)
+        try:
+            await _write_counts(run_id, _counts(_progress_source(job)))
+        except Exception as e:
+            logger.warning(f"Failed to record progress for sync run {run_id}: {e}")
+
+
+def _serialize_options(options: Dict[str, Any]) -> str:
+    return json.dumps(
+        {key: value.dict() if hasattr(value, "dict") else value for key, value in options.items()},
+        default=str
+    )
+
+
+async def run_job(
+    name: str,
+    trigger: str = "manual",
+    triggered_by: str = SYSTEM_USER_ID,
+    **options
+) -> Optional[Dict]:
+    """
+    Run a sync job once across all workers and record it in sync_runs.
+
+    Args:
+        name: Key of SYNC_JOBS
+        trigger: 'manual' or 'scheduled'
+        triggered_by: User ID
+        **options: Passed to the job (force_refresh, sync_request)
+
+    Returns:
+        Job result counts, or None if the job was already running or failed
+    """
+    job = SYNC_JOBS[name]
+
+    if name in _running_jobs:
+        logger.info(f"⏭️ {job.label} sync already running on this worker, skipping")
+        return None
+
+    _running_jobs.add(name)
+    try:
+        return await _run_locked(name, job, trigger, triggered_by, options)
+    finally:
+        _running_jobs.discard(name)
+
+
+async def _run_locked(
+    name: str,
+    job: SyncJob,
+    trigger: str,
+    triggered_by: str,
+    options: Dict[str, Any]
+) -> Optional[Dict]:
+    """run_job once it is the only start on this worker"""
+    async with _group_semaphore(job.group):
+        pool = get_db()
+        async with pool.acquire() as lock_conn:
+            lock_tx = lock_conn.transaction()
+            await lock_tx.start()
+            try:
+                locked = await lock_conn.fetchval(
+                    "SELECT pg_try_advisory_xact_lock(hashtext($1))", f"sync_run:{name}"
+                )
+                if not locked:
+                    logger.info(f"⏭️ {job.label} sync already running on another worker, skipping")
+                    return None
+
+                # We hold the lock, so any 'running' row belongs to a worker that died
+                await execute_query(INTERRUPTED_RUN_QUERY, name)
+
+                source = _progress_source(job)
+                if not source.get("in_progress"):
+                    source.update({field: 0 for field in PROGRESS_FIELDS})
+
+                run_id = await execute_query(
+                    """
+                    INSERT INTO sync_runs (job_name, trigger, triggered_by, options)
+                    VALUES ($1, $2, $3, $4::jsonb)
+                    RETURNING id
+                    """,
+                    name, trigger, str(triggered_by) if triggered_by else None, _serialize_options(options)
+                )
+                logger.info(f"🔄 Starting {trigger} {job.label} sync (run {run_id})")
+
+                flusher = asyncio.create_task(_flush_progress(run_id, job))
+                result = None
+                error = None
+                try:
+                    result = await job.run(triggered_by, **options)
+                except Exception as e:
+                    error = getattr(e, "detail", None) or str(e) or e.__class__.__name__
+                    logger.error(f"❌ {job.label} sync failed (run {run_id}): {error}", exc_info=True)
+                finally:
+                    flusher.cancel()
+
+                final = _progress_source(job)
+                counts = _counts({**final, **result} if isinstance(result, dict) else final)
+                await execute_query(
+                    """
+                    UPDATE sync_runs
+                    SET status = $2, total = $3, current = $4, added = $5, updated = $6,
+                        skipped = $7, errors = $8, error_message = $9,
+                        finished_at = NOW(), updated_at = NOW()
+                    WHERE id = $1
+                    """,
+                    run_id, "failed" if error else "completed", *counts, error
+                )
+
+                if not error:
+                    logger.info(
+                        f"✅ {job.label} sync completed (run {run_id}): "
+                        f"{result.get('added', 0)} added, {result.get('updated', 0)} updated, "
+                        f"{result.get('skipped', 0)} skipped, {result.get('errors', 0)} errors"
+                    )
+                return result
+            finally:
+                # Ends the transaction, releasing the advisory lock
+                await lock_tx.rollback()
+
+
+async def run_jobs(
+    names: List[str],
+    trigger: str = "scheduled",
+    triggered_by: str = SYSTEM_USER_ID
+) -> Dict[str, Optional[Dict]]:
+    """
+    Run several jobs: the i-th job starts i * SYNC_STAGGER_SECONDS after the
+    first, waits for its dependencies in this batch to finish, then runs
+    within its concurrency group.
+
+    Returns:
+        Result per job name (None for skipped or failed jobs)
+    """
+    finished = {name: asyncio.Event() for name in names}
+    results: Dict[str, Optional[Dict]] = {}
+
+    async def run_one(index: int, name: str):
+        try:
+            await asyncio.sleep(index * settings.SYNC_STAGGER_SECONDS)
+            for dependency in SYNC_JOBS[name].depends_on:
+                if dependency in finished:
+                    await finished[dependency].wait()
+            results[name] = await run_job(name, trigger=trigger, triggered_by=triggered_by)
+        except Exception as e:
+            logger.error(f"❌ Error running {name} sync: {e}", exc_info=True)
+            results[name] = None
+        finally:
+            finished[name].set()
+
+    await asyncio.gather(*[run_one(index, name) for index, name in enumerate(names)])
+    return results
+
+
+async def _clear_interrupted_run(name: str) -> bool:
+    """
+    Fail the job's 'running' rows if no worker holds its run lock.
+
+    Probes the lock with pg_try_advisory_xact_lock in a short transaction
+    (released on commit); if it can be taken, the worker that wrote the
+    'running' row has died.
+
+    Returns:
+        True if a stale run was marked failed
+    """
+    async with DatabaseTransaction() as conn:
+        free = await conn.fetchval(
+            "SELECT pg_try_advisory_xact_lock(hashtext($1))", f"sync_run:{name}"
+        )
+        if not free:
+            return False
+        result = await conn.execute(INTERRUPTED_RUN_QUERY, name)
+    if result != "UPDATE 0":
+        logger.warning(f"⚠️ Marked interrupted {SYNC_JOBS[name].label} sync run as failed")
+    return result != "UPDATE 0"
+
+
+async def get_progress(name: str) -> Dict[str, Any]:
+    """
+    Progress of a job's latest run.
+
+    A 'running' row only counts as in progress while a worker holds the job's
+    run lock; rows left behind by a dead worker are marked failed here, so
+    manual syncs are not blocked until the next scheduled run.
+
+    Returns:
+        Dict with in_progress, counts, percentage, eta_seconds, status,
+        error, started_at and finished_at
+    """
+    row = await fetch_one(LATEST_RUN_QUERY, name)
+    if row and row["status"] == "running" and await _clear_interrupted_run(name):
+        row = await fetch_one(LATEST_RUN_QUERY, name)
+    if not row:
+        return {
+            "in_progress": False, "current": 0, "total": 0, "added": 0, "updated": 0,
+            "skipped": 0, "errors": 0, "percentage": 0, "eta_seconds": 0,
+            "status": None, "error": None, "run_id": None, "started_at": None, "finished_at": None,
+        }
+
+    progress = {
+        "in_progress": row["status"] == "running",
+        "current": row["current"],
+        "total": row["total"],
+        "added": row["added"],
+        "updated": row["updated"],
+        "skipped": row["skipped"],
+        "errors": row["errors"],
+        "status": row["status"],
+        "error": row["error_message"],
+        "run_id": row["id"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+    }
+
+    # Calculate percentage
+    if progress["total"] > 0:
+        progress["percentage"] = round((progress["current"] / progress["total"]) * 100, 1)
+    else:
+        progress["percentage"] = 0
+
+    # Calculate ETA
+    elapsed = row["elapsed_seconds"] or 0
+    if progress["in_progress"] and progress["current"] > 0 and elapsed > 0:
+        items_per_second = progress["current"] / elapsed
+        progress["eta_seconds"] = int((progress["total"] - progress["current"]) / items_per_second)
+    else:
+        progress["eta_seconds"] = 0
+
+    return progress
+
@@ -557,7 +557,31 @@ async def notify_po_status_changed(po: Dict, old_status: str, new_status: str) -
     return await send_to_channel("po_channel_id", message)
 
 
+# ============================================================================
+# WASTAGE NOTIFICATIONS
+# ============================================================================
+
+async def notify_wastage_alerts(alerts: List[Dict]) -> bool:
+    """Notify newly raised wastage threshold alerts (one message per run)"""
+    enabled = await get_setting("enable_inventory_notifications")
+    if enabled != "true" or not alerts:
+        return False
+    event_enabled = await get_setting("notify_wastage_alerts")
+    if event_enabled == "false":
+        return False
+
+    icons = {"critical": "🔴", "warning": "🟠", "info": "🔵"}
+    lines = "\n".join(
+        f"{icons.get(alert['alert_level'], '⚪')} *{alert['alert_level'].title()}:* {alert['message']}"
+        for alert in alerts
+    )
+
+    message = f"""⚠️ *Wastage Threshold Alert*
+━━━━━━━━━━━━━━━━
+{lines}
+"""
 
+    return await send_to_channel("inventory_channel_id", message)
 
 
 # ============================================================================
@@ -55,7 +55,8 @@ import logging
 
 from app.database import (
     fetch_one, fetch_all, execute_query, DatabaseTransaction,
-    fetch_one_tx, execute_query_tx
+    fetch_one_tx, execute_query_tx,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
 )
 from app.schemas.tickets import (
     TicketType, TicketStatus, TicketPriority, TicketCategory,
@@ -66,6 +67,12 @@ from app.services import telegram_service
 
 logger = logging.getLogger(__name__)
 
+# Newest first; id breaks ties between tickets created in the same instant
+TICKET_SORT = [
+    SortKey("t.created_at", "created_at", descending=True),
+    SortKey("t.id", "id", descending=True),
+]
+
 
 # ============================================================================
 # TICKET OPERATIONS
@@ -78,12 +85,21 @@ async def get_tickets_list(
     ticket_status: Optional[TicketStatus] = None,
     priority: Optional[TicketPriority] = None,
     created_by_id: Optional[str] = None,
+    search: Optional[str] = None,
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
 ) -> Dict:
     """
     Get paginated list of tickets with optional filters.
     All users can see all tickets.
+
+    search matches words in title/description (full-text) or any substring
+    of the title (trigram index).
+
+    When a cursor from a previous page is given, keyset pagination is used
+    and page is ignored.
     """
     # Build WHERE clause
     where_conditions = []
@@ -115,15 +131,34 @@ async def get_tickets_list(
         params.append(UUID(created_by_id))
         param_count += 1
 
+    if search:
+        where_conditions.append(
+            f"(t.search_vector @@ websearch_to_tsquery('simple', ${param_count})"
+            f" OR t.title ILIKE ${param_count + 1})"
+        )
+        params.extend([search, f"%{search}%"])
+        param_count += 2
+
     where_clause = f"WHERE {' AND '.join(where_conditions)}" if where_conditions else ""
 
     # Get total count
-    count_query = f"SELECT COUNT(*) as total FROM tickets t {where_clause}"
-    count_result = await fetch_one(count_query, *params)
-    total = count_result["total"] if count_result else 0
+    total = await count_rows(f"FROM tickets t {where_clause}", *params, mode=count_mode)
+
+    # Continue after the cursor position, or fall back to page offset
+    try:
+        cursor_condition, cursor_params = keyset_condition(TICKET_SORT, cursor, param_count)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if cursor_condition:
+        where_conditions.append(cursor_condition)
+        params.extend(cursor_params)
+        param_count += len(cursor_params)
+        where_clause = f"WHERE {' AND '.join(where_conditions)}"
+        offset = 0
+    else:
+        offset = (page - 1) * limit
 
     # Get paginated results with user info and comment count
-    offset = (page - 1) * limit
     tickets_query = f"""
         SELECT
             t.id,
@@ -153,27 +188,26 @@ async def get_tickets_list(
             t.is_late_claim,
             t.photo_urls,
             t.assigned_to_id::text,
-            COALESCE(
-                (SELECT COUNT(*) FROM ticket_comments tc WHERE tc.ticket_id = t.id),
-                0
-            ) as comment_count
+            t.comment_count
         FROM tickets t
         LEFT JOIN user_profiles up_created ON t.created_by_id = up_created.id
         LEFT JOIN auth.users au_created ON au_created.id = up_created.id
         LEFT JOIN user_profiles up_closed ON t.closed_by_id = up_closed.id
         LEFT JOIN auth.users au_closed ON au_closed.id = up_closed.id
         {where_clause}
-        ORDER BY t.created_at DESC
+        {keyset_order_by(TICKET_SORT)}
         LIMIT ${param_count} OFFSET ${param_count + 1}
     """
 
-    tickets = await fetch_all(tickets_query, *params, limit, offset)
+    tickets = await fetch_all(tickets_query, *params, limit + 1, offset)
+    tickets, next_cursor = keyset_page(tickets, TICKET_SORT, limit)
 
     return {
         "tickets": tickets,
         "total": total,
         "page": page,
         "limit": limit,
+        "next_cursor": next_cursor,
     }
 
 
@@ -565,6 +599,7 @@ async def close_ticket(
                 f"[Closing comment] {comment}",
                 conn=conn
             )
+            await _adjust_comment_count(conn, ticket_id, 1)
 
     logger.info(f"Ticket {ticket_id} closed by admin {admin_id}")
 
@@ -626,6 +661,22 @@ async def delete_ticket(
 # ============================================================================
 
 
+async def _adjust_comment_count(conn, ticket_id: int, delta: int) -> None:
+    """
+    Keep tickets.comment_count in step with ticket_comments.
+    Must run on the same connection/transaction as the comment write.
+    """
+    await conn.execute(
+        """
+        UPDATE tickets
+        SET comment_count = GREATEST(comment_count + $1, 0)
+        WHERE id = $2
+        """,
+        delta,
+        ticket_id
+    )
+
+
 async def add_comment(
     ticket_id: int,
     request: CreateCommentRequest,
@@ -652,17 +703,20 @@ async def add_comment(
             detail="Cannot add comments to a closed ticket"
         )
 
-    # Insert comment
-    comment_id = await execute_query(
-        """
-        INSERT INTO ticket_comments (ticket_id, user_id, comment)
-        VALUES ($1, $2, $3)
-        RETURNING id
-        """,
-        ticket_id,
-        UUID(user_id),
-        request.comment
-    )
+    # Insert comment and bump the ticket's counter in one transaction
+    async with DatabaseTransaction() as conn:
+        comment_id = await execute_query_tx(
+            """
+            INSERT INTO ticket_comments (ticket_id, user_id, comment)
+            VALUES ($1, $2, $3)
+            RETURNING id
+            """,
+            ticket_id,
+            UUID(user_id),
+            request.comment,
+            conn=conn
+        )
+        await _adjust_comment_count(conn, ticket_id, 1)
 
     logger.info(f"Comment {comment_id} added to ticket {ticket_id} by user {user_id}")
 
@@ -811,11 +865,15 @@ async def delete_comment(
             detail="Cannot delete comments from a closed ticket"
         )
 
-    # Delete comment
-    await execute_query(
-        "DELETE FROM ticket_comments WHERE id = $1",
-        comment_id
-    )
+    # Delete comment and decrement the ticket's counter in one transaction
+    async with DatabaseTransaction() as conn:
+        deleted = await execute_query_tx(
+            "DELETE FROM ticket_comments WHERE id = $1",
+            comment_id,
+            conn=conn
+        )
+        if deleted == "DELETE 1":
+            await _adjust_comment_count(conn, comment["ticket_id"], -1)
 
     logger.info(f"Comment {comment_id} deleted by user {user_id}")
 
@@ -889,6 +947,8 @@ async def get_my_tickets(
     ticket_status: Optional[TicketStatus] = None,
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
 ) -> Dict:
     """
     Get tickets created by the current user.
@@ -898,6 +958,8 @@ async def get_my_tickets(
         created_by_id=user_id,
         page=page,
         limit=limit,
+        cursor=cursor,
+        count_mode=count_mode,
     )
 
 
@@ -2,8 +2,8 @@
 ================================================================================
 Marketplace ERP - Wastage Tracking Service
 ================================================================================
-Version: 1.0.0
-Last Updated: 2024-12-06
+Version: 1.1.0
+Last Updated: 2026-10-18
 
 Description:
   Business logic for wastage tracking module. Handles wastage event logging,
@@ -12,24 +12,30 @@ Description:
 
 Key Functions:
   - log_wastage_event: Create wastage event with photos
-  - upload_wastage_photos: Upload to Supabase Storage
+  - upload_wastage_photos: Concurrent upload to storage (media pipeline)
   - get_wastage_by_batch: All wastage for batch
   - get_wastage_analytics_*: Farm/stage/product analytics
+  - get_wastage_trends: Daily/weekly/monthly series
+  - add_events_to_rollup / reconcile_wastage_rollup: Daily rollup
+    (wastage_daily_rollup, migration 046) that all analytics read
   - initiate_repacking: Create repacked batch
-  - check_threshold_alerts: Evaluate wastage vs thresholds
+  - check_threshold_alerts: Evaluate wastage vs thresholds; persists
+    alerts (wastage_alerts, migration 047) and pushes them to admins
 
 ================================================================================
 """
 
 import logging
+import time
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from app.utils.timezone import now_ist
 from decimal import Decimal
 import uuid
 
 from fastapi import UploadFile, HTTPException, status
 
+from app.config import settings
 from app.database import fetch_one, fetch_all, execute_query, DatabaseTransaction
 from app.schemas.wastage_tracking import (
     LogWastageRequest, RepackRequest, PhotoUploadData,
@@ -42,7 +48,8 @@ from app.schemas.wastage_tracking import (
     AlertsListResponse, WastageFarmAnalytics, WastageStageAnalytics,
     WastageProductAnalytics, WastageTrendDataPoint
 )
-from app.utils.supabase_client import get_supabase_client_async
+from app.utils.media_upload import MediaUploadError, StoredMedia, upload_media
+from app.utils.storage import get_storage_client
 
 logger = logging.getLogger(__name__)
 
@@ -68,11 +75,12 @@ async def log_wastage_event(
     1. Validate batch exists and is active
     2. Validate minimum 1 photo uploaded
     3. Calculate estimated cost if not provided
-    4. Insert wastage event record
-    5. Upload photos to Supabase Storage
-    6. Link photos to event
-    7. Update batch history
-    8. Return success response
+    4. Upload photos concurrently (before the transaction)
+    5. Insert wastage event record
+    6. Link photos to event (one bulk insert)
+    7. Add event to the daily analytics rollup
+    8. Update batch history
+    9. Return success response
     
     Args:
         request: Wastage event data
@@ -118,80 +126,91 @@ async def log_wastage_event(
                 po_id=batch.get('po_id')
             )
         
-        # Use transaction for atomic operation
-        async with DatabaseTransaction() as conn:
-            # Insert wastage event
-            insert_event_query = """
-                INSERT INTO wastage_events (
-                    batch_id, stage, wastage_type, item_name, quantity, unit,
-                    cost_allocation, estimated_cost, reason, notes, location,
-                    po_id, grn_id, so_id, ticket_id, created_by
-                ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16
-                )
-                RETURNING id, event_id, created_at
-            """
-            
-            event_result = await conn.fetchrow(
-                insert_event_query,
-                batch_id,
-                request.stage.value,
-                request.wastage_type.value,
-                request.item_name,
-                request.quantity,
-                request.unit,
-                request.cost_allocation.value,
-                estimated_cost,
-                request.reason,
-                request.notes,
-                request.location,
-                request.po_id,
-                request.grn_id,
-                request.so_id,
-                request.ticket_id,
-                created_by
-            )
+        # Upload photos before opening the transaction, so no database
+        # connection is held while files are transferred
+        event_id = str(uuid.uuid4())
+        stored_photos = await upload_wastage_photos(
+            batch_number=request.batch_number,
+            photos=photos
+        )
+        
+        try:
+            # Use transaction for atomic operation
+            async with DatabaseTransaction() as conn:
+                # Insert wastage event
+                insert_event_query = """
+                    INSERT INTO wastage_events (
+                        event_id, batch_id, stage, wastage_type, item_name, quantity, unit,
+                        cost_allocation, estimated_cost, reason, notes, location,
+                        po_id, grn_id, so_id, ticket_id, created_by
+                    ) VALUES (
+                        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17
+                    )
+                    RETURNING id, event_id, created_at
+                """
             
-            wastage_event_id = event_result['id']
-            event_id = str(event_result['event_id'])
-            created_at = event_result['created_at']
+                event_result = await conn.fetchrow(
+                    insert_event_query,
+                    uuid.UUID(event_id),
+                    batch_id,
+                    request.stage.value,
+                    request.wastage_type.value,
+                    request.item_name,
+                    request.quantity,
+                    request.unit,
+                    request.cost_allocation.value,
+                    estimated_cost,
+                    request.reason,
+                    request.notes,
+                    request.location,
+                    request.po_id,
+                    request.grn_id,
+                    request.so_id,
+                    request.ticket_id,
+                    created_by
+                )
             
-            # Upload photos to Supabase Storage
-            photo_urls = await upload_wastage_photos(
-                event_id=event_id,
-                batch_number=request.batch_number,
-                photos=photos,
-                photo_metadata=request.photo_metadata
-            )
+                wastage_event_id = event_result['id']
+                created_at = event_result['created_at']
             
-            # Link photos to wastage event
-            for i, photo_url in enumerate(photo_urls):
-                metadata = request.photo_metadata[i] if i < len(request.photo_metadata) else PhotoUploadData(file_name=photos[i].filename)
-                
-                insert_photo_query = """
+                # Link photos to wastage event
+                metadata = [
+                    request.photo_metadata[i] if i < len(request.photo_metadata) else PhotoUploadData(file_name=photos[i].filename)
+                    for i in range(len(stored_photos))
+                ]
+                await conn.execute("""
                     INSERT INTO wastage_photos (
                         wastage_event_id, photo_url, photo_path, file_name,
-                        file_size_kb, gps_latitude, gps_longitude, device_info,
-                        uploaded_by
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                """
-                
-                photo_path = f"{request.batch_number}/{event_id}/{metadata.file_name}"
-                
-                await conn.execute(
-                    insert_photo_query,
+                        file_size_kb, width, height, content_type,
+                        gps_latitude, gps_longitude, device_info, uploaded_by
+                    )
+                    SELECT $1, p.url, p.path, p.file_name, p.size_kb, p.width, p.height, p.content_type,
+                           p.lat, p.lng, p.device, $2
+                    FROM unnest(
+                        $3::text[], $4::text[], $5::text[], $6::int[], $7::int[], $8::int[], $9::text[],
+                        $10::numeric[], $11::numeric[], $12::text[]
+                    ) AS p(url, path, file_name, size_kb, width, height, content_type, lat, lng, device)
+                """,
                     wastage_event_id,
-                    photo_url,
-                    photo_path,
-                    metadata.file_name,
-                    metadata.file_size_kb,
-                    metadata.gps_latitude,
-                    metadata.gps_longitude,
-                    metadata.device_info,
-                    created_by
+                    created_by,
+                    [photo.url for photo in stored_photos],
+                    [photo.path for photo in stored_photos],
+                    [m.file_name for m in metadata],
+                    [photo.size_kb for photo in stored_photos],
+                    [photo.width for photo in stored_photos],
+                    [photo.height for photo in stored_photos],
+                    [photo.content_type for photo in stored_photos],
+                    [m.gps_latitude for m in metadata],
+                    [m.gps_longitude for m in metadata],
+                    [m.device_info for m in metadata]
                 )
             
-            # Note: Batch history will be added outside transaction to avoid nested transaction issues
+                await add_events_to_rollup(conn, [wastage_event_id])
+            
+                # Note: Batch history will be added outside transaction to avoid nested transaction issues
+        except Exception:
+            await _discard_unlinked_photos([photo.path for photo in stored_photos])
+            raise
         
         # Add batch history (outside transaction)
         try:
@@ -229,7 +248,7 @@ async def log_wastage_event(
             unit=request.unit,
             cost_allocation=request.cost_allocation.value,
             estimated_cost=estimated_cost,
-            photos_uploaded=len(photo_urls),
+            photos_uploaded=len(stored_photos),
             created_at=created_at
         )
         
@@ -244,80 +263,51 @@ async def log_wastage_event(
 
 
 async def upload_wastage_photos(
-    event_id: str,
     batch_number: str,
-    photos: List[UploadFile],
-    photo_metadata: List[PhotoUploadData]
-) -> List[str]:
+    photos: List[UploadFile]
+) -> List[StoredMedia]:
     """
-    Upload wastage photos to Supabase Storage.
+    Upload wastage photos to storage, concurrently.
     
-    Path structure: {batch_number}/{event_id}/{filename}
+    Path structure: {batch_number}/{content hash}.{ext}. Objects are named
+    by content rather than by event, so re-sending a request after a failure
+    overwrites the same objects instead of storing the photos again. If some
+    uploads fail, the stored ones that no event links to are removed.
     
     Args:
-        event_id: Wastage event UUID
         batch_number: Batch number
         photos: List of uploaded files
-        photo_metadata: Metadata for each photo
         
     Returns:
-        List of photo URLs
+        Stored photos (URL, path, real size and dimensions), in upload order
         
     Raises:
         HTTPException: If upload fails or validation fails
     """
+    def path_for(_: int, media) -> str:
+        return f"{batch_number}/{media.sha256[:32]}.{media.extension}"
+
     try:
-        supabase = await get_supabase_client_async()
-        photo_urls = []
-        
-        for i, photo in enumerate(photos):
-            # Validate file type
-            if photo.content_type not in ALLOWED_PHOTO_TYPES:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid file type: {photo.content_type}. Allowed: {ALLOWED_PHOTO_TYPES}"
-                )
-            
-            # Read file content
-            content = await photo.read()
-            
-            # Validate file size
-            file_size_mb = len(content) / (1024 * 1024)
-            if file_size_mb > MAX_PHOTO_SIZE_MB:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"File size {file_size_mb:.2f}MB exceeds maximum {MAX_PHOTO_SIZE_MB}MB"
-                )
-            
-            # Generate storage path
-            filename = photo_metadata[i].file_name if i < len(photo_metadata) else photo.filename
-            storage_path = f"{batch_number}/{event_id}/{filename}"
-            
-            # Upload to Supabase Storage
-            try:
-                result = supabase.storage.from_(WASTAGE_PHOTOS_BUCKET).upload(
-                    path=storage_path,
-                    file=content,
-                    file_options={"content-type": photo.content_type, "upsert": "true"}
-                )
-                
-                # Get public URL
-                photo_url = supabase.storage.from_(WASTAGE_PHOTOS_BUCKET).get_public_url(storage_path)
-                photo_urls.append(photo_url)
-                
-                logger.info(f"Uploaded wastage photo: {storage_path}")
-                
-            except Exception as e:
-                logger.error(f"Failed to upload photo to Supabase: {e}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Failed to upload photo: {str(e)}"
-                )
-        
-        return photo_urls
-        
-    except HTTPException:
-        raise
+        stored = await upload_media(
+            WASTAGE_PHOTOS_BUCKET, photos, path_for,
+            allowed_types=ALLOWED_PHOTO_TYPES,
+            max_bytes=MAX_PHOTO_SIZE_MB * 1024 * 1024
+        )
+        for media in stored:
+            logger.info(f"Uploaded wastage photo: {media.path}")
+        return stored
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except MediaUploadError as e:
+        await _discard_unlinked_photos([media.path for media in e.stored])
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to upload photos: {e}"
+        )
     except Exception as e:
         logger.error(f"Failed to upload wastage photos: {e}", exc_info=True)
         raise HTTPException(
@@ -326,6 +316,30 @@ async def upload_wastage_photos(
         )
 
 
+async def _discard_unlinked_photos(paths: List[str]) -> None:
+    """
+    Remove stored photos that no wastage event links to.
+
+    Photos are shared by content hash within a batch, so an object is kept
+    if an earlier event already recorded it. Failures are logged only: the
+    caller is already reporting an error.
+    """
+    if not paths:
+        return
+    try:
+        linked = await fetch_all(
+            "SELECT DISTINCT photo_path FROM wastage_photos WHERE photo_path = ANY($1::text[])",
+            paths
+        )
+        unlinked = sorted(set(paths) - {row['photo_path'] for row in linked})
+        if unlinked:
+            storage = await get_storage_client()
+            await storage.remove(WASTAGE_PHOTOS_BUCKET, unlinked)
+            logger.info(f"Removed {len(unlinked)} unlinked wastage photo(s)")
+    except Exception as e:
+        logger.warning(f"Failed to remove unlinked wastage photos {paths}: {e}")
+
+
 async def _calculate_wastage_cost(
     batch_id: int,
     quantity: float,
@@ -461,38 +475,213 @@ async def get_wastage_by_batch(batch_number: str) -> WastageByBatchResponse:
         )
 
 
+# ============================================================================
+# ANALYTICS ROLLUP
+# ============================================================================
+
+# Rollup key: one row per IST day, farm (PO vendor, 0 = none), stage,
+# product, wastage type, reason ('' = none) and cost allocation
+ROLLUP_KEY = "day, farm_id, stage, item_name, wastage_type, reason, cost_allocation"
+
+# wastage_events aggregated to rollup rows; {condition} filters `we`
+ROLLUP_SOURCE_QUERY = """
+    SELECT
+        (we.created_at AT TIME ZONE 'Asia/Kolkata')::date AS day,
+        COALESCE(po.vendor_id, 0) AS farm_id,
+        we.stage, we.item_name, we.wastage_type,
+        COALESCE(we.reason, '') AS reason,
+        we.cost_allocation,
+        COUNT(*)::int AS event_count,
+        SUM(we.quantity) AS total_quantity,
+        COALESCE(SUM(we.estimated_cost), 0) AS total_cost
+    FROM wastage_events we
+    LEFT JOIN batches b ON b.id = we.batch_id
+    LEFT JOIN purchase_orders po ON po.id = COALESCE(we.po_id, b.po_id)
+    WHERE {condition}
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+# Events created on or after IST day $1 (all events when $1 is NULL)
+ROLLUP_SINCE_CONDITION = """
+    we.created_at IS NOT NULL
+    AND ($1::date IS NULL OR we.created_at >= ($1::date::timestamp AT TIME ZONE 'Asia/Kolkata'))
+"""
+
+TREND_BUCKETS = {"daily": "day", "weekly": "week", "monthly": "month"}
+
+# Name shown for wastage not linked to a purchase order
+UNASSIGNED_FARM = "Unassigned"
+
+
+async def add_events_to_rollup(conn, event_ids: List[int]) -> None:
+    """
+    Add newly inserted wastage events to the daily rollup.
+
+    Call on the connection (and inside the transaction) that inserted the
+    events, so the rollup commits or rolls back with them.
+
+    Args:
+        conn: Database connection
+        event_ids: wastage_events.id of the new events
+    """
+    if not event_ids:
+        return
+
+    await conn.execute(f"""
+        INSERT INTO wastage_daily_rollup (
+            {ROLLUP_KEY}, event_count, total_quantity, total_cost
+        )
+        {ROLLUP_SOURCE_QUERY.format(condition="we.id = ANY($1::int[])")}
+        ON CONFLICT ({ROLLUP_KEY}) DO UPDATE SET
+            event_count = wastage_daily_rollup.event_count + EXCLUDED.event_count,
+            total_quantity = wastage_daily_rollup.total_quantity + EXCLUDED.total_quantity,
+            total_cost = wastage_daily_rollup.total_cost + EXCLUDED.total_cost,
+            updated_at = NOW()
+    """, event_ids)
+
+
+async def reconcile_wastage_rollup(days: Optional[int] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    Rebuild recent days of the daily rollup from wastage_events.
+
+    Catches anything the incremental path missed (events inserted or
+    corrected outside the service). Days whose rollup already matches
+    are left untouched.
+
+    Args:
+        days: Days to check, including today (IST)
+            (default: settings.WASTAGE_ROLLUP_RECONCILE_DAYS)
+        full: Rebuild every day instead
+
+    Returns:
+        Summary with the first day checked and rows corrected
+    """
+    since = None if full else now_ist().date() - timedelta(days=(days or settings.WASTAGE_ROLLUP_RECONCILE_DAYS) - 1)
+    started = time.monotonic()
+
+    async with DatabaseTransaction() as conn:
+        # Waits for in-flight event inserts to commit and holds new ones
+        # back until the rebuild commits, so each event is counted once
+        await conn.execute("LOCK TABLE wastage_daily_rollup IN SHARE ROW EXCLUSIVE MODE")
+
+        drift = await conn.fetchval(f"""
+            WITH source AS ({ROLLUP_SOURCE_QUERY.format(condition=ROLLUP_SINCE_CONDITION)}),
+            current AS (
+                SELECT * FROM wastage_daily_rollup
+                WHERE $1::date IS NULL OR day >= $1::date
+            )
+            SELECT COUNT(*)
+            FROM source s
+            FULL JOIN current c USING ({ROLLUP_KEY})
+            WHERE s.event_count IS DISTINCT FROM c.event_count
+               OR s.total_quantity IS DISTINCT FROM c.total_quantity
+               OR s.total_cost IS DISTINCT FROM c.total_cost
+        """, since)
+
+        if drift:
+            await conn.execute(
+                "DELETE FROM wastage_daily_rollup WHERE $1::date IS NULL OR day >= $1::date", since
+            )
+            await conn.execute(f"""
+                INSERT INTO wastage_daily_rollup (
+                    {ROLLUP_KEY}, event_count, total_quantity, total_cost
+                )
+                {ROLLUP_SOURCE_QUERY.format(condition=ROLLUP_SINCE_CONDITION)}
+            """, since)
+
+    duration_ms = int((time.monotonic() - started) * 1000)
+    if drift:
+        logger.warning(f"⚠️ Wastage rollup corrected: {drift} row(s) differed since {since or 'the beginning'}")
+    else:
+        logger.debug(f"Wastage rollup in sync since {since or 'the beginning'} ({duration_ms} ms)")
+
+    return {
+        'since': since.isoformat() if since else None,
+        'rows_corrected': drift,
+        'duration_ms': duration_ms
+    }
+
+
 # ============================================================================
 # ANALYTICS
 # ============================================================================
 
+def _analytics_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[str, str, date, date]:
+    """Requested range as strings and dates (default: last 30 days, IST)"""
+    if not date_from:
+        date_from = (now_ist() - timedelta(days=30)).strftime("%Y-%m-%d")
+    if not date_to:
+        date_to = now_ist().strftime("%Y-%m-%d")
+    return date_from, date_to, date.fromisoformat(date_from), date.fromisoformat(date_to)
+
+
 async def get_wastage_analytics_by_farm(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     farm_id: Optional[int] = None
 ) -> WastageAnalyticsByFarmResponse:
     """
-    Get wastage analytics grouped by farm.
+    Get wastage analytics grouped by farm (the vendor of the wastage's PO).
     
     Args:
         date_from: Start date (YYYY-MM-DD), defaults to 30 days ago
         date_to: End date (YYYY-MM-DD), defaults to today
-        farm_id: Optional farm filter
+        farm_id: Optional farm (vendor) filter
         
     Returns:
-        WastageAnalyticsByFarmResponse with farm analytics
+        WastageAnalyticsByFarmResponse with farm analytics; wastage_percentage
+        is the farm's share of all wastage in the range
     """
-    # Set default date range (last 30 days)
-    if not date_from:
-        date_from = (now_ist() - timedelta(days=30)).strftime("%Y-%m-%d")
-    if not date_to:
-        date_to = now_ist().strftime("%Y-%m-%d")
-    
-    # TODO: Implement farm analytics when farm/PO tables are ready
-    # For now, return empty response
-    return WastageAnalyticsByFarmResponse(
-        date_range={"from": date_from, "to": date_to},
-        farms=[]
-    )
+    try:
+        date_from, date_to, date_from_obj, date_to_obj = _analytics_range(date_from, date_to)
+        
+        rows = await fetch_all("""
+            SELECT
+                r.farm_id, zv.contact_name AS farm_name, r.wastage_type, r.stage,
+                SUM(r.total_quantity) AS wastage_kg,
+                SUM(r.total_cost) AS cost
+            FROM wastage_daily_rollup r
+            LEFT JOIN zoho_vendors zv ON zv.id = r.farm_id
+            WHERE r.day BETWEEN $1 AND $2
+            GROUP BY r.farm_id, zv.contact_name, r.wastage_type, r.stage
+        """, date_from_obj, date_to_obj)
+        
+        total_wastage = sum(float(row['wastage_kg'] or 0) for row in rows)
+        
+        farms: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            if farm_id is not None and row['farm_id'] != farm_id:
+                continue
+            farm = farms.setdefault(row['farm_id'], {
+                'farm_name': row['farm_name'] or UNASSIGNED_FARM,
+                'total_wastage_kg': 0.0,
+                'total_cost': 0.0,
+                'breakdown_by_type': {},
+                'breakdown_by_stage': {}
+            })
+            kg = float(row['wastage_kg'] or 0)
+            farm['total_wastage_kg'] += kg
+            farm['total_cost'] += float(row['cost'] or 0)
+            farm['breakdown_by_type'][row['wastage_type']] = farm['breakdown_by_type'].get(row['wastage_type'], 0.0) + kg
+            farm['breakdown_by_stage'][row['stage']] = farm['breakdown_by_stage'].get(row['stage'], 0.0) + kg
+        
+        return WastageAnalyticsByFarmResponse(
+            date_range={"from": date_from, "to": date_to},
+            farms=[
+                WastageFarmAnalytics(
+                    **farm,
+                    wastage_percentage=(farm['total_wastage_kg'] / total_wastage * 100) if total_wastage > 0 else 0
+                )
+                for farm in sorted(farms.values(), key=lambda f: f['total_wastage_kg'], reverse=True)
+            ]
+        )
+        
+    except Exception as e:
+        logger.error(f"Failed to get wastage analytics by farm: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get analytics: {str(e)}"
+        )
 
 
 async def get_wastage_analytics_by_stage(
@@ -510,65 +699,56 @@ async def get_wastage_analytics_by_stage(
         WastageAnalyticsByStageResponse with stage analytics
     """
     try:
-        # Set default date range
-        if not date_from:
-            date_from = (now_ist() - timedelta(days=30)).strftime("%Y-%m-%d")
-        if not date_to:
-            date_to = now_ist().strftime("%Y-%m-%d")
-        
-        # Convert string dates to date objects for asyncpg
-        from datetime import date as date_type
-        date_from_obj = date_type.fromisoformat(date_from) if isinstance(date_from, str) else date_from
-        date_to_obj = date_type.fromisoformat(date_to) if isinstance(date_to, str) else date_to
+        date_from, date_to, date_from_obj, date_to_obj = _analytics_range(date_from, date_to)
         
         # Get wastage by stage
-        query = """
+        results = await fetch_all("""
             SELECT 
                 stage,
-                COUNT(*) as event_count,
-                SUM(quantity) as total_wastage_kg,
-                SUM(estimated_cost) as total_cost,
-                AVG(quantity) as avg_wastage_per_event
-            FROM wastage_events
-            WHERE created_at >= $1 AND created_at < ($2 + interval '1 day')
+                SUM(event_count)::int as event_count,
+                SUM(total_quantity) as total_wastage_kg,
+                SUM(total_cost) as total_cost
+            FROM wastage_daily_rollup
+            WHERE day BETWEEN $1 AND $2
             GROUP BY stage
             ORDER BY total_wastage_kg DESC
-        """
-        
-        results = await fetch_all(query, date_from_obj, date_to_obj)
+        """, date_from_obj, date_to_obj)
+        
+        # Top 5 reasons of every stage
+        reasons = await fetch_all("""
+            SELECT stage, reason, count
+            FROM (
+                SELECT
+                    stage, reason, SUM(event_count)::int as count,
+                    ROW_NUMBER() OVER (PARTITION BY stage ORDER BY SUM(event_count) DESC, reason) as rank
+                FROM wastage_daily_rollup
+                WHERE day BETWEEN $1 AND $2 AND reason <> ''
+                GROUP BY stage, reason
+            ) ranked
+            WHERE rank <= 5
+            ORDER BY stage, rank
+        """, date_from_obj, date_to_obj)
+        
+        top_reasons: Dict[str, List[Dict[str, Any]]] = {}
+        for r in reasons:
+            top_reasons.setdefault(r['stage'], []).append({"reason": r['reason'], "count": r['count']})
         
         # Calculate total for percentages
         total_wastage = sum(float(r['total_wastage_kg'] or 0) for r in results)
         
-        # Get top reasons for each stage
-        stages = []
-        for result in results:
-            # Get top reasons
-            reasons_query = """
-                SELECT reason, COUNT(*) as count
-                FROM wastage_events
-                WHERE stage = $1 
-                  AND created_at >= $2 
-                  AND created_at < ($3 + interval '1 day')
-                  AND reason IS NOT NULL
-                GROUP BY reason
-                ORDER BY count DESC
-                LIMIT 5
-            """
-            top_reasons_data = await fetch_all(reasons_query, result['stage'], date_from_obj, date_to_obj)
-            top_reasons = [{"reason": r['reason'], "count": r['count']} for r in top_reasons_data]
-            
-            stage_analytics = WastageStageAnalytics(
+        stages = [
+            WastageStageAnalytics(
                 stage=result['stage'],
                 stage_name=result['stage'].replace('_', ' ').title(),
                 total_wastage_kg=float(result['total_wastage_kg'] or 0),
                 total_cost=float(result['total_cost'] or 0),
                 percentage_of_total=(float(result['total_wastage_kg'] or 0) / total_wastage * 100) if total_wastage > 0 else 0,
                 event_count=result['event_count'],
-                avg_wastage_per_event=float(result['avg_wastage_per_event'] or 0),
-                top_reasons=top_reasons
+                avg_wastage_per_event=float(result['total_wastage_kg'] or 0) / result['event_count'] if result['event_count'] else 0,
+                top_reasons=top_reasons.get(result['stage'], [])
             )
-            stages.append(stage_analytics)
+            for result in results
+        ]
         
         return WastageAnalyticsByStageResponse(
             date_range={"from": date_from, "to": date_to},
@@ -600,60 +780,55 @@ async def get_wastage_analytics_by_product(
         WastageAnalyticsByProductResponse with product analytics
     """
     try:
-        # Set default date range
-        if not date_from:
-            date_from = (now_ist() - timedelta(days=30)).strftime("%Y-%m-%d")
-        if not date_to:
-            date_to = now_ist().strftime("%Y-%m-%d")
-        
-        # Convert string dates to date objects for asyncpg
-        from datetime import date as date_type
-        date_from_obj = date_type.fromisoformat(date_from) if isinstance(date_from, str) else date_from
-        date_to_obj = date_type.fromisoformat(date_to) if isinstance(date_to, str) else date_to
-        
-        # Build query with optional item filter
-        query = """
-            SELECT 
-                item_name,
-                SUM(quantity) as total_wastage_kg,
-                SUM(estimated_cost) as total_cost
-            FROM wastage_events
-            WHERE created_at >= $1 AND created_at < ($2 + interval '1 day')
-        """
-        params = [date_from_obj, date_to_obj]
+        date_from, date_to, date_from_obj, date_to_obj = _analytics_range(date_from, date_to)
         
-        if item_name:
-            query += " AND item_name ILIKE $3"
-            params.append(f"%{item_name}%")
+        # Optional item filter ($3 NULL matches every item)
+        item_pattern = f"%{item_name}%" if item_name else None
         
-        query += " GROUP BY item_name ORDER BY total_wastage_kg DESC"
-        
-        results = await fetch_all(query, *params)
+        results = await fetch_all("""
+            SELECT 
+                item_name,
+                SUM(total_quantity) as total_wastage_kg,
+                SUM(total_cost) as total_cost
+            FROM wastage_daily_rollup
+            WHERE day BETWEEN $1 AND $2
+              AND ($3::text IS NULL OR item_name ILIKE $3)
+            GROUP BY item_name
+            ORDER BY total_wastage_kg DESC
+        """, date_from_obj, date_to_obj, item_pattern)
+        
+        # Top 3 stages of every product
+        stages_data = await fetch_all("""
+            SELECT item_name, stage, wastage_kg
+            FROM (
+                SELECT
+                    item_name, stage, SUM(total_quantity) as wastage_kg,
+                    ROW_NUMBER() OVER (PARTITION BY item_name ORDER BY SUM(total_quantity) DESC, stage) as rank
+                FROM wastage_daily_rollup
+                WHERE day BETWEEN $1 AND $2
+                  AND ($3::text IS NULL OR item_name ILIKE $3)
+                GROUP BY item_name, stage
+            ) ranked
+            WHERE rank <= 3
+            ORDER BY item_name, rank
+        """, date_from_obj, date_to_obj, item_pattern)
+        
+        problematic_stages: Dict[str, List[Dict[str, Any]]] = {}
+        for s in stages_data:
+            problematic_stages.setdefault(s['item_name'], []).append(
+                {"stage": s['stage'], "wastage_kg": float(s['wastage_kg'])}
+            )
         
-        # Get problematic stages for each product
-        products = []
-        for result in results:
-            stages_query = """
-                SELECT stage, SUM(quantity) as wastage_kg
-                FROM wastage_events
-                WHERE item_name = $1 
-                  AND created_at >= $2 
-                  AND created_at < ($3 + interval '1 day')
-                GROUP BY stage
-                ORDER BY wastage_kg DESC
-                LIMIT 3
-            """
-            stages_data = await fetch_all(stages_query, result['item_name'], date_from_obj, date_to_obj)
-            problematic_stages = [{"stage": s['stage'], "wastage_kg": float(s['wastage_kg'])} for s in stages_data]
-            
-            product_analytics = WastageProductAnalytics(
+        products = [
+            WastageProductAnalytics(
                 item_name=result['item_name'],
                 total_wastage_kg=float(result['total_wastage_kg'] or 0),
                 total_cost=float(result['total_cost'] or 0),
                 wastage_percentage=0.0,  # TODO: Calculate when we have total received data
-                problematic_stages=problematic_stages
+                problematic_stages=problematic_stages.get(result['item_name'], [])
             )
-            products.append(product_analytics)
+            for result in results
+        ]
         
         return WastageAnalyticsByProductResponse(
             date_range={"from": date_from, "to": date_to},
@@ -676,6 +851,9 @@ async def get_wastage_trends(
     """
     Get wastage trends over time.
     
+    Weekly and monthly points are summed from the daily rollup; weeks start
+    on Monday.
+    
     Args:
         date_from: Start date (YYYY-MM-DD), defaults to 30 days ago
         date_to: End date (YYYY-MM-DD), defaults to today
@@ -685,38 +863,19 @@ async def get_wastage_trends(
         WastageTrendsResponse with time series data
     """
     try:
-        # Set default date range
-        if not date_from:
-            date_from = (now_ist() - timedelta(days=30)).strftime("%Y-%m-%d")
-        if not date_to:
-            date_to = now_ist().strftime("%Y-%m-%d")
-        
-        # Convert string dates to date objects for asyncpg
-        from datetime import date as date_type
-        date_from_obj = date_type.fromisoformat(date_from) if isinstance(date_from, str) else date_from
-        date_to_obj = date_type.fromisoformat(date_to) if isinstance(date_to, str) else date_to
-        
-        # Determine date truncation based on granularity
-        if granularity == "weekly":
-            date_trunc = "week"
-        elif granularity == "monthly":
-            date_trunc = "month"
-        else:
-            date_trunc = "day"
-        
-        query = f"""
+        date_from, date_to, date_from_obj, date_to_obj = _analytics_range(date_from, date_to)
+        
+        results = await fetch_all("""
             SELECT 
-                DATE_TRUNC('{date_trunc}', created_at)::date as date,
-                SUM(quantity) as total_wastage_kg,
-                SUM(estimated_cost) as total_cost,
-                COUNT(*) as event_count
-            FROM wastage_events
-            WHERE created_at >= $1 AND created_at < ($2 + interval '1 day')
-            GROUP BY DATE_TRUNC('{date_trunc}', created_at)
+                DATE_TRUNC($3::text, day::timestamp)::date as date,
+                SUM(total_quantity) as total_wastage_kg,
+                SUM(total_cost) as total_cost,
+                SUM(event_count)::int as event_count
+            FROM wastage_daily_rollup
+            WHERE day BETWEEN $1 AND $2
+            GROUP BY 1
             ORDER BY date
-        """
-        
-        results = await fetch_all(query, date_from_obj, date_to_obj)
+        """, date_from_obj, date_to_obj, TREND_BUCKETS.get(granularity, "day"))
         
         data_points = [
             WastageTrendDataPoint(
@@ -740,7 +899,6 @@ async def get_wastage_trends(
             detail=f"Failed to get trends: {str(e)}"
         )
 
-
 # ============================================================================
 # REPACKING WORKFLOW
 # ============================================================================
@@ -790,13 +948,11 @@ async def initiate_repacking(
             request.wastage_in_repacking = request.damaged_quantity - request.repacked_quantity
         
         # Upload photos first
-        event_id = str(uuid.uuid4())
-        photo_urls = await upload_wastage_photos(
-            event_id=event_id,
+        stored_photos = await upload_wastage_photos(
             batch_number=request.parent_batch_number,
-            photos=photos,
-            photo_metadata=request.photo_metadata
+            photos=photos
         )
+        photo_urls = [photo.url for photo in stored_photos]
         
         # Create repacked batch via Batch Tracking API
         batch_repack_request = BatchRepackRequest(
@@ -990,38 +1146,237 @@ async def update_wastage_threshold(
 # THRESHOLD ALERTS
 # ============================================================================
 
+ALERT_LOCK_KEY = "wastage_threshold_alerts"
+
+ALERT_COLUMNS = """
+    id, threshold_id, alert_level, scope_type, scope_value, stage,
+    current_percentage, threshold_percentage, window_days, message,
+    status, triggered_at, resolved_at
+"""
+
+# Wastage % of every active threshold's scope over IST days $1..$2. The
+# wasted and received totals of all scopes are computed once (grouping
+# sets) and thresholds are joined to them, so the cost does not grow with
+# the number of thresholds. 'stage' thresholds name their stage in stage
+# (or scope_value); farm and item names match case-insensitively.
+THRESHOLD_EVALUATION_CTES = """
+    received AS (
+        SELECT
+            CASE WHEN GROUPING(s.farm) = 0 THEN 'farm'
+                 WHEN GROUPING(s.item) = 0 THEN 'item'
+                 ELSE 'global' END AS scope_type,
+            COALESCE(s.farm, s.item, '') AS scope_key,
+            SUM(s.quantity) AS quantity
+        FROM (
+            SELECT lower(zv.contact_name) AS farm, lower(zi.name) AS item, gi.gross_received AS quantity
+            FROM grns g
+            JOIN grn_items gi ON gi.grn_id = g.id
+            JOIN zoho_items zi ON zi.id = gi.item_id
+            JOIN purchase_orders po ON po.id = g.po_id
+            LEFT JOIN zoho_vendors zv ON zv.id = po.vendor_id
+            WHERE g.status IN ('completed', 'locked')
+              AND g.receiving_date BETWEEN $1::date AND $2::date
+        ) s
+        GROUP BY GROUPING SETS ((), (s.farm), (s.item))
+    ),
+    wasted AS (
+        SELECT
+            CASE WHEN GROUPING(s.farm) = 0 THEN 'farm'
+                 WHEN GROUPING(s.item) = 0 THEN 'item'
+                 ELSE 'global' END AS scope_type,
+            COALESCE(s.farm, s.item, '') AS scope_key,
+            COALESCE(s.stage, '') AS stage_key,
+            SUM(s.quantity) AS quantity
+        FROM (
+            SELECT lower(zv.contact_name) AS farm, lower(r.item_name) AS item, r.stage, r.total_quantity AS quantity
+            FROM wastage_daily_rollup r
+            LEFT JOIN zoho_vendors zv ON zv.id = r.farm_id
+            WHERE r.day BETWEEN $1::date AND $2::date
+        ) s
+        GROUP BY GROUPING SETS ((), (s.stage), (s.farm), (s.farm, s.stage), (s.item), (s.item, s.stage))
+    ),
+    thresholds AS (
+        SELECT
+            t.id, t.alert_level, t.scope_type, t.scope_value, t.threshold_percentage,
+            COALESCE(t.stage, CASE WHEN t.scope_type = 'stage' THEN t.scope_value END) AS stage,
+            CASE WHEN t.scope_type IN ('farm', 'item') THEN t.scope_type ELSE 'global' END AS match_type,
+            CASE WHEN t.scope_type IN ('farm', 'item') THEN lower(COALESCE(t.scope_value, '')) ELSE '' END AS match_key
+        FROM wastage_thresholds t
+        WHERE t.is_active
+    ),
+    evaluation AS (
+        SELECT
+            t.*,
+            COALESCE(w.quantity, 0) AS wasted_quantity,
+            COALESCE(rc.quantity, 0) AS received_quantity,
+            CASE WHEN rc.quantity > 0 THEN ROUND(COALESCE(w.quantity, 0) / rc.quantity * 100, 2) END AS percentage,
+            t.threshold_percentage * (1 - $4::numeric / 100) AS clear_percentage
+        FROM thresholds t
+        LEFT JOIN wasted w
+          ON w.scope_type = t.match_type AND w.scope_key = t.match_key AND w.stage_key = COALESCE(t.stage, '')
+        LEFT JOIN received rc
+          ON rc.scope_type = t.match_type AND rc.scope_key = t.match_key
+    )
+"""
+
+# Evaluate, then in the same statement: raise (or refresh) alerts at or over
+# their threshold, keep active alerts inside the hysteresis band, resolve
+# the rest. Returns the alerts newly raised and resolved.
+# $1/$2 window, $3 window days, $4 hysteresis percent
+EVALUATE_ALERTS_QUERY = f"""
+    WITH {THRESHOLD_EVALUATION_CTES},
+    raised AS (
+        INSERT INTO wastage_alerts (
+            threshold_id, alert_level, scope_type, scope_value, stage, threshold_percentage,
+            current_percentage, peak_percentage, wasted_quantity, received_quantity,
+            window_days, message
+        )
+        SELECT
+            e.id, e.alert_level, e.scope_type, e.scope_value, e.stage, e.threshold_percentage,
+            e.percentage, e.percentage, e.wasted_quantity, e.received_quantity,
+            $3::int,
+            format('%s wastage%s is %s%% of received over the last %s days (threshold %s%%)',
+                   COALESCE(initcap(replace(e.stage, '_', ' ')), 'Total'),
+                   CASE e.match_type
+                       WHEN 'farm' THEN ' for farm ' || e.scope_value
+                       WHEN 'item' THEN ' for ' || e.scope_value
+                       ELSE ''
+                   END,
+                   e.percentage, $3::int, e.threshold_percentage)
+        FROM evaluation e
+        WHERE e.percentage >= e.threshold_percentage
+        ON CONFLICT (threshold_id) WHERE status = 'active' DO UPDATE SET
+            alert_level = EXCLUDED.alert_level,
+            threshold_percentage = EXCLUDED.threshold_percentage,
+            current_percentage = EXCLUDED.current_percentage,
+            peak_percentage = GREATEST(wastage_alerts.peak_percentage, EXCLUDED.current_percentage),
+            wasted_quantity = EXCLUDED.wasted_quantity,
+            received_quantity = EXCLUDED.received_quantity,
+            window_days = EXCLUDED.window_days,
+            message = EXCLUDED.message,
+            last_evaluated_at = NOW()
+        RETURNING {ALERT_COLUMNS}, (xmax = 0) AS is_new
+    ),
+    held AS (
+        UPDATE wastage_alerts a
+        SET current_percentage = e.percentage,
+            wasted_quantity = e.wasted_quantity,
+            received_quantity = e.received_quantity,
+            last_evaluated_at = NOW()
+        FROM evaluation e
+        WHERE a.threshold_id = e.id
+          AND a.status = 'active'
+          AND e.percentage < e.threshold_percentage
+          AND e.percentage >= e.clear_percentage
+        RETURNING a.id
+    ),
+    resolved AS (
+        UPDATE wastage_alerts a
+        SET status = 'resolved',
+            resolved_at = NOW(),
+            last_evaluated_at = NOW(),
+            current_percentage = (SELECT e.percentage FROM evaluation e WHERE e.id = a.threshold_id)
+        WHERE a.status = 'active'
+          AND NOT EXISTS (
+              SELECT 1 FROM evaluation e
+              WHERE e.id = a.threshold_id AND e.percentage >= e.clear_percentage
+          )
+        RETURNING {ALERT_COLUMNS}
+    )
+    SELECT {ALERT_COLUMNS} FROM raised WHERE is_new
+    UNION ALL
+    SELECT {ALERT_COLUMNS} FROM resolved
+"""
+
+
+def _alert_response(row: Dict[str, Any]) -> WastageAlertResponse:
+    return WastageAlertResponse(
+        id=row['id'],
+        threshold_id=row['threshold_id'],
+        alert_level=row['alert_level'],
+        message=row['message'],
+        farm=row['scope_value'] if row['scope_type'] == 'farm' else None,
+        item=row['scope_value'] if row['scope_type'] == 'item' else None,
+        stage=row['stage'],
+        current_percentage=float(row['current_percentage'] or 0),
+        threshold=float(row['threshold_percentage']),
+        period=f"last_{row['window_days']}_days",
+        status=row['status'],
+        triggered_at=row['triggered_at'],
+        resolved_at=row['resolved_at']
+    )
+
+
+async def _notify_alerts(raised: List[WastageAlertResponse], resolved: List[WastageAlertResponse]) -> None:
+    """Push raised / resolved alerts to admins (WebSocket) and raised ones to Telegram"""
+    from app.services import telegram_service
+    from app.websocket.events import emit_wastage_alerts
+
+    # JSON-safe payloads (timestamps as ISO strings)
+    raised_data = [alert.model_dump(mode="json") for alert in raised]
+    resolved_data = [alert.model_dump(mode="json") for alert in resolved]
+
+    try:
+        await emit_wastage_alerts(raised_data, resolved_data)
+    except Exception as e:
+        logger.warning(f"Failed to emit wastage alerts: {e}")
+
+    if not raised:
+        return
+    try:
+        if await telegram_service.notify_wastage_alerts(raised_data):
+            await execute_query(
+                "UPDATE wastage_alerts SET notified_at = NOW() WHERE id = ANY($1::int[])",
+                [alert.id for alert in raised]
+            )
+    except Exception as e:
+        logger.warning(f"Failed to send wastage alerts to Telegram: {e}")
+
+
 async def check_threshold_alerts() -> AlertsListResponse:
     """
     Check current wastage against thresholds and generate alerts.
     
     This function is called by the scheduler hourly.
-    Evaluates wastage percentages and compares against configured thresholds.
+    Evaluates wastage percentages (wastage / quantity received on completed
+    GRNs over the last settings.WASTAGE_ALERT_WINDOW_DAYS days) for every
+    active threshold in one statement, and updates wastage_alerts:
+    - at or over the threshold: alert raised, or the active one refreshed
+    - under the threshold but within WASTAGE_ALERT_HYSTERESIS_PERCENT of
+      it: active alert kept
+    - below that, or threshold deactivated: alert resolved
+    Newly raised and resolved alerts are pushed to admins over WebSocket;
+    raised ones are also sent to the Telegram inventory channel.
     
     Returns:
-        AlertsListResponse with current alerts
+        AlertsListResponse with the alerts raised by this run
     """
     try:
-        alerts = []
-        
-        # Get active thresholds
-        thresholds_query = """
-            SELECT id, scope_type, scope_value, stage, threshold_percentage, alert_level
-            FROM wastage_thresholds
-            WHERE is_active = true
-        """
-        thresholds = await fetch_all(thresholds_query)
+        days = settings.WASTAGE_ALERT_WINDOW_DAYS
+        date_to = now_ist().date()
+        date_from = date_to - timedelta(days=days - 1)
         
-        # Check each threshold
-        for threshold in thresholds:
-            # Calculate wastage percentage for last 7 days
-            date_from = (now_ist() - timedelta(days=7)).strftime("%Y-%m-%d")
-            date_to = now_ist().strftime("%Y-%m-%d")
+        async with DatabaseTransaction() as conn:
+            # One evaluation at a time across workers
+            locked = await conn.fetchval("SELECT pg_try_advisory_xact_lock(hashtext($1))", ALERT_LOCK_KEY)
+            if not locked:
+                logger.debug("Wastage threshold check already running on another worker, skipping")
+                return AlertsListResponse(alerts=[])
             
-            # TODO: Implement actual threshold checking when we have total received data
-            # For now, just log that we're checking
-            logger.info(f"Checking threshold {threshold['id']}: {threshold['scope_type']} - {threshold['stage']}")
+            rows = await conn.fetch(
+                EVALUATE_ALERTS_QUERY,
+                date_from, date_to, days, settings.WASTAGE_ALERT_HYSTERESIS_PERCENT
+            )
+        
+        alerts = [_alert_response(dict(row)) for row in rows]
+        raised = [alert for alert in alerts if alert.status == 'active']
+        resolved = [alert for alert in alerts if alert.status == 'resolved']
         
-        return AlertsListResponse(alerts=alerts)
+        if raised or resolved:
+            logger.info(f"Wastage thresholds: {len(raised)} alert(s) raised, {len(resolved)} resolved")
+            await _notify_alerts(raised, resolved)
+        
+        return AlertsListResponse(alerts=raised)
         
     except Exception as e:
         logger.error(f"Failed to check threshold alerts: {e}", exc_info=True)
@@ -1033,8 +1388,22 @@ async def get_current_alerts() -> AlertsListResponse:
     Get current wastage alerts.
     
     Returns:
-        AlertsListResponse with active alerts
+        AlertsListResponse with active alerts, most severe first
     """
-    # For now, return empty alerts
-    # TODO: Implement alert storage and retrieval
-    return AlertsListResponse(alerts=[])
+    try:
+        rows = await fetch_all(f"""
+            SELECT {ALERT_COLUMNS}
+            FROM wastage_alerts
+            WHERE status = 'active'
+            ORDER BY
+                CASE alert_level WHEN 'critical' THEN 0 WHEN 'warning' THEN 1 ELSE 2 END,
+                current_percentage DESC
+        """)
+        return AlertsListResponse(alerts=[_alert_response(row) for row in rows])
+        
+    except Exception as e:
+        logger.error(f"Failed to get wastage alerts: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get alerts: {str(e)}"
+        )
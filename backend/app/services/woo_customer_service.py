@@ -12,14 +12,58 @@ Service layer for WooCommerce customer operations
 import logging
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+import httpx
+import pandas as pd
 from fastapi import HTTPException, status
 
-from app.database import fetch_all, fetch_one, execute_query
+from app.database import (
+    fetch_all, fetch_one,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
+from app.services import contact_sync_service, sync_runner_service
 from app.services.woocommerce_service import WooCommerceService
 from app.schemas.woo_customer import WooCustomerUpdate
 
 logger = logging.getLogger(__name__)
 
+# Customer list order: by name, id as keyset tie-breaker. Names are nullable,
+# so they are compared through COALESCE to keep the keyset comparison total.
+CUSTOMER_LIST_SORT = [
+    SortKey("COALESCE(first_name, '')", "first_name", default=''),
+    SortKey("COALESCE(last_name, '')", "last_name", default=''),
+    SortKey("id", "id"),
+]
+
+# Maximum customers fetched per sync
+WOO_CUSTOMER_SYNC_MAX = 10000
+
+# Address fields copied from WooCommerce billing/shipping objects
+ADDRESS_FIELDS = {
+    "billing": (
+        "first_name", "last_name", "company", "address_1", "address_2",
+        "city", "state", "postcode", "country", "email", "phone",
+    ),
+    "shipping": (
+        "first_name", "last_name", "company", "address_1", "address_2",
+        "city", "state", "postcode", "country",
+    ),
+}
+
+# Columns written by the sync; notes stay user-owned
+WOO_CUSTOMER_SYNC = contact_sync_service.ContactSyncSpec(
+    table="woo_customers",
+    key="customer_id",
+    columns=(
+        "email", "username", "first_name", "last_name", "role",
+        *(f"billing_{field}" for field in ADDRESS_FIELDS["billing"]),
+        *(f"shipping_{field}" for field in ADDRESS_FIELDS["shipping"]),
+        "is_paying_customer", "avatar_url", "date_created", "date_modified",
+    ),
+    required=("email",),
+    insert_values={"created_by": "$1"},
+    audit_values={"updated_by": "$1"},
+)
+
 # Global progress tracking for sync operations
 _sync_progress = {
     "in_progress": False,
@@ -41,8 +85,10 @@ async def get_customers(
     search: Optional[str] = None,
     paying_only: bool = False,
     limit: int = 1000,
-    offset: int = 0
-) -> Tuple[List[Dict], int]:
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT
+) -> Tuple[List[Dict], Optional[int], Optional[str]]:
     """
     Get WooCommerce customers with optional search and filters
     
@@ -50,10 +96,12 @@ async def get_customers(
         search: Search term for name, email, company
         paying_only: Filter for paying customers only
         limit: Max results
-        offset: Pagination offset
+        offset: Pagination offset (ignored when cursor is given)
+        cursor: Keyset cursor from a previous page
+        count_mode: exact, estimated or no total count
         
     Returns:
-        Tuple of (List of customer dictionaries, total count)
+        Tuple of (List of customer dictionaries, total count, next cursor)
     """
     try:
         # Build WHERE clause
@@ -81,9 +129,19 @@ async def get_customers(
         where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
         
         # Get total count
-        count_query = f"SELECT COUNT(*) as total FROM woo_customers WHERE {where_clause}"
-        count_result = await fetch_one(count_query, *params)
-        total_count = count_result['total'] if count_result else 0
+        total_count = await count_rows(f"FROM woo_customers WHERE {where_clause}", *params, mode=count_mode)
+        
+        # Continue after the cursor position, or fall back to offset
+        try:
+            cursor_condition, cursor_params = keyset_condition(CUSTOMER_LIST_SORT, cursor, param_count + 1)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if cursor_condition:
+            where_conditions.append(cursor_condition)
+            params.extend(cursor_params)
+            param_count += len(cursor_params)
+            where_clause = " AND ".join(where_conditions)
+            offset = 0
         
         # Get paginated customers
         query = f"""
@@ -100,15 +158,18 @@ async def get_customers(
                 created_at, updated_at, notes
             FROM woo_customers
             WHERE {where_clause}
-            ORDER BY first_name, last_name
+            {keyset_order_by(CUSTOMER_LIST_SORT)}
             LIMIT ${param_count + 1}
             OFFSET ${param_count + 2}
         """
-        params.extend([limit, offset])
+        params.extend([limit + 1, offset])
         
         customers = await fetch_all(query, *params)
-        return [dict(customer) for customer in customers], total_count
+        customers, next_cursor = keyset_page(customers, CUSTOMER_LIST_SORT, limit)
+        return [dict(customer) for customer in customers], total_count, next_cursor
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching WooCommerce customers: {e}")
         raise HTTPException(
@@ -275,24 +336,23 @@ async def sync_from_woocommerce(synced_by: str) -> Dict:
         logger.info(f"Starting WooCommerce customer sync by {synced_by}")
         
         # Fetch customers from WooCommerce
-        woo_customers = await WooCommerceService.fetch_customers(
-            per_page=100,
-            max_customers=10000
-        )
+        woo_customers = await _fetch_woo_customers()
         
         _sync_progress["total"] = len(woo_customers)
         logger.info(f"Fetched {len(woo_customers)} customers from WooCommerce")
-        
-        # Process each customer
-        for idx, woo_customer in enumerate(woo_customers):
-            _sync_progress["current"] = idx + 1
-            
-            try:
-                await _process_customer(woo_customer, synced_by)
-            except Exception as e:
-                logger.error(f"Error processing customer {woo_customer.get('id')}: {e}")
-                _sync_progress["errors"] += 1
-        
+
+        def on_batch(counts: Dict[str, int]):
+            for key in ("added", "updated", "skipped", "errors"):
+                _sync_progress[key] = counts[key]
+            _sync_progress["current"] = counts["added"] + counts["updated"] + counts["skipped"] + counts["errors"]
+
+        # Unchanged customers (same content hash) are skipped
+        await contact_sync_service.upsert_contacts(
+            WOO_CUSTOMER_SYNC,
+            _customer_frame(woo_customers),
+            synced_by=synced_by,
+            on_batch=on_batch
+        )
         
         # Log final counts before marking as complete
         logger.info(
@@ -328,169 +388,65 @@ async def sync_from_woocommerce(synced_by: str) -> Dict:
         )
 
 
-async def _process_customer(woo_customer: Dict, synced_by: str):
-    """Process a single customer from WooCommerce"""
-    customer_id = woo_customer.get('id')
-    
-    if not customer_id:
-        logger.warning("Customer missing ID, skipping")
-        _sync_progress["skipped"] += 1
-        return
-    
-    # Check if customer exists
-    existing = await fetch_one(
-        "SELECT id FROM woo_customers WHERE customer_id = $1",
-        customer_id
-    )
-    
-    # Parse dates
-    date_created = None
-    date_modified = None
-    if woo_customer.get('date_created'):
-        try:
-            date_created = datetime.fromisoformat(woo_customer['date_created'].replace('Z', '+00:00'))
-        except:
-            pass
-    if woo_customer.get('date_modified'):
-        try:
-            date_modified = datetime.fromisoformat(woo_customer['date_modified'].replace('Z', '+00:00'))
-        except:
-            pass
-    
-    # Extract billing and shipping info
-    billing = woo_customer.get('billing', {})
-    shipping = woo_customer.get('shipping', {})
-    
-    if existing:
-        # Update existing customer
-        query = """
-            UPDATE woo_customers SET
-                email = $1, username = $2, first_name = $3, last_name = $4, role = $5,
-                billing_first_name = $6, billing_last_name = $7, billing_company = $8,
-                billing_address_1 = $9, billing_address_2 = $10, billing_city = $11,
-                billing_state = $12, billing_postcode = $13, billing_country = $14,
-                billing_email = $15, billing_phone = $16,
-                shipping_first_name = $17, shipping_last_name = $18, shipping_company = $19,
-                shipping_address_1 = $20, shipping_address_2 = $21, shipping_city = $22,
-                shipping_state = $23, shipping_postcode = $24, shipping_country = $25,
-                is_paying_customer = $26, avatar_url = $27,
-                date_created = $28, date_modified = $29,
-                last_sync_at = $30, updated_by = $31, updated_at = $32
-            WHERE customer_id = $33
-        """
-        await execute_query(
-            query,
-            woo_customer.get('email'),
-            woo_customer.get('username'),
-            woo_customer.get('first_name'),
-            woo_customer.get('last_name'),
-            woo_customer.get('role', 'customer'),
-            billing.get('first_name'),
-            billing.get('last_name'),
-            billing.get('company'),
-            billing.get('address_1'),
-            billing.get('address_2'),
-            billing.get('city'),
-            billing.get('state'),
-            billing.get('postcode'),
-            billing.get('country'),
-            billing.get('email'),
-            billing.get('phone'),
-            shipping.get('first_name'),
-            shipping.get('last_name'),
-            shipping.get('company'),
-            shipping.get('address_1'),
-            shipping.get('address_2'),
-            shipping.get('city'),
-            shipping.get('state'),
-            shipping.get('postcode'),
-            shipping.get('country'),
-            woo_customer.get('is_paying_customer', False),
-            woo_customer.get('avatar_url'),
-            date_created,
-            date_modified,
-            datetime.utcnow(),
-            synced_by,
-            datetime.utcnow(),
-            customer_id
-        )
-        _sync_progress["updated"] += 1
-    else:
-        # Insert new customer
-        query = """
-            INSERT INTO woo_customers (
-                customer_id, email, username, first_name, last_name, role,
-                billing_first_name, billing_last_name, billing_company,
-                billing_address_1, billing_address_2, billing_city,
-                billing_state, billing_postcode, billing_country,
-                billing_email, billing_phone,
-                shipping_first_name, shipping_last_name, shipping_company,
-                shipping_address_1, shipping_address_2, shipping_city,
-                shipping_state, shipping_postcode, shipping_country,
-                is_paying_customer, avatar_url,
-                date_created, date_modified,
-                last_sync_at, created_by, updated_by
-            ) VALUES (
-                $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15,
-                $16, $17, $18, $19, $20, $21, $22, $23, $24, $25, $26, $27, $28,
-                $29, $30, $31, $32, $33
+async def _fetch_woo_customers() -> List[Dict]:
+    """Fetch up to WOO_CUSTOMER_SYNC_MAX customers, several pages at a time"""
+    api_url, consumer_key, consumer_secret = await WooCommerceService.get_api_credentials()
+    per_page = 100  # WooCommerce max per page
+
+    async with httpx.AsyncClient(
+        auth=(consumer_key, consumer_secret),
+        transport=httpx.AsyncHTTPTransport(retries=3),
+        timeout=30.0
+    ) as client:
+        async def fetch_page(page: int):
+            response = await client.get(
+                f"{api_url}/customers",
+                params={'per_page': per_page, 'page': page, 'order': 'asc', 'orderby': 'id'}
             )
-        """
-        await execute_query(
-            query,
-            customer_id,
-            woo_customer.get('email'),
-            woo_customer.get('username'),
-            woo_customer.get('first_name'),
-            woo_customer.get('last_name'),
-            woo_customer.get('role', 'customer'),
-            billing.get('first_name'),
-            billing.get('last_name'),
-            billing.get('company'),
-            billing.get('address_1'),
-            billing.get('address_2'),
-            billing.get('city'),
-            billing.get('state'),
-            billing.get('postcode'),
-            billing.get('country'),
-            billing.get('email'),
-            billing.get('phone'),
-            shipping.get('first_name'),
-            shipping.get('last_name'),
-            shipping.get('company'),
-            shipping.get('address_1'),
-            shipping.get('address_2'),
-            shipping.get('city'),
-            shipping.get('state'),
-            shipping.get('postcode'),
-            shipping.get('country'),
-            woo_customer.get('is_paying_customer', False),
-            woo_customer.get('avatar_url'),
-            date_created,
-            date_modified,
-            datetime.utcnow(),
-            synced_by,
-            synced_by
+            response.raise_for_status()
+            total_pages = int(response.headers.get('X-WP-TotalPages', 1))
+            return response.json(), page < total_pages
+
+        return await contact_sync_service.fetch_all_pages(
+            fetch_page,
+            max_pages=(WOO_CUSTOMER_SYNC_MAX + per_page - 1) // per_page
         )
-        _sync_progress["added"] += 1
+
+
+def _customer_frame(customers: List[Dict]) -> pd.DataFrame:
+    """Normalize WooCommerce customers (billing/shipping flattened) into woo_customers columns"""
+    df = contact_sync_service.flatten_records(customers)
+    if df.empty:
+        return df
+    c = contact_sync_service
+
+    frame = pd.DataFrame({
+        "customer_id": pd.to_numeric(c.column(df, "id"), errors="coerce").astype("Int64"),
+        "email": c.column(df, "email"),
+        "username": c.column(df, "username"),
+        "first_name": c.column(df, "first_name"),
+        "last_name": c.column(df, "last_name"),
+        "role": c.column(df, "role", "customer"),
+        "is_paying_customer": c.column(df, "is_paying_customer", False).astype(bool),
+        "avatar_url": c.column(df, "avatar_url"),
+        "date_created": c.parse_datetimes(c.column(df, "date_created"), naive=True),
+        "date_modified": c.parse_datetimes(c.column(df, "date_modified"), naive=True),
+    })
+    for prefix in ("billing", "shipping"):
+        for field in ADDRESS_FIELDS[prefix]:
+            frame[f"{prefix}_{field}"] = c.column(df, f"{prefix}_{field}")
+    return frame[[WOO_CUSTOMER_SYNC.key, *WOO_CUSTOMER_SYNC.columns]]
 
 
 async def get_sync_progress() -> Dict:
     """
-    Get current sync progress
-    
+    Get progress of the latest sync run (from sync_runs, so it is the same
+    on every worker)
+
     Returns:
         Dict with progress information including percentage and ETA
     """
-    progress = _sync_progress.copy()
-    
-    # Calculate percentage
-    if progress["total"] > 0:
-        progress["percentage"] = int((progress["current"] / progress["total"]) * 100)
-    else:
-        progress["percentage"] = 0
-    
-    return progress
+    return await sync_runner_service.get_progress("woo_customers")
 
 
 # ============================================================================
@@ -2,37 +2,66 @@
 ================================================================================
 Woo to Zoho Export Service
 ================================================================================
-Version: 1.0.0
+Version: 1.1.0
 Created: 2025-12-03
+Last Updated: 2026-10-18
 
 Service for exporting WooCommerce orders to Zoho Books format.
 Handles fetching orders, mapping products, generating files, and tracking history.
+
+Orders are flattened once into an order frame and a line item frame; the
+product mapping is applied as a join and names, HSN, usage units, tax and
+prices are computed column-wise. The summary workbook is streamed with an
+openpyxl write-only workbook, column widths taken from column stats.
 ================================================================================
 """
 
 import logging
 import io
-import csv
 import zipfile
-from typing import List, Dict, Any, Tuple, Optional
-from datetime import date, datetime
+from typing import List, Dict, Tuple, Optional
+from datetime import date
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment
 
 from app.database import fetch_all, fetch_one, execute_query
+from app.services.contact_sync_service import flatten_records, column, first_present
 from app.services.woocommerce_service import WooCommerceService
 
 logger = logging.getLogger(__name__)
 
+# Invoice CSV columns, in Zoho Books import order
+INVOICE_COLUMNS = [
+    "Invoice Number", "PurchaseOrder", "Invoice Date", "Invoice Status", "Customer Name",
+    "Place of Supply", "Currency Code", "Item Name", "HSN/SAC", "Item Type", "Quantity",
+    "Usage unit", "Item Price", "Is Inclusive Tax", "Item Tax %", "Discount Type",
+    "Is Discount Before Tax", "Entity Discount Amount", "Shipping Charge",
+    "Item Tax Exemption Reason", "Supply Type", "GST Treatment",
+]
+
+REPLACEMENT_COLUMNS = [
+    "Product ID", "Variation ID", "Original WooCommerce Name", "Replaced Zoho Name", "HSN", "Usage Unit",
+]
+
+MAPPING_COLUMNS = ['lookup_id', 'zoho_name', 'hsn', 'usage_units']
+
+# Line item meta_data keys used when the product mapping has no value
+META_FALLBACK_KEYS = {'hsn': 'meta_hsn', 'usage unit': 'meta_usage_unit'}
+
+# Characters added to the longest value when sizing a summary column
+COLUMN_WIDTH_PADDING = 2
+
 class WooToZohoService:
     
     @staticmethod
-    async def get_product_mapping() -> Dict[int, Dict[str, str]]:
+    async def get_product_mapping() -> pd.DataFrame:
         """
         Fetch product mapping from database.
-        Returns dict: {product_id or variation_id: {'zoho_name', 'hsn', 'usage_units'}}
+        Returns frame with lookup_id (variation_id if set, else product_id),
+        zoho_name, hsn and usage_units
         """
         try:
             # Fetch active products with mapping info
@@ -42,21 +71,20 @@ class WooToZohoService:
                 WHERE is_active = true
             """
             rows = await fetch_all(query)
-            
-            mapping = {}
-            for row in rows:
-                # Use variation_id if exists, otherwise product_id
-                key = row['variation_id'] if row['variation_id'] else row['product_id']
-                if key:
-                    mapping[key] = {
-                        'zoho_name': row.get('zoho_name') or '',
-                        'hsn': row.get('hsn') or '',
-                        'usage_units': row.get('usage_units') or ''
-                    }
-            return mapping
+            df = pd.DataFrame(rows, columns=['product_id', 'variation_id', 'zoho_name', 'hsn', 'usage_units'])
+
+            # Use variation_id if exists, otherwise product_id
+            variation_id = pd.to_numeric(df['variation_id'], errors='coerce').fillna(0)
+            product_id = pd.to_numeric(df['product_id'], errors='coerce').fillna(0)
+            df['lookup_id'] = variation_id.where(variation_id != 0, product_id).astype('int64')
+            df = df[df['lookup_id'] != 0]
+
+            for name in ('zoho_name', 'hsn', 'usage_units'):
+                df[name] = df[name].fillna('').astype(str)
+            return df.drop_duplicates(subset=['lookup_id'], keep='last')[MAPPING_COLUMNS].reset_index(drop=True)
         except Exception as e:
             logger.error(f"Error fetching product mapping: {e}")
-            return {}
+            return pd.DataFrame(columns=MAPPING_COLUMNS)
 
     @staticmethod
     async def get_last_sequence(prefix: str) -> Optional[int]:
@@ -85,135 +113,217 @@ class WooToZohoService:
         return await WooCommerceService.fetch_orders(start_date, end_date, status="completed")
 
     @staticmethod
-    def _to_float(x) -> float:
-        """Convert value to float, return 0.0 if invalid."""
-        try:
-            if x is None or x == "":
-                return 0.0
-            return float(x)
-        except Exception:
-            return 0.0
+    def _numbers(values: pd.Series) -> pd.Series:
+        """Column as floats; blank or invalid values become 0.0"""
+        return pd.to_numeric(values, errors='coerce').fillna(0.0).astype(float)
+
+    @staticmethod
+    def _explode_records(values: pd.Series, columns: List[str]) -> pd.DataFrame:
+        """
+        Nested lists of dicts (line_items, refunds, meta_data) as one frame
+        indexed by the parent row, with the given columns.
+        """
+        exploded = values.explode()
+        exploded = exploded[exploded.map(lambda value: isinstance(value, dict))]
+        if exploded.empty:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame(exploded.tolist(), index=exploded.index).reindex(columns=columns)
+
+    @staticmethod
+    def _order_frame(orders: List[Dict], invoice_prefix: str, start_sequence: int) -> pd.DataFrame:
+        """
+        One row per order, sorted by order ID, with its invoice number, dates,
+        customer and net total (order total minus refunds).
+        """
+        df = flatten_records(orders)
+        df = df.assign(id=pd.to_numeric(column(df, 'id', 0), errors='coerce').fillna(0).astype('int64'))
+        df = df.sort_values('id', kind='stable').reset_index(drop=True)
+
+        sequence = pd.Series(range(start_sequence, start_sequence + len(df)), index=df.index)
+
+        # WooCommerce date_created is site-local time without an offset
+        raw_dates = column(df, 'date_created', '').astype(str)
+        order_dates = pd.to_datetime(raw_dates.where(raw_dates != ''), errors='coerce', format='ISO8601')
+        invoice_dates = order_dates.dt.strftime('%Y-%m-%d').where(
+            order_dates.notna(), raw_dates.str.split('T').str[0]
+        )
+
+        customer_names = (
+            column(df, 'billing_first_name', '').astype(str) + ' ' + column(df, 'billing_last_name', '').astype(str)
+        ).str.strip()
+
+        # Refund amount is 'amount' or, when blank, 'total'
+        refunds = WooToZohoService._explode_records(column(df, 'refunds'), ['amount', 'total'])
+        refunds = refunds.where(refunds.astype(str) != '')
+        refund_totals = (
+            WooToZohoService._numbers(first_present(refunds, 'amount', 'total'))
+            .groupby(level=0).sum()
+            .reindex(df.index, fill_value=0.0)
+        )
+
+        return pd.DataFrame({
+            'id': df['id'],
+            'sequence_number': sequence,
+            'invoice_number': invoice_prefix + sequence.astype(str).str.zfill(5),
+            'invoice_date': invoice_dates,
+            'order_date': order_dates,
+            'status': column(df, 'status', '').astype(str).str.capitalize(),
+            'customer_name': customer_names,
+            'place_of_supply': column(df, 'billing_state', ''),
+            'currency': column(df, 'currency', ''),
+            'shipping_charge': WooToZohoService._numbers(column(df, 'shipping_total', 0)),
+            'entity_discount': WooToZohoService._numbers(column(df, 'discount_total', 0)),
+            'net_total': WooToZohoService._numbers(column(df, 'total', 0)) - refund_totals,
+            'line_items': column(df, 'line_items'),
+        })
+
+    @staticmethod
+    def _line_item_frame(orders_df: pd.DataFrame, product_mapping: pd.DataFrame) -> pd.DataFrame:
+        """
+        One row per line item with its order fields, joined to the product
+        mapping on variation_id (or product_id for simple products). Items
+        without a mapped HSN / usage unit fall back to their meta_data.
+        """
+        items = WooToZohoService._explode_records(
+            orders_df['line_items'], ['name', 'product_id', 'variation_id', 'quantity', 'subtotal', 'tax_class', 'meta_data']
+        )
+        items = items.join(orders_df.drop(columns=['line_items'])).reset_index(drop=True)
+
+        for name in ('product_id', 'variation_id'):
+            items[name] = pd.to_numeric(items[name], errors='coerce').fillna(0).astype('int64')
+        items['lookup_id'] = items['variation_id'].where(items['variation_id'] != 0, items['product_id'])
+
+        mapping = product_mapping.astype({'lookup_id': 'int64'})
+        items = items.merge(mapping, on='lookup_id', how='left')
+        for name in ('zoho_name', 'hsn', 'usage_units'):
+            items[name] = items[name].fillna('').astype(str)
+
+        # First 'hsn' / 'usage unit' meta entry per item
+        meta = WooToZohoService._explode_records(items['meta_data'], ['key', 'value'])
+        meta['key'] = meta['key'].fillna('').astype(str).str.lower()
+        meta = meta[meta['key'].isin(META_FALLBACK_KEYS)].rename_axis('item').reset_index()
+        meta = meta.drop_duplicates(subset=['item', 'key'], keep='first')
+        fallback = (
+            meta.pivot(index='item', columns='key', values='value')
+            .rename(columns=META_FALLBACK_KEYS)
+            .reindex(index=items.index, columns=list(META_FALLBACK_KEYS.values()))
+        )
+        fallback = fallback.where(fallback.notna(), '').astype(str)
+
+        items['name'] = items['name'].fillna('').astype(str)
+        items['mapped'] = items['zoho_name'] != ''
+        items['item_name'] = items['zoho_name'].where(items['mapped'], items['name'])
+        items['hsn_final'] = items['hsn'].where(items['hsn'] != '', fallback['meta_hsn'])
+        items['usage_unit_final'] = items['usage_units'].where(items['usage_units'] != '', fallback['meta_usage_unit'])
+        return items
 
     @staticmethod
-    async def transform_orders(
-        orders: List[Dict], 
-        product_mapping: Dict, 
-        invoice_prefix: str, 
+    def build_export_frames(
+        orders: List[Dict],
+        product_mapping: pd.DataFrame,
+        invoice_prefix: str,
         start_sequence: int
-    ) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         """
-        Transform orders into CSV rows and replacements log.
-        Returns: (csv_rows, replacements_log, completed_orders)
+        Transform orders into the invoice CSV, replacements log and order frames.
+        Orders are numbered in order ID order starting at start_sequence.
+        Returns: (invoice_df, replacements_df, orders_df)
         """
-        # Sort by ID
-        orders.sort(key=lambda x: x.get("id", 0))
-        
-        csv_rows = []
-        replacements_log = []
-        sequence_number = start_sequence
-        
-        for order in orders:
-            order_id = order.get("id")
-            invoice_number = f"{invoice_prefix}{sequence_number:05d}"
-            sequence_number += 1
-            
-            # Parse date
-            date_created = order.get("date_created")
-            invoice_date = ""
-            if date_created:
-                try:
-                    dt = datetime.fromisoformat(date_created)
-                    invoice_date = dt.strftime("%Y-%m-%d")
-                except ValueError:
-                    invoice_date = str(date_created).split('T')[0]
-
-            billing = order.get('billing', {})
-            customer_name = f"{billing.get('first_name','')} {billing.get('last_name','')}".strip()
-            place_of_supply = billing.get('state', '')
-            currency = order.get('currency', '')
-            shipping_charge = WooToZohoService._to_float(order.get('shipping_total', 0))
-            entity_discount = WooToZohoService._to_float(order.get('discount_total', 0))
-
-            for item in order.get("line_items", []):
-                original_item_name = item.get("name", "")
-                variation_id = item.get("variation_id", 0)
-                product_id = item.get("product_id", 0)
-                
-                # Match by variation_id first, then product_id
-                lookup_id = variation_id if variation_id else product_id
-                
-                mapping = product_mapping.get(lookup_id, {})
-                
-                item_name_final = mapping.get("zoho_name") or original_item_name
-                hsn = mapping.get("hsn", "")
-                usage_unit = mapping.get("usage_units", "")
-                
-                # Log replacement if zoho_name used
-                if mapping.get("zoho_name"):
-                    replacements_log.append({
-                        "Product ID": product_id,
-                        "Variation ID": variation_id if variation_id else "-",
-                        "Original WooCommerce Name": original_item_name,
-                        "Replaced Zoho Name": item_name_final,
-                        "HSN": hsn,
-                        "Usage Unit": usage_unit
-                    })
-                
-                # Fallback to meta data if not mapped
-                if not hsn or not usage_unit:
-                    for meta in item.get("meta_data", []) or []:
-                        key = str(meta.get("key", "")).lower()
-                        if key == "hsn" and not hsn:
-                            hsn = str(meta.get("value", ""))
-                        if key == "usage unit" and not usage_unit:
-                            usage_unit = str(meta.get("value", ""))
-
-                # Tax
-                try:
-                    item_tax_pct = float(item.get("tax_class") or 0)
-                except (TypeError, ValueError):
-                    item_tax_pct = 0.0
-
-                # HSN formatting for Excel (prevent leading zero stripping)
-                hsn_formatted = f"'{hsn}" if hsn else ""
-
-                quantity = item.get("quantity", 0)
-                subtotal = WooToZohoService._to_float(item.get("subtotal", 0))
-                unit_price = subtotal / quantity if quantity > 0 else 0.0
-
-                row = {
-                    "Invoice Number": invoice_number,
-                    "PurchaseOrder": order_id,
-                    "Invoice Date": invoice_date,
-                    "Invoice Status": str(order.get("status", "")).capitalize(),
-                    "Customer Name": customer_name,
-                    "Place of Supply": place_of_supply,
-                    "Currency Code": currency,
-                    "Item Name": item_name_final,
-                    "HSN/SAC": hsn_formatted,
-                    "Item Type": "goods", # Default
-                    "Quantity": quantity,
-                    "Usage unit": usage_unit,
-                    "Item Price": unit_price,
-                    "Is Inclusive Tax": "FALSE",
-                    "Item Tax %": item_tax_pct,
-                    "Discount Type": "entity_level",
-                    "Is Discount Before Tax": "TRUE",
-                    "Entity Discount Amount": entity_discount,
-                    "Shipping Charge": shipping_charge,
-                    "Item Tax Exemption Reason": "ITEM EXEMPT FROM GST",
-                    "Supply Type": "Exempted",
-                    "GST Treatment": "consumer"
-                }
-                csv_rows.append(row)
-                
-        return csv_rows, replacements_log, orders
+        orders_df = WooToZohoService._order_frame(orders, invoice_prefix, start_sequence)
+        if orders_df.empty:
+            return pd.DataFrame(columns=INVOICE_COLUMNS), pd.DataFrame(columns=REPLACEMENT_COLUMNS), orders_df
+
+        items = WooToZohoService._line_item_frame(orders_df, product_mapping)
+
+        quantity = pd.to_numeric(items['quantity'], errors='coerce').fillna(0)
+        subtotal = WooToZohoService._numbers(items['subtotal'])
+        # HSN formatting for Excel (prevent leading zero stripping)
+        hsn_formatted = ("'" + items['hsn_final']).where(items['hsn_final'] != '', '')
+
+        invoice_df = pd.DataFrame({
+            "Invoice Number": items['invoice_number'],
+            "PurchaseOrder": items['id'],
+            "Invoice Date": items['invoice_date'],
+            "Invoice Status": items['status'],
+            "Customer Name": items['customer_name'],
+            "Place of Supply": items['place_of_supply'],
+            "Currency Code": items['currency'],
+            "Item Name": items['item_name'],
+            "HSN/SAC": hsn_formatted,
+            "Item Type": "goods",  # Default
+            "Quantity": quantity,
+            "Usage unit": items['usage_unit_final'],
+            "Item Price": (subtotal / quantity.where(quantity > 0)).fillna(0.0),
+            "Is Inclusive Tax": "FALSE",
+            "Item Tax %": WooToZohoService._numbers(items['tax_class']),
+            "Discount Type": "entity_level",
+            "Is Discount Before Tax": "TRUE",
+            "Entity Discount Amount": items['entity_discount'],
+            "Shipping Charge": items['shipping_charge'],
+            "Item Tax Exemption Reason": "ITEM EXEMPT FROM GST",
+            "Supply Type": "Exempted",
+            "GST Treatment": "consumer",
+        }, columns=INVOICE_COLUMNS)
+
+        # Log of items whose name was replaced by the Zoho name
+        replaced = items[items['mapped']]
+        replacements_df = pd.DataFrame({
+            "Product ID": replaced['product_id'],
+            "Variation ID": replaced['variation_id'].astype(object).where(replaced['variation_id'] != 0, "-"),
+            "Original WooCommerce Name": replaced['name'],
+            "Replaced Zoho Name": replaced['item_name'],
+            "HSN": replaced['hsn'],
+            "Usage Unit": replaced['usage_units'],
+        }, columns=REPLACEMENT_COLUMNS).reset_index(drop=True)
+
+        return invoice_df, replacements_df, orders_df.drop(columns=['line_items'])
+
+    @staticmethod
+    def _column_widths(df: pd.DataFrame) -> List[int]:
+        """Column widths from the longest header or value in each column"""
+        widths = []
+        for name in df.columns:
+            longest = df[name].astype(str).str.len().max() if len(df) else 0
+            widths.append(max(len(str(name)), int(longest)) + COLUMN_WIDTH_PADDING)
+        return widths
+
+    @staticmethod
+    def _write_workbook(sheets: Dict[str, pd.DataFrame]) -> bytes:
+        """
+        Write frames as sheets with a write-only (streaming) workbook: bold
+        centered headers, widths sized from column stats before any row is
+        written.
+        """
+        wb = Workbook(write_only=True)
+        header_font = Font(bold=True)
+        header_alignment = Alignment(horizontal="center")
+
+        for sheet_name, df in sheets.items():
+            ws = wb.create_sheet(title=sheet_name)
+            for index, width in enumerate(WooToZohoService._column_widths(df), start=1):
+                ws.column_dimensions[get_column_letter(index)].width = width
+
+            header = []
+            for name in df.columns:
+                cell = WriteOnlyCell(ws, value=str(name))
+                cell.font = header_font
+                cell.alignment = header_alignment
+                header.append(cell)
+            ws.append(header)
+
+            values = df.astype(object).where(df.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                ws.append(row)
+
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
 
     @staticmethod
     def generate_files(
-        csv_rows: List[Dict], 
-        orders: List[Dict], 
-        invoice_prefix: str, 
+        invoice_df: pd.DataFrame,
+        orders_df: pd.DataFrame,
+        invoice_prefix: str,
         start_sequence: int,
         start_date: date,
         end_date: date
@@ -222,56 +332,18 @@ class WooToZohoService:
         Generate ZIP file containing CSV and Excel summary.
         """
         # 1. Create CSV
-        df_csv = pd.DataFrame(csv_rows)
-        csv_buffer = io.StringIO()
-        df_csv.to_csv(csv_buffer, index=False)
-        csv_bytes = csv_buffer.getvalue().encode('utf-8')
+        csv_bytes = invoice_df.to_csv(index=False).encode('utf-8')
 
         # 2. Create Excel Summary
-        # Calculate summary metrics
-        total_orders = len(orders)
-        total_revenue = 0.0
-        
-        order_details_rows = []
-        seq_temp = start_sequence
-        
-        for order in orders:
-            order_total = WooToZohoService._to_float(order.get("total", 0))
-            refunds = order.get("refunds") or []
-            refund_total = sum(WooToZohoService._to_float(r.get("amount") or r.get("total") or 0) for r in refunds)
-            net_total = order_total - refund_total
-            total_revenue += net_total
-            
-            invoice_number = f"{invoice_prefix}{seq_temp:05d}"
-            seq_temp += 1
-            
-            # Date formatting
-            date_created = order.get("date_created")
-            order_date = ""
-            if date_created:
-                try:
-                    dt = datetime.fromisoformat(date_created)
-                    order_date = dt.strftime("%Y-%m-%d")
-                except ValueError:
-                    order_date = str(date_created).split('T')[0]
-            
-            billing = order.get('billing', {})
-            customer_name = f"{billing.get('first_name','')} {billing.get('last_name','')}".strip()
-
-            order_details_rows.append({
-                "Invoice Number": invoice_number,
-                "Order Number": order.get("id"),
-                "Date": order_date,
-                "Customer Name": customer_name,
-                "Order Total": net_total
-            })
-
-        first_order_id = orders[0].get("id") if orders else ""
-        last_order_id = orders[-1].get("id") if orders else ""
+        total_orders = len(orders_df)
+        total_revenue = float(orders_df['net_total'].sum()) if total_orders else 0.0
+
+        first_order_id = orders_df['id'].iloc[0] if total_orders else ""
+        last_order_id = orders_df['id'].iloc[-1] if total_orders else ""
         first_inv = f"{invoice_prefix}{start_sequence:05d}"
-        last_inv = f"{invoice_prefix}{(start_sequence + total_orders - 1):05d}" if orders else ""
+        last_inv = f"{invoice_prefix}{(start_sequence + total_orders - 1):05d}" if total_orders else ""
 
-        summary_data = {
+        df_summary = pd.DataFrame({
             "Metric": [
                 "Total Orders Fetched",
                 "Completed Orders",
@@ -286,50 +358,31 @@ class WooToZohoService:
                 f"{first_order_id} -> {last_order_id}",
                 f"{first_inv} -> {last_inv}"
             ]
-        }
-        
-        df_summary = pd.DataFrame(summary_data)
-        df_details = pd.DataFrame(order_details_rows)
-        
+        })
+
+        df_details = pd.DataFrame({
+            "Invoice Number": orders_df['invoice_number'],
+            "Order Number": orders_df['id'],
+            "Date": orders_df['invoice_date'],
+            "Customer Name": orders_df['customer_name'],
+            "Order Total": orders_df['net_total'],
+        })
+
         # Add grand total
         if not df_details.empty:
-            grand_total = df_details["Order Total"].sum()
             grand_total_row = pd.DataFrame([{
                 "Invoice Number": "Grand Total",
                 "Order Number": "",
                 "Date": "",
                 "Customer Name": "",
-                "Order Total": grand_total
+                "Order Total": total_revenue
             }])
             df_details = pd.concat([df_details, grand_total_row], ignore_index=True)
 
-        # Write Excel
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            df_summary.to_excel(writer, index=False, sheet_name="Summary Metrics")
-            df_details.to_excel(writer, index=False, sheet_name="Order Details")
-            
-            # Formatting
-            for sheet_name in writer.sheets:
-                ws = writer.sheets[sheet_name]
-                # Header bold
-                for cell in ws[1]:
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal="center")
-                # Auto width
-                for col in ws.columns:
-                    max_length = 0
-                    column = col[0].column_letter # Get the column name
-                    for cell in col:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = (max_length + 2)
-                    ws.column_dimensions[column].width = adjusted_width
-
-        excel_bytes = excel_buffer.getvalue()
+        excel_bytes = WooToZohoService._write_workbook({
+            "Summary Metrics": df_summary,
+            "Order Details": df_details,
+        })
 
         # 3. Zip it
         zip_buffer = io.BytesIO()
@@ -337,83 +390,51 @@ class WooToZohoService:
             date_str = f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
             zf.writestr(f"orders_{date_str}.csv", csv_bytes)
             zf.writestr(f"summary_report_{date_str}.xlsx", excel_bytes)
-        
+
         zip_buffer.seek(0)
         return zip_buffer.getvalue()
 
     @staticmethod
     async def save_history(
-        orders: List[Dict],
+        orders_df: pd.DataFrame,
         invoice_prefix: str,
-        start_sequence: int,
         start_date: date,
         end_date: date,
         user_id: str
     ):
-        """Save export history to database."""
+        """Save export history to database (one INSERT for the whole export)."""
         try:
-            seq = start_sequence
-            
-            # Prepare batch insert
-            # Note: asyncpg supports executemany but we need to construct the query
-            # For simplicity and safety, we'll loop or use a bulk insert query construction
-            # Given the number of orders might be 100-200, a loop is okay-ish but bulk is better.
-            # Let's use a loop for now as it's safer with error handling, or construct a large INSERT.
-            
-            values = []
-            for order in orders:
-                invoice_number = f"{invoice_prefix}{seq:05d}"
-                order_total = WooToZohoService._to_float(order.get("total", 0))
-                refunds = order.get("refunds") or []
-                refund_total = sum(WooToZohoService._to_float(r.get("amount") or r.get("total") or 0) for r in refunds)
-                net_total = order_total - refund_total
-                
-                billing = order.get('billing', {})
-                customer_name = f"{billing.get('first_name','')} {billing.get('last_name','')}".strip()
-                
-                # Parse date
-                date_created = order.get("date_created")
-                order_dt = None
-                if date_created:
-                    try:
-                        order_dt = datetime.fromisoformat(date_created)
-                    except ValueError:
-                        pass
-
-                values.append((
-                    invoice_number,
-                    invoice_prefix,
-                    seq,
-                    order.get('id'),
-                    order_dt,
-                    customer_name,
-                    net_total,
-                    start_date,
-                    end_date,
-                    len(orders),
-                    user_id
-                ))
-                seq += 1
-
-            # Bulk insert query
-            query = """
+            order_dates = [None if pd.isna(value) else value.to_pydatetime() for value in orders_df['order_date']]
+
+            await execute_query(
+                """
                 INSERT INTO export_history (
-                    invoice_number, invoice_prefix, sequence_number, order_id, 
-                    order_date, customer_name, order_total, 
+                    invoice_number, invoice_prefix, sequence_number, order_id,
+                    order_date, customer_name, order_total,
                     date_range_start, date_range_end, total_orders_in_export, exported_by
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-            """
-            
-            # We need to execute this for each row. 
-            # app.database.execute_query runs fetchval/execute.
-            # We can't easily access executemany via the helper.
-            # So we'll iterate.
-            for v in values:
-                await execute_query(query, *v)
-                
-            logger.info(f"Saved {len(values)} export history records")
+                )
+                SELECT h.invoice_number, $7, h.sequence_number, h.order_id,
+                       h.order_date, h.customer_name, h.order_total,
+                       $8, $9, $10, $11
+                FROM unnest($1::text[], $2::int[], $3::bigint[], $4::timestamptz[], $5::text[], $6::numeric[])
+                    AS h(invoice_number, sequence_number, order_id, order_date, customer_name, order_total)
+                """,
+                orders_df['invoice_number'].tolist(),
+                orders_df['sequence_number'].tolist(),
+                orders_df['id'].tolist(),
+                order_dates,
+                orders_df['customer_name'].tolist(),
+                orders_df['net_total'].round(2).tolist(),
+                invoice_prefix,
+                start_date,
+                end_date,
+                len(orders_df),
+                user_id
+            )
+
+            logger.info(f"Saved {len(orders_df)} export history records")
             return True
-            
+
         except Exception as e:
             logger.error(f"Error saving history: {e}")
             return False
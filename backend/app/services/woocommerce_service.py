@@ -13,6 +13,7 @@ Description:
 
 Features:
     - Concurrent fetching for performance (3x faster for 100-200 orders)
+    - Batch product/variation updates (up to 100 per request)
     - Retry strategy for transient failures
     - Connection pooling for efficiency
     - Comprehensive error handling
@@ -22,7 +23,7 @@ Features:
 
 import httpx
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 from datetime import date
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import asyncio
@@ -31,6 +32,9 @@ from app.database import fetch_one
 
 logger = logging.getLogger(__name__)
 
+# WooCommerce batch endpoints accept at most 100 objects per request
+WOO_BATCH_LIMIT = 100
+
 
 class WooCommerceService:
     """Service for interacting with WooCommerce API"""
@@ -554,3 +558,105 @@ class WooCommerceService:
         except Exception as e:
             logger.error(f"Error updating variation {variation_id}: {str(e)}")
             return False
+    
+    @staticmethod
+    async def _post_batch_update(
+        client: httpx.AsyncClient,
+        url: str,
+        updates: List[Dict[str, Any]]
+    ) -> Dict[int, Optional[str]]:
+        """
+        POST one chunk to a WooCommerce batch endpoint
+        
+        Args:
+            client: Async HTTPX client with auth
+            url: products/batch or products/{id}/variations/batch URL
+            updates: Up to WOO_BATCH_LIMIT objects, each with an 'id'
+            
+        Returns:
+            Dict of {object id: error message, or None if updated}
+        """
+        try:
+            response = await client.post(url, json={'update': updates})
+            
+            if response.status_code == 429:
+                # Rate limited - wait and retry once
+                retry_after = int(response.headers.get('Retry-After', 5))
+                await asyncio.sleep(retry_after)
+                response = await client.post(url, json={'update': updates})
+            
+            if response.status_code not in (200, 201):
+                error = f"WooCommerce batch update failed: Status {response.status_code}"
+                logger.error(f"{error} ({url}, {len(updates)} objects)")
+                return {update['id']: error for update in updates}
+            
+            results = {}
+            for obj in response.json().get('update', []):
+                error = obj.get('error')
+                results[obj.get('id')] = error.get('message', 'Update failed') if error else None
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error posting batch update to {url}: {str(e)}")
+            return {update['id']: str(e) for update in updates}
+    
+    @staticmethod
+    async def batch_update_products(
+        product_updates: List[Dict[str, Any]],
+        variation_updates: Dict[int, List[Dict[str, Any]]],
+        max_concurrent: int = 3
+    ) -> Dict[Tuple[int, Optional[int]], Optional[str]]:
+        """
+        Update products and variations through the WooCommerce batch endpoints
+        
+        Simple products go to products/batch; variations are grouped by parent
+        and go to products/{id}/variations/batch, WOO_BATCH_LIMIT per request.
+        
+        Args:
+            product_updates: Objects with 'id' plus fields to update
+            variation_updates: {parent product ID: objects with variation 'id' plus fields}
+            max_concurrent: Batch requests in flight at once
+            
+        Returns:
+            Dict of {(product_id, variation_id or None): error message, or None if updated}
+        """
+        api_url, consumer_key, consumer_secret = await WooCommerceService.get_api_credentials()
+        
+        semaphore = asyncio.Semaphore(max_concurrent)
+        results: Dict[Tuple[int, Optional[int]], Optional[str]] = {}
+        
+        async with httpx.AsyncClient(
+            auth=(consumer_key, consumer_secret),
+            transport=httpx.AsyncHTTPTransport(retries=3),
+            timeout=60.0
+        ) as client:
+            
+            async def push(url: str, chunk: List[Dict[str, Any]], parent_id: Optional[int]):
+                async with semaphore:
+                    outcome = await WooCommerceService._post_batch_update(client, url, chunk)
+                for update in chunk:
+                    key = (parent_id, update['id']) if parent_id is not None else (update['id'], None)
+                    results[key] = outcome.get(update['id'], 'Missing from WooCommerce batch response')
+            
+            tasks = [
+                push(f"{api_url}/products/batch", product_updates[i:i + WOO_BATCH_LIMIT], None)
+                for i in range(0, len(product_updates), WOO_BATCH_LIMIT)
+            ]
+            for parent_id, updates in variation_updates.items():
+                tasks.extend(
+                    push(
+                        f"{api_url}/products/{parent_id}/variations/batch",
+                        updates[i:i + WOO_BATCH_LIMIT],
+                        parent_id
+                    )
+                    for i in range(0, len(updates), WOO_BATCH_LIMIT)
+                )
+            
+            await asyncio.gather(*tasks)
+        
+        failed = sum(1 for error in results.values() if error)
+        logger.info(
+            f"WooCommerce batch update: {len(results) - failed} updated, {failed} failed "
+            f"in {len(tasks)} requests"
+        )
+        return results
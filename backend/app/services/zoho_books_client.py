@@ -5,84 +5,181 @@ Zoho Books API Client
 Version: 1.0.0
 Created: 2025-12-02
 
-Service for authenticating and fetching data from Zoho Books API
+Service for authenticating and fetching data from Zoho Books API.
+The OAuth access token is shared by all workers through the oauth_tokens
+table and refreshed single-flight before it expires. All API calls go
+through zoho_request (rate limiting, retries, quota metrics).
 ================================================================================
 """
 
+import asyncio
 import httpx
 import logging
-from typing import List, Dict, Optional
+import random
+import time
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from fastapi import HTTPException, status
 
+from app.config import settings
 from app.services import settings_service
-from app.database import get_db
+from app.database import get_db, DatabaseTransaction
+from app.utils.timezone import now_ist
 
 logger = logging.getLogger(__name__)
 
-# Token cache (in-memory, expires after 50 minutes)
+# Zoho OAuth token endpoint and default API base
+ZOHO_TOKEN_URL = "https://accounts.zoho.com/oauth/v2/token"
+ZOHO_DEFAULT_BASE_URL = "https://books.zoho.com/api/v3"
+
+# A token is refreshed this long before it expires
+ZOHO_TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# A worker re-reads the shared token row at most this often, so a token
+# replaced by another worker (or cleared after a credential change) is
+# picked up without a refresh of its own
+ZOHO_TOKEN_LOCAL_TTL = timedelta(seconds=60)
+
+# organization_id / base_url are cached per worker for this long
+ZOHO_CONFIG_TTL = timedelta(minutes=5)
+
+# Worker-local copy of the shared token (oauth_tokens row, provider 'zoho')
 _token_cache = {
     "access_token": None,
-    "expires_at": None
+    "expires_at": None,
+    "checked_at": None
+}
+_token_lock = asyncio.Lock()
+
+# Worker-local API config
+_config_cache = {
+    "organization_id": None,
+    "base_url": None,
+    "loaded_at": None
 }
 
 
-async def get_access_token() -> str:
+def _token_usable(access_token: Optional[str], expires_at: Optional[datetime]) -> bool:
+    return bool(access_token) and expires_at is not None and now_ist() < expires_at - ZOHO_TOKEN_REFRESH_MARGIN
+
+
+def _local_token() -> Optional[str]:
+    checked_at = _token_cache["checked_at"]
+    if checked_at is None or now_ist() - checked_at > ZOHO_TOKEN_LOCAL_TTL:
+        return None
+    if not _token_usable(_token_cache["access_token"], _token_cache["expires_at"]):
+        return None
+    return _token_cache["access_token"]
+
+
+def _remember_token(access_token: str, expires_at: datetime):
+    _token_cache["access_token"] = access_token
+    _token_cache["expires_at"] = expires_at
+    _token_cache["checked_at"] = now_ist()
+
+
+async def _request_new_token(conn) -> Tuple[str, datetime]:
+    """Exchange the refresh token for an access token"""
+    client_id = await settings_service.get_setting(conn, "zoho.client_id")
+    client_secret = await settings_service.get_setting(conn, "zoho.client_secret")
+    refresh_token = await settings_service.get_setting(conn, "zoho.refresh_token")
+
+    if not all([client_id, client_secret, refresh_token]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Zoho Books API credentials not configured. Please set zoho.client_id, zoho.client_secret, and zoho.refresh_token in system settings."
+        )
+
+    payload = {
+        "refresh_token": refresh_token,
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token"
+    }
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(ZOHO_TOKEN_URL, data=payload, timeout=30.0)
+        response.raise_for_status()
+        data = response.json()
+
+    access_token = data.get("access_token")
+    if not access_token:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to obtain access token from Zoho"
+        )
+
+    # Zoho tokens normally last an hour
+    expires_at = now_ist() + timedelta(seconds=int(data.get("expires_in", 3600)))
+    return access_token, expires_at
+
+
+async def get_access_token(force_refresh: bool = False) -> str:
     """
-    Get Zoho Books access token using refresh token
-    Caches token for 50 minutes to avoid unnecessary API calls
-    
+    Get a Zoho Books access token shared by all workers.
+
+    Order of lookup: this worker's copy (re-validated against the database
+    every ZOHO_TOKEN_LOCAL_TTL), then the oauth_tokens row, then a refresh.
+    Refreshes are single-flight: one per worker (asyncio lock) and one
+    across workers (advisory lock; waiting workers re-read the row the
+    winner stored). Tokens are refreshed ZOHO_TOKEN_REFRESH_MARGIN before
+    they expire.
+
+    Args:
+        force_refresh: Replace the stored token (e.g. after a 401)
+
     Returns:
         Access token string
     """
-    # Check if cached token is still valid
-    if _token_cache["access_token"] and _token_cache["expires_at"]:
-        if datetime.utcnow() < _token_cache["expires_at"]:
-            logger.debug("Using cached Zoho access token")
-            return _token_cache["access_token"]
-    
+    if not force_refresh:
+        access_token = _local_token()
+        if access_token:
+            return access_token
+
+    stale_token = _token_cache["access_token"] if force_refresh else None
+
     try:
-        # Get credentials from database
-        pool = get_db()
-        async with pool.acquire() as conn:
-            client_id = await settings_service.get_setting(conn, "zoho.client_id")
-            client_secret = await settings_service.get_setting(conn, "zoho.client_secret")
-            refresh_token = await settings_service.get_setting(conn, "zoho.refresh_token")
-        
-        if not all([client_id, client_secret, refresh_token]):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Zoho Books API credentials not configured. Please set zoho.client_id, zoho.client_secret, and zoho.refresh_token in system settings."
-            )
-        
-        # Exchange refresh token for access token
-        token_url = "https://accounts.zoho.com/oauth/v2/token"
-        payload = {
-            "refresh_token": refresh_token,
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "grant_type": "refresh_token"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(token_url, data=payload, timeout=30.0)
-            response.raise_for_status()
-            data = response.json()
-        
-        access_token = data.get("access_token")
-        if not access_token:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to obtain access token from Zoho"
-            )
-        
-        # Cache token for 50 minutes (Zoho tokens expire after 1 hour)
-        _token_cache["access_token"] = access_token
-        _token_cache["expires_at"] = datetime.utcnow() + timedelta(minutes=50)
-        
-        logger.info("Successfully obtained new Zoho access token")
-        return access_token
-        
+        async with _token_lock:
+            # Another request in this worker may have refreshed meanwhile
+            access_token = _local_token()
+            if access_token and access_token != stale_token:
+                return access_token
+
+            async with DatabaseTransaction() as conn:
+                row = await conn.fetchrow(
+                    "SELECT access_token, expires_at FROM oauth_tokens WHERE provider = 'zoho'"
+                )
+                if row and _token_usable(row["access_token"], row["expires_at"]) and row["access_token"] != stale_token:
+                    _remember_token(row["access_token"], row["expires_at"])
+                    return row["access_token"]
+
+                # One refresh across workers; the others wait here and then
+                # find the new token in the row
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('oauth_token:zoho'))")
+                row = await conn.fetchrow(
+                    "SELECT access_token, expires_at FROM oauth_tokens WHERE provider = 'zoho'"
+                )
+                if row and _token_usable(row["access_token"], row["expires_at"]) and row["access_token"] != stale_token:
+                    _remember_token(row["access_token"], row["expires_at"])
+                    return row["access_token"]
+
+                access_token, expires_at = await _request_new_token(conn)
+                await conn.execute(
+                    """
+                    INSERT INTO oauth_tokens (provider, access_token, expires_at, refreshed_at)
+                    VALUES ('zoho', $1, $2, NOW())
+                    ON CONFLICT (provider) DO UPDATE
+                    SET access_token = EXCLUDED.access_token,
+                        expires_at = EXCLUDED.expires_at,
+                        refreshed_at = NOW()
+                    """,
+                    access_token, expires_at
+                )
+
+            _remember_token(access_token, expires_at)
+            logger.info("Successfully obtained new Zoho access token")
+            return access_token
+
     except HTTPException:
         raise
     except Exception as e:
@@ -93,70 +190,316 @@ async def get_access_token() -> str:
         )
 
 
-async def fetch_all_items() -> List[Dict]:
+async def get_api_config() -> Dict[str, str]:
     """
-    Fetch all items from Zoho Books with automatic pagination
-    
-    Returns:
-        List of item dictionaries
+    organization_id and base_url, read from settings once per
+    ZOHO_CONFIG_TTL per worker
+
+    Raises:
+        HTTPException: If organization_id is not configured
     """
-    try:
-        access_token = await get_access_token()
-        
-        # Get organization ID and base URL from settings
+    loaded_at = _config_cache["loaded_at"]
+    if loaded_at is None or now_ist() - loaded_at > ZOHO_CONFIG_TTL:
         pool = get_db()
         async with pool.acquire() as conn:
             organization_id = await settings_service.get_setting(conn, "zoho.organization_id")
             base_url = await settings_service.get_setting(conn, "zoho.base_url")
-        
+
         if not organization_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Zoho organization_id not configured in system settings"
             )
-        
-        if not base_url:
-            base_url = "https://books.zoho.com/api/v3"
-        
-        headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-        items = []
-        page = 1
-        
-        async with httpx.AsyncClient() as client:
-            while True:
-                logger.info(f"Fetching Zoho items page {page}...")
-                
-                response = await client.get(
-                    f"{base_url}/items",
-                    headers=headers,
-                    params={
-                        "organization_id": organization_id,
-                        "page": page
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Zoho API error: {response.text}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Zoho Books API error: {response.text}"
+
+        _config_cache["organization_id"] = organization_id
+        _config_cache["base_url"] = base_url or ZOHO_DEFAULT_BASE_URL
+        _config_cache["loaded_at"] = now_ist()
+
+    return {
+        "organization_id": _config_cache["organization_id"],
+        "base_url": _config_cache["base_url"]
+    }
+
+
+# ============================================================================
+# REQUEST SCHEDULER
+# ============================================================================
+# Every Zoho Books API call goes through zoho_request: a token bucket keeps
+# this worker under settings.ZOHO_REQUESTS_PER_MINUTE (bursts of at most
+# settings.ZOHO_REQUEST_BURST), a semaphore caps
+# concurrent calls at settings.ZOHO_MAX_CONCURRENT_REQUESTS, 429/5xx and
+# network errors are retried with exponential backoff, and a 401 triggers
+# one token refresh. The daily quota reported in Zoho's X-Rate-Limit-*
+# headers is tracked in _quota.
+
+class _TokenBucket:
+    """
+    Token bucket holding at most `burst` tokens, refilled continuously with
+    the rest of rate_per_minute, so burst + refill in any 60s window stays
+    within rate_per_minute.
+    """
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.capacity = max(1, min(burst, rate_per_minute - 1))
+        self.rate = max(1, rate_per_minute - self.capacity) / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait for a token (waiters are served in order)"""
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def drain(self):
+        """Empty the bucket after Zoho throttled us"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+    def available(self) -> int:
+        self._refill()
+        return int(self.tokens)
+
+
+_bucket = _TokenBucket(settings.ZOHO_REQUESTS_PER_MINUTE, settings.ZOHO_REQUEST_BURST)
+_request_slots = asyncio.Semaphore(settings.ZOHO_MAX_CONCURRENT_REQUESTS)
+
+# Quota usage since this worker started
+_quota = {
+    "requests": 0,
+    "retries": 0,
+    "throttled": 0,
+    "server_errors": 0,
+    "network_errors": 0,
+    "failed": 0,
+    "in_flight": 0,
+    "daily_limit": None,
+    "daily_remaining": None,
+    "daily_reset_at": None,
+    "last_request_at": None,
+}
+
+
+def _record_quota_headers(response: httpx.Response):
+    """Track the daily quota Zoho reports on every response"""
+    headers = response.headers
+    try:
+        if "X-Rate-Limit-Limit" in headers:
+            _quota["daily_limit"] = int(headers["X-Rate-Limit-Limit"])
+        if "X-Rate-Limit-Remaining" in headers:
+            _quota["daily_remaining"] = int(headers["X-Rate-Limit-Remaining"])
+        if "X-Rate-Limit-Reset" in headers:
+            _quota["daily_reset_at"] = now_ist() + timedelta(seconds=int(headers["X-Rate-Limit-Reset"]))
+    except ValueError:
+        pass
+
+
+def _backoff_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Retry-After if Zoho sent one, else exponential backoff with jitter"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.ZOHO_RETRY_MAX_DELAY_SECONDS)
+    return min(2 ** attempt + random.uniform(0, 1), settings.ZOHO_RETRY_MAX_DELAY_SECONDS)
+
+
+async def zoho_request(
+    method: str,
+    path: str,
+    params: Optional[Dict] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    **kwargs
+) -> httpx.Response:
+    """
+    Call the Zoho Books API within the rate limits, with retries.
+
+    Args:
+        method: HTTP method
+        path: Path below base_url, e.g. '/items'
+        params: Query parameters (organization_id is added)
+        client: Shared client for batches of calls (one is created otherwise)
+
+    Returns:
+        The response (any status other than 401/429/5xx is returned as is)
+
+    Raises:
+        HTTPException: 429 when the daily quota is used up, 500 when retries
+            are exhausted
+    """
+    config = await get_api_config()
+    url = f"{config['base_url']}{path}"
+    params = {"organization_id": config["organization_id"], **(params or {})}
+
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient()
+
+    refreshed_token = False
+    last_error = None
+    try:
+        attempt = 0
+        while True:
+            await _bucket.acquire()
+            access_token = await get_access_token()
+
+            response = None
+            async with _request_slots:
+                _quota["requests"] += 1
+                _quota["in_flight"] += 1
+                _quota["last_request_at"] = now_ist()
+                try:
+                    response = await client.request(
+                        method, url,
+                        params=params,
+                        headers={"Authorization": f"Zoho-oauthtoken {access_token}"},
+                        timeout=30.0,
+                        **kwargs
                     )
-                
-                data = response.json()
-                page_items = data.get("items", [])
-                
-                if not page_items:
-                    break
-                
-                items.extend(page_items)
-                
-                # Check if there are more pages
-                page_context = data.get("page_context", {})
-                if not page_context.get("has_more_page"):
-                    break
-                
-                page += 1
+                except httpx.TransportError as e:
+                    _quota["network_errors"] += 1
+                    last_error = str(e) or e.__class__.__name__
+                finally:
+                    _quota["in_flight"] -= 1
+
+            if response is not None:
+                _record_quota_headers(response)
+
+                if response.status_code == 401 and not refreshed_token:
+                    # Resend once with a new token; this is not a retry attempt
+                    refreshed_token = True
+                    await get_access_token(force_refresh=True)
+                    continue
+
+                if response.status_code == 429:
+                    _quota["throttled"] += 1
+                    if _quota["daily_remaining"] == 0:
+                        _quota["failed"] += 1
+                        raise HTTPException(
+                            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Zoho Books daily API limit reached. Try again after the quota resets."
+                        )
+                    _bucket.drain()
+                    last_error = "rate limited (429)"
+                elif response.status_code >= 500:
+                    _quota["server_errors"] += 1
+                    last_error = f"HTTP {response.status_code}: {response.text[:200]}"
+                else:
+                    return response
+
+            if attempt == settings.ZOHO_MAX_RETRIES:
+                break
+
+            delay = _backoff_delay(attempt, response)
+            _quota["retries"] += 1
+            logger.warning(f"Zoho {method} {path} failed ({last_error}); retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        _quota["failed"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Zoho Books API error after {settings.ZOHO_MAX_RETRIES + 1} attempts: {last_error}"
+        )
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+def get_quota_metrics() -> Dict:
+    """Zoho API usage for this worker, plus the daily quota Zoho last reported"""
+    metrics = dict(_quota)
+    metrics["requests_per_minute_limit"] = settings.ZOHO_REQUESTS_PER_MINUTE
+    metrics["request_burst"] = _bucket.capacity
+    metrics["bucket_available"] = _bucket.available()
+    metrics["max_concurrent_requests"] = settings.ZOHO_MAX_CONCURRENT_REQUESTS
+    if metrics["daily_limit"] and metrics["daily_remaining"] is not None:
+        metrics["daily_used_percentage"] = round(
+            (metrics["daily_limit"] - metrics["daily_remaining"]) / metrics["daily_limit"] * 100, 1
+        )
+    else:
+        metrics["daily_used_percentage"] = None
+    return metrics
+
+
+async def _fetch_list_page(
+    client: httpx.AsyncClient,
+    path: str,
+    key: str,
+    page: int,
+    params: Optional[Dict] = None
+) -> Tuple[List[Dict], bool]:
+    """One page of a Zoho list endpoint: (records, has_more_page)"""
+    logger.info(f"Fetching Zoho {path.strip('/')} page {page}...")
+    response = await zoho_request("GET", path, params={**(params or {}), "page": page}, client=client)
+
+    if response.status_code != 200:
+        logger.error(f"Zoho API error: {response.text}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Zoho Books API error: {response.text}"
+        )
+
+    data = response.json()
+    page_context = data.get("page_context", {})
+    return data.get(key, []), bool(page_context.get("has_more_page"))
+
+
+async def iter_list_pages(
+    path: str,
+    key: str,
+    params: Optional[Dict] = None,
+    concurrency: Optional[int] = None
+) -> AsyncIterator[List[Dict]]:
+    """
+    Yield the pages of a Zoho list endpoint in order.
+
+    Pages are requested `concurrency` at a time (within the rate limits of
+    zoho_request); the next round starts only when the caller asks for more,
+    so a slow consumer bounds how many pages are held in memory.
+
+    Args:
+        path: List endpoint, e.g. '/items'
+        key: Records key in the response, e.g. 'items'
+        params: Extra query parameters
+        concurrency: Pages per round (default ZOHO_MAX_CONCURRENT_REQUESTS)
+    """
+    concurrency = concurrency or settings.ZOHO_MAX_CONCURRENT_REQUESTS
+    async with httpx.AsyncClient() as client:
+        page = 1
+        while True:
+            results = await asyncio.gather(*[
+                _fetch_list_page(client, path, key, p, params)
+                for p in range(page, page + concurrency)
+            ])
+            for records, has_more in results:
+                if records:
+                    yield records
+                if not records or not has_more:
+                    return
+            page += concurrency
+
+
+async def fetch_all_items() -> List[Dict]:
+    """
+    Fetch all items from Zoho Books, requesting pages concurrently within
+    the rate limits (see zoho_request)
+    
+    Returns:
+        List of item dictionaries
+    """
+    try:
+        items = []
+        async for page_items in iter_list_pages("/items", "items"):
+            items.extend(page_items)
         
         logger.info(f"Successfully fetched {len(items)} items from Zoho Books")
         return items
@@ -182,32 +525,14 @@ async def fetch_item_by_id(item_id: str) -> Optional[Dict]:
         Item dictionary or None
     """
     try:
-        access_token = await get_access_token()
-        
-        pool = get_db()
-        async with pool.acquire() as conn:
-            organization_id = await settings_service.get_setting(conn, "zoho.organization_id")
-            base_url = await settings_service.get_setting(conn, "zoho.base_url")
-        
-        if not base_url:
-            base_url = "https://books.zoho.com/api/v3"
-        
-        headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{base_url}/items/{item_id}",
-                headers=headers,
-                params={"organization_id": organization_id},
-                timeout=30.0
-            )
-            
-            if response.status_code == 404:
-                return None
-            
-            response.raise_for_status()
-            data = response.json()
-            return data.get("item")
+        response = await zoho_request("GET", f"/items/{item_id}")
+
+        if response.status_code == 404:
+            return None
+
+        response.raise_for_status()
+        data = response.json()
+        return data.get("item")
 
     except Exception as e:
         logger.error(f"Error fetching Zoho item {item_id}: {e}")
@@ -216,7 +541,8 @@ async def fetch_item_by_id(item_id: str) -> Optional[Dict]:
 
 async def fetch_all_contacts(contact_type: str = "vendor") -> List[Dict]:
     """
-    Fetch all contacts (vendors or customers) from Zoho Books with automatic pagination
+    Fetch all contacts (vendors or customers) from Zoho Books, requesting
+    pages concurrently within the rate limits (see zoho_request)
 
     Args:
         contact_type: Type of contact to fetch - "vendor" or "customer"
@@ -225,63 +551,9 @@ async def fetch_all_contacts(contact_type: str = "vendor") -> List[Dict]:
         List of contact dictionaries
     """
     try:
-        access_token = await get_access_token()
-
-        # Get organization ID and base URL from settings
-        pool = get_db()
-        async with pool.acquire() as conn:
-            organization_id = await settings_service.get_setting(conn, "zoho.organization_id")
-            base_url = await settings_service.get_setting(conn, "zoho.base_url")
-
-        if not organization_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Zoho organization_id not configured in system settings"
-            )
-
-        if not base_url:
-            base_url = "https://books.zoho.com/api/v3"
-
-        headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
         contacts = []
-        page = 1
-
-        async with httpx.AsyncClient() as client:
-            while True:
-                logger.info(f"Fetching Zoho {contact_type}s page {page}...")
-
-                response = await client.get(
-                    f"{base_url}/contacts",
-                    headers=headers,
-                    params={
-                        "organization_id": organization_id,
-                        "contact_type": contact_type,
-                        "page": page
-                    },
-                    timeout=30.0
-                )
-
-                if response.status_code != 200:
-                    logger.error(f"Zoho API error: {response.text}")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Zoho Books API error: {response.text}"
-                    )
-
-                data = response.json()
-                page_contacts = data.get("contacts", [])
-
-                if not page_contacts:
-                    break
-
-                contacts.extend(page_contacts)
-
-                # Check if there are more pages
-                page_context = data.get("page_context", {})
-                if not page_context.get("has_more_page"):
-                    break
-
-                page += 1
+        async for page_contacts in iter_list_pages("/contacts", "contacts", {"contact_type": contact_type}):
+            contacts.extend(page_contacts)
 
         logger.info(f"Successfully fetched {len(contacts)} {contact_type}s from Zoho Books")
         return contacts
@@ -307,32 +579,14 @@ async def fetch_contact_by_id(contact_id: str) -> Optional[Dict]:
         Contact dictionary or None
     """
     try:
-        access_token = await get_access_token()
-
-        pool = get_db()
-        async with pool.acquire() as conn:
-            organization_id = await settings_service.get_setting(conn, "zoho.organization_id")
-            base_url = await settings_service.get_setting(conn, "zoho.base_url")
-
-        if not base_url:
-            base_url = "https://books.zoho.com/api/v3"
-
-        headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{base_url}/contacts/{contact_id}",
-                headers=headers,
-                params={"organization_id": organization_id},
-                timeout=30.0
-            )
+        response = await zoho_request("GET", f"/contacts/{contact_id}")
 
-            if response.status_code == 404:
-                return None
+        if response.status_code == 404:
+            return None
 
-            response.raise_for_status()
-            data = response.json()
-            return data.get("contact")
+        response.raise_for_status()
+        data = response.json()
+        return data.get("contact")
 
     except Exception as e:
         logger.error(f"Error fetching Zoho contact {contact_id}: {e}")
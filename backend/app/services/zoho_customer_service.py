@@ -16,10 +16,11 @@ from datetime import datetime, timezone
 from app.utils.timezone import now_ist
 import json
 from dateutil import parser as date_parser
+import pandas as pd
 
-from app.database import fetch_one, fetch_all, execute_query
+from app.database import fetch_one, fetch_all
 from app.schemas.zoho_customer import ZohoCustomerCreate, ZohoCustomerUpdate
-from app.services import zoho_books_client
+from app.services import zoho_books_client, contact_sync_service, sync_runner_service
 
 logger = logging.getLogger(__name__)
 
@@ -263,13 +264,66 @@ async def update_item(
 # ZOHO BOOKS SYNC
 # ============================================================================
 
+# Columns written by the sync; notes and customer_segment stay user-owned
+ZOHO_CUSTOMER_SYNC = contact_sync_service.ContactSyncSpec(
+    table="zoho_customers",
+    key="contact_id",
+    columns=(
+        "contact_name", "company_name", "email", "phone", "mobile", "contact_person",
+        "billing_address", "shipping_address",
+        "payment_terms", "payment_terms_label", "customer_type", "status",
+        "gst_no", "gst_treatment", "pan_no", "tax_id", "place_of_contact", "is_taxable",
+        "outstanding_receivable_amount", "unused_credits", "credit_limit",
+        "created_time", "last_modified_time", "raw_json",
+    ),
+    required=("contact_name",),
+    insert_values={"customer_segment": "'{}'::text[]"},
+)
+
+
+def _customer_frame(customers: List[Dict]) -> pd.DataFrame:
+    """Normalize Zoho customer records into zoho_customers columns"""
+    df = contact_sync_service.flatten_records(customers)
+    if df.empty:
+        return df
+    c = contact_sync_service
+
+    return pd.DataFrame({
+        "contact_id": pd.to_numeric(c.column(df, "contact_id"), errors="coerce").astype("Int64"),
+        "contact_name": c.column(df, "contact_name"),
+        "company_name": c.column(df, "company_name"),
+        "email": c.column(df, "email"),
+        "phone": c.column(df, "phone"),
+        "mobile": c.column(df, "mobile"),
+        "contact_person": c.column(df, "contact_person"),
+        "billing_address": c.first_present(df, "billing_address_address", "billing_address"),
+        "shipping_address": c.first_present(df, "shipping_address_address", "shipping_address"),
+        "payment_terms": pd.to_numeric(c.column(df, "payment_terms"), errors="coerce").astype("Int64"),
+        "payment_terms_label": c.column(df, "payment_terms_label"),
+        "customer_type": c.column(df, "customer_type", "business"),
+        "status": c.column(df, "status", "active"),
+        "gst_no": c.column(df, "gst_no"),
+        "gst_treatment": c.column(df, "gst_treatment"),
+        "pan_no": c.column(df, "pan_no"),
+        "tax_id": c.column(df, "tax_id"),
+        "place_of_contact": c.column(df, "place_of_contact"),
+        "is_taxable": c.column(df, "is_taxable", True).astype(bool),
+        "outstanding_receivable_amount": pd.to_numeric(c.column(df, "outstanding_receivable_amount", 0), errors="coerce"),
+        "unused_credits": c.first_nonzero(df, "unused_credits_receivable_amount", "unused_credits"),
+        "credit_limit": pd.to_numeric(c.column(df, "credit_limit", 0), errors="coerce"),
+        "created_time": c.parse_datetimes(c.column(df, "created_time")),
+        "last_modified_time": c.parse_datetimes(c.column(df, "last_modified_time")),
+        "raw_json": [json.dumps(customer) for customer in customers],
+    })
+
+
 async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> Dict[str, int]:
     """
     Sync customers from Zoho Books API
 
     Args:
         synced_by: User ID performing sync
-        force_refresh: If True, sync all customers; if False, only sync customers modified in last 24 hours
+        force_refresh: If True, rewrite every customer; if False, skip customers whose content is unchanged
 
     Returns:
         Dict with added, updated, skipped, errors counts
@@ -316,160 +370,34 @@ async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> D
         _sync_progress["errors"] = 0
         _sync_progress["start_time"] = now_ist()
 
-        added = 0
-        updated = 0
-        skipped = 0
-        errors = 0
-
-        for index, customer in enumerate(zoho_customers, 1):
-            try:
-                # Convert contact_id to int (Zoho returns as string)
-                contact_id = int(customer.get('contact_id'))
-
-                # Log progress every 50 customers
-                if index % 50 == 0 or index == total_customers:
-                    logger.info(f"Syncing progress: {index}/{total_customers} customers processed")
-
-                # Check if customer already exists
-                existing = await fetch_one(
-                    "SELECT id, last_sync_at FROM zoho_customers WHERE contact_id = $1",
-                    contact_id
-                )
-
-                # Update progress
-                _sync_progress["current"] = index
-
-                # Skip if not force_refresh and customer was synced in last 24 hours
-                if not force_refresh and existing and existing['last_sync_at']:
-                    from datetime import timedelta
-                    # Both datetimes are now timezone-aware (UTC)
-                    hours_since_sync = (now_ist() - existing['last_sync_at']).total_seconds() / 3600
-                    if hours_since_sync < 24:
-                        skipped += 1
-                        _sync_progress["skipped"] = skipped
-                        continue
-
-                # Prepare customer data
-                customer_data = {
-                    'contact_id': contact_id,
-                    'contact_name': customer.get('contact_name'),
-                    'company_name': customer.get('company_name'),
-                    'email': customer.get('email'),
-                    'phone': customer.get('phone'),
-                    'mobile': customer.get('mobile'),
-                    'contact_person': customer.get('contact_person'),
-                    'billing_address': customer.get('billing_address', {}).get('address') if isinstance(customer.get('billing_address'), dict) else customer.get('billing_address'),
-                    'shipping_address': customer.get('shipping_address', {}).get('address') if isinstance(customer.get('shipping_address'), dict) else customer.get('shipping_address'),
-                    'payment_terms': customer.get('payment_terms'),
-                    'payment_terms_label': customer.get('payment_terms_label'),
-                    'customer_type': customer.get('customer_type', 'business'),
-                    'status': customer.get('status', 'active'),
-                    'gst_no': customer.get('gst_no'),
-                    'gst_treatment': customer.get('gst_treatment'),
-                    'pan_no': customer.get('pan_no'),
-                    'tax_id': customer.get('tax_id'),
-                    'place_of_contact': customer.get('place_of_contact'),
-                    'is_taxable': customer.get('is_taxable', True),
-                    'outstanding_receivable_amount': customer.get('outstanding_receivable_amount', 0),
-                    'unused_credits': customer.get('unused_credits_receivable_amount', 0) or customer.get('unused_credits', 0),
-                    'credit_limit': customer.get('credit_limit', 0),
-                    'created_time': parse_zoho_datetime(customer.get('created_time')),
-                    'last_modified_time': parse_zoho_datetime(customer.get('last_modified_time')),
-                    'raw_json': json.dumps(customer),
-                    'last_sync_at': now_ist()
-                }
-
-                if existing:
-                    # Update existing customer (preserve user-edited fields: notes, customer_segment)
-                    await execute_query(
-                        """
-                        UPDATE zoho_customers SET
-                            contact_name = $2, company_name = $3, email = $4,
-                            phone = $5, mobile = $6, contact_person = $7,
-                            billing_address = $8, shipping_address = $9,
-                            payment_terms = $10, payment_terms_label = $11, customer_type = $12, status = $13,
-                            gst_no = $14, gst_treatment = $15, pan_no = $16, tax_id = $17,
-                            place_of_contact = $18, is_taxable = $19,
-                            outstanding_receivable_amount = $20, unused_credits = $21, credit_limit = $22,
-                            created_time = $23, last_modified_time = $24,
-                            raw_json = $25, last_sync_at = $26, updated_at = NOW()
-                        WHERE id = $1
-                        -- Note: notes and customer_segment are NOT updated to preserve user edits
-                        """,
-                        existing['id'],
-                        customer_data['contact_name'], customer_data['company_name'], customer_data['email'],
-                        customer_data['phone'], customer_data['mobile'], customer_data['contact_person'],
-                        customer_data['billing_address'], customer_data['shipping_address'],
-                        customer_data['payment_terms'], customer_data['payment_terms_label'],
-                        customer_data['customer_type'], customer_data['status'],
-                        customer_data['gst_no'], customer_data['gst_treatment'], customer_data['pan_no'],
-                        customer_data['tax_id'], customer_data['place_of_contact'], customer_data['is_taxable'],
-                        customer_data['outstanding_receivable_amount'], customer_data['unused_credits'],
-                        customer_data['credit_limit'],
-                        customer_data['created_time'], customer_data['last_modified_time'],
-                        customer_data['raw_json'], customer_data['last_sync_at']
-                    )
-                    updated += 1
-                    _sync_progress["updated"] = updated
-                else:
-                    # Insert new customer with default values for user-editable fields
-                    await execute_query(
-                        """
-                        INSERT INTO zoho_customers (
-                            contact_id, contact_name, company_name, email,
-                            phone, mobile, contact_person,
-                            billing_address, shipping_address,
-                            payment_terms, payment_terms_label, customer_type, status,
-                            gst_no, gst_treatment, pan_no, tax_id,
-                            place_of_contact, is_taxable,
-                            outstanding_receivable_amount, unused_credits, credit_limit,
-                            customer_segment,
-                            created_time, last_modified_time,
-                            raw_json, last_sync_at
-                        ) VALUES (
-                            $1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
-                            $11, $12, $13, $14, $15, $16, $17, $18, $19, $20,
-                            $21, $22, $23, $24, $25, $26, $27
-                        )
-                        """,
-                        customer_data['contact_id'], customer_data['contact_name'], customer_data['company_name'],
-                        customer_data['email'], customer_data['phone'], customer_data['mobile'],
-                        customer_data['contact_person'], customer_data['billing_address'], customer_data['shipping_address'],
-                        customer_data['payment_terms'], customer_data['payment_terms_label'],
-                        customer_data['customer_type'], customer_data['status'],
-                        customer_data['gst_no'], customer_data['gst_treatment'], customer_data['pan_no'],
-                        customer_data['tax_id'], customer_data['place_of_contact'], customer_data['is_taxable'],
-                        customer_data['outstanding_receivable_amount'], customer_data['unused_credits'],
-                        customer_data['credit_limit'],
-                        [],  # customer_segment - empty array default
-                        customer_data['created_time'], customer_data['last_modified_time'],
-                        customer_data['raw_json'], customer_data['last_sync_at']
-                    )
-                    added += 1
-                    _sync_progress["added"] = added
-
-            except ValueError as e:
-                logger.error(f"Invalid contact_id format for customer {customer.get('contact_id', 'unknown')}: {e}")
-                errors += 1
-                _sync_progress["errors"] = errors
-            except Exception as e:
-                logger.error(f"Error syncing Zoho customer {customer.get('contact_id', 'unknown')}: {e}")
-                errors += 1
-                _sync_progress["errors"] = errors
+        def on_batch(counts: Dict[str, int]):
+            for key in ("added", "updated", "skipped", "errors"):
+                _sync_progress[key] = counts[key]
+            _sync_progress["current"] = counts["added"] + counts["updated"] + counts["skipped"] + counts["errors"]
+            logger.info(f"Syncing progress: {_sync_progress['current']}/{total_customers} customers processed")
+
+        # Unchanged customers (same content hash) are skipped unless force_refresh
+        result = await contact_sync_service.upsert_contacts(
+            ZOHO_CUSTOMER_SYNC,
+            _customer_frame(zoho_customers),
+            force=force_refresh,
+            on_batch=on_batch
+        )
 
         logger.info(
             f"Zoho Books customer sync completed: {total_customers} total customers, "
-            f"{added} added, {updated} updated, {skipped} skipped, {errors} errors"
+            f"{result['added']} added, {result['updated']} updated, "
+            f"{result['skipped']} skipped, {result['errors']} errors"
         )
 
         # Reset progress tracking
         _sync_progress["in_progress"] = False
 
         return {
-            "added": added,
-            "updated": updated,
-            "skipped": skipped,
-            "errors": errors,
+            "added": result["added"],
+            "updated": result["updated"],
+            "skipped": result["skipped"],
+            "errors": result["errors"],
             "total": total_customers
         }
 
@@ -485,33 +413,13 @@ async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> D
 
 async def get_sync_progress() -> Dict:
     """
-    Get current sync progress
+    Get progress of the latest sync run (from sync_runs, so it is the same
+    on every worker)
 
     Returns:
         Dict with progress information including percentage and ETA
     """
-    progress = _sync_progress.copy()
-
-    # Calculate percentage
-    if progress["total"] > 0:
-        progress["percentage"] = round((progress["current"] / progress["total"]) * 100, 1)
-    else:
-        progress["percentage"] = 0
-
-    # Calculate ETA
-    if progress["in_progress"] and progress["start_time"] and progress["current"] > 0:
-        elapsed = (now_ist() - progress["start_time"]).total_seconds()
-        items_per_second = progress["current"] / elapsed if elapsed > 0 else 0
-        remaining_items = progress["total"] - progress["current"]
-        eta_seconds = remaining_items / items_per_second if items_per_second > 0 else 0
-        progress["eta_seconds"] = int(eta_seconds)
-    else:
-        progress["eta_seconds"] = 0
-
-    # Remove start_time from response (not JSON serializable)
-    progress.pop("start_time", None)
-
-    return progress
+    return await sync_runner_service.get_progress("zoho_customers")
 
 
 # ============================================================================
@@ -11,18 +11,30 @@ Service for managing Zoho items, sync operations, and CRUD
 
 from typing import List, Dict, Optional
 from fastapi import HTTPException, status
+import asyncio
+import contextlib
 import logging
 from datetime import datetime, timezone
 from app.utils.timezone import now_ist
 import json
 from dateutil import parser as date_parser
+import pandas as pd
 
-from app.database import fetch_one, fetch_all, execute_query
+from app.database import (
+    fetch_one, fetch_all,
+    CountMode, SortKey, count_rows, keyset_condition, keyset_order_by, keyset_page
+)
 from app.schemas.zoho_item import ZohoItemCreate, ZohoItemUpdate
-from app.services import zoho_books_client
+from app.services import zoho_books_client, contact_sync_service, sync_runner_service
 
 logger = logging.getLogger(__name__)
 
+# Item list order: alphabetical, id as keyset tie-breaker for duplicate names
+ITEM_LIST_SORT = [
+    SortKey("name", "name"),
+    SortKey("id", "id"),
+]
+
 # Global progress tracking for sync operations
 _sync_progress = {
     "in_progress": False,
@@ -66,8 +78,10 @@ async def get_items(
     item_type: Optional[str] = None,
     product_type: Optional[str] = None,
     limit: int = 1000,
-    offset: int = 0
-) -> tuple[List[Dict], int]:
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT
+) -> tuple[List[Dict], Optional[int], Optional[str]]:
     """
     Get Zoho items with optional search and filters
 
@@ -77,10 +91,12 @@ async def get_items(
         item_type: Filter by item_type (sales, purchases, etc.)
         product_type: Filter by product_type (goods, service)
         limit: Max results
-        offset: Pagination offset
+        offset: Pagination offset (ignored when cursor is given)
+        cursor: Keyset cursor from a previous page
+        count_mode: exact, estimated or no total count
 
     Returns:
-        Tuple of (List of item dictionaries, total count)
+        Tuple of (List of item dictionaries, total count, next cursor)
     """
     try:
         # Build WHERE clause for both queries
@@ -111,9 +127,19 @@ async def get_items(
         where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
 
         # Get total count
-        count_query = f"SELECT COUNT(*) as total FROM zoho_items WHERE {where_clause}"
-        count_result = await fetch_one(count_query, *params)
-        total_count = count_result['total'] if count_result else 0
+        total_count = await count_rows(f"FROM zoho_items WHERE {where_clause}", *params, mode=count_mode)
+
+        # Continue after the cursor position, or fall back to offset
+        try:
+            cursor_condition, cursor_params = keyset_condition(ITEM_LIST_SORT, cursor, param_count + 1)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if cursor_condition:
+            where_conditions.append(cursor_condition)
+            params.extend(cursor_params)
+            param_count += len(cursor_params)
+            where_clause = " AND ".join(where_conditions)
+            offset = 0
 
         # Get paginated items
         query = f"""
@@ -126,15 +152,18 @@ async def get_items(
                 last_sync_at, created_at, updated_at
             FROM zoho_items
             WHERE {where_clause}
-            ORDER BY name
+            {keyset_order_by(ITEM_LIST_SORT)}
             LIMIT ${param_count + 1}
             OFFSET ${param_count + 2}
         """
-        params.extend([limit, offset])
+        params.extend([limit + 1, offset])
 
         items = await fetch_all(query, *params)
-        return [dict(item) for item in items], total_count
+        items, next_cursor = keyset_page(items, ITEM_LIST_SORT, limit)
+        return [dict(item) for item in items], total_count, next_cursor
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching Zoho items: {e}")
         raise HTTPException(
@@ -258,13 +287,64 @@ async def update_item(
 # ZOHO BOOKS SYNC
 # ============================================================================
 
+# Fetched pages waiting for the writer; bounds memory during a sync
+ZOHO_SYNC_QUEUE_PAGES = 4
+
+# Columns written by the sync; for_purchase and segment stay user-owned
+ZOHO_ITEM_SYNC = contact_sync_service.ContactSyncSpec(
+    table="zoho_items",
+    key="item_id",
+    columns=(
+        "name", "sku", "description", "rate", "purchase_rate", "item_type", "product_type",
+        "status", "hsn_or_sac", "tax_id", "tax_name", "tax_percentage", "is_taxable",
+        "unit", "account_id", "created_time", "last_modified_time", "raw_json",
+    ),
+    required=("name",),
+    insert_values={"for_purchase": "FALSE", "segment": "'{}'::text[]"},
+)
+
+
+def _item_frame(items: List[Dict]) -> pd.DataFrame:
+    """Normalize one page of Zoho items into zoho_items columns"""
+    df = contact_sync_service.flatten_records(items, max_level=0)
+    if df.empty:
+        return df
+    c = contact_sync_service
+
+    return pd.DataFrame({
+        "item_id": pd.to_numeric(c.column(df, "item_id"), errors="coerce").astype("Int64"),
+        "name": c.column(df, "name"),
+        "sku": c.column(df, "sku"),
+        "description": c.column(df, "description"),
+        "rate": pd.to_numeric(c.column(df, "rate"), errors="coerce"),
+        "purchase_rate": pd.to_numeric(c.column(df, "purchase_rate"), errors="coerce"),
+        "item_type": c.column(df, "item_type"),
+        "product_type": c.column(df, "product_type"),
+        "status": c.column(df, "status", "active"),
+        "hsn_or_sac": c.column(df, "hsn_or_sac"),
+        "tax_id": c.column(df, "tax_id"),
+        "tax_name": c.column(df, "tax_name"),
+        "tax_percentage": pd.to_numeric(c.column(df, "tax_percentage"), errors="coerce"),
+        "is_taxable": c.column(df, "is_taxable", True).astype(bool),
+        "unit": c.column(df, "unit"),
+        "account_id": c.column(df, "account_id"),
+        "created_time": c.parse_datetimes(c.column(df, "created_time")),
+        "last_modified_time": c.parse_datetimes(c.column(df, "last_modified_time")),
+        "raw_json": [json.dumps(item) for item in items],
+    })
+
+
 async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> Dict[str, int]:
     """
     Sync items from Zoho Books API
 
+    Pages stream from the Zoho client through a bounded queue into a writer
+    that bulk-upserts each page, so downloading and writing overlap and at
+    most ZOHO_SYNC_QUEUE_PAGES pages are held in memory.
+
     Args:
         synced_by: User ID performing sync
-        force_refresh: If True, sync all items; if False, only sync items modified in last 24 hours
+        force_refresh: If True, rewrite every item; if False, skip items whose content is unchanged
 
     Returns:
         Dict with added, updated, skipped, errors counts
@@ -295,155 +375,74 @@ async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> D
                 detail=f"Zoho Books API credentials not configured. Missing: {', '.join(missing)}. Please configure in System Settings → Zoho Books."
             )
 
-        # Fetch all items from Zoho Books
-        zoho_items = await zoho_books_client.fetch_all_items()
-
-        total_items = len(zoho_items)
-        logger.info(f"Fetched {total_items} items from Zoho Books")
-
-        # Initialize progress tracking
+        # Initialize progress tracking (total grows as pages arrive)
         _sync_progress["in_progress"] = True
         _sync_progress["current"] = 0
-        _sync_progress["total"] = total_items
+        _sync_progress["total"] = 0
         _sync_progress["added"] = 0
         _sync_progress["updated"] = 0
         _sync_progress["skipped"] = 0
         _sync_progress["errors"] = 0
         _sync_progress["start_time"] = now_ist()
 
-        added = 0
-        updated = 0
-        skipped = 0
-        errors = 0
+        # Producer: Zoho pages -> bounded queue; the writer below upserts
+        # each page while the next ones download
+        pages: asyncio.Queue = asyncio.Queue(maxsize=ZOHO_SYNC_QUEUE_PAGES)
 
-        for index, item in enumerate(zoho_items, 1):
+        async def produce():
+            # aclosing: a cancelled producer closes the page iterator (and
+            # its HTTP client) right away instead of at garbage collection
             try:
-                # Convert item_id to int (Zoho returns as string)
-                item_id = int(item.get('item_id'))
-
-                # Log progress every 50 items
-                if index % 50 == 0 or index == total_items:
-                    logger.info(f"Syncing progress: {index}/{total_items} items processed")
-
-                # Check if item already exists
-                existing = await fetch_one(
-                    "SELECT id, last_sync_at FROM zoho_items WHERE item_id = $1",
-                    item_id
+                async with contextlib.aclosing(
+                    zoho_books_client.iter_list_pages("/items", "items")
+                ) as page_iter:
+                    async for page_items in page_iter:
+                        _sync_progress["total"] += len(page_items)
+                        await pages.put(page_items)
+            except Exception:
+                # Wake the writer (still reading) so the error surfaces below
+                await pages.put(None)
+                raise
+            # No sentinel on cancellation: the writer has already stopped
+            await pages.put(None)
+
+        producer = asyncio.create_task(produce())
+        totals = {"added": 0, "updated": 0, "skipped": 0, "errors": 0}
+        try:
+            while (page_items := await pages.get()) is not None:
+                # Unchanged items (same content hash) are skipped unless force_refresh
+                counts = await contact_sync_service.upsert_contacts(
+                    ZOHO_ITEM_SYNC,
+                    _item_frame(page_items),
+                    force=force_refresh
                 )
-
-                # Update progress
-                _sync_progress["current"] = index
-
-                # Skip if not force_refresh and item was synced in last 24 hours
-                if not force_refresh and existing and existing['last_sync_at']:
-                    from datetime import timedelta
-                    # Both datetimes are now timezone-aware (UTC)
-                    hours_since_sync = (now_ist() - existing['last_sync_at']).total_seconds() / 3600
-                    if hours_since_sync < 24:
-                        skipped += 1
-                        _sync_progress["skipped"] = skipped
-                        continue
-
-                # Prepare item data
-                item_data = {
-                    'item_id': item_id,
-                    'name': item.get('name'),
-                    'sku': item.get('sku'),
-                    'description': item.get('description'),
-                    'rate': item.get('rate'),
-                    'purchase_rate': item.get('purchase_rate'),
-                    'item_type': item.get('item_type'),
-                    'product_type': item.get('product_type'),
-                    'status': item.get('status', 'active'),
-                    'hsn_or_sac': item.get('hsn_or_sac'),
-                    'tax_id': item.get('tax_id'),
-                    'tax_name': item.get('tax_name'),
-                    'tax_percentage': item.get('tax_percentage'),
-                    'is_taxable': item.get('is_taxable', True),
-                    'unit': item.get('unit'),
-                    'account_id': item.get('account_id'),
-                    'created_time': parse_zoho_datetime(item.get('created_time')),
-                    'last_modified_time': parse_zoho_datetime(item.get('last_modified_time')),
-                    'raw_json': json.dumps(item),
-                    'last_sync_at': now_ist()
-                }
-                
-                if existing:
-                    # Update existing item (preserve user-edited fields: for_purchase, segment)
-                    await execute_query(
-                        """
-                        UPDATE zoho_items SET
-                            name = $2, sku = $3, description = $4,
-                            rate = $5, purchase_rate = $6, item_type = $7, product_type = $8,
-                            status = $9, hsn_or_sac = $10, tax_id = $11, tax_name = $12,
-                            tax_percentage = $13, is_taxable = $14, unit = $15, account_id = $16,
-                            created_time = $17, last_modified_time = $18,
-                            raw_json = $19, last_sync_at = $20, updated_at = NOW()
-                        WHERE id = $1
-                        -- Note: for_purchase and segment are NOT updated to preserve user edits
-                        """,
-                        existing['id'],
-                        item_data['name'], item_data['sku'], item_data['description'],
-                        item_data['rate'], item_data['purchase_rate'], item_data['item_type'],
-                        item_data['product_type'], item_data['status'], item_data['hsn_or_sac'],
-                        item_data['tax_id'], item_data['tax_name'], item_data['tax_percentage'],
-                        item_data['is_taxable'], item_data['unit'], item_data['account_id'],
-                        item_data['created_time'], item_data['last_modified_time'],
-                        item_data['raw_json'], item_data['last_sync_at']
-                    )
-                    updated += 1
-                    _sync_progress["updated"] = updated
-                else:
-                    # Insert new item with default values for user-editable fields
-                    await execute_query(
-                        """
-                        INSERT INTO zoho_items (
-                            item_id, name, sku, description,
-                            rate, purchase_rate, item_type, product_type, status,
-                            hsn_or_sac, tax_id, tax_name, tax_percentage, is_taxable,
-                            unit, account_id, for_purchase, segment,
-                            created_time, last_modified_time,
-                            raw_json, last_sync_at
-                        ) VALUES (
-                            $1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
-                            $11, $12, $13, $14, $15, $16, $17, $18, $19, $20, $21, $22
-                        )
-                        """,
-                        item_data['item_id'], item_data['name'], item_data['sku'],
-                        item_data['description'], item_data['rate'], item_data['purchase_rate'],
-                        item_data['item_type'], item_data['product_type'], item_data['status'],
-                        item_data['hsn_or_sac'], item_data['tax_id'], item_data['tax_name'],
-                        item_data['tax_percentage'], item_data['is_taxable'], item_data['unit'],
-                        item_data['account_id'], False, [],  # for_purchase=False, segment=empty array
-                        item_data['created_time'],
-                        item_data['last_modified_time'], item_data['raw_json'],
-                        item_data['last_sync_at']
-                    )
-                    added += 1
-                    _sync_progress["added"] = added
-
-            except ValueError as e:
-                logger.error(f"Invalid item_id format for item {item.get('item_id', 'unknown')}: {e}")
-                errors += 1
-                _sync_progress["errors"] = errors
-            except Exception as e:
-                logger.error(f"Error syncing Zoho item {item.get('item_id', 'unknown')}: {e}")
-                errors += 1
-                _sync_progress["errors"] = errors
-        
+                for key in totals:
+                    totals[key] += counts[key]
+                    _sync_progress[key] = totals[key]
+                _sync_progress["current"] += len(page_items)
+                logger.info(f"Syncing progress: {_sync_progress['current']}/{_sync_progress['total']} items processed")
+        except BaseException:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            raise
+        # Surface a fetch failure (the writer stopped at the sentinel)
+        await producer
+
+        total_items = _sync_progress["total"]
         logger.info(
             f"Zoho Books sync completed: {total_items} total items, "
-            f"{added} added, {updated} updated, {skipped} skipped, {errors} errors"
+            f"{totals['added']} added, {totals['updated']} updated, "
+            f"{totals['skipped']} skipped, {totals['errors']} errors"
         )
 
         # Reset progress tracking
         _sync_progress["in_progress"] = False
 
         return {
-            "added": added,
-            "updated": updated,
-            "skipped": skipped,
-            "errors": errors,
+            "added": totals["added"],
+            "updated": totals["updated"],
+            "skipped": totals["skipped"],
+            "errors": totals["errors"],
             "total": total_items
         }
         
@@ -459,33 +458,13 @@ async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> D
 
 async def get_sync_progress() -> Dict:
     """
-    Get current sync progress
+    Get progress of the latest sync run (from sync_runs, so it is the same
+    on every worker)
 
     Returns:
         Dict with progress information including percentage and ETA
     """
-    progress = _sync_progress.copy()
-
-    # Calculate percentage
-    if progress["total"] > 0:
-        progress["percentage"] = round((progress["current"] / progress["total"]) * 100, 1)
-    else:
-        progress["percentage"] = 0
-
-    # Calculate ETA
-    if progress["in_progress"] and progress["start_time"] and progress["current"] > 0:
-        elapsed = (now_ist() - progress["start_time"]).total_seconds()
-        items_per_second = progress["current"] / elapsed if elapsed > 0 else 0
-        remaining_items = progress["total"] - progress["current"]
-        eta_seconds = remaining_items / items_per_second if items_per_second > 0 else 0
-        progress["eta_seconds"] = int(eta_seconds)
-    else:
-        progress["eta_seconds"] = 0
-
-    # Remove start_time from response (not JSON serializable)
-    progress.pop("start_time", None)
-
-    return progress
+    return await sync_runner_service.get_progress("zoho_items")
 
 
 # ============================================================================
@@ -16,10 +16,11 @@ from datetime import datetime, timezone
 from app.utils.timezone import now_ist
 import json
 from dateutil import parser as date_parser
+import pandas as pd
 
-from app.database import fetch_one, fetch_all, execute_query
+from app.database import fetch_one, fetch_all
 from app.schemas.zoho_vendor import ZohoVendorCreate, ZohoVendorUpdate
-from app.services import zoho_books_client
+from app.services import zoho_books_client, contact_sync_service, sync_runner_service
 
 logger = logging.getLogger(__name__)
 
@@ -257,13 +258,63 @@ async def update_item(
 # ZOHO BOOKS SYNC
 # ============================================================================
 
+# Columns written by the sync; notes stay user-owned
+ZOHO_VENDOR_SYNC = contact_sync_service.ContactSyncSpec(
+    table="zoho_vendors",
+    key="contact_id",
+    columns=(
+        "contact_name", "company_name", "email", "phone", "mobile", "contact_person",
+        "billing_address", "shipping_address",
+        "payment_terms", "payment_terms_label", "status",
+        "gst_no", "gst_treatment", "pan_no", "tax_id", "place_of_contact", "is_taxable",
+        "outstanding_balance", "unused_credits",
+        "created_time", "last_modified_time", "raw_json",
+    ),
+    required=("contact_name",),
+)
+
+
+def _vendor_frame(vendors: List[Dict]) -> pd.DataFrame:
+    """Normalize Zoho vendor records into zoho_vendors columns"""
+    df = contact_sync_service.flatten_records(vendors)
+    if df.empty:
+        return df
+    c = contact_sync_service
+
+    return pd.DataFrame({
+        "contact_id": pd.to_numeric(c.column(df, "contact_id"), errors="coerce").astype("Int64"),
+        "contact_name": c.column(df, "contact_name"),
+        "company_name": c.column(df, "company_name"),
+        "email": c.column(df, "email"),
+        "phone": c.column(df, "phone"),
+        "mobile": c.column(df, "mobile"),
+        "contact_person": c.column(df, "contact_person"),
+        "billing_address": c.first_present(df, "billing_address_address", "billing_address"),
+        "shipping_address": c.first_present(df, "shipping_address_address", "shipping_address"),
+        "payment_terms": pd.to_numeric(c.column(df, "payment_terms"), errors="coerce").astype("Int64"),
+        "payment_terms_label": c.column(df, "payment_terms_label"),
+        "status": c.column(df, "status", "active"),
+        "gst_no": c.column(df, "gst_no"),
+        "gst_treatment": c.column(df, "gst_treatment"),
+        "pan_no": c.column(df, "pan_no"),
+        "tax_id": c.column(df, "tax_id"),
+        "place_of_contact": c.column(df, "place_of_contact"),
+        "is_taxable": c.column(df, "is_taxable", True).astype(bool),
+        "outstanding_balance": c.first_nonzero(df, "outstanding_payable_amount", "outstanding_balance"),
+        "unused_credits": c.first_nonzero(df, "unused_credits_payable_amount", "unused_credits"),
+        "created_time": c.parse_datetimes(c.column(df, "created_time")),
+        "last_modified_time": c.parse_datetimes(c.column(df, "last_modified_time")),
+        "raw_json": [json.dumps(vendor) for vendor in vendors],
+    })
+
+
 async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> Dict[str, int]:
     """
     Sync vendors from Zoho Books API
 
     Args:
         synced_by: User ID performing sync
-        force_refresh: If True, sync all vendors; if False, only sync vendors modified in last 24 hours
+        force_refresh: If True, rewrite every vendor; if False, skip vendors whose content is unchanged
 
     Returns:
         Dict with added, updated, skipped, errors counts
@@ -310,151 +361,34 @@ async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> D
         _sync_progress["errors"] = 0
         _sync_progress["start_time"] = now_ist()
 
-        added = 0
-        updated = 0
-        skipped = 0
-        errors = 0
-
-        for index, vendor in enumerate(zoho_vendors, 1):
-            try:
-                # Convert contact_id to int (Zoho returns as string)
-                contact_id = int(vendor.get('contact_id'))
-
-                # Log progress every 50 vendors
-                if index % 50 == 0 or index == total_vendors:
-                    logger.info(f"Syncing progress: {index}/{total_vendors} vendors processed")
-
-                # Check if vendor already exists
-                existing = await fetch_one(
-                    "SELECT id, last_sync_at FROM zoho_vendors WHERE contact_id = $1",
-                    contact_id
-                )
-
-                # Update progress
-                _sync_progress["current"] = index
-
-                # Skip if not force_refresh and vendor was synced in last 24 hours
-                if not force_refresh and existing and existing['last_sync_at']:
-                    from datetime import timedelta
-                    # Both datetimes are now timezone-aware (UTC)
-                    hours_since_sync = (now_ist() - existing['last_sync_at']).total_seconds() / 3600
-                    if hours_since_sync < 24:
-                        skipped += 1
-                        _sync_progress["skipped"] = skipped
-                        continue
-
-                # Prepare vendor data
-                vendor_data = {
-                    'contact_id': contact_id,
-                    'contact_name': vendor.get('contact_name'),
-                    'company_name': vendor.get('company_name'),
-                    'email': vendor.get('email'),
-                    'phone': vendor.get('phone'),
-                    'mobile': vendor.get('mobile'),
-                    'contact_person': vendor.get('contact_person'),
-                    'billing_address': vendor.get('billing_address', {}).get('address') if isinstance(vendor.get('billing_address'), dict) else vendor.get('billing_address'),
-                    'shipping_address': vendor.get('shipping_address', {}).get('address') if isinstance(vendor.get('shipping_address'), dict) else vendor.get('shipping_address'),
-                    'payment_terms': vendor.get('payment_terms'),
-                    'payment_terms_label': vendor.get('payment_terms_label'),
-                    'status': vendor.get('status', 'active'),
-                    'gst_no': vendor.get('gst_no'),
-                    'gst_treatment': vendor.get('gst_treatment'),
-                    'pan_no': vendor.get('pan_no'),
-                    'tax_id': vendor.get('tax_id'),
-                    'place_of_contact': vendor.get('place_of_contact'),
-                    'is_taxable': vendor.get('is_taxable', True),
-                    'outstanding_balance': vendor.get('outstanding_payable_amount', 0) or vendor.get('outstanding_balance', 0),
-                    'unused_credits': vendor.get('unused_credits_payable_amount', 0) or vendor.get('unused_credits', 0),
-                    'created_time': parse_zoho_datetime(vendor.get('created_time')),
-                    'last_modified_time': parse_zoho_datetime(vendor.get('last_modified_time')),
-                    'raw_json': json.dumps(vendor),
-                    'last_sync_at': now_ist()
-                }
-
-                if existing:
-                    # Update existing vendor
-                    await execute_query(
-                        """
-                        UPDATE zoho_vendors SET
-                            contact_name = $2, company_name = $3, email = $4,
-                            phone = $5, mobile = $6, contact_person = $7,
-                            billing_address = $8, shipping_address = $9,
-                            payment_terms = $10, payment_terms_label = $11, status = $12,
-                            gst_no = $13, gst_treatment = $14, pan_no = $15, tax_id = $16,
-                            place_of_contact = $17, is_taxable = $18,
-                            outstanding_balance = $19, unused_credits = $20,
-                            created_time = $21, last_modified_time = $22,
-                            raw_json = $23, last_sync_at = $24, updated_at = NOW()
-                        WHERE id = $1
-                        """,
-                        existing['id'],
-                        vendor_data['contact_name'], vendor_data['company_name'], vendor_data['email'],
-                        vendor_data['phone'], vendor_data['mobile'], vendor_data['contact_person'],
-                        vendor_data['billing_address'], vendor_data['shipping_address'],
-                        vendor_data['payment_terms'], vendor_data['payment_terms_label'], vendor_data['status'],
-                        vendor_data['gst_no'], vendor_data['gst_treatment'], vendor_data['pan_no'],
-                        vendor_data['tax_id'], vendor_data['place_of_contact'], vendor_data['is_taxable'],
-                        vendor_data['outstanding_balance'], vendor_data['unused_credits'],
-                        vendor_data['created_time'], vendor_data['last_modified_time'],
-                        vendor_data['raw_json'], vendor_data['last_sync_at']
-                    )
-                    updated += 1
-                    _sync_progress["updated"] = updated
-                else:
-                    # Insert new vendor
-                    await execute_query(
-                        """
-                        INSERT INTO zoho_vendors (
-                            contact_id, contact_name, company_name, email,
-                            phone, mobile, contact_person,
-                            billing_address, shipping_address,
-                            payment_terms, payment_terms_label, status,
-                            gst_no, gst_treatment, pan_no, tax_id,
-                            place_of_contact, is_taxable,
-                            outstanding_balance, unused_credits,
-                            created_time, last_modified_time,
-                            raw_json, last_sync_at
-                        ) VALUES (
-                            $1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
-                            $11, $12, $13, $14, $15, $16, $17, $18, $19, $20,
-                            $21, $22, $23, $24
-                        )
-                        """,
-                        vendor_data['contact_id'], vendor_data['contact_name'], vendor_data['company_name'],
-                        vendor_data['email'], vendor_data['phone'], vendor_data['mobile'],
-                        vendor_data['contact_person'], vendor_data['billing_address'], vendor_data['shipping_address'],
-                        vendor_data['payment_terms'], vendor_data['payment_terms_label'], vendor_data['status'],
-                        vendor_data['gst_no'], vendor_data['gst_treatment'], vendor_data['pan_no'],
-                        vendor_data['tax_id'], vendor_data['place_of_contact'], vendor_data['is_taxable'],
-                        vendor_data['outstanding_balance'], vendor_data['unused_credits'],
-                        vendor_data['created_time'], vendor_data['last_modified_time'],
-                        vendor_data['raw_json'], vendor_data['last_sync_at']
-                    )
-                    added += 1
-                    _sync_progress["added"] = added
-
-            except ValueError as e:
-                logger.error(f"Invalid contact_id format for vendor {vendor.get('contact_id', 'unknown')}: {e}")
-                errors += 1
-                _sync_progress["errors"] = errors
-            except Exception as e:
-                logger.error(f"Error syncing Zoho vendor {vendor.get('contact_id', 'unknown')}: {e}")
-                errors += 1
-                _sync_progress["errors"] = errors
+        def on_batch(counts: Dict[str, int]):
+            for key in ("added", "updated", "skipped", "errors"):
+                _sync_progress[key] = counts[key]
+            _sync_progress["current"] = counts["added"] + counts["updated"] + counts["skipped"] + counts["errors"]
+            logger.info(f"Syncing progress: {_sync_progress['current']}/{total_vendors} vendors processed")
+
+        # Unchanged vendors (same content hash) are skipped unless force_refresh
+        result = await contact_sync_service.upsert_contacts(
+            ZOHO_VENDOR_SYNC,
+            _vendor_frame(zoho_vendors),
+            force=force_refresh,
+            on_batch=on_batch
+        )
 
         logger.info(
             f"Zoho Books vendor sync completed: {total_vendors} total vendors, "
-            f"{added} added, {updated} updated, {skipped} skipped, {errors} errors"
+            f"{result['added']} added, {result['updated']} updated, "
+            f"{result['skipped']} skipped, {result['errors']} errors"
         )
 
         # Reset progress tracking
         _sync_progress["in_progress"] = False
 
         return {
-            "added": added,
-            "updated": updated,
-            "skipped": skipped,
-            "errors": errors,
+            "added": result["added"],
+            "updated": result["updated"],
+            "skipped": result["skipped"],
+            "errors": result["errors"],
             "total": total_vendors
         }
 
@@ -470,33 +404,13 @@ async def sync_from_zoho_books(synced_by: str, force_refresh: bool = False) -> D
 
 async def get_sync_progress() -> Dict:
     """
-    Get current sync progress
+    Get progress of the latest sync run (from sync_runs, so it is the same
+    on every worker)
 
     Returns:
         Dict with progress information including percentage and ETA
     """
-    progress = _sync_progress.copy()
-
-    # Calculate percentage
-    if progress["total"] > 0:
-        progress["percentage"] = round((progress["current"] / progress["total"]) * 100, 1)
-    else:
-        progress["percentage"] = 0
-
-    # Calculate ETA
-    if progress["in_progress"] and progress["start_time"] and progress["current"] > 0:
-        elapsed = (now_ist() - progress["start_time"]).total_seconds()
-        items_per_second = progress["current"] / elapsed if elapsed > 0 else 0
-        remaining_items = progress["total"] - progress["current"]
-        eta_seconds = remaining_items / items_per_second if items_per_second > 0 else 0
-        progress["eta_seconds"] = int(eta_seconds)
-    else:
-        progress["eta_seconds"] = 0
-
-    # Remove start_time from response (not JSON serializable)
-    progress.pop("start_time", None)
-
-    return progress
+    return await sync_runner_service.get_progress("zoho_vendors")
 
 
 # ============================================================================
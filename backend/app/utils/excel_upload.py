@@ -0,0 +1,179 @@
+"""
+================================================================================
+Excel Upload Pipeline - Shared parsing and validation for spreadsheet uploads
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Helpers used by the stock/price, price list and MRP label uploads. A sheet
+  is read once into a DataFrame (pandas opens .xlsx with openpyxl in
+  read-only mode), columns are matched by header alias or position, values
+  are coerced column-wise, and every problem is collected as a row-level
+  error in a single pass. Keys are then resolved with one `= ANY($1)` query
+  per upload and merged back onto the frame, instead of one lookup per row.
+
+Usage:
+  df = read_upload_frame(content, sheet_name='Products', aliases={...})
+  errors = UploadErrors()
+  df['qty'] = coerce_numeric(df, 'qty', errors, integer=True, min_value=0)
+  rows = await fetch_all("SELECT ... WHERE key = ANY($1::text[])", keys)
+  df = merge_lookup(df, rows, on=['key'], values=['id'])
+
+================================================================================
+"""
+
+import io
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+# Spreadsheet row of the first data row (row 1 is the header)
+FIRST_DATA_ROW = 2
+
+
+class UploadErrors:
+    """Row-level errors collected while validating an upload"""
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+
+    def add(self, df: pd.DataFrame, mask: pd.Series, message: str, label_column: Optional[str] = None):
+        """Record message for every row where mask is True"""
+        for _, row in df.loc[mask].iterrows():
+            self.items.append({
+                'row_number': int(row['row_number']),
+                'label': None if label_column is None or pd.isna(row[label_column]) else str(row[label_column]),
+                'error': message,
+            })
+
+    def messages(self) -> List[str]:
+        """Errors as 'Row N: message' strings, in sheet order"""
+        return [
+            f"Row {e['row_number']}: {e['label'] + ' - ' if e['label'] else ''}{e['error']}"
+            for e in sorted(self.items, key=lambda e: e['row_number'])
+        ]
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def read_upload_frame(
+    content: bytes,
+    sheet_name: Any = 0,
+    aliases: Optional[Dict[str, Sequence[str]]] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read one sheet into a DataFrame with standard column names.
+
+    Args:
+        content: Uploaded file bytes
+        sheet_name: Sheet name or index
+        aliases: {standard name: accepted headers}, matched case-insensitively
+            after trimming; every standard name is required
+        columns: Names for the first len(columns) columns by position, for
+            templates whose header text is not stable (used instead of aliases)
+
+    Returns:
+        DataFrame with the standard columns plus row_number (spreadsheet row);
+        fully empty rows are dropped
+
+    Raises:
+        ValueError: If the sheet cannot be read or required columns are missing
+    """
+    try:
+        df = pd.read_excel(io.BytesIO(content), sheet_name=sheet_name)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Failed to read Excel data: {str(e)}")
+
+    if columns is not None:
+        if len(df.columns) < len(columns):
+            raise ValueError(f"Expected at least {len(columns)} columns: {', '.join(columns)}")
+        df = df.iloc[:, :len(columns)]
+        df.columns = list(columns)
+    elif aliases is not None:
+        normalized = {str(col).strip().lower(): col for col in df.columns}
+        rename = {}
+        for standard, accepted in aliases.items():
+            for name in [standard, *accepted]:
+                if name.lower() in normalized:
+                    rename[normalized[name.lower()]] = standard
+                    break
+        missing = [standard for standard in aliases if standard not in rename.values()]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        df = df.rename(columns=rename)[list(aliases.keys())]
+
+    df['row_number'] = df.index + FIRST_DATA_ROW
+    data_columns = [col for col in df.columns if col != 'row_number']
+    return df.dropna(how='all', subset=data_columns).reset_index(drop=True)
+
+
+def coerce_numeric(
+    df: pd.DataFrame,
+    column: str,
+    errors: UploadErrors,
+    integer: bool = False,
+    required: bool = False,
+    min_value: Optional[float] = None,
+    exclusive_min: bool = False,
+    label_column: Optional[str] = None,
+) -> pd.Series:
+    """
+    Convert a column to numbers, recording bad values as row errors.
+
+    Blank cells stay missing (NaN / <NA>) unless required. Values that are
+    not numbers, are fractional for integer columns, or are below min_value
+    are reported and returned as missing.
+
+    Returns:
+        Float series, or nullable Int64 series when integer=True
+    """
+    raw = df[column]
+    blank = raw.isna() | (raw.astype(str).str.strip() == '')
+    values = pd.to_numeric(raw.where(~blank), errors='coerce')
+
+    invalid = ~blank & values.isna()
+    errors.add(df, invalid, f"{column} is not a number", label_column)
+
+    if integer:
+        fractional = values.notna() & (values % 1 != 0)
+        errors.add(df, fractional, f"{column} must be a whole number", label_column)
+        values = values.where(~fractional)
+
+    if min_value is not None:
+        too_small = values.notna() & ((values <= min_value) if exclusive_min else (values < min_value))
+        comparison = 'greater than' if exclusive_min else 'at least'
+        errors.add(df, too_small, f"{column} must be {comparison} {min_value:g}", label_column)
+        values = values.where(~too_small)
+
+    if required:
+        errors.add(df, blank, f"{column} is required", label_column)
+
+    return values.round().astype('Int64') if integer else values.astype(float)
+
+
+def merge_lookup(
+    df: pd.DataFrame,
+    rows: List[Dict[str, Any]],
+    on: Sequence[str],
+    values: Sequence[str],
+) -> pd.DataFrame:
+    """
+    Left-join database rows (from one `= ANY($1)` query) onto the upload.
+
+    Key columns in rows are cast to the frame's dtypes so nullable integer
+    keys (e.g. a missing variation_id) match NULLs from the database. Only
+    the first row per key is used; unmatched upload rows get NaN values.
+    """
+    lookup = pd.DataFrame(rows, columns=[*on, *values])
+    for key in on:
+        lookup[key] = lookup[key].astype(df[key].dtype)
+    lookup = lookup.drop_duplicates(subset=list(on), keep='first')
+    return df.merge(lookup, on=list(on), how='left')
@@ -0,0 +1,255 @@
+"""
+================================================================================
+Media Upload Pipeline - Photo uploads for GRN and wastage documentation
+================================================================================
+Version: 1.0.0
+Last Updated: 2026-10-18
+
+Description:
+  Takes the UploadFiles of one request to storage without blocking the
+  event loop:
+
+  1. read_upload: bodies are read in MEDIA_CHUNK_SIZE chunks and rejected
+     as soon as they pass the size limit
+  2. prepare_media: type check, then (in a MEDIA_PROCESS_WORKERS thread
+     pool) EXIF orientation is applied and images larger than
+     settings.MEDIA_MAX_IMAGE_DIMENSION are downsized; real byte size,
+     width, height and a SHA-256 are recorded
+  3. upload_media: files are uploaded MEDIA_UPLOAD_CONCURRENCY at a time
+     through app.utils.storage. Every file is attempted; if some fail,
+     MediaUploadError carries both the stored and the failed files so the
+     caller can keep the stored ones. Callers that name objects by content
+     hash make a retried request skip work already done (same path,
+     upsert).
+
+  Pillow is optional: without it images are stored as uploaded and
+  dimensions are left empty.
+
+================================================================================
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import UploadFile
+
+from app.config import settings
+from app.utils.storage import get_storage_client
+
+# Try importing Pillow, fallback if not available
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from an UploadFile per call
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+IMAGE_EXTENSIONS = {"image/jpeg": "jpg", "image/jpg": "jpg", "image/png": "png"}
+
+_process_pool: Optional[ThreadPoolExecutor] = None
+
+
+class MediaFile(NamedTuple):
+    """An upload read, validated and processed, ready to store"""
+    source_name: str
+    content_type: str
+    extension: str
+    data: bytes
+    size: int
+    width: Optional[int]
+    height: Optional[int]
+    sha256: str
+
+
+class StoredMedia(NamedTuple):
+    """A file in storage"""
+    source_name: str
+    path: str
+    url: str
+    content_type: str
+    size: int
+    width: Optional[int]
+    height: Optional[int]
+    sha256: str
+
+    @property
+    def size_kb(self) -> int:
+        return (self.size + 1023) // 1024
+
+
+class MediaUploadError(Exception):
+    """Some files of a request could not be stored"""
+
+    def __init__(self, stored: List[StoredMedia], failed: List[Tuple[str, str]]):
+        self.stored = stored
+        self.failed = failed
+        names = ", ".join(f"{name} ({error})" for name, error in failed)
+        super().__init__(f"{len(failed)} of {len(stored) + len(failed)} photo(s) failed to upload: {names}")
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ThreadPoolExecutor(
+            max_workers=settings.MEDIA_PROCESS_WORKERS, thread_name_prefix="media"
+        )
+    return _process_pool
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    """
+    Read an upload in chunks.
+
+    Raises:
+        ValueError: As soon as the body exceeds max_bytes
+    """
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(MEDIA_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ValueError(
+                f"{file.filename}: file exceeds maximum {max_bytes / (1024 * 1024):.0f}MB"
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _process_image(data: bytes, content_type: str) -> Tuple[bytes, Optional[int], Optional[int]]:
+    """Upright, downsized image bytes and their dimensions (runs in the pool)"""
+    if not PIL_AVAILABLE:
+        return data, None, None
+
+    try:
+        with Image.open(io.BytesIO(data)) as opened:
+            limit = settings.MEDIA_MAX_IMAGE_DIMENSION
+            rotated = opened.getexif().get(0x0112, 1) != 1  # EXIF Orientation
+            oversized = bool(limit) and max(opened.size) > limit
+            if not rotated and not oversized:
+                # Already upright and small enough: store the original bytes
+                return data, opened.width, opened.height
+
+            image = ImageOps.exif_transpose(opened) if rotated else opened
+            if oversized:
+                image.thumbnail((limit, limit))
+            output = io.BytesIO()
+            if content_type == "image/png":
+                image.save(output, format="PNG", optimize=True)
+            else:
+                image.convert("RGB").save(
+                    output, format="JPEG", quality=settings.MEDIA_JPEG_QUALITY, optimize=True
+                )
+            return output.getvalue(), image.width, image.height
+    except Exception as e:
+        raise ValueError(f"Not a readable image: {e}")
+
+
+async def prepare_media(
+    file: UploadFile,
+    allowed_types: Sequence[str],
+    max_bytes: int
+) -> MediaFile:
+    """
+    Read, validate and process one upload.
+
+    Raises:
+        ValueError: Disallowed type, too large or unreadable image
+    """
+    content_type = (file.content_type or "").lower()
+    if content_type not in allowed_types:
+        raise ValueError(f"Invalid file type: {file.content_type}. Allowed: {list(allowed_types)}")
+
+    data = await read_upload(file, max_bytes)
+    if not data:
+        raise ValueError(f"{file.filename}: file is empty")
+
+    loop = asyncio.get_running_loop()
+    data, width, height = await loop.run_in_executor(_pool(), _process_image, data, content_type)
+
+    return MediaFile(
+        source_name=file.filename or "",
+        content_type="image/jpeg" if content_type == "image/jpg" else content_type,
+        extension=IMAGE_EXTENSIONS.get(content_type, "bin"),
+        data=data,
+        size=len(data),
+        width=width,
+        height=height,
+        sha256=hashlib.sha256(data).hexdigest(),
+    )
+
+
+async def upload_media(
+    bucket: str,
+    files: List[UploadFile],
+    path_for: Callable[[int, MediaFile], str],
+    allowed_types: Sequence[str] = tuple(IMAGE_EXTENSIONS),
+    max_bytes: Optional[int] = None,
+) -> List[StoredMedia]:
+    """
+    Process and upload the files of one request.
+
+    Every file is validated before anything is uploaded, then uploads run
+    settings.MEDIA_UPLOAD_CONCURRENCY at a time.
+
+    Args:
+        bucket: Storage bucket
+        files: Uploaded files
+        path_for: (index, MediaFile) -> object path in the bucket
+        allowed_types: Accepted content types
+        max_bytes: Per-file limit (default settings.MAX_UPLOAD_SIZE_MB)
+
+    Returns:
+        Stored files, in input order
+
+    Raises:
+        ValueError: If any file fails validation (nothing is uploaded)
+        MediaUploadError: If some uploads failed (the others are stored)
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    prepared = await asyncio.gather(*[prepare_media(file, allowed_types, max_bytes) for file in files])
+
+    storage = await get_storage_client()
+    slots = asyncio.Semaphore(settings.MEDIA_UPLOAD_CONCURRENCY)
+
+    async def store(index: int, media: MediaFile) -> StoredMedia:
+        path = path_for(index, media)
+        async with slots:
+            await storage.upload(bucket, path, media.data, content_type=media.content_type)
+        return StoredMedia(
+            source_name=media.source_name,
+            path=path,
+            url=storage.public_url(bucket, path),
+            content_type=media.content_type,
+            size=media.size,
+            width=media.width,
+            height=media.height,
+            sha256=media.sha256,
+        )
+
+    results = await asyncio.gather(
+        *[store(index, media) for index, media in enumerate(prepared)], return_exceptions=True
+    )
+
+    stored = [result for result in results if isinstance(result, StoredMedia)]
+    failed = [
+        (media.source_name, str(result) or result.__class__.__name__)
+        for media, result in zip(prepared, results)
+        if not isinstance(result, StoredMedia)
+    ]
+    if failed:
+        logger.error(f"❌ {len(failed)} upload(s) to {bucket} failed: {failed}")
+        raise MediaUploadError(stored, failed)
+
+    logger.info(f"✅ Uploaded {len(stored)} file(s) to {bucket} ({sum(m.size for m in stored) // 1024} KB)")
+    return stored
@@ -0,0 +1,421 @@
+"""
+================================================================================
+Object Storage - Async client for Supabase Storage buckets
+================================================================================
+Version: 1.1.0
+Last Updated: 2026-10-18
+
+Changelog:
+----------
+v1.1.0 (2026-10-18):
+  - Added list, download (with byte ranges), create_signed_url
+  - Added download_many / upload_many: concurrent batch transfers bounded by
+    settings.STORAGE_BATCH_CONCURRENCY, reporting per-object failures
+  - MRP label library moved onto this client; supabase-py is now used for
+    auth only
+  - StorageClient is an abstract base class: a backend missing one of the
+    bucket operations fails when it is created
+
+v1.0.0 (2026-10-18):
+  - Initial async client (upload, public_url, remove) for GRN and wastage
+    photos
+
+Description:
+  Non-blocking access to storage buckets. The supabase-py client is
+  synchronous, so every call through it blocked the event loop for the
+  duration of the network transfer; this module talks to the Storage REST
+  API through one pooled httpx.AsyncClient per worker instead.
+
+  Backends (settings.STORAGE_BACKEND):
+  - supabase: Supabase Storage (credentials database-first, env fallback)
+  - local:    Files under settings.STORAGE_LOCAL_ROOT/<bucket>/<path>, for
+              tests and offline use (served at /storage by main.py)
+
+Usage:
+  storage = await get_storage_client()
+  await storage.upload('grn-photos', path, data, content_type='image/jpeg')
+  url = storage.public_url('grn-photos', path)
+  header = await storage.download('mrp_labels', '123.pdf', byte_range=(0, 1023))
+  batch = await storage.download_many('mrp_labels', ['1.pdf', '2.pdf'])
+  link = await storage.create_signed_url('grn-photos', path, expires_in=600)
+
+================================================================================
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote, urlencode
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Objects requested per page when listing a Supabase bucket
+LIST_PAGE_SIZE = 1000
+
+# (first byte, last byte) inclusive; last byte None reads to the end
+ByteRange = Tuple[int, Optional[int]]
+
+
+class StorageError(Exception):
+    """A storage operation failed"""
+
+
+class StorageObject(NamedTuple):
+    """An object in a bucket listing"""
+    name: str
+    size: int
+    content_type: Optional[str]
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+
+class BatchResult(NamedTuple):
+    """Outcome of a batch transfer; every object is attempted"""
+    succeeded: Dict[str, Any]  # path -> bytes (download) or public URL (upload)
+    failed: Dict[str, str]     # path -> error
+
+
+def _range_header(byte_range: ByteRange) -> str:
+    start, end = byte_range
+    if start < 0 or (end is not None and end < start):
+        raise StorageError(f"Invalid byte range: {byte_range}")
+    return f"bytes={start}-{'' if end is None else end}"
+
+
+class StorageClient(ABC):
+    """Bucket operations shared by all backends (subclasses implement the abstract ones)"""
+
+    @abstractmethod
+    async def upload(
+        self,
+        bucket: str,
+        path: str,
+        data: bytes,
+        content_type: str = "application/octet-stream",
+        upsert: bool = True
+    ) -> None:
+        ...
+
+    @abstractmethod
+    def public_url(self, bucket: str, path: str) -> str:
+        ...
+
+    @abstractmethod
+    async def remove(self, bucket: str, paths: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def list(self, bucket: str, prefix: str = "") -> List[StorageObject]:
+        """Objects directly under prefix (folders are not included)"""
+
+    @abstractmethod
+    async def download(self, bucket: str, path: str, byte_range: Optional[ByteRange] = None) -> bytes:
+        """
+        Object contents, or only byte_range of them.
+
+        Raises:
+            StorageError: If the object is missing or the read fails
+        """
+
+    @abstractmethod
+    async def create_signed_url(self, bucket: str, path: str, expires_in: Optional[int] = None) -> str:
+        """Time-limited URL for an object (default settings.STORAGE_SIGNED_URL_EXPIRY_SECONDS)"""
+
+    async def close(self) -> None:
+        pass
+
+    async def _batch(self, keys: Sequence[str], transfer) -> BatchResult:
+        slots = asyncio.Semaphore(settings.STORAGE_BATCH_CONCURRENCY)
+
+        async def run(key):
+            async with slots:
+                return await transfer(key)
+
+        unique = list(dict.fromkeys(keys))
+        results = await asyncio.gather(*[run(key) for key in unique], return_exceptions=True)
+
+        succeeded, failed = {}, {}
+        for key, result in zip(unique, results):
+            if isinstance(result, BaseException):
+                failed[key] = str(result) or result.__class__.__name__
+            else:
+                succeeded[key] = result
+        return BatchResult(succeeded, failed)
+
+    async def download_many(self, bucket: str, paths: Sequence[str]) -> BatchResult:
+        """
+        Download objects concurrently (duplicates are fetched once).
+
+        Returns:
+            BatchResult with path -> bytes for the objects read
+        """
+        result = await self._batch(paths, lambda path: self.download(bucket, path))
+        if result.failed:
+            logger.error(f"❌ {len(result.failed)} download(s) from {bucket} failed: {result.failed}")
+        return result
+
+    async def upload_many(
+        self,
+        bucket: str,
+        objects: Sequence[Tuple[str, bytes, str]],
+        upsert: bool = True
+    ) -> BatchResult:
+        """
+        Upload (path, data, content_type) objects concurrently.
+
+        Returns:
+            BatchResult with path -> public URL for the objects stored
+        """
+        by_path = {path: (data, content_type) for path, data, content_type in objects}
+
+        async def store(path):
+            data, content_type = by_path[path]
+            await self.upload(bucket, path, data, content_type=content_type, upsert=upsert)
+            return self.public_url(bucket, path)
+
+        result = await self._batch(list(by_path), store)
+        if result.failed:
+            logger.error(f"❌ {len(result.failed)} upload(s) to {bucket} failed: {result.failed}")
+        return result
+
+
+class SupabaseStorageClient(StorageClient):
+    """Supabase Storage REST API over a pooled async HTTP client"""
+
+    def __init__(self, url: str, service_key: str):
+        self.url = url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.url}/storage/v1",
+            headers={"Authorization": f"Bearer {service_key}", "apikey": service_key},
+            limits=httpx.Limits(
+                max_connections=settings.STORAGE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.STORAGE_MAX_CONNECTIONS
+            ),
+            timeout=settings.STORAGE_TIMEOUT_SECONDS
+        )
+
+    @staticmethod
+    def _object(bucket: str, path: str) -> str:
+        return f"{bucket}/{quote(path.lstrip('/'))}"
+
+    @staticmethod
+    def _check(response: httpx.Response, action: str) -> None:
+        if response.status_code >= 400:
+            raise StorageError(f"Storage {action} failed ({response.status_code}): {response.text[:200]}")
+
+    async def upload(self, bucket, path, data, content_type="application/octet-stream", upsert=True):
+        response = await self._client.post(
+            f"/object/{self._object(bucket, path)}",
+            content=data,
+            headers={"Content-Type": content_type, "x-upsert": "true" if upsert else "false"}
+        )
+        self._check(response, f"upload of {bucket}/{path}")
+
+    def public_url(self, bucket, path):
+        return f"{self.url}/storage/v1/object/public/{self._object(bucket, path)}"
+
+    async def remove(self, bucket, paths):
+        if not paths:
+            return
+        response = await self._client.request("DELETE", f"/object/{bucket}", json={"prefixes": list(paths)})
+        self._check(response, f"removal from {bucket}")
+
+    async def list(self, bucket, prefix=""):
+        objects = []
+        offset = 0
+        while True:
+            response = await self._client.post(
+                f"/object/list/{bucket}",
+                json={
+                    "prefix": prefix.strip("/"),
+                    "limit": LIST_PAGE_SIZE,
+                    "offset": offset,
+                    "sortBy": {"column": "name", "order": "asc"}
+                }
+            )
+            self._check(response, f"listing of {bucket}/{prefix}")
+            page = response.json()
+            for entry in page:
+                if entry.get("id") is None:
+                    continue  # folder placeholder
+                metadata = entry.get("metadata") or {}
+                objects.append(StorageObject(
+                    name=entry["name"],
+                    size=int(metadata.get("size") or 0),
+                    content_type=metadata.get("mimetype"),
+                    created_at=entry.get("created_at"),
+                    updated_at=entry.get("updated_at")
+                ))
+            if len(page) < LIST_PAGE_SIZE:
+                return objects
+            offset += LIST_PAGE_SIZE
+
+    async def download(self, bucket, path, byte_range=None):
+        headers = {"Range": _range_header(byte_range)} if byte_range else None
+        response = await self._client.get(f"/object/authenticated/{self._object(bucket, path)}", headers=headers)
+        self._check(response, f"download of {bucket}/{path}")
+        return response.content
+
+    async def create_signed_url(self, bucket, path, expires_in=None):
+        response = await self._client.post(
+            f"/object/sign/{self._object(bucket, path)}",
+            json={"expiresIn": expires_in or settings.STORAGE_SIGNED_URL_EXPIRY_SECONDS}
+        )
+        self._check(response, f"signing of {bucket}/{path}")
+        return f"{self.url}/storage/v1{response.json()['signedURL']}"
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class LocalStorageClient(StorageClient):
+    """Buckets as directories on local disk; file I/O runs in threads"""
+
+    def __init__(self, root: str, public_base_url: str):
+        self.root = Path(root).resolve()
+        self.public_base_url = public_base_url.rstrip("/")
+
+    def _file(self, bucket: str, path: str) -> Path:
+        target = (self.root / bucket / path.lstrip("/")).resolve()
+        if self.root / bucket not in target.parents:
+            raise StorageError(f"Invalid storage path: {path}")
+        return target
+
+    async def upload(self, bucket, path, data, content_type="application/octet-stream", upsert=True):
+        target = self._file(bucket, path)
+
+        def write():
+            if target.exists() and not upsert:
+                raise StorageError(f"Object already exists: {bucket}/{path}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partial = target.with_name(f".{target.name}.part")
+            partial.write_bytes(data)
+            os.replace(partial, target)
+
+        await asyncio.to_thread(write)
+
+    def public_url(self, bucket, path):
+        return f"{self.public_base_url}/{bucket}/{quote(path.lstrip('/'))}"
+
+    async def remove(self, bucket, paths):
+        targets = [self._file(bucket, path) for path in paths]
+        await asyncio.to_thread(lambda: [target.unlink(missing_ok=True) for target in targets])
+
+    async def list(self, bucket, prefix=""):
+        folder = self.root / bucket
+        if prefix.strip("/"):
+            folder = self._file(bucket, prefix.strip("/"))
+
+        def scan():
+            if not folder.is_dir():
+                return []
+            objects = []
+            for entry in sorted(folder.iterdir(), key=lambda e: e.name):
+                if not entry.is_file() or entry.name.endswith(".part"):
+                    continue
+                stat = entry.stat()
+                objects.append(StorageObject(
+                    name=entry.name,
+                    size=stat.st_size,
+                    content_type=None,
+                    created_at=datetime.fromtimestamp(stat.st_ctime, timezone.utc).isoformat(),
+                    updated_at=datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat()
+                ))
+            return objects
+
+        return await asyncio.to_thread(scan)
+
+    async def download(self, bucket, path, byte_range=None):
+        target = self._file(bucket, path)
+        if byte_range:
+            _range_header(byte_range)  # validates
+
+        def read():
+            if not target.is_file():
+                raise StorageError(f"Object not found: {bucket}/{path}")
+            with open(target, "rb") as handle:
+                if not byte_range:
+                    return handle.read()
+                start, end = byte_range
+                handle.seek(start)
+                return handle.read(-1 if end is None else end - start + 1)
+
+        return await asyncio.to_thread(read)
+
+    async def create_signed_url(self, bucket, path, expires_in=None):
+        # Local files are served without authentication at /storage, so the
+        # token only marks the URL as issued by this app and when it lapses
+        expires = int(time.time()) + (expires_in or settings.STORAGE_SIGNED_URL_EXPIRY_SECONDS)
+        message = f"{bucket}/{path.lstrip('/')}:{expires}".encode()
+        token = hmac.new(settings.JWT_SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+        return f"{self.public_url(bucket, path)}?{urlencode({'expires': expires, 'token': token})}"
+
+
+_storage_client: Optional[StorageClient] = None
+_storage_lock = asyncio.Lock()
+
+
+async def _supabase_credentials() -> tuple:
+    """Supabase URL and service key, database first with env fallback"""
+    try:
+        from app.database import get_db
+        from app.utils.settings_helper import get_supabase_credentials
+        async with get_db().acquire() as conn:
+            url, key = await get_supabase_credentials(conn)
+    except Exception as e:
+        logger.warning(f"⚠️ Database unavailable for Supabase credentials lookup: {e}. Using environment.")
+        url, key = None, None
+    return url or settings.SUPABASE_URL or None, key or settings.SUPABASE_SERVICE_KEY or None
+
+
+async def get_storage_client() -> StorageClient:
+    """
+    Storage client singleton for settings.STORAGE_BACKEND.
+
+    Raises:
+        RuntimeError: If the backend is unknown or Supabase is not configured
+    """
+    global _storage_client
+
+    if _storage_client is None:
+        async with _storage_lock:
+            if _storage_client is None:
+                backend = settings.STORAGE_BACKEND.lower()
+                if backend == "local":
+                    _storage_client = LocalStorageClient(
+                        settings.STORAGE_LOCAL_ROOT,
+                        settings.STORAGE_LOCAL_PUBLIC_URL or f"{settings.API_BASE_URL.rstrip('/')}/storage"
+                    )
+                elif backend == "supabase":
+                    url, key = await _supabase_credentials()
+                    if not url or not key:
+                        raise RuntimeError(
+                            "❌ Supabase credentials not configured. "
+                            "Please configure via Settings UI or environment variables."
+                        )
+                    _storage_client = SupabaseStorageClient(url, key)
+                else:
+                    raise RuntimeError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+                logger.info(f"✅ Storage client initialized ({backend})")
+
+    return _storage_client
+
+
+async def close_storage_client() -> None:
+    """Close pooled connections (application shutdown)"""
+    global _storage_client
+    if _storage_client is not None:
+        await _storage_client.close()
+        _storage_client = None
@@ -2,11 +2,19 @@
 ================================================================================
 Supabase Client Utility
 ================================================================================
-Version: 2.0.0
-Last Updated: 2025-11-23
+Version: 2.1.0
+Last Updated: 2026-10-18
+
+Note:
+  supabase-py is synchronous: calls through this client block the event
+  loop. Use it for Supabase Auth only; Storage goes through the async
+  client in app.utils.storage (get_storage_client).
 
 Changelog:
 ----------
+v2.1.0 (2026-10-18):
+  - Storage callers moved to app.utils.storage; this client is auth-only
+
 v2.0.0 (2025-11-23):
   - BREAKING: Changed to database-first configuration with env fallback
   - Added async get_supabase_client_async() for database lookup
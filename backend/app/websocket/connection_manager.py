@@ -57,6 +57,10 @@ class ConnectionManager:
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
 
+                # Clients re-join their rooms when they reconnect
+                for room in list(self.rooms):
+                    self.leave_room(user_id, room)
+
                 # Broadcast user offline
                 asyncio.create_task(
                     self.broadcast({
@@ -119,6 +123,10 @@ class ConnectionManager:
         if room in self.rooms:
             await self.send_to_users(list(self.rooms[room]), message)
 
+    def has_room_members(self, room: str) -> bool:
+        """Whether anyone connected to this worker is in the room"""
+        return bool(self.rooms.get(room))
+
     def get_connection_count(self) -> int:
         """Get total number of active connections"""
         return sum(len(conns) for conns in self.active_connections.values())
@@ -15,10 +15,13 @@ Event Types:
   - dashboard.update: Dashboard statistics updated
   - notification: User-specific notification
   - inventory.low_stock: Low stock alert for admins
+  - allocation.cells: Changed / removed cells of an allocation sheet, sent to
+    the sheet's room (allocation:<sheet_id>) as compact per-cell deltas
+  - wastage.alerts: Wastage threshold alerts raised / resolved, for admins
 
 ================================================================================
 """
-from typing import Dict, Any
+from typing import Dict, Any, List
 from .connection_manager import manager
 
 
@@ -60,3 +63,41 @@ async def emit_low_stock_alert(items: list):
         "type": "inventory.low_stock",
         "data": {"items": items}
     })
+
+
+async def emit_wastage_alerts(raised: List[Dict[str, Any]], resolved: List[Dict[str, Any]]):
+    """Emit wastage threshold alerts raised / resolved to admins"""
+    await manager.broadcast_to_admins({
+        "type": "wastage.alerts",
+        "data": {"raised": raised, "resolved": resolved}
+    })
+
+
+def allocation_room(sheet_id: int) -> str:
+    """Room of clients viewing an allocation sheet"""
+    return f"allocation:{sheet_id}"
+
+
+def has_allocation_watchers(sheet_id: int) -> bool:
+    """Whether any client on this worker is viewing the sheet"""
+    return manager.has_room_members(allocation_room(sheet_id))
+
+
+async def emit_allocation_cells(
+    sheet_id: int,
+    cells: List[Dict[str, Any]],
+    removed: List[int],
+    totals: Dict[str, Any],
+    reason: str
+):
+    """Emit allocation cell deltas to the sheet's room"""
+    await manager.broadcast_to_room(allocation_room(sheet_id), {
+        "type": "allocation.cells",
+        "data": {
+            "sheet_id": sheet_id,
+            "reason": reason,
+            "cells": cells,
+            "removed": removed,
+            "totals": totals
+        }
+    })
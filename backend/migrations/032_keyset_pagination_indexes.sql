@@ -0,0 +1,50 @@
+-- ================================================================================
+-- Migration 032: Keyset Pagination Indexes
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Composite indexes matching the sort order of list endpoints so
+--              cursor (keyset) pagination is answered by an index range scan.
+--              Each index ends with the primary key used as tie-breaker.
+-- ================================================================================
+
+-- Newest-first lists: (created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_tickets_keyset
+ON tickets(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_sales_orders_keyset
+ON sales_orders(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_keyset
+ON purchase_orders(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_grns_keyset
+ON grns(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_batches_keyset
+ON batches(created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_activity_logs_keyset
+ON activity_logs(created_at DESC, id DESC);
+
+-- Alphabetical lists
+CREATE INDEX IF NOT EXISTS idx_zoho_items_keyset
+ON zoho_items(name, id);
+
+CREATE INDEX IF NOT EXISTS idx_woo_customers_keyset
+ON woo_customers((COALESCE(first_name, '')), (COALESCE(last_name, '')), id);
+
+-- Keep planner statistics fresh for count=estimated
+ANALYZE tickets;
+ANALYZE sales_orders;
+ANALYZE purchase_orders;
+ANALYZE grns;
+ANALYZE batches;
+ANALYZE activity_logs;
+ANALYZE zoho_items;
+ANALYZE woo_customers;
+
+-- ================================================================================
+-- Verification
+-- ================================================================================
+-- SELECT indexname, tablename FROM pg_indexes WHERE indexname LIKE '%_keyset';
@@ -0,0 +1,76 @@
+-- ================================================================================
+-- Migration 033: Denormalized Batch Location and Ticket Comment Count
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Adds batches.current_location and tickets.comment_count so batch
+--              search and ticket lists no longer run a correlated subquery per
+--              row. Both columns are maintained by the application in the same
+--              transaction that writes batch_history / ticket_comments.
+-- ================================================================================
+
+-- ================================================================================
+-- STEP 1: batches.current_location
+-- ================================================================================
+
+ALTER TABLE batches
+ADD COLUMN IF NOT EXISTS current_location VARCHAR(100);
+
+COMMENT ON COLUMN batches.current_location IS
+'Location of the latest batch_history event with a location. Written by add_batch_history.';
+
+-- Backfill from the latest located history event per batch
+UPDATE batches b
+SET current_location = h.location
+FROM (
+    SELECT DISTINCT ON (batch_id) batch_id, location
+    FROM batch_history
+    WHERE location IS NOT NULL
+    ORDER BY batch_id, created_at DESC, id DESC
+) h
+WHERE h.batch_id = b.id
+  AND b.current_location IS DISTINCT FROM h.location;
+
+-- ================================================================================
+-- STEP 2: tickets.comment_count
+-- ================================================================================
+
+ALTER TABLE tickets
+ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN tickets.comment_count IS
+'Number of ticket_comments rows. Maintained by the comment add/delete paths.';
+
+-- Backfill from existing comments
+UPDATE tickets t
+SET comment_count = c.cnt
+FROM (
+    SELECT ticket_id, COUNT(*) as cnt
+    FROM ticket_comments
+    GROUP BY ticket_id
+) c
+WHERE c.ticket_id = t.id
+  AND t.comment_count <> c.cnt;
+
+-- Counter changes are bookkeeping, not edits: keep updated_at unchanged when
+-- comment_count is the only column that changed. The function is shared with
+-- ticket_comments, where removing the missing key is a no-op.
+CREATE OR REPLACE FUNCTION update_tickets_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (to_jsonb(NEW) - 'comment_count' - 'updated_at')
+       = (to_jsonb(OLD) - 'comment_count' - 'updated_at') THEN
+        NEW.updated_at = OLD.updated_at;
+    ELSE
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ================================================================================
+-- Verification
+-- ================================================================================
+-- SELECT COUNT(*) FROM tickets t
+-- WHERE t.comment_count <> (SELECT COUNT(*) FROM ticket_comments tc WHERE tc.ticket_id = t.id);
+-- (should return 0)
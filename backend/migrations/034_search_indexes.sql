@@ -0,0 +1,126 @@
+-- ================================================================================
+-- Migration 034: Trigram and Full-Text Search Indexes
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Enables pg_trgm and adds GIN trigram indexes on every column used
+--              by an ILIKE '%term%' search filter, so those filters (and the
+--              global quick-search endpoint) use an index instead of a
+--              sequential scan. Tickets also get a weighted tsvector column for
+--              word search over title and description.
+-- ================================================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ================================================================================
+-- STEP 1: Items and products
+-- ================================================================================
+
+CREATE INDEX IF NOT EXISTS idx_zoho_items_name_trgm
+    ON zoho_items USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_zoho_items_sku_trgm
+    ON zoho_items USING GIN (sku gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_zoho_items_hsn_trgm
+    ON zoho_items USING GIN (hsn_or_sac gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm
+    ON products USING GIN (product_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_sku_trgm
+    ON products USING GIN (sku gin_trgm_ops);
+
+-- ================================================================================
+-- STEP 2: Batches and documents
+-- ================================================================================
+
+CREATE INDEX IF NOT EXISTS idx_batches_batch_number_trgm
+    ON batches USING GIN (batch_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_purchase_orders_po_number_trgm
+    ON purchase_orders USING GIN (po_number gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_so_number_trgm
+    ON sales_orders USING GIN (so_number gin_trgm_ops);
+
+-- ================================================================================
+-- STEP 3: Customers and vendors
+-- ================================================================================
+
+CREATE INDEX IF NOT EXISTS idx_zoho_customers_contact_name_trgm
+    ON zoho_customers USING GIN (contact_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_zoho_customers_company_name_trgm
+    ON zoho_customers USING GIN (company_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_zoho_customers_email_trgm
+    ON zoho_customers USING GIN (email gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_zoho_vendors_contact_name_trgm
+    ON zoho_vendors USING GIN (contact_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_zoho_vendors_company_name_trgm
+    ON zoho_vendors USING GIN (company_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_zoho_vendors_email_trgm
+    ON zoho_vendors USING GIN (email gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_woo_customers_first_name_trgm
+    ON woo_customers USING GIN (first_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_woo_customers_last_name_trgm
+    ON woo_customers USING GIN (last_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_woo_customers_email_trgm
+    ON woo_customers USING GIN (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_woo_customers_billing_company_trgm
+    ON woo_customers USING GIN (billing_company gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_woo_customers_billing_phone_trgm
+    ON woo_customers USING GIN (billing_phone gin_trgm_ops);
+
+-- ================================================================================
+-- STEP 4: Tickets (trigram on title, full-text on title + description)
+-- ================================================================================
+
+CREATE INDEX IF NOT EXISTS idx_tickets_title_trgm
+    ON tickets USING GIN (title gin_trgm_ops);
+
+ALTER TABLE tickets
+ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', COALESCE(title, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(description, '')), 'B')
+) STORED;
+
+COMMENT ON COLUMN tickets.search_vector IS
+'Weighted title (A) + description (B) tsvector for ticket search. Generated column.';
+
+CREATE INDEX IF NOT EXISTS idx_tickets_search_vector
+    ON tickets USING GIN (search_vector);
+
+-- Generated columns are not yet computed when BEFORE triggers run, so ignore
+-- search_vector when deciding whether a row change should touch updated_at
+-- (see migration 033).
+CREATE OR REPLACE FUNCTION update_tickets_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF (to_jsonb(NEW) - 'comment_count' - 'updated_at' - 'search_vector')
+       = (to_jsonb(OLD) - 'comment_count' - 'updated_at' - 'search_vector') THEN
+        NEW.updated_at = OLD.updated_at;
+    ELSE
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ================================================================================
+-- STEP 5: Refresh planner statistics
+-- ================================================================================
+
+ANALYZE zoho_items;
+ANALYZE products;
+ANALYZE batches;
+ANALYZE purchase_orders;
+ANALYZE sales_orders;
+ANALYZE zoho_customers;
+ANALYZE zoho_vendors;
+ANALYZE woo_customers;
+ANALYZE tickets;
+
+-- ================================================================================
+-- VERIFICATION
+-- ================================================================================
+-- EXPLAIN ANALYZE SELECT id FROM zoho_items WHERE name ILIKE '%tomato%';
+--   -> Bitmap Index Scan on idx_zoho_items_name_trgm
+-- ================================================================================
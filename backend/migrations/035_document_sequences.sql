@@ -0,0 +1,74 @@
+-- ================================================================================
+-- Migration 035: Document Number Sequences
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: One counter row per (document type, financial year) for SO, PO
+--              and batch numbers. Numbers are reserved with a single
+--              INSERT ... ON CONFLICT DO UPDATE ... RETURNING outside the
+--              document's own transaction, so concurrent order entry neither
+--              collides (old MAX()+1 over a LIKE scan) nor waits on a row lock
+--              held for the whole create transaction (old batch_sequence row).
+--              A new financial year simply starts a new row at 1.
+--
+--              batch_sequence stays as the batch prefix / FY configuration row;
+--              its current_number column is no longer used.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS document_sequences (
+    doc_type VARCHAR(30) NOT NULL,          -- sales_order, purchase_order, batch
+    financial_year VARCHAR(4) NOT NULL,     -- Short FY format: 2526 for FY 2025-26
+    current_number INTEGER NOT NULL DEFAULT 0 CHECK (current_number >= 0),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (doc_type, financial_year)
+);
+
+COMMENT ON TABLE document_sequences IS
+'Last issued number per document type and financial year (Apr 1 - Mar 31).';
+
+-- ================================================================================
+-- STEP 1: Seed from existing documents
+-- ================================================================================
+
+-- Purchase orders carry sequence_number / financial_year columns
+INSERT INTO document_sequences (doc_type, financial_year, current_number)
+SELECT 'purchase_order', financial_year, MAX(sequence_number)
+FROM purchase_orders
+WHERE financial_year ~ '^\d{4}$' AND sequence_number IS NOT NULL
+GROUP BY financial_year
+ON CONFLICT (doc_type, financial_year) DO UPDATE
+SET current_number = GREATEST(document_sequences.current_number, EXCLUDED.current_number);
+
+-- Sales orders: parse SO/25-26/0001
+INSERT INTO document_sequences (doc_type, financial_year, current_number)
+SELECT 'sales_order',
+       replace(split_part(so_number, '/', 2), '-', ''),
+       MAX(split_part(so_number, '/', 3)::INTEGER)
+FROM sales_orders
+WHERE so_number ~ '^SO/\d{2}-\d{2}/\d+$'
+GROUP BY 2
+ON CONFLICT (doc_type, financial_year) DO UPDATE
+SET current_number = GREATEST(document_sequences.current_number, EXCLUDED.current_number);
+
+-- Batches: parse B/2526/0001, then take the configured counter if higher
+INSERT INTO document_sequences (doc_type, financial_year, current_number)
+SELECT 'batch',
+       split_part(batch_number, '/', 2),
+       MAX(split_part(batch_number, '/', 3)::INTEGER)
+FROM batches
+WHERE batch_number ~ '^[^/]+/\d{4}/\d+$'
+GROUP BY 2
+ON CONFLICT (doc_type, financial_year) DO UPDATE
+SET current_number = GREATEST(document_sequences.current_number, EXCLUDED.current_number);
+
+INSERT INTO document_sequences (doc_type, financial_year, current_number)
+SELECT 'batch', financial_year, current_number
+FROM batch_sequence
+WHERE id = 1
+ON CONFLICT (doc_type, financial_year) DO UPDATE
+SET current_number = GREATEST(document_sequences.current_number, EXCLUDED.current_number);
+
+-- ================================================================================
+-- Verification
+-- ================================================================================
+-- SELECT * FROM document_sequences ORDER BY doc_type, financial_year;
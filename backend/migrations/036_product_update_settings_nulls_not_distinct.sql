@@ -0,0 +1,54 @@
+-- ================================================================================
+-- Migration 036: product_update_settings unique key treats NULL variation as a value
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: UNIQUE (product_id, variation_id) never conflicted for simple
+--              products (variation_id IS NULL), so every upsert of a simple
+--              product's settings inserted another row. Collapses those
+--              duplicates (newest row wins, but a manual lock on any
+--              duplicate is kept) and recreates the constraint with
+--              NULLS NOT DISTINCT (PostgreSQL 15+) so ON CONFLICT matches them.
+--              Required by the bulk "mark deleted" upsert in
+--              StockPriceService.sync_from_woocommerce.
+-- ================================================================================
+
+BEGIN;
+
+-- Carry a manual lock (is_updatable = false) on any duplicate over to the
+-- newest row, which is the one kept below
+UPDATE product_update_settings s
+SET is_updatable = d.is_updatable
+FROM (
+    SELECT product_id, variation_id,
+           MAX(id) AS keep_id,
+           bool_and(COALESCE(is_updatable, TRUE)) AS is_updatable
+    FROM product_update_settings
+    GROUP BY product_id, variation_id
+    HAVING COUNT(*) > 1
+) d
+WHERE s.id = d.keep_id
+  AND s.is_updatable IS DISTINCT FROM d.is_updatable;
+
+-- Keep the most recent settings row per product / variation
+DELETE FROM product_update_settings a
+USING product_update_settings b
+WHERE a.product_id = b.product_id
+  AND a.variation_id IS NOT DISTINCT FROM b.variation_id
+  AND a.id < b.id;
+
+ALTER TABLE product_update_settings
+DROP CONSTRAINT IF EXISTS product_update_settings_product_id_variation_id_key;
+
+ALTER TABLE product_update_settings
+ADD CONSTRAINT product_update_settings_product_id_variation_id_key
+UNIQUE NULLS NOT DISTINCT (product_id, variation_id);
+
+COMMIT;
+
+-- ================================================================================
+-- Verification
+-- ================================================================================
+-- SELECT product_id, variation_id, COUNT(*) FROM product_update_settings
+-- GROUP BY 1, 2 HAVING COUNT(*) > 1;
+-- (should return 0 rows)
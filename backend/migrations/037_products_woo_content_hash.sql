@@ -0,0 +1,16 @@
+-- ================================================================================
+-- Migration 037: Content hash for WooCommerce product sync
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Adds products.woo_content_hash, the MD5 of the WooCommerce
+--              fields last written by ProductService.sync_from_woocommerce.
+--              The sync compares it against the freshly fetched data and only
+--              rewrites rows whose content changed. Existing rows start NULL
+--              and are rewritten once on the next sync.
+-- ================================================================================
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS woo_content_hash VARCHAR(32);
+
+COMMENT ON COLUMN products.woo_content_hash IS
+    'MD5 of WooCommerce fields last synced (sku, name, parent, stock, prices, categories, attributes, status)';
@@ -0,0 +1,19 @@
+-- ================================================================================
+-- Migration 038: Content hash for contact master syncs
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Adds content_hash to zoho_customers, zoho_vendors and
+--              woo_customers. contact_sync_service.upsert_contacts stores the
+--              MD5 of the synced columns and only rewrites a contact when the
+--              hash of the freshly fetched data differs. Existing rows start
+--              NULL and are rewritten once on the next sync.
+-- ================================================================================
+
+ALTER TABLE zoho_customers ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
+ALTER TABLE zoho_vendors ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
+ALTER TABLE woo_customers ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
+
+COMMENT ON COLUMN zoho_customers.content_hash IS 'MD5 of the columns last written by the Zoho sync';
+COMMENT ON COLUMN zoho_vendors.content_hash IS 'MD5 of the columns last written by the Zoho sync';
+COMMENT ON COLUMN woo_customers.content_hash IS 'MD5 of the columns last written by the WooCommerce sync';
@@ -0,0 +1,43 @@
+-- ================================================================================
+-- Migration 039: Sync run history
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: One row per run of a Zoho / WooCommerce sync job, written by
+--              sync_runner_service. Counts are flushed while the job runs, so
+--              every worker's /sync-progress endpoint sees the same progress.
+--              Only one run per job executes at a time (advisory lock held by
+--              the runner); a 'running' row whose lock is free is a run whose
+--              worker died and is closed as 'failed' by the next run.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS sync_runs (
+    id BIGSERIAL PRIMARY KEY,
+    job_name VARCHAR(50) NOT NULL,               -- zoho_items, woo_items, zoho_vendors, ...
+    trigger VARCHAR(20) NOT NULL DEFAULT 'manual', -- manual, scheduled
+    status VARCHAR(20) NOT NULL DEFAULT 'running', -- running, completed, failed
+    triggered_by VARCHAR(255),
+    options JSONB,
+
+    -- Progress / result counts
+    total INTEGER NOT NULL DEFAULT 0,
+    current INTEGER NOT NULL DEFAULT 0,
+    added INTEGER NOT NULL DEFAULT 0,
+    updated INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    error_message TEXT,
+
+    -- Timings
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE,
+
+    CONSTRAINT sync_runs_status_check CHECK (status IN ('running', 'completed', 'failed'))
+);
+
+-- Latest run per job (progress endpoints, history)
+CREATE INDEX IF NOT EXISTS idx_sync_runs_job_started
+    ON sync_runs (job_name, started_at DESC, id DESC);
+
+COMMENT ON TABLE sync_runs IS 'Zoho/WooCommerce sync job runs with progress, counts, timings and errors';
@@ -0,0 +1,20 @@
+-- ================================================================================
+-- Migration 040: Shared OAuth access tokens
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Access tokens shared by all API workers. zoho_books_client
+--              stores the Zoho Books token here after a refresh (one refresh
+--              at a time across workers, under an advisory lock) and every
+--              worker reuses it until shortly before expires_at. The row is
+--              deleted when Zoho credentials change in system settings.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS oauth_tokens (
+    provider VARCHAR(50) PRIMARY KEY,          -- zoho
+    access_token TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE oauth_tokens IS 'Current OAuth access token per provider, shared across workers';
@@ -0,0 +1,14 @@
+-- ================================================================================
+-- Migration 041: Content hash for the Zoho item sync
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Adds zoho_items.content_hash. The pipelined item sync merges
+--              each fetched page with contact_sync_service.upsert_contacts,
+--              which skips rows whose hash is unchanged. Existing rows start
+--              NULL and are rewritten once on the next sync.
+-- ================================================================================
+
+ALTER TABLE zoho_items ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
+
+COMMENT ON COLUMN zoho_items.content_hash IS 'MD5 of the columns last written by the Zoho sync';
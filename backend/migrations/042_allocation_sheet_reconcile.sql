@@ -0,0 +1,143 @@
+-- ================================================================================
+-- Migration 042: Incremental allocation sheet reconciliation
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Opening an allocation sheet no longer rewrites it. Changes to
+--              sales orders, SO lines and packed warehouse stock mark the
+--              affected (delivery_date, item_id) pairs in
+--              allocation_dirty_items; allocation_service.reconcile_sheet
+--              then upserts cells and re-runs FIFO for those items only.
+--              Only dates that already have a sheet are marked; a new sheet
+--              is built in full when it is first opened.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS allocation_dirty_items (
+    delivery_date DATE NOT NULL,
+    item_id INT NOT NULL,
+    marked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (delivery_date, item_id)
+);
+
+COMMENT ON TABLE allocation_dirty_items IS 'Items whose allocation sheet cells must be reconciled, per delivery date';
+
+-- Mark one item on a delivery date (no-op when the date has no sheet)
+CREATE OR REPLACE FUNCTION mark_allocation_item_dirty(p_delivery_date DATE, p_item_id INT)
+RETURNS VOID AS $$
+BEGIN
+    IF p_delivery_date IS NULL OR p_item_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO allocation_dirty_items (delivery_date, item_id)
+    SELECT s.delivery_date, p_item_id
+    FROM allocation_sheets s
+    WHERE s.delivery_date = p_delivery_date
+    ON CONFLICT (delivery_date, item_id) DO NOTHING;
+END;
+$$ LANGUAGE plpgsql;
+
+-- SO line added, changed or removed
+CREATE OR REPLACE FUNCTION trg_so_items_mark_allocation_dirty()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM mark_allocation_item_dirty(
+            (SELECT delivery_date FROM sales_orders WHERE id = OLD.sales_order_id), OLD.item_id
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM mark_allocation_item_dirty(
+            (SELECT delivery_date FROM sales_orders WHERE id = NEW.sales_order_id), NEW.item_id
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_so_items_allocation_dirty ON sales_order_items;
+CREATE TRIGGER trg_so_items_allocation_dirty
+    AFTER INSERT OR UPDATE OR DELETE ON sales_order_items
+    FOR EACH ROW
+    EXECUTE FUNCTION trg_so_items_mark_allocation_dirty();
+
+-- SO moved to another date, cancelled, delivered or reassigned
+CREATE OR REPLACE FUNCTION trg_sales_orders_mark_allocation_dirty()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO allocation_dirty_items (delivery_date, item_id)
+    SELECT s.delivery_date, soi.item_id
+    FROM sales_order_items soi
+    JOIN allocation_sheets s ON s.delivery_date IN (OLD.delivery_date, NEW.delivery_date)
+    WHERE soi.sales_order_id = NEW.id
+    ON CONFLICT (delivery_date, item_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sales_orders_allocation_dirty ON sales_orders;
+CREATE TRIGGER trg_sales_orders_allocation_dirty
+    AFTER UPDATE OF delivery_date, status, customer_id ON sales_orders
+    FOR EACH ROW
+    WHEN (OLD.delivery_date IS DISTINCT FROM NEW.delivery_date
+          OR OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.customer_id IS DISTINCT FROM NEW.customer_id)
+    EXECUTE FUNCTION trg_sales_orders_mark_allocation_dirty();
+
+-- Packed warehouse stock changed: FIFO input of every open sheet
+CREATE OR REPLACE FUNCTION trg_inventory_mark_allocation_dirty()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_item_ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.location <> 'packed_warehouse' THEN
+            RETURN NULL;
+        END IF;
+        v_item_ids := ARRAY[NEW.item_id];
+    ELSIF TG_OP = 'DELETE' THEN
+        IF OLD.location <> 'packed_warehouse' THEN
+            RETURN NULL;
+        END IF;
+        v_item_ids := ARRAY[OLD.item_id];
+    ELSE
+        IF OLD.location <> 'packed_warehouse' AND NEW.location <> 'packed_warehouse' THEN
+            RETURN NULL;
+        END IF;
+        v_item_ids := ARRAY[OLD.item_id, NEW.item_id];
+    END IF;
+
+    INSERT INTO allocation_dirty_items (delivery_date, item_id)
+    SELECT DISTINCT s.delivery_date, u.item_id
+    FROM allocation_sheets s
+    CROSS JOIN unnest(v_item_ids) AS u(item_id)
+    WHERE s.status = 'active'
+      AND s.delivery_date >= CURRENT_DATE
+    ON CONFLICT (delivery_date, item_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_inventory_allocation_dirty ON inventory;
+CREATE TRIGGER trg_inventory_allocation_dirty
+    AFTER INSERT OR DELETE ON inventory
+    FOR EACH ROW
+    EXECUTE FUNCTION trg_inventory_mark_allocation_dirty();
+
+DROP TRIGGER IF EXISTS trg_inventory_allocation_dirty_update ON inventory;
+CREATE TRIGGER trg_inventory_allocation_dirty_update
+    AFTER UPDATE ON inventory
+    FOR EACH ROW
+    WHEN (OLD.quantity IS DISTINCT FROM NEW.quantity
+          OR OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.location IS DISTINCT FROM NEW.location
+          OR OLD.item_id IS DISTINCT FROM NEW.item_id
+          OR OLD.expiry_date IS DISTINCT FROM NEW.expiry_date)
+    EXECUTE FUNCTION trg_inventory_mark_allocation_dirty();
+
+-- ================================================================================
+-- Verification Queries
+-- ================================================================================
+
+-- Pending reconciliation per sheet:
+-- SELECT delivery_date, COUNT(*) FROM allocation_dirty_items GROUP BY delivery_date;
@@ -0,0 +1,45 @@
+-- ================================================================================
+-- Migration 043: Order reference on allocated inventory
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: inventory_allocation_service.allocate_order reserves a whole
+--              sales order in one transaction. Allocated rows now record the
+--              order they belong to, so deallocation and confirmation touch
+--              exactly that order's rows instead of every allocated row of
+--              the same item/batch/location. Rows allocated before this
+--              migration keep a NULL reference and are still matched through
+--              their allocation movements.
+--
+--              Also allows the 'deallocation' movement type, which the
+--              allocation service already writes.
+-- ================================================================================
+
+ALTER TABLE inventory
+    ADD COLUMN IF NOT EXISTS allocated_order_id INTEGER;
+
+COMMENT ON COLUMN inventory.allocated_order_id IS 'Sales order holding this row (status allocated/delivered); NULL for free stock';
+
+CREATE INDEX IF NOT EXISTS idx_inventory_allocated_order
+    ON inventory(allocated_order_id)
+    WHERE allocated_order_id IS NOT NULL;
+
+-- FIFO candidates per item at a location
+CREATE INDEX IF NOT EXISTS idx_inventory_available_item_location
+    ON inventory(item_id, location)
+    WHERE status = 'available';
+
+ALTER TABLE inventory_movements DROP CONSTRAINT IF EXISTS check_movement_type_valid;
+ALTER TABLE inventory_movements ADD CONSTRAINT check_movement_type_valid CHECK (movement_type IN (
+    'stock_in', 'stock_out', 'location_transfer', 'adjustment', 'allocation', 'deallocation', 'delivery'
+));
+
+COMMENT ON COLUMN inventory_movements.movement_type IS 'Type: stock_in/stock_out/location_transfer/adjustment/allocation/deallocation/delivery';
+
+-- ================================================================================
+-- Verification Queries
+-- ================================================================================
+
+-- Allocated stock per order:
+-- SELECT allocated_order_id, item_id, SUM(quantity) FROM inventory
+-- WHERE status = 'allocated' GROUP BY allocated_order_id, item_id;
@@ -0,0 +1,53 @@
+-- ================================================================================
+-- Migration 044: Stale allocation release runs
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: allocation_cleanup_service.release_stale_allocations now runs
+--              on the scheduler and releases stale allocations in chunks
+--              (one UPDATE ... RETURNING plus one movement insert per chunk,
+--              each in its own short transaction). Every run is recorded here
+--              with its counts and timings. Only one run executes at a time
+--              (advisory lock); an overlapping run is recorded as 'skipped'.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS allocation_cleanup_runs (
+    id BIGSERIAL PRIMARY KEY,
+    trigger VARCHAR(20) NOT NULL DEFAULT 'scheduled', -- scheduled, manual
+    triggered_by VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'running',    -- running, completed, failed, skipped
+    timeout_hours INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+
+    -- Results
+    released_count INTEGER NOT NULL DEFAULT 0,
+    released_quantity DECIMAL(14, 3) NOT NULL DEFAULT 0,
+    orders_affected INTEGER NOT NULL DEFAULT 0,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    error_message TEXT,
+
+    -- Timings
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE,
+    duration_ms INTEGER,
+
+    CONSTRAINT allocation_cleanup_runs_status_check CHECK (status IN ('running', 'completed', 'failed', 'skipped'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_allocation_cleanup_runs_started
+    ON allocation_cleanup_runs(started_at DESC);
+
+-- Oldest allocations first (chunked release, expiring-soon report)
+CREATE INDEX IF NOT EXISTS idx_inventory_allocated_updated
+    ON inventory(updated_at)
+    WHERE status = 'allocated';
+
+COMMENT ON TABLE allocation_cleanup_runs IS 'One row per run of the stale allocation release job';
+
+-- ================================================================================
+-- Verification Queries
+-- ================================================================================
+
+-- Recent runs:
+-- SELECT started_at, trigger, status, released_count, chunks, duration_ms
+-- FROM allocation_cleanup_runs ORDER BY started_at DESC LIMIT 20;
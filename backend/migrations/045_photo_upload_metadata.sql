@@ -0,0 +1,35 @@
+-- ================================================================================
+-- Migration 045: Photo upload metadata
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: GRN and wastage photos are uploaded through the concurrent
+--              media pipeline (app/utils/media_upload.py), which records the
+--              stored byte size, pixel dimensions and content type.
+--
+--              GRN photos are stored under a content-hash file name, so a
+--              retried upload of the same photo lands on the same object;
+--              the unique (grn_id, photo_path) index makes the row insert a
+--              no-op for photos that were already recorded.
+-- ================================================================================
+
+ALTER TABLE grn_photos
+    ADD COLUMN IF NOT EXISTS width INTEGER,
+    ADD COLUMN IF NOT EXISTS height INTEGER,
+    ADD COLUMN IF NOT EXISTS content_type VARCHAR(50),
+    ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_grn_photos_grn_path
+    ON grn_photos(grn_id, photo_path);
+
+-- Photo checks during GRN finalization
+CREATE INDEX IF NOT EXISTS idx_grn_photos_grn_item_type
+    ON grn_photos(grn_id, item_id, photo_type);
+
+ALTER TABLE wastage_photos
+    ADD COLUMN IF NOT EXISTS width INTEGER,
+    ADD COLUMN IF NOT EXISTS height INTEGER,
+    ADD COLUMN IF NOT EXISTS content_type VARCHAR(50);
+
+COMMENT ON COLUMN grn_photos.file_size IS 'Stored object size in bytes (after downsizing)';
+COMMENT ON COLUMN grn_photos.content_hash IS 'SHA-256 of the stored bytes';
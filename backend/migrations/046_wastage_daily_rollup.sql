@@ -0,0 +1,59 @@
+-- ================================================================================
+-- Migration 046: Daily wastage rollup
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Wastage analytics (by farm, stage, product, trends) read a
+--              daily rollup instead of grouping wastage_events on every
+--              request. One row per IST day, farm, stage, product, wastage
+--              type, reason and cost allocation.
+--
+--              wastage_tracking_service.add_events_to_rollup adds new events
+--              in the transaction that inserts them (log_wastage_event, GRN
+--              finalization); reconcile_wastage_rollup rebuilds recent days
+--              from wastage_events on the scheduler, correcting any drift.
+--
+--              Key columns are NOT NULL so ON CONFLICT can match them:
+--              farm_id 0 = no purchase order / vendor, reason '' = none.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS wastage_daily_rollup (
+    day DATE NOT NULL,
+    farm_id INTEGER NOT NULL DEFAULT 0,
+    stage VARCHAR(50) NOT NULL,
+    item_name VARCHAR(255) NOT NULL,
+    wastage_type VARCHAR(100) NOT NULL,
+    reason TEXT NOT NULL DEFAULT '',
+    cost_allocation VARCHAR(20) NOT NULL,
+
+    event_count INTEGER NOT NULL DEFAULT 0,
+    total_quantity DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_cost DECIMAL(14, 2) NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (day, farm_id, stage, item_name, wastage_type, reason, cost_allocation)
+);
+
+CREATE INDEX IF NOT EXISTS idx_wastage_rollup_stage_day ON wastage_daily_rollup(stage, day);
+CREATE INDEX IF NOT EXISTS idx_wastage_rollup_item_day ON wastage_daily_rollup(item_name, day);
+CREATE INDEX IF NOT EXISTS idx_wastage_rollup_farm_day ON wastage_daily_rollup(farm_id, day);
+
+COMMENT ON TABLE wastage_daily_rollup IS 'Daily wastage totals (IST days) for analytics; rebuilt from wastage_events by reconcile_wastage_rollup';
+
+-- Backfill from existing events
+INSERT INTO wastage_daily_rollup (
+    day, farm_id, stage, item_name, wastage_type, reason, cost_allocation,
+    event_count, total_quantity, total_cost
+)
+SELECT
+    (we.created_at AT TIME ZONE 'Asia/Kolkata')::date,
+    COALESCE(po.vendor_id, 0),
+    we.stage, we.item_name, we.wastage_type, COALESCE(we.reason, ''), we.cost_allocation,
+    COUNT(*), SUM(we.quantity), COALESCE(SUM(we.estimated_cost), 0)
+FROM wastage_events we
+LEFT JOIN batches b ON b.id = we.batch_id
+LEFT JOIN purchase_orders po ON po.id = COALESCE(we.po_id, b.po_id)
+WHERE we.created_at IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5, 6, 7
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,65 @@
+-- ================================================================================
+-- Migration 047: Wastage threshold alerts
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Alerts raised by wastage_tracking_service.check_threshold_alerts.
+--              Every run evaluates all active wastage_thresholds in one
+--              statement: wastage from wastage_daily_rollup (migration 046)
+--              against quantities received on completed GRNs over the last
+--              WASTAGE_ALERT_WINDOW_DAYS days.
+--
+--              - Dedup: at most one active alert per threshold; while it
+--                stays above the threshold the same row is updated
+--              - Hysteresis: an alert resolves only once wastage falls below
+--                threshold * (1 - WASTAGE_ALERT_HYSTERESIS_PERCENT / 100),
+--                so values hovering at the threshold do not re-alert
+--
+--              Telegram delivery follows enable_inventory_notifications and
+--              the notify_wastage_alerts event toggle seeded below.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS wastage_alerts (
+    id SERIAL PRIMARY KEY,
+    threshold_id INTEGER NOT NULL REFERENCES wastage_thresholds(id) ON DELETE CASCADE,
+
+    -- Threshold as evaluated
+    alert_level VARCHAR(20) NOT NULL,
+    scope_type VARCHAR(50) NOT NULL,
+    scope_value VARCHAR(255),
+    stage VARCHAR(50),
+    threshold_percentage DECIMAL(5, 2) NOT NULL,
+
+    -- Latest evaluation
+    current_percentage DECIMAL(7, 2),
+    peak_percentage DECIMAL(7, 2),
+    wasted_quantity DECIMAL(14, 3) NOT NULL DEFAULT 0,
+    received_quantity DECIMAL(14, 3) NOT NULL DEFAULT 0,
+    window_days INTEGER NOT NULL,
+    message TEXT NOT NULL,
+
+    status VARCHAR(20) NOT NULL DEFAULT 'active',
+    triggered_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_evaluated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    resolved_at TIMESTAMP WITH TIME ZONE,
+    notified_at TIMESTAMP WITH TIME ZONE,
+
+    CONSTRAINT check_wastage_alert_status CHECK (status IN ('active', 'resolved'))
+);
+
+-- One active alert per threshold (dedup target of the evaluation upsert)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_wastage_alerts_active_threshold
+    ON wastage_alerts(threshold_id) WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_wastage_alerts_triggered ON wastage_alerts(triggered_at DESC);
+
+-- Received quantities per window (completed GRNs by receiving date)
+CREATE INDEX IF NOT EXISTS idx_grn_status_date ON grns(status, receiving_date);
+
+COMMENT ON TABLE wastage_alerts IS 'Wastage threshold alerts; one active row per threshold, resolved with hysteresis';
+
+-- Telegram event toggle (alongside the other inventory notification toggles)
+INSERT INTO notification_settings (setting_key, setting_value, setting_type, description)
+VALUES
+    ('notify_wastage_alerts', 'true', 'boolean', 'Send notification when a wastage threshold alert is raised')
+ON CONFLICT (setting_key) DO NOTHING;
@@ -0,0 +1,98 @@
+-- ================================================================================
+-- Migration 048: Batch lineage closure table
+-- ================================================================================
+-- Version: 1.0.0
+-- Created: 2026-10-18
+-- Description: Materialized repack lineage for traceability. batch_lineage
+--              holds one row per (ancestor, descendant) pair of the
+--              batches.parent_batch_id tree, including each batch with itself
+--              at depth 0, so all ancestors or all descendants of a batch
+--              are one index lookup instead of a walk one hop at a time.
+--
+--              Kept current by a trigger on batches (insert, and re-parent);
+--              batch_tracking_service.get_batch_trace reads it to return the
+--              full upstream/downstream graph in a single query.
+-- ================================================================================
+
+CREATE TABLE IF NOT EXISTS batch_lineage (
+    ancestor_id INTEGER NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+    descendant_id INTEGER NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id),
+    CONSTRAINT check_batch_lineage_depth CHECK (depth >= 0)
+);
+
+-- Upstream lookups (ancestors of a batch)
+CREATE INDEX IF NOT EXISTS idx_batch_lineage_descendant ON batch_lineage(descendant_id, depth);
+
+COMMENT ON TABLE batch_lineage IS 'Closure table of batch repack lineage (ancestor, descendant, hops)';
+
+-- Sales orders that took stock from a batch (trace downstream)
+CREATE INDEX IF NOT EXISTS idx_inventory_movements_batch_reference
+    ON inventory_movements(batch_id, reference_type, reference_id);
+
+CREATE OR REPLACE FUNCTION maintain_batch_lineage()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO batch_lineage (ancestor_id, descendant_id, depth)
+        SELECT NEW.id, NEW.id, 0
+        UNION ALL
+        SELECT l.ancestor_id, NEW.id, l.depth + 1
+        FROM batch_lineage l
+        WHERE l.descendant_id = NEW.parent_batch_id;
+        RETURN NULL;
+    END IF;
+
+    IF NEW.parent_batch_id IS NOT DISTINCT FROM OLD.parent_batch_id THEN
+        RETURN NULL;
+    END IF;
+
+    IF NEW.parent_batch_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM batch_lineage
+        WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_batch_id
+    ) THEN
+        RAISE EXCEPTION 'Batch % cannot descend from its own descendant %', NEW.id, NEW.parent_batch_id;
+    END IF;
+
+    -- Detach the subtree from its old ancestors
+    DELETE FROM batch_lineage l
+    USING batch_lineage anc, batch_lineage sub
+    WHERE anc.descendant_id = NEW.id AND anc.depth > 0
+      AND sub.ancestor_id = NEW.id
+      AND l.ancestor_id = anc.ancestor_id
+      AND l.descendant_id = sub.descendant_id;
+
+    -- Attach it under the new parent
+    INSERT INTO batch_lineage (ancestor_id, descendant_id, depth)
+    SELECT p.ancestor_id, s.descendant_id, p.depth + s.depth + 1
+    FROM batch_lineage p
+    JOIN batch_lineage s ON s.ancestor_id = NEW.id
+    WHERE p.descendant_id = NEW.parent_batch_id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_batches_lineage_insert ON batches;
+CREATE TRIGGER trg_batches_lineage_insert
+    AFTER INSERT ON batches
+    FOR EACH ROW EXECUTE FUNCTION maintain_batch_lineage();
+
+DROP TRIGGER IF EXISTS trg_batches_lineage_reparent ON batches;
+CREATE TRIGGER trg_batches_lineage_reparent
+    AFTER UPDATE OF parent_batch_id ON batches
+    FOR EACH ROW EXECUTE FUNCTION maintain_batch_lineage();
+
+-- Backfill existing batches
+WITH RECURSIVE paths AS (
+    SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+    FROM batches
+    UNION ALL
+    SELECT p.ancestor_id, b.id, p.depth + 1
+    FROM paths p
+    JOIN batches b ON b.parent_batch_id = p.descendant_id
+)
+INSERT INTO batch_lineage (ancestor_id, descendant_id, depth)
+SELECT ancestor_id, descendant_id, depth FROM paths
+ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
@@ -0,0 +1,71 @@
+"""
+Batch traceability query against a migrated database.
+
+Set TEST_DATABASE_URL to a database with the repo's migrations applied
+(through 048). Everything runs in a transaction that is rolled back.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+
+from app.services.batch_tracking_service import BATCH_TRACE_QUERY
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL not set")
+
+
+async def _trace_repacked_batch():
+    import asyncpg
+
+    conn = await asyncpg.connect(TEST_DATABASE_URL, statement_cache_size=0)
+    tx = conn.transaction()
+    await tx.start()
+    try:
+        suffix = uuid.uuid4().hex[:8]
+        vendor_id = await conn.fetchval(
+            """
+            INSERT INTO zoho_vendors (contact_id, contact_name)
+            VALUES ($1, $2) RETURNING id
+            """,
+            int(uuid.uuid4().int % 10**12), f"Trace Farm {suffix}"
+        )
+        po_id = await conn.fetchval(
+            """
+            INSERT INTO purchase_orders (po_number, vendor_id, dispatch_date, delivery_date)
+            VALUES ($1, $2, CURRENT_DATE, CURRENT_DATE) RETURNING id
+            """,
+            f"PO/TEST/{suffix}", vendor_id
+        )
+        parent_id = await conn.fetchval(
+            "INSERT INTO batches (batch_number, po_id) VALUES ($1, $2) RETURNING id",
+            f"B/TEST/{suffix}", po_id
+        )
+        await conn.execute(
+            """
+            INSERT INTO batches (batch_number, is_repacked, parent_batch_id, po_id)
+            VALUES ($1, TRUE, $2, $3)
+            """,
+            f"B/TEST/{suffix}R", parent_id, po_id
+        )
+
+        row = await conn.fetchrow(BATCH_TRACE_QUERY, f"B/TEST/{suffix}R")
+        return suffix, json.loads(row["batches"])
+    finally:
+        await tx.rollback()
+        await conn.close()
+
+
+def test_trace_returns_upstream_batch_with_farm():
+    suffix, batches = asyncio.run(_trace_repacked_batch())
+
+    assert [b["batch_number"] for b in batches] == [f"B/TEST/{suffix}", f"B/TEST/{suffix}R"]
+    assert [b["relation"] for b in batches] == ["upstream", "self"]
+    assert [b["depth"] for b in batches] == [-1, 0]
+    assert batches[0]["purchase_order"]["farm"] == f"Trace Farm {suffix}"
+    assert batches[1]["sales_orders"] == []
+    assert batches[1]["wastage"] == {"events": 0, "quantity": 0}
@@ -0,0 +1,41 @@
+"""
+Content hashes of the shared contact sync must not depend on the other
+records on the same page.
+"""
+
+import pandas as pd
+
+from app.services.contact_sync_service import _content_hashes, column, flatten_records
+
+COLUMNS = ["contact_id", "contact_name", "phone", "credit_limit"]
+
+
+def _frame(records):
+    df = flatten_records(records)
+    for name in COLUMNS:
+        df[name] = column(df, name)
+    return df
+
+
+def test_missing_field_hashes_the_same_with_or_without_other_records():
+    alone = _frame([{"contact_id": 1, "contact_name": "Farm A"}])
+    with_other = _frame([
+        {"contact_id": 1, "contact_name": "Farm A"},
+        {"contact_id": 2, "contact_name": "Farm B", "phone": "98400", "credit_limit": 2.5},
+    ])
+
+    assert _content_hashes(alone, COLUMNS).iloc[0] == _content_hashes(with_other, COLUMNS).iloc[0]
+
+
+def test_integral_numbers_hash_the_same_across_dtypes():
+    ints = pd.DataFrame({"contact_id": [1], "contact_name": ["A"], "phone": [None], "credit_limit": [5]})
+    floats = pd.DataFrame({"contact_id": [1.0], "contact_name": ["A"], "phone": [float("nan")], "credit_limit": [5.0]})
+
+    assert _content_hashes(ints, COLUMNS).iloc[0] == _content_hashes(floats, COLUMNS).iloc[0]
+
+
+def test_changed_value_changes_the_hash():
+    before = _frame([{"contact_id": 1, "contact_name": "Farm A", "credit_limit": 5}])
+    after = _frame([{"contact_id": 1, "contact_name": "Farm A", "credit_limit": 5.5}])
+
+    assert _content_hashes(before, COLUMNS).iloc[0] != _content_hashes(after, COLUMNS).iloc[0]
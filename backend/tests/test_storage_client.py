@@ -0,0 +1,22 @@
+"""
+Storage backends must implement every bucket operation of StorageClient.
+"""
+
+import pytest
+
+from app.utils.storage import LocalStorageClient, StorageClient
+
+
+def test_incomplete_backend_fails_when_created():
+    class UploadOnly(StorageClient):
+        async def upload(self, bucket, path, data, content_type="application/octet-stream", upsert=True):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        UploadOnly()
+
+
+def test_local_backend_implements_every_operation(tmp_path):
+    storage = LocalStorageClient(str(tmp_path), "http://localhost/storage")
+
+    assert storage.public_url("grn-photos", "a/b.jpg").endswith("/grn-photos/a/b.jpg")
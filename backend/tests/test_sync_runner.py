@@ -0,0 +1,35 @@
+"""
+A second start of a job on the same worker is reported as already running
+instead of queueing behind the first.
+"""
+
+import asyncio
+
+from app.services import sync_runner_service
+
+
+def test_second_start_on_same_worker_is_skipped(monkeypatch):
+    runs = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def run_locked(name, job, trigger, triggered_by, options):
+            runs.append(name)
+            await release.wait()
+            return {"added": 1}
+
+        monkeypatch.setattr(sync_runner_service, "_run_locked", run_locked)
+
+        first = asyncio.create_task(sync_runner_service.run_job("zoho_items"))
+        await asyncio.sleep(0)
+        second = await sync_runner_service.run_job("zoho_items")
+        release.set()
+        return await first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == {"added": 1}
+    assert second is None
+    assert runs == ["zoho_items"]
+    assert "zoho_items" not in sync_runner_service._running_jobs
@@ -0,0 +1,31 @@
+"""
+Wastage analytics responses must accept what the service builds.
+"""
+
+from app.schemas.wastage_tracking import (
+    WastageAnalyticsByProductResponse,
+    WastageProductAnalytics,
+)
+
+
+def test_product_analytics_accepts_named_problematic_stages():
+    product = WastageProductAnalytics(
+        item_name="Tomato",
+        total_wastage_kg=12.5,
+        total_cost=340.0,
+        wastage_percentage=0.0,
+        problematic_stages=[
+            {"stage": "receiving", "wastage_kg": 8.0},
+            {"stage": "grading", "wastage_kg": 4.5},
+        ],
+    )
+    response = WastageAnalyticsByProductResponse(
+        date_range={"from": "2026-10-01", "to": "2026-10-18"},
+        products=[product],
+    )
+
+    dumped = response.model_dump(mode="json")
+    assert dumped["products"][0]["problematic_stages"] == [
+        {"stage": "receiving", "wastage_kg": 8.0},
+        {"stage": "grading", "wastage_kg": 4.5},
+    ]
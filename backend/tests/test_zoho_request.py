@@ -0,0 +1,42 @@
+"""
+zoho_request resends once after refreshing an expired token, without using
+up a retry attempt.
+"""
+
+import asyncio
+
+import httpx
+
+from app.services import zoho_books_client
+
+
+def test_expired_token_is_refreshed_and_resent_without_retries(monkeypatch):
+    tokens = []
+    seen = []
+
+    async def get_api_config():
+        return {"base_url": "https://books.example.test/api/v3", "organization_id": "1"}
+
+    async def get_access_token(force_refresh=False):
+        tokens.append(force_refresh)
+        return "new" if force_refresh or len(tokens) > 2 else "expired"
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        if request.headers["Authorization"].endswith("expired"):
+            return httpx.Response(401, json={"message": "token expired"})
+        return httpx.Response(200, json={"items": []})
+
+    monkeypatch.setattr(zoho_books_client, "get_api_config", get_api_config)
+    monkeypatch.setattr(zoho_books_client, "get_access_token", get_access_token)
+    monkeypatch.setattr(zoho_books_client.settings, "ZOHO_MAX_RETRIES", 0)
+
+    async def call():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await zoho_books_client.zoho_request("GET", "/items", client=client)
+
+    response = asyncio.run(call())
+
+    assert response.status_code == 200
+    assert seen == ["Zoho-oauthtoken expired", "Zoho-oauthtoken new"]
+    assert tokens == [False, True, False]
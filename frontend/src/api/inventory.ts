@@ -120,6 +120,19 @@ export interface StockAvailabilityResponse {
     }[];
 }
 
+export interface StockAvailabilityLineResult extends StockAvailabilityResponse {
+    line_index: number;
+    location_filter?: string;
+    grade_filter?: string;
+}
+
+export interface StockAvailabilityBatchResponse {
+    lines: StockAvailabilityLineResult[];
+    all_available: boolean;
+    lines_short: number;
+    total_shortage: number;
+}
+
 export interface InventoryAdjustmentRequest {
     item_id: number;
     batch_id?: number;
@@ -222,6 +235,14 @@ export const inventoryAPI = {
         return response.data;
     },
 
+    /**
+     * Check stock availability for many order lines in one request
+     */
+    checkAvailabilityBatch: async (lines: StockAvailabilityQuery[]): Promise<StockAvailabilityBatchResponse> => {
+        const response = await apiClient.post('/inventory/availability/batch', { lines });
+        return response.data;
+    },
+
     /**
      * Get low stock items
      */
@@ -57,6 +57,8 @@ const POCreateForm: React.FC = () => {
     const { enqueueSnackbar } = useSnackbar();
 
     const [poNumber, setPoNumber] = useState('');
+    // Next number as previewed; only reserved by the backend when the PO is created
+    const [previewPoNumber, setPreviewPoNumber] = useState('');
     const [hsnMap, setHsnMap] = useState<Record<number, string>>({});
 
     const [loading, setLoading] = useState(false);
@@ -77,6 +79,7 @@ const POCreateForm: React.FC = () => {
                 try {
                     const nextPo = await purchaseOrdersAPI.getNextNumber();
                     setPoNumber(nextPo.po_number);
+                    setPreviewPoNumber(nextPo.po_number);
                 } catch (error) {
                     console.error('Failed to fetch next PO number:', error);
                     enqueueSnackbar('Could not generate PO number automatically', { variant: 'warning' });
@@ -254,16 +257,12 @@ const POCreateForm: React.FC = () => {
             return;
         }
 
-        if (!poNumber) {
-            enqueueSnackbar('PO Number is required', { variant: 'error' });
-            return;
-        }
-
         setLoading(true);
         try {
             const poData: POCreateRequest = {
                 vendor_id: vendorId!,
-                po_number: poNumber, // Add custom PO number
+                // Send only a number the user typed; the preview is reserved server-side
+                po_number: poNumber.trim() && poNumber.trim() !== previewPoNumber ? poNumber.trim() : undefined,
                 dispatch_date: dispatchDate,
                 delivery_date: deliveryDate,
                 items: items.map((item) => ({
@@ -312,13 +311,12 @@ const POCreateForm: React.FC = () => {
                 {/* PO Number (Top Row) */}
                 <Box sx={{ mb: 3 }}>
                     <TextField
-                        label="PO Number *"
+                        label="PO Number"
                         value={poNumber}
                         onChange={(e) => setPoNumber(e.target.value)}
                         placeholder="PO/YY[YY+1]/XXXX"
-                        helperText="Auto-generated but editable (Format: PO/2526/0001)"
+                        helperText="Next number shown; assigned on save unless edited (Format: PO/2526/0001)"
                         fullWidth
-                        required
                     />
                 </Box>
 
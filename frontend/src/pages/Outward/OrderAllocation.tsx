@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
     Box,
     Paper,
@@ -16,6 +16,7 @@ import AllocationGrid from './components/AllocationGrid';
 import StatisticsDashboard from './components/StatisticsDashboard';
 import InvoiceStatusList from './components/InvoiceStatusList';
 import { allocationApi } from '../../api';
+import websocketService from '../../services/websocket';
 
 interface TabPanelProps {
     children?: React.ReactNode;
@@ -52,6 +53,59 @@ export default function OrderAllocation() {
         }
     }, [selectedDate]);
 
+    // Patch changed cells into the grid: deltas pushed to this sheet's room,
+    // and the changed cells returned by this client's own writes (room
+    // deltas only reach clients connected to the worker that made the write)
+    const sheetRef = useRef<any>(null);
+    sheetRef.current = sheetData;
+    const sheetId = sheetData?.sheet_id;
+
+    const applyCellChanges = (delta: any) => {
+        const current = sheetRef.current;
+        if (!current || delta.sheet_id !== current.sheet_id) return;
+
+        // A cell for an item or customer not in the grid needs a full load
+        const itemIds = new Set(current.items.map((i: any) => i.id));
+        const customerIds = new Set(current.customers.map((c: any) => c.id));
+        if (delta.cells.some((c: any) => !itemIds.has(c.item_id) || !customerIds.has(c.customer_id))) {
+            handleRefresh();
+            return;
+        }
+
+        setSheetData((prev: any) => {
+            if (!prev || prev.sheet_id !== delta.sheet_id) return prev;
+
+            const removed = new Set(delta.removed || []);
+            const changed = new Map<number, any>(delta.cells.map((c: any) => [c.id, c]));
+            const cells = prev.cells
+                .filter((c: any) => !removed.has(c.id))
+                .map((c: any) => {
+                    const update = changed.get(c.id);
+                    changed.delete(c.id);
+                    // Ignore deltas older than what we already have
+                    return update && update.version >= c.version ? { ...c, ...update } : c;
+                });
+            return {
+                ...prev,
+                cells: [...cells, ...Array.from(changed.values())],
+                totals: delta.totals || prev.totals
+            };
+        });
+    };
+
+    useEffect(() => {
+        if (!sheetId) return;
+        const room = `allocation:${sheetId}`;
+        const handleCells = (delta: any) => applyCellChanges(delta);
+
+        websocketService.joinRoom(room);
+        websocketService.on('allocation.cells', handleCells);
+        return () => {
+            websocketService.off('allocation.cells', handleCells);
+            websocketService.leaveRoom(room);
+        };
+    }, [sheetId]);
+
     const loadSheetData = async (date: string) => {
         setLoading(true);
         setError(null);
@@ -136,6 +190,7 @@ export default function OrderAllocation() {
                         <AllocationGrid
                             sheetData={sheetData}
                             onRefresh={handleRefresh}
+                            onCellsChanged={applyCellChanges}
                         />
                     </TabPanel>
 
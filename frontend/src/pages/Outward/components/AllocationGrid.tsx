@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
     Box,
     Table,
@@ -28,9 +28,10 @@ import { toast } from 'react-toastify';
 interface AllocationGridProps {
     sheetData: any;
     onRefresh: () => void;
+    onCellsChanged: (delta: any) => void;
 }
 
-export default function AllocationGrid({ sheetData, onRefresh }: AllocationGridProps) {
+export default function AllocationGrid({ sheetData, onRefresh, onCellsChanged }: AllocationGridProps) {
     const [autoFilling, setAutoFilling] = useState(false);
     const [fullscreen, setFullscreen] = useState(false);
 
@@ -49,9 +50,11 @@ export default function AllocationGrid({ sheetData, onRefresh }: AllocationGridP
     const handleAutoFill = async () => {
         setAutoFilling(true);
         try {
-            await allocationApi.autoFillSheet(sheetData.sheet_id);
+            const result = await allocationApi.autoFillSheet(sheetData.sheet_id);
             toast.success('Auto-filled SENT quantities using FIFO');
-            onRefresh();
+            // Apply the changed cells from the response; the room broadcast
+            // may come from another worker's socket, or not at all
+            onCellsChanged({ sheet_id: sheetData.sheet_id, cells: result.cells, totals: result.totals });
         } catch (error: any) {
             toast.error(error.response?.data?.detail || 'Failed to auto-fill');
         } finally {
@@ -290,11 +293,13 @@ export default function AllocationGrid({ sheetData, onRefresh }: AllocationGridP
                                                     cell={cell}
                                                     field="order"
                                                     onRefresh={onRefresh}
+                                                    onCellsChanged={onCellsChanged}
                                                 />
                                                 <EditableCell
                                                     cell={cell}
                                                     field="sent"
                                                     onRefresh={onRefresh}
+                                                    onCellsChanged={onCellsChanged}
                                                 />
                                             </React.Fragment>
                                         );
@@ -317,20 +322,32 @@ interface EditableCellProps {
     cell: any;
     field: 'order' | 'sent';
     onRefresh: () => void;
+    onCellsChanged: (delta: any) => void;
 }
 
-function EditableCell({ cell, field, onRefresh }: EditableCellProps) {
+function EditableCell({ cell, field, onRefresh, onCellsChanged }: EditableCellProps) {
     const { value, updateValue, isUpdating, error } = useOptimisticCell({
         cellId: cell.id,
         initialValue: field === 'order' ? cell.order_quantity : (cell.sent_quantity || ''),
         version: cell.version,
         field: field,
-        onSuccess: onRefresh
+        onSuccess: (result: any) => onCellsChanged({
+            sheet_id: result.cell.sheet_id,
+            cells: [result.cell],
+            totals: result.totals
+        }),
+        onConflict: onRefresh
     });
 
     const [localValue, setLocalValue] = useState(String(value));
     const [isFocused, setIsFocused] = useState(false);
 
+    useEffect(() => {
+        if (!isFocused) {
+            setLocalValue(String(value));
+        }
+    }, [value]);
+
     const isShortfall = field === 'sent' && cell.has_shortfall;
     const isModified = field === 'order' && cell.order_modified;
 
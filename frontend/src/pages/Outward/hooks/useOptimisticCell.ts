@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { allocationApi } from '../../../api';
 
 interface UseOptimisticCellProps {
@@ -6,7 +6,8 @@ interface UseOptimisticCellProps {
     initialValue: number | string;
     version: number;
     field: 'order' | 'sent';
-    onSuccess?: () => void;
+    onSuccess?: (result: any) => void;
+    onConflict?: () => void;
 }
 
 export function useOptimisticCell({
@@ -14,13 +15,23 @@ export function useOptimisticCell({
     initialValue,
     version,
     field,
-    onSuccess
+    onSuccess,
+    onConflict
 }: UseOptimisticCellProps) {
     const [value, setValue] = useState(initialValue);
     const [currentVersion, setCurrentVersion] = useState(version);
     const [isUpdating, setIsUpdating] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
+    // Follow newer cell state pushed by the server (live grid deltas)
+    useEffect(() => {
+        if (!isUpdating && version > currentVersion) {
+            setValue(initialValue);
+            setCurrentVersion(version);
+            setError(null);
+        }
+    }, [initialValue, version]);
+
     const updateValue = async (newValue: number) => {
         // 1. Optimistic update (immediate UI change)
         const oldValue = value;
@@ -42,7 +53,7 @@ export function useOptimisticCell({
             setValue(field === 'order' ? result.cell.order_quantity : result.cell.sent_quantity);
 
             if (onSuccess) {
-                onSuccess();
+                onSuccess(result);
             }
         } catch (err: any) {
             // 4. Handle errors
@@ -54,8 +65,8 @@ export function useOptimisticCell({
                 setCurrentVersion(oldVersion);
 
                 // Trigger refresh to get latest data
-                if (onSuccess) {
-                    setTimeout(onSuccess, 500);
+                if (onConflict) {
+                    setTimeout(onConflict, 500);
                 }
             } else {
                 // Other errors - revert
@@ -27,6 +27,7 @@ class WebSocketService {
     private reconnectAttempts: number = 0;
     private readonly maxReconnectAttempts: number = 5;
     private pingInterval: NodeJS.Timeout | null = null;
+    private rooms: Set<string> = new Set();
 
     /**
      * Connect to WebSocket server
@@ -57,6 +58,9 @@ class WebSocketService {
             this.isConnecting = false;
             this.reconnectAttempts = 0;
 
+            // Server drops room membership with the connection
+            this.rooms.forEach(room => this.send({ type: 'join_room', room }));
+
             // Send ping every 30 seconds to keep alive
             this.pingInterval = setInterval(() => {
                 if (this.ws && this.ws.readyState === WebSocket.OPEN) {
@@ -195,11 +199,21 @@ class WebSocketService {
     }
 
     /**
-     * Join a room for group messaging
+     * Whether the socket is open
+     */
+    isConnected(): boolean {
+        return !!this.ws && this.ws.readyState === WebSocket.OPEN;
+    }
+
+    /**
+     * Join a room for group messaging (re-joined after reconnects)
      * @param {string} room - Room name
      */
     joinRoom(room: string): void {
-        this.send({ type: 'join_room', room });
+        this.rooms.add(room);
+        if (this.isConnected()) {
+            this.send({ type: 'join_room', room });
+        }
     }
 
     /**
@@ -207,7 +221,10 @@ class WebSocketService {
      * @param {string} room - Room name
      */
     leaveRoom(room: string): void {
-        this.send({ type: 'leave_room', room });
+        this.rooms.delete(room);
+        if (this.isConnected()) {
+            this.send({ type: 'leave_room', room });
+        }
     }
 }
 